@@ -0,0 +1,77 @@
+import argparse
+import logging
+import os
+import sys
+from dataclasses import dataclass
+
+from .harness import (
+    BENCHMARKS, SCALES, DEFAULT_THRESHOLD, run_benchmarks, compare, save_results, load_results,
+    format_result, format_comparison
+)
+from .standins import FakeInfluxDB, FakeRuleEngine
+
+# Runs the hot-path benchmarks against local stand-ins for InfluxDB and the
+# rule engine, so no external service is needed:
+#
+#   python -m benchmarks --scale default --output results.json
+#   python -m benchmarks --save-baseline benchmarks/baseline.json
+#   python -m benchmarks --baseline benchmarks/baseline.json   # exits 1 on regressions
+
+
+@dataclass
+class Backends:
+    influx: FakeInfluxDB
+    rule_engine: FakeRuleEngine
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Hermetic dashboard benchmarks')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='default')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--filter', help='Only run benchmarks whose name contains this')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--baseline', help='Compare against results saved by an earlier run')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Slowdown of the median, as a fraction, that counts as a regression')
+    parser.add_argument('--save-baseline', help='Write results to this file for later comparisons')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    backends = Backends(FakeInfluxDB().start(), FakeRuleEngine().start())
+    try:
+        # Settings are read when src is first imported, so the stand-ins go in first
+        os.environ['INFLUXDB_URL'] = backends.influx.url
+        os.environ['RULE_ENGINE_URL'] = backends.rule_engine.url
+        os.environ.setdefault('INFLUXDB_SLOW_QUERY_MS', '1e9')
+        logging.disable(logging.INFO)
+        from . import hot_paths  # noqa: F401
+
+        results = run_benchmarks(BENCHMARKS, SCALES[args.scale], backends, args.repeat, args.warmup, args.filter,
+                                 report=lambda result: print(format_result(result), flush=True))
+    finally:
+        backends.influx.stop()
+        backends.rule_engine.stop()
+
+    if args.output:
+        save_results(args.output, results, args.scale)
+    if args.save_baseline:
+        save_results(args.save_baseline, results, args.scale)
+    if not args.baseline:
+        return 0
+
+    comparisons = compare(results, load_results(args.baseline), args.threshold)
+    print()
+    for comparison in comparisons:
+        print(format_comparison(comparison))
+    regressions = [comparison for comparison in comparisons if comparison['status'] in ('regression', 'failed')]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%} or failed case(s)")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+import itertools
+import json
+import platform
+import statistics
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Parameter values per scale; each benchmark runs over the product of the axes
+# it uses. devices is per sensor type and points per device, so the largest
+# sensor query in 'large' decodes 32 * 1440 rows.
+SCALES = {
+    'quick': {'devices': [2], 'points': [60], 'rules': [2], 'leaves': [8]},
+    'default': {'devices': [2, 8], 'points': [60, 360], 'rules': [5], 'leaves': [8, 64]},
+    'large': {'devices': [8, 32], 'points': [360, 1440], 'rules': [5, 25], 'leaves': [64, 512]},
+}
+
+DEFAULT_THRESHOLD = 0.25
+
+
+@dataclass
+class Case:
+    # run is timed; reset, when given, runs untimed before every repetition
+    run: Callable[[], Any]
+    reset: Optional[Callable[[], Any]] = None
+
+
+@dataclass
+class Benchmark:
+    name: str
+    axes: Tuple[str, ...]
+    setup: Callable[..., Case]
+
+
+BENCHMARKS: List[Benchmark] = []
+
+
+def benchmark(name: str, *axes: str):
+    def register(setup):
+        BENCHMARKS.append(Benchmark(name, axes, setup))
+        return setup
+    return register
+
+
+def parameter_grid(axes: Tuple[str, ...], scale: Dict[str, List[int]]) -> List[Dict[str, int]]:
+    return [dict(zip(axes, values)) for values in itertools.product(*(scale[axis] for axis in axes))]
+
+
+def measure(case: Case, repeat: int = 5, warmup: int = 1) -> Dict[str, Any]:
+    timings = []
+    for iteration in range(warmup + repeat):
+        if case.reset is not None:
+            case.reset()
+        start = time.perf_counter()
+        case.run()
+        elapsed = time.perf_counter() - start
+        if iteration >= warmup:
+            timings.append(elapsed)
+    return {
+        'repeat': repeat,
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.fmean(timings),
+        'stdev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        'max': max(timings),
+    }
+
+
+def run_benchmarks(benchmarks: List[Benchmark], scale: Dict[str, List[int]], context: Any, repeat: int = 5,
+                   warmup: int = 1, selected: Optional[str] = None, report=None) -> List[Dict[str, Any]]:
+    results = []
+    for bench in benchmarks:
+        if selected and selected not in bench.name:
+            continue
+        for params in parameter_grid(bench.axes, scale):
+            try:
+                case = bench.setup(params, context)
+                result = {'name': bench.name, 'params': params, **measure(case, repeat, warmup)}
+            except Exception as e:
+                # One broken case is reported without losing the rest of the run
+                result = {'name': bench.name, 'params': params, 'error': f"{type(e).__name__}: {e}"}
+            results.append(result)
+            if report is not None:
+                report(result)
+    return results
+
+
+def result_key(result: Dict[str, Any]) -> str:
+    params = ",".join(f"{key}={value}" for key, value in sorted(result['params'].items()))
+    return f"{result['name']}[{params}]"
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]],
+            threshold: float = DEFAULT_THRESHOLD, metric: str = 'median') -> List[Dict[str, Any]]:
+    # metric, the median by default, is compared; a case is a regression when
+    # it got slower by more than threshold
+    previous = {result_key(result): result for result in baseline if result.get(metric) is not None}
+    comparisons = []
+    for result in results:
+        key = result_key(result)
+        before = previous.get(key)
+        if 'error' in result:
+            comparisons.append({'key': key, 'current': None, 'baseline': before and before[metric], 'ratio': None,
+                                'status': 'failed'})
+            continue
+        if before is None:
+            comparisons.append({'key': key, 'current': result[metric], 'baseline': None, 'ratio': None,
+                                'status': 'new'})
+            continue
+        ratio = result[metric] / before[metric] if before[metric] else float('inf')
+        status = 'regression' if ratio > 1 + threshold else 'improvement' if ratio < 1 / (1 + threshold) else 'ok'
+        comparisons.append({'key': key, 'current': result[metric], 'baseline': before[metric], 'ratio': ratio,
+                            'status': status})
+    return comparisons
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def save_results(path: str, results: List[Dict[str, Any]], scale: str):
+    with open(path, 'w') as f:
+        json.dump({'environment': environment(), 'scale': scale, 'results': results}, f, indent=2)
+        f.write("\n")
+
+
+def load_results(path: str) -> List[Dict[str, Any]]:
+    with open(path) as f:
+        return json.load(f)['results']
+
+
+def format_result(result: Dict[str, Any]) -> str:
+    if 'error' in result:
+        return f"{result_key(result):<64} failed: {result['error']}"
+    return (f"{result_key(result):<64} median {result['median'] * 1000:9.2f} ms  "
+            f"min {result['min'] * 1000:9.2f} ms  stdev {result['stdev'] * 1000:7.2f} ms")
+
+
+def format_comparison(comparison: Dict[str, Any]) -> str:
+    if comparison['status'] == 'failed':
+        return f"{comparison['key']:<64} failed"
+    if comparison['baseline'] is None:
+        return f"{comparison['key']:<64} {comparison['current'] * 1000:9.2f} ms  (new)"
+    return (f"{comparison['key']:<64} {comparison['baseline'] * 1000:9.2f} -> {comparison['current'] * 1000:9.2f} ms  "
+            f"x{comparison['ratio']:.2f}  {comparison['status']}")
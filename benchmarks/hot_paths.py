@@ -0,0 +1,141 @@
+import itertools
+
+from src.dashboard.callbacks import sensor_models, device_snapshot, rule_cache
+from src.dashboard.callbacks.charts import update_charts
+from src.dashboard.callbacks.sensor_devices import update_sensor_devices
+from src.dashboard.utils import condition_tree
+from src.dashboard.utils.condition_tree import (
+    tree_digests, render_condition_tree, remember_rendered_tree, condition_tree_update, update_condition_node
+)
+from src.rules import normalize_condition_tree, compile_condition_tree
+from .harness import Case, benchmark
+from .standins import SensorDataset, RuleEngineDataset, sensor_device_ids
+
+# Wide enough to return every reading of the largest dataset
+TIME_RANGE = '-30d'
+# Readings per sensor device behind the device cards, which only show the latest one
+CARD_POINTS = 60
+
+_sensor_datasets = {}
+
+
+def use_sensor_data(backends, devices, points):
+    # Datasets are seeded, so one per scale is built once and reused
+    key = (devices, points)
+    if key not in _sensor_datasets:
+        _sensor_datasets[key] = SensorDataset(devices, points)
+    backends.influx.dataset = _sensor_datasets[key]
+    # Readings cached from the previous dataset would be merged into this one's
+    for model in sensor_models:
+        if model.cache is not None:
+            model.cache.clear()
+    return _sensor_datasets[key]
+
+
+def condition_tree_of(leaves, depth=0, offset=0):
+    # Balanced tree alternating AND and OR over temperature and humidity leaves
+    if leaves == 1:
+        sensor_type = 'temperature' if offset % 2 == 0 else 'humidity'
+        return {'type': 'condition', 'sensor_device': sensor_device_ids(sensor_type, 4)[offset % 4],
+                'operator': 'gte' if offset % 3 else 'lt', 'value': 20 + offset % 10}
+    left = leaves // 2
+    return {
+        'type': 'and' if depth % 2 == 0 else 'or',
+        'left': condition_tree_of(left, depth + 1, offset),
+        'right': condition_tree_of(leaves - left, depth + 1, offset + left),
+    }
+
+
+def leaf_ids(tree, node_id='root'):
+    if tree.get('type') == 'condition':
+        return [node_id]
+    return [leaf for key in ['left', 'right', 'child'] if key in tree
+            for leaf in leaf_ids(tree[key], f"{node_id}_{key}")]
+
+
+def clear_render_caches():
+    with condition_tree._render_lock:
+        condition_tree._render_cache.clear()
+        condition_tree._rendered_trees.clear()
+
+
+@benchmark('sensor_data.fetch', 'devices', 'points')
+def sensor_data_fetch(params, backends):
+    # HTTP round trip to the stand-in and annotated-CSV decoding into a frame
+    use_sensor_data(backends, params['devices'], params['points'])
+    model = sensor_models[0]
+    query = model.sensor_data_query(TIME_RANGE)
+    return Case(lambda: model._query_frame('benchmark', query))
+
+
+@benchmark('sensor_data.get', 'devices', 'points')
+def sensor_data_get(params, backends):
+    # The fetch plus timestamp conversion and per-device dedup
+    use_sensor_data(backends, params['devices'], params['points'])
+    model = sensor_models[0]
+    return Case(lambda: model.get_sensor_data(TIME_RANGE))
+
+
+@benchmark('charts.update_charts', 'devices', 'points')
+def charts_update(params, backends):
+    dataset = use_sensor_data(backends, params['devices'], params['points'])
+    selected = dataset.device_ids
+    # The callback logs its own exceptions and returns hidden placeholder figures
+    _, _, line_style, _ = update_charts(TIME_RANGE, 0, selected, 'charts')
+    if line_style != {'display': 'block'}:
+        raise RuntimeError("update_charts fell back to its error figures; see the log above")
+    return Case(lambda: update_charts(TIME_RANGE, 0, selected, 'charts'))
+
+
+@benchmark('sensor_devices.update_sensor_devices', 'devices', 'rules')
+def sensor_devices_update(params, backends):
+    dataset = use_sensor_data(backends, params['devices'], CARD_POINTS)
+    backends.rule_engine.dataset = RuleEngineDataset(params['devices'], params['rules'], dataset.device_ids)
+    rule_cache.invalidate()
+    device_snapshot.sync(force=True)
+    return Case(lambda: update_sensor_devices(0))
+
+
+@benchmark('condition_tree.digests', 'leaves')
+def condition_tree_digests(params, backends):
+    tree = condition_tree_of(params['leaves'])
+    return Case(lambda: tree_digests(tree))
+
+
+@benchmark('condition_tree.render_cold', 'leaves')
+def condition_tree_render_cold(params, backends):
+    tree = condition_tree_of(params['leaves'])
+    return Case(lambda: render_condition_tree(tree), reset=clear_render_caches)
+
+
+@benchmark('condition_tree.render_cached', 'leaves')
+def condition_tree_render_cached(params, backends):
+    tree = condition_tree_of(params['leaves'])
+    return Case(lambda: render_condition_tree(tree))
+
+
+@benchmark('condition_tree.edit_patch', 'leaves')
+def condition_tree_edit_patch(params, backends):
+    # One leaf edited and the display patched against the tree the browser shows
+    tree = condition_tree_of(params['leaves'])
+    leaves = itertools.cycle(leaf_ids(tree))
+    values = itertools.count()
+    state = {}
+
+    def reset():
+        state['digest'] = remember_rendered_tree(tree)
+        state['edited'] = update_condition_node(tree, next(leaves), {'value': next(values)})
+
+    return Case(lambda: condition_tree_update(state['edited'], state['digest']), reset=reset)
+
+
+@benchmark('condition_tree.normalize', 'leaves')
+def condition_tree_normalize(params, backends):
+    tree = condition_tree_of(params['leaves'])
+    return Case(lambda: normalize_condition_tree(tree))
+
+
+@benchmark('condition_tree.compile', 'leaves')
+def condition_tree_compile(params, backends):
+    tree = condition_tree_of(params['leaves'])
+    return Case(lambda: compile_condition_tree(tree))
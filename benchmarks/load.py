@@ -0,0 +1,845 @@
+import argparse
+import copy
+import itertools
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import requests
+
+from .harness import compare, save_results, load_results, format_comparison
+from .standins import FakeInfluxDB, FakeRuleEngine, SensorDataset, RuleEngineDataset, FAILURE_MODES
+
+# Multi-session load test. Each simulated browser loads the layout, keeps the
+# component tree and fires callbacks through /_dash-update-component the way
+# the Dash renderer does: when an input changes, when new components appear
+# and on every interval tick, with clientside callbacks emulated locally.
+# Sessions follow scripted user flows over the dashboard's tabs and rule
+# editor, and the number of sessions is raised level by level to find where
+# the server saturates:
+#
+#   python -m benchmarks.load --sessions 1,5,10,25 --duration 30
+#   python -m benchmarks.load --influx-latency 0.05 --rule-engine-failures 0.02
+#   python -m benchmarks.load --url http://localhost:8050   # an already running dashboard
+
+DEFAULT_MIX = 'sensors=4,charts=3,actionable=2,rules=1'
+# Concurrent requests per session, as browsers allow per host over HTTP/1.1
+BROWSER_CONNECTIONS = 6
+# Callback chains deeper than this are cut off, like a renderer stuck in a loop would be
+MAX_CASCADE_DEPTH = 16
+# A level is saturated when any callback's median is this many times its lowest-level median,
+# and at least SATURATION_MIN_DELAY seconds slower, so millisecond callbacks do not count
+SATURATION_SLOWDOWN = 3.0
+SATURATION_MIN_DELAY = 0.05
+# p99 latency is noisy under load, so regressions need a larger slowdown than the hot-path benchmarks
+LOAD_THRESHOLD = 0.5
+WILDCARDS = (['ALL'], ['MATCH'], ['ALLSMALLER'])
+
+NO_UPDATE = object()
+
+
+class ScenarioError(Exception):
+    pass
+
+
+def stringify_id(component_id) -> str:
+    # Same encoding as dash's, used in changedPropIds and response keys
+    if isinstance(component_id, dict):
+        return "{" + ",".join(f"{json.dumps(key)}:{json.dumps(component_id[key])}" for key in sorted(component_id)) + "}"
+    return component_id
+
+
+def parse_id(component_id):
+    # The callback graph sends pattern-matching ids as JSON
+    return json.loads(component_id) if isinstance(component_id, str) and component_id.startswith('{') else component_id
+
+
+def parse_outputs(output: str) -> List[Dict[str, Any]]:
+    # "..a.x...b.y.." for several outputs, "a.x" for one; a property may carry an @hash
+    parts = output[2:-2].split('...') if output.startswith('..') else [output]
+    outputs = []
+    for part in parts:
+        component_id, prop = part.rsplit('.', 1)
+        outputs.append({'id': parse_id(component_id), 'property': prop})
+    return outputs
+
+
+def clean_property(prop: str) -> str:
+    return prop.split('@')[0]
+
+
+def callback_name(dependency: Dict[str, Any]) -> str:
+    return ",".join(f"{stringify_id(output['id'])}.{clean_property(output['property'])}"
+                    for output in parse_outputs(dependency['output']))
+
+
+def is_wildcard(component_id) -> bool:
+    return isinstance(component_id, dict) and any(value in WILDCARDS for value in component_id.values())
+
+
+def matches(pattern, component_id) -> bool:
+    if not isinstance(pattern, dict) or not isinstance(component_id, dict) or pattern.keys() != component_id.keys():
+        return False
+    return all(value in WILDCARDS or component_id[key] == value for key, value in pattern.items())
+
+
+def is_component(value) -> bool:
+    return isinstance(value, dict) and 'props' in value and 'type' in value and 'namespace' in value
+
+
+def walk_components(value) -> Iterator[Dict[str, Any]]:
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        if is_component(value):
+            yield value
+            stack.extend((value.get('props') or {}).values())
+        elif isinstance(value, list):
+            stack.extend(value)
+
+
+def apply_patch(value, operations: List[Dict[str, Any]]):
+    # Applies a serialized dash.Patch the way the renderer does
+    value = copy.deepcopy(value)
+    for operation in operations:
+        location, params, name = operation['location'], operation.get('params', {}), operation['operation']
+        if name == 'Assign' and not location:
+            value = params['value']
+            continue
+        parent = value
+        for key in location[:-1]:
+            parent = parent[key]
+        target = parent[location[-1]] if location else value
+        if name == 'Assign':
+            parent[location[-1]] = params['value']
+        elif name == 'Delete':
+            del parent[location[-1]]
+        elif name == 'Merge':
+            target.update(params['value'])
+        elif name == 'Extend':
+            target.extend(params['value'])
+        elif name == 'Append':
+            target.append(params['value'])
+        elif name == 'Prepend':
+            target.insert(0, params['value'])
+        elif name == 'Insert':
+            target.insert(params['index'], params['value'])
+        elif name == 'Clear':
+            target.clear()
+        elif name == 'Reverse':
+            target.reverse()
+        elif name == 'Remove':
+            target.remove(params['value'])
+        elif name in ('Add', 'Sub', 'Mul', 'Div'):
+            operand = params['value']
+            result = {'Add': lambda a: a + operand, 'Sub': lambda a: a - operand, 'Mul': lambda a: a * operand,
+                      'Div': lambda a: a / operand}[name](target)
+            if location:
+                parent[location[-1]] = result
+            else:
+                value = result
+        else:
+            raise ValueError(f"Unsupported patch operation {name}")
+    return value
+
+
+# Clientside callbacks from assets/clientside.js, by function name. Each takes
+# the input and state values and the triggering id and returns one value per output.
+
+def _close_modal(args, triggered):
+    return [{'display': 'none'}] if args[0] else [NO_UPDATE]
+
+
+def _switch_tab(args, triggered):
+    tabs = {'nav-sensors': 'sensors', 'nav-charts': 'charts', 'nav-actionable': 'actionable'}
+    active = tabs.get(triggered, 'sensors')
+    return [active] + ['nav-button active' if tab == active else 'nav-button' for tab in tabs.values()]
+
+
+def _open_edit_modal(args, triggered):
+    clicks, tree = args
+    if not any(clicks or []) or not isinstance(triggered, dict):
+        return [NO_UPDATE] * 3
+    return [{'display': 'block'}, triggered['node_id'], tree]
+
+
+CLIENTSIDE = {
+    'close_modal': _close_modal,
+    'switch_tab': _switch_tab,
+    'open_edit_modal': _open_edit_modal,
+}
+
+
+def percentile(samples: List[float], fraction: float) -> Optional[float]:
+    # samples must be sorted
+    return samples[int(fraction * (len(samples) - 1))] if samples else None
+
+
+class LoadStats:
+    # Latencies and failures of every request the sessions of one level make
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.error_kinds: Counter = Counter()
+        self.ticks: List[float] = []
+        self.late_ticks = 0
+        self.script_errors: Counter = Counter()
+        self.interval: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float, error: Optional[str] = None):
+        with self._lock:
+            self.latencies[name].append(seconds)
+            if error is not None:
+                self.errors[name] += 1
+                self.error_kinds[error] += 1
+
+    def record_tick(self, seconds: float, late: int = 0):
+        with self._lock:
+            self.ticks.append(seconds)
+            self.late_ticks += late
+
+    def script_error(self, scenario: str, message: str):
+        with self._lock:
+            self.script_errors[f"{scenario}: {message}"] += 1
+
+    def summary(self, sessions: int, elapsed: float) -> Dict[str, Any]:
+        with self._lock:
+            latencies = {name: sorted(samples) for name, samples in self.latencies.items()}
+            errors = dict(self.errors)
+            ticks = sorted(self.ticks)
+        every = sorted(itertools.chain.from_iterable(latencies.values()))
+        total_errors = sum(errors.values())
+        return {
+            'sessions': sessions,
+            'elapsed': elapsed,
+            'interval': self.interval,
+            'requests': len(every),
+            'throughput': len(every) / elapsed if elapsed else 0.0,
+            'errors': total_errors,
+            'error_rate': total_errors / len(every) if every else 0.0,
+            'p50': percentile(every, 0.5),
+            'p99': percentile(every, 0.99),
+            'ticks': len(ticks),
+            'tick_p99': percentile(ticks, 0.99),
+            'late_ticks': self.late_ticks,
+            'error_kinds': dict(self.error_kinds),
+            'script_errors': dict(self.script_errors),
+            'callbacks': {name: {
+                'count': len(samples),
+                'errors': errors.get(name, 0),
+                'p50': percentile(samples, 0.5),
+                'p99': percentile(samples, 0.99),
+            } for name, samples in sorted(latencies.items())},
+        }
+
+
+class DashSession:
+    # One browser tab: the layout as JSON, with the props of every component
+    # that has an id indexed by its stringified id. Values sent to the server,
+    # children included, are read from the tree, so they reflect every update.
+    def __init__(self, url: str, stats: LoadStats, http: Optional[requests.Session] = None,
+                 connections: int = BROWSER_CONNECTIONS, timeout: float = 30.0):
+        self.url = url.rstrip('/')
+        self.stats = stats
+        self.http = http or requests.Session()
+        self.timeout = timeout
+        self.layout = None
+        self.dependencies: List[Dict[str, Any]] = []
+        self.components: Dict[str, Dict[str, Any]] = {}
+        self.ids: Dict[str, Any] = {}
+        self._pool = ThreadPoolExecutor(connections, thread_name_prefix='dash-session')
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        self.http.close()
+
+    def get(self, path: str):
+        start = time.perf_counter()
+        try:
+            response = self.http.get(self.url + path, timeout=self.timeout)
+        except requests.RequestException as e:
+            self.stats.record(f"GET {path}", time.perf_counter() - start, type(e).__name__)
+            raise ScenarioError(f"GET {path} failed: {type(e).__name__}")
+        error = None if response.status_code == 200 else f"HTTP {response.status_code}"
+        self.stats.record(f"GET {path}", time.perf_counter() - start, error)
+        if error:
+            raise ScenarioError(f"GET {path} failed: {error}")
+        return response.json()
+
+    def load(self):
+        # A page load: layout and callback graph, then the initial callbacks
+        self.components.clear()
+        self.ids.clear()
+        self.layout = self.get('/_dash-layout')
+        self.dependencies = [dict(dependency, **{
+            group: [dict(item, id=parse_id(item['id'])) for item in dependency[group]] for group in ['inputs', 'state']
+        }) for dependency in self.get('/_dash-dependencies')]
+        self.cascade(set(), self._register(self.layout))
+
+    def has(self, component_id) -> bool:
+        return stringify_id(component_id) in self.components
+
+    def value(self, component_id, prop: str, default=None):
+        props = self.components.get(stringify_id(component_id))
+        return default if props is None else props.get(prop, default)
+
+    def find(self, component_type: str) -> List[Any]:
+        # Ids of the rendered pattern-matching components of one type
+        return [component_id for component_id in self.ids.values()
+                if isinstance(component_id, dict) and component_id.get('type') == component_type]
+
+    def interact(self, changes: Dict[Tuple[Any, str], Any]):
+        # A user changing props, followed by every callback that fires as a result
+        added = []
+        for (component_id, prop), value in changes.items():
+            key = stringify_id(component_id)
+            if key not in self.components:
+                raise ScenarioError(f"{key} is not rendered")
+            added.extend(self._set(key, prop, value))
+        self.cascade({(stringify_id(component_id), prop) for component_id, prop in changes}, added)
+
+    def click(self, component_id):
+        key = stringify_id(component_id)
+        clicks = self.value(key, 'n_clicks') or 0
+        self.interact({(key, 'n_clicks'): clicks + 1, (key, 'n_clicks_timestamp'): int(time.time() * 1000)})
+
+    def tick(self, interval_id: str = 'interval-component'):
+        self.interact({(interval_id, 'n_intervals'): (self.value(interval_id, 'n_intervals') or 0) + 1})
+
+    def cascade(self, changed: Set[Tuple[str, str]], added: List[str]):
+        for _ in range(MAX_CASCADE_DEPTH):
+            ready = self._triggered(changed, set(added))
+            if not ready:
+                return
+            changed, added = set(), []
+            server = [(dependency, triggers, self._pool.submit(self._call, dependency, self._payload(dependency, triggers)))
+                      for dependency, triggers in ready if not dependency.get('clientside_function')]
+            updates = [self._clientside(dependency, triggers)
+                       for dependency, triggers in ready if dependency.get('clientside_function')]
+            updates.extend(future.result() for _, _, future in server)
+            for update in updates:
+                for key, props in update.items():
+                    if key not in self.components:
+                        continue
+                    for prop, value in props.items():
+                        if isinstance(value, dict) and value.get('__dash_patch_update'):
+                            value = apply_patch(self.components[key].get(prop), value['operations'])
+                        added.extend(self._set(key, prop, value))
+                        changed.add((key, prop))
+        self.stats.script_error('cascade', f"deeper than {MAX_CASCADE_DEPTH} callbacks")
+
+    def _register(self, value) -> List[str]:
+        added = []
+        for component in walk_components(value):
+            props = component.setdefault('props', {})
+            if 'id' in props:
+                key = stringify_id(props['id'])
+                self.components[key] = props
+                self.ids[key] = props['id']
+                added.append(key)
+        return added
+
+    def _unregister(self, value):
+        for component in walk_components(value):
+            props = component.get('props') or {}
+            if 'id' in props:
+                key = stringify_id(props['id'])
+                if self.components.get(key) is props:
+                    del self.components[key]
+                    del self.ids[key]
+
+    def _set(self, key: str, prop: str, value) -> List[str]:
+        props = self.components[key]
+        self._unregister(props.get(prop))
+        props[prop] = value
+        return self._register(value)
+
+    def _present(self, component_id) -> bool:
+        return is_wildcard(component_id) or stringify_id(component_id) in self.components
+
+    def _triggered(self, changed: Set[Tuple[str, str]], added: Set[str]) -> List[Tuple[Dict[str, Any], List[str]]]:
+        # Callbacks to fire, with the props that triggered them. Like the
+        # renderer, a callback runs only while its outputs, inputs and state
+        # are all rendered, and when components it reads or writes appear
+        # unless prevent_initial_call.
+        ready = []
+        for dependency in self.dependencies:
+            outputs = parse_outputs(dependency['output'])
+            if not all(self._present(output['id']) for output in outputs):
+                continue
+            if not all(self._present(item['id']) for item in dependency['inputs'] + dependency['state']):
+                continue
+            triggers = []
+            initial = any(stringify_id(output['id']) in added for output in outputs)
+            for item in dependency['inputs']:
+                keys = ([key for key, component_id in self.ids.items() if matches(item['id'], component_id)]
+                        if is_wildcard(item['id']) else [stringify_id(item['id'])])
+                triggers.extend(f"{key}.{item['property']}" for key in keys if (key, item['property']) in changed)
+                initial = initial or any(key in added for key in keys)
+            if triggers or (initial and not dependency.get('prevent_initial_call')):
+                ready.append((dependency, triggers))
+        return ready
+
+    def _argument(self, item: Dict[str, Any]):
+        if is_wildcard(item['id']):
+            return [{'id': component_id, 'property': item['property'],
+                     'value': self.components[key].get(item['property'])}
+                    for key, component_id in self.ids.items() if matches(item['id'], component_id)]
+        return {'id': item['id'], 'property': item['property'],
+                'value': self.components[stringify_id(item['id'])].get(item['property'])}
+
+    def _payload(self, dependency: Dict[str, Any], triggers: List[str]) -> Dict[str, Any]:
+        outputs = parse_outputs(dependency['output'])
+        return {
+            'output': dependency['output'],
+            'outputs': outputs if dependency['output'].startswith('..') else outputs[0],
+            'inputs': [self._argument(item) for item in dependency['inputs']],
+            'state': [self._argument(item) for item in dependency['state']],
+            'changedPropIds': triggers,
+        }
+
+    def _call(self, dependency: Dict[str, Any], payload: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        # Runs on the session's connection pool; returns {id: {prop: value}}
+        name = callback_name(dependency)
+        start = time.perf_counter()
+        try:
+            response = self.http.post(self.url + '/_dash-update-component', json=payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            self.stats.record(name, time.perf_counter() - start, type(e).__name__)
+            return {}
+        elapsed = time.perf_counter() - start
+        # 204 is PreventUpdate
+        if response.status_code == 204:
+            self.stats.record(name, elapsed)
+            return {}
+        if response.status_code != 200:
+            self.stats.record(name, elapsed, f"HTTP {response.status_code}")
+            return {}
+        self.stats.record(name, elapsed)
+        body = response.json()
+        update = dict(body.get('response') or {})
+        for key, props in (body.get('sideUpdate') or {}).items():
+            update[key] = dict(update.get(key, {}), **props)
+        return update
+
+    def _clientside(self, dependency: Dict[str, Any], triggers: List[str]) -> Dict[str, Dict[str, Any]]:
+        function = CLIENTSIDE.get(dependency['clientside_function']['function_name'])
+        if function is None:
+            self.stats.script_error('clientside', f"{dependency['clientside_function']['function_name']} is not emulated")
+            return {}
+        args = []
+        for item in dependency['inputs'] + dependency['state']:
+            argument = self._argument(item)
+            args.append([entry['value'] for entry in argument] if isinstance(argument, list) else argument['value'])
+        triggered = self.ids.get(triggers[0].rsplit('.', 1)[0]) if triggers else None
+        update = defaultdict(dict)
+        for output, value in zip(parse_outputs(dependency['output']), function(args, triggered)):
+            if value is not NO_UPDATE:
+                update[stringify_id(output['id'])][clean_property(output['property'])] = value
+        return update
+
+
+# Scenarios are generators driving one session. They act on the session and
+# yield how long the user thinks before the next step; interval ticks keep
+# firing in between, as they do in a browser left open.
+
+def browse_sensors(session: DashSession, think: Callable[..., float], rng: random.Random):
+    # The sensors tab is the landing page, so this user just leaves it open
+    return
+    yield
+
+
+def browse_charts(session: DashSession, think: Callable[..., float], rng: random.Random):
+    session.click('nav-charts')
+    yield think()
+    options = session.value('device-dropdown', 'options')
+    if not options:
+        raise ScenarioError("device dropdown has no options")
+    session.interact({('device-dropdown', 'value'): [option['value'] for option in options[:2]]})
+    for option in itertools.cycle(session.value('time-range-dropdown', 'options') or []):
+        yield think(6)
+        session.interact({('time-range-dropdown', 'value'): option['value']})
+
+
+def browse_actionable(session: DashSession, think: Callable[..., float], rng: random.Random):
+    session.click('nav-actionable')
+    while True:
+        yield think(6)
+        buttons = session.find('view-rules-button')
+        if not buttons:
+            raise ScenarioError("no View Rules buttons")
+        session.click(rng.choice(buttons))
+        yield think(2)
+        session.click('close-rules-modal')
+
+
+def edit_rules(session: DashSession, think: Callable[..., float], rng: random.Random):
+    # Creates a rule: opens the editor, grows and edits the condition tree,
+    # picks an action and saves
+    session.click('nav-actionable')
+    for number in itertools.count(1):
+        yield think()
+        buttons = session.find('rule-button')
+        if not buttons:
+            raise ScenarioError("no Create Rule buttons")
+        session.click(rng.choice(buttons))
+        yield think()
+        session.click('add-and-btn')
+        yield think()
+        leaves = session.find('edit-node')
+        if not leaves:
+            raise ScenarioError("condition tree has no editable nodes")
+        # Every leaf needs a sensor, operator and value before the rule saves
+        for leaf in sorted(leaves, key=stringify_id):
+            session.click(leaf)
+            yield think()
+            for component_id in ['edit-sensor-device', 'edit-operator']:
+                select(session, component_id, rng)
+                yield think(0.5)
+            session.interact({('edit-value', 'value'): rng.randrange(15, 30)})
+            yield think(0.5)
+            session.click('save-edit-button')
+            yield think()
+        session.interact({('rule-name-input', 'value'): f"Load test rule {number}"})
+        select(session, 'action-capability-dropdown', rng)
+        yield think(0.5)
+        select(session, 'action-type-dropdown', rng)
+        yield think()
+        session.click('save-rule-button')
+        yield think(3)
+
+
+def select(session: DashSession, component_id: str, rng: random.Random):
+    options = session.value(component_id, 'options')
+    if not options:
+        raise ScenarioError(f"{component_id} has no options")
+    option = rng.choice(options)
+    session.interact({(component_id, 'value'): option['value'] if isinstance(option, dict) else option})
+
+
+SCENARIOS = {
+    'sensors': browse_sensors,
+    'charts': browse_charts,
+    'actionable': browse_actionable,
+    'rules': edit_rules,
+}
+
+
+def parse_mix(text: str) -> Dict[str, int]:
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in SCENARIOS:
+            raise ValueError(f"Unknown scenario {name.strip()!r}; expected one of {', '.join(SCENARIOS)}")
+        mix[name.strip()] = int(weight or 1)
+    return mix
+
+
+def expand_mix(mix: Dict[str, int]) -> List[str]:
+    # Smooth weighted round robin, so small session counts still get every scenario
+    total = sum(mix.values())
+    current = dict.fromkeys(mix, 0)
+    order = []
+    for _ in range(total):
+        for name, weight in mix.items():
+            current[name] += weight
+        chosen = max(current, key=current.get)
+        current[chosen] -= total
+        order.append(chosen)
+    return order
+
+
+def run_session(session: DashSession, scenario: str, stop_at: float, think_seconds: float, seed: int):
+    rng = random.Random(seed)
+
+    def think(steps: float = 1.0) -> float:
+        return steps * think_seconds * rng.uniform(0.5, 1.5)
+
+    stats = session.stats
+    steps = None
+    interval = next_tick = wake = 0.0
+    while True:
+        now = time.monotonic()
+        if now >= stop_at:
+            return
+        try:
+            if steps is None:
+                if now < wake:
+                    time.sleep(min(wake, stop_at) - now)
+                    continue
+                session.load()
+                steps = SCENARIOS[scenario](session, think, rng)
+                interval = (session.value('interval-component', 'interval') or 5000) / 1000
+                stats.interval = interval
+                next_tick = time.monotonic() + interval
+                wake = time.monotonic()
+            elif now >= next_tick:
+                # Ticks missed while the previous cascade ran are skipped, as dcc.Interval does
+                late = int((now - next_tick) // interval)
+                next_tick += (late + 1) * interval
+                start = time.perf_counter()
+                session.tick()
+                stats.record_tick(time.perf_counter() - start, late)
+            elif now >= wake:
+                wake = now + next(steps)
+            else:
+                time.sleep(min(next_tick, wake, stop_at) - now)
+        except StopIteration:
+            wake = float('inf')
+        except Exception as e:
+            # The user starts over from a fresh page load after a moment
+            stats.script_error(scenario, str(e) if isinstance(e, ScenarioError) else f"{type(e).__name__}: {e}")
+            steps = None
+            wake = time.monotonic() + think()
+
+
+def run_level(url: str, sessions: int, duration: float, mix: List[str], think: float = 2.0, ramp: float = 5.0,
+              seed: int = 1, connections: int = BROWSER_CONNECTIONS, timeout: float = 30.0) -> Dict[str, Any]:
+    # Sessions arrive evenly over ramp seconds and all stop after duration
+    stats = LoadStats()
+    start = time.monotonic()
+    stop_at = start + duration
+    threads = []
+    browsers = []
+    for index in range(sessions):
+        delay = ramp * index / sessions
+        session = DashSession(url, stats, connections=connections, timeout=timeout)
+        browsers.append(session)
+
+        def begin(session=session, scenario=mix[index % len(mix)], delay=delay, index=index):
+            time.sleep(delay)
+            run_session(session, scenario, stop_at, think, seed + index)
+
+        thread = threading.Thread(target=begin, name=f"session-{index}", daemon=True)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join(duration + timeout * MAX_CASCADE_DEPTH)
+    elapsed = time.monotonic() - start
+    for session in browsers:
+        session.close()
+    return stats.summary(sessions, elapsed)
+
+
+def saturation(levels: List[Dict[str, Any]], max_error_rate: float = 0.01) -> Tuple[Optional[int], List[str]]:
+    # The first level that fails requests, cannot finish a tick's callbacks
+    # within the interval, or has a callback queueing to several times its
+    # median at the lowest level it ran at
+    baseline: Dict[str, float] = {}
+    for level in levels:
+        reasons = []
+        if level['error_rate'] > max_error_rate:
+            reasons.append(f"error rate {level['error_rate']:.1%}")
+        if level['interval'] and level['tick_p99'] is not None and level['tick_p99'] > level['interval']:
+            reasons.append(f"tick p99 {level['tick_p99'] * 1000:.0f} ms over the {level['interval'] * 1000:.0f} ms interval")
+        if level['late_ticks']:
+            reasons.append(f"{level['late_ticks']} late tick(s)")
+        slowdowns = []
+        for name, callback in level['callbacks'].items():
+            before = baseline.setdefault(name, callback['p50'])
+            if (before and callback['p50'] > SATURATION_SLOWDOWN * before
+                    and callback['p50'] - before > SATURATION_MIN_DELAY):
+                slowdowns.append((callback['p50'] / before, name))
+        slowdowns.sort(reverse=True)
+        reasons.extend(f"{name} median x{slowdown:.1f}" for slowdown, name in slowdowns[:3])
+        if len(slowdowns) > 3:
+            reasons.append(f"{len(slowdowns) - 3} more callback(s) slowed down")
+        if reasons:
+            return level['sessions'], reasons
+    return None, []
+
+
+def level_results(level: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # One result per callback in the shape the benchmark harness compares
+    params = {'sessions': level['sessions']}
+    results = [{'name': 'load.all', 'params': params, 'median': level['p50'], 'p99': level['p99'],
+                'count': level['requests'], 'errors': level['errors'], 'throughput': level['throughput']},
+               {'name': 'load.tick', 'params': params, 'p99': level['tick_p99'], 'count': level['ticks'],
+                'late': level['late_ticks']}]
+    results.extend({'name': f"load.{name}", 'params': params, 'median': callback['p50'], 'p99': callback['p99'],
+                    'count': callback['count'], 'errors': callback['errors']}
+                   for name, callback in level['callbacks'].items())
+    return results
+
+
+def _ms(seconds: Optional[float]) -> str:
+    return '-' if seconds is None else f"{seconds * 1000:.1f}"
+
+
+def format_level(level: Dict[str, Any]) -> str:
+    lines = [f"{level['sessions']:>4} sessions  {level['requests']:>6} requests  {level['throughput']:8.1f} req/s  "
+             f"errors {level['error_rate']:6.2%}  p50 {_ms(level['p50']):>8} ms  p99 {_ms(level['p99']):>8} ms  "
+             f"tick p99 {_ms(level['tick_p99']):>8} ms  late ticks {level['late_ticks']}"]
+    for name, callback in level['callbacks'].items():
+        label = name if len(name) <= 60 else name[:57] + '...'
+        lines.append(f"       {label:<60} {callback['count']:>6}  errors {callback['errors']:>4}  "
+                     f"p50 {_ms(callback['p50']):>8} ms  p99 {_ms(callback['p99']):>8} ms")
+    for kind, count in sorted(level['error_kinds'].items()):
+        lines.append(f"       request error {kind}: {count}")
+    for message, count in sorted(level['script_errors'].items()):
+        lines.append(f"       script error {message}: {count}")
+    return "\n".join(lines)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_dashboard(env: Dict[str, str], log, timeout: float = 60.0, workers: int = 0) -> Tuple[subprocess.Popen, str]:
+    # The dashboard in its own process, so the load generator's threads do
+    # not compete with it for the GIL. With workers, it runs the way
+    # production does: under gunicorn, sharing caches through a SQLite file.
+    port = free_port()
+    # Runs start cold unless the caller passes a snapshot to start from
+    env = dict({'CACHE_SNAPSHOT_PATH': ''}, **env)
+    if workers:
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'src/dashboard/gunicorn_conf.py', 'src.dashboard.wsgi:server']
+        cache = os.path.join(tempfile.mkdtemp(prefix='dashboard-cache-'), 'cache.sqlite')
+        env = dict(env, SERVER_BIND=f"127.0.0.1:{port}", SERVER_WORKERS=str(workers), SHARED_CACHE_PATH=cache)
+    else:
+        command = [sys.executable, '-m', 'benchmarks.load', '--serve', str(port)]
+    process = subprocess.Popen(command, env=dict(os.environ, **env), stdout=log, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Dashboard exited with status {process.returncode}")
+        try:
+            if requests.get(url + '/_dash-layout', timeout=5).status_code == 200:
+                return process, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Dashboard did not answer within {timeout:.0f} s")
+
+
+def serve(port: int):
+    logging.disable(logging.INFO)
+    from src.dashboard.app import app
+    app.run(host='127.0.0.1', port=port, debug=False, threaded=True)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.load',
+                                     description='Multi-session load test of the dashboard against local stand-ins')
+    parser.add_argument('--sessions', default='1,5,10,25',
+                        help='Comma separated session counts, one level each, run in increasing order')
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds per level')
+    parser.add_argument('--ramp', type=float, default=5.0, help='Seconds over which a level\'s sessions arrive')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"Scenario weights, from {', '.join(SCENARIOS)}")
+    parser.add_argument('--think', type=float, default=2.0, help='Mean seconds between user actions')
+    parser.add_argument('--connections', type=int, default=BROWSER_CONNECTIONS,
+                        help='Concurrent requests per session')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Seconds before a request counts as failed')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--url', help='Load an already running dashboard; stand-in options are then ignored')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='Serve with this many gunicorn workers sharing caches, instead of one process')
+    parser.add_argument('--devices', type=int, default=4, help='Sensor devices per type in the InfluxDB stand-in')
+    parser.add_argument('--points', type=int, default=360, help='Readings per sensor device')
+    parser.add_argument('--actionable-devices', type=int, default=4)
+    parser.add_argument('--rules', type=int, default=5, help='Rules per actionable device')
+    for service in ['influx', 'rule-engine']:
+        parser.add_argument(f"--{service}-latency", type=float, default=0.0, help='Seconds added to every request')
+        parser.add_argument(f"--{service}-jitter", type=float, default=0.0, help='Latency varies by up to this much')
+        parser.add_argument(f"--{service}-failures", type=float, default=0.0, help='Fraction of requests that fail')
+    parser.add_argument('--failure-mode', choices=FAILURE_MODES, default='error',
+                        help='Injected failures answer 503 or drop the connection')
+    parser.add_argument('--max-error-rate', type=float, default=0.01,
+                        help='Error rate above which a level counts as saturated')
+    parser.add_argument('--output', help='Write level reports as JSON to this file')
+    parser.add_argument('--baseline', help='Compare p99 latencies against results saved by an earlier run')
+    parser.add_argument('--threshold', type=float, default=LOAD_THRESHOLD,
+                        help='Slowdown of a p99, as a fraction, that counts as a regression')
+    parser.add_argument('--save-baseline', help='Write results to this file for later comparisons')
+    parser.add_argument('--serve', type=int, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.serve:
+        serve(args.serve)
+        return 0
+    levels_sessions = sorted({int(count) for count in args.sessions.split(',')})
+    mix = expand_mix(parse_mix(args.mix))
+
+    backends, process, log = [], None, None
+    try:
+        url = args.url
+        if url is None:
+            sensors = SensorDataset(args.devices, args.points)
+            influx = FakeInfluxDB(sensors, latency=args.influx_latency, jitter=args.influx_jitter,
+                                  failure_rate=args.influx_failures, failure_mode=args.failure_mode, seed=args.seed)
+            rule_engine = FakeRuleEngine(
+                RuleEngineDataset(args.actionable_devices, args.rules, sensors.device_ids, args.seed),
+                latency=args.rule_engine_latency, jitter=args.rule_engine_jitter,
+                failure_rate=args.rule_engine_failures, failure_mode=args.failure_mode, seed=args.seed)
+            backends = [influx.start(), rule_engine.start()]
+            log = tempfile.NamedTemporaryFile('w+', prefix='dashboard-', suffix='.log', delete=False)
+            process, url = start_dashboard({'INFLUXDB_URL': influx.url, 'RULE_ENGINE_URL': rule_engine.url,
+                                            'INFLUXDB_SLOW_QUERY_MS': os.environ.get('INFLUXDB_SLOW_QUERY_MS', '1e9')},
+                                           log, workers=args.workers)
+            print(f"Dashboard at {url}, log in {log.name}", flush=True)
+
+        levels = []
+        for sessions in levels_sessions:
+            level = run_level(url, sessions, args.duration, mix, args.think, args.ramp, args.seed, args.connections,
+                              args.timeout)
+            levels.append(level)
+            print(format_level(level), flush=True)
+        if backends:
+            print(f"Backend requests: InfluxDB {backends[0].requests}, rule engine {backends[1].requests}")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(10)
+        for backend in backends:
+            backend.stop()
+        if log is not None:
+            log.close()
+
+    point, reasons = saturation(levels, args.max_error_rate)
+    if point is None:
+        print(f"\nNot saturated at up to {levels_sessions[-1]} sessions")
+    else:
+        print(f"\nSaturated at {point} sessions: {'; '.join(reasons)}")
+
+    results = [result for level in levels for result in level_results(level)]
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'levels': levels, 'saturation': {'sessions': point, 'reasons': reasons}}, f, indent=2)
+            f.write("\n")
+    if args.save_baseline:
+        save_results(args.save_baseline, results, 'load')
+    if not args.baseline:
+        return 0
+
+    measured = [result for result in results if result.get('p99') is not None]
+    comparisons = compare(measured, load_results(args.baseline), args.threshold, metric='p99')
+    print()
+    for comparison in comparisons:
+        print(format_comparison(comparison))
+    regressions = [comparison for comparison in comparisons if comparison['status'] in ('regression', 'failed')]
+    if regressions:
+        print(f"\n{len(regressions)} p99 regression(s) over {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
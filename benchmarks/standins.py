@@ -0,0 +1,416 @@
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+# Local replacements for InfluxDB and the rule engine. They speak the same
+# HTTP APIs as the real services, so the dashboard runs unchanged against
+# them, including the influxdb client's annotated-CSV decoding.
+
+SENSOR_TYPES = ['temperature', 'humidity', 'motion', 'gas']
+SENSOR_PREFIXES = {'temperature': 'temp', 'humidity': 'humid', 'motion': 'motion', 'gas': 'gas'}
+LOCATIONS = ['living_room', 'kitchen', 'bedroom', 'bathroom', 'hallway', 'entrance', 'basement', 'garage']
+
+# (base value, random walk step, decimals) per sensor type
+SENSOR_VALUES = {
+    'temperature': (21.0, 0.1, 1),
+    'humidity': (50.0, 0.5, 1),
+    'motion': (0, None, 0),
+    'gas': (0.1, 0.01, 2),
+}
+
+_PIVOT_COLUMNS = ['result', 'table', '_start', '_stop', '_time', '_measurement', 'device_id', 'location', 'type',
+                  'value']
+_PIVOT_DATATYPES = ['string', 'long', 'dateTime:RFC3339', 'dateTime:RFC3339', 'dateTime:RFC3339', 'string',
+                    'string', 'string', 'string', 'double']
+_PIVOT_GROUPS = ['false', 'false', 'true', 'true', 'false', 'true', 'true', 'true', 'true', 'false']
+
+_RANGE = re.compile(r'range\(start:\s*-(\d+)([smhd])')
+_ABSOLUTE_RANGE = re.compile(r'range\(start:\s*(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\dZ)')
+_TYPE = re.compile(r'r\["type"\] == "([^"]*)"')
+_DEVICE = re.compile(r'r\["device_id"\] == "([^"]*)"')
+_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def sensor_device_ids(sensor_type: str, count: int) -> List[str]:
+    return [f"{SENSOR_PREFIXES[sensor_type]}_{index:03d}" for index in range(1, count + 1)]
+
+
+def rfc3339(moment: datetime) -> str:
+    return moment.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+class SensorDataset:
+    # Seeded readings for devices_per_type devices of every sensor type, one
+    # reading every step_seconds up to end, by default the time the dataset is
+    # built so the dashboard's own clock finds the readings recent. Values are
+    # a rounded random walk, so consecutive duplicates occur as they do with
+    # real sensors.
+    def __init__(self, devices_per_type: int = 4, points: int = 360, step_seconds: int = 10, seed: int = 1,
+                 end: Optional[datetime] = None):
+        self.devices_per_type = devices_per_type
+        self.points = points
+        self.step_seconds = step_seconds
+        self.end = end or datetime.now(timezone.utc).replace(microsecond=0)
+        rng = random.Random(seed)
+        times = [self.end - timedelta(seconds=step_seconds * (points - 1 - index), microseconds=rng.randrange(1000000))
+                 for index in range(points)]
+        self.series: Dict[str, Dict[str, Tuple[str, List[Tuple[datetime, float]]]]] = {}
+        for sensor_type in SENSOR_TYPES:
+            base, step, decimals = SENSOR_VALUES[sensor_type]
+            devices = {}
+            for position, device_id in enumerate(sensor_device_ids(sensor_type, devices_per_type)):
+                value = base
+                readings = []
+                for moment in times:
+                    if step is None:
+                        value = 1 if rng.random() < 0.05 else 0
+                    else:
+                        value = round(value + rng.choice([-step, 0, 0, step]), decimals)
+                    readings.append((moment, value))
+                devices[device_id] = (LOCATIONS[position % len(LOCATIONS)], readings)
+            self.series[sensor_type] = devices
+        self._responses: Dict[tuple, str] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def device_ids(self) -> List[str]:
+        return [device_id for devices in self.series.values() for device_id in devices]
+
+    def respond(self, query: str) -> str:
+        # Annotated CSV for the three query shapes SensorModel sends
+        # Relative ranges count back from the end of the data, absolute ones are taken as they are
+        match, absolute = _RANGE.search(query), _ABSOLUTE_RANGE.search(query)
+        if absolute:
+            start = datetime.strptime(absolute.group(1), '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+        else:
+            start = self.end - timedelta(seconds=int(match.group(1)) * _UNITS[match.group(2)] if match else 3600)
+        sensor_type = (_TYPE.findall(query) or [None])[0]
+        devices = frozenset(_DEVICE.findall(query))
+        kind = 'devices' if 'distinct(' in query else 'latest' if 'last()' in query else 'readings'
+        key = (kind, sensor_type, start, devices)
+        with self._lock:
+            response = self._responses.get(key)
+        if response is None:
+            response = self._render(kind, sensor_type, start, devices)
+            with self._lock:
+                self._responses[key] = response
+        return response
+
+    def _render(self, kind: str, sensor_type: Optional[str], start: datetime, devices: frozenset) -> str:
+        series = self.series.get(sensor_type, {})
+        selected = [(device_id, series[device_id]) for device_id in series if not devices or device_id in devices]
+        if kind == 'devices':
+            if not selected:
+                return ''
+            rows = [f",,{table},{device_id}" for table, (device_id, _) in enumerate(selected)]
+            return "\r\n".join(["#group,false,false,true", "#datatype,string,long,string", "#default,_result,,",
+                                ",result,table,device_id"] + rows) + "\r\n\r\n"
+
+        start_text, stop_text = rfc3339(start), rfc3339(self.end)
+        rows = []
+        for table, (device_id, (location, readings)) in enumerate(selected):
+            if kind == 'latest':
+                readings = readings[-1:]
+            prefix = f",,{table},{start_text},{stop_text},"
+            suffix = f",sensor_events,{device_id},{location},{sensor_type},"
+            rows.extend(f"{prefix}{rfc3339(moment)}{suffix}{value}" for moment, value in readings if moment >= start)
+        if not rows:
+            return ''
+        header = ["#group," + ",".join(_PIVOT_GROUPS), "#datatype," + ",".join(_PIVOT_DATATYPES),
+                  "#default,_result" + "," * (len(_PIVOT_COLUMNS) - 1), "," + ",".join(_PIVOT_COLUMNS)]
+        return "\r\n".join(header + rows) + "\r\n\r\n"
+
+
+class RuleEngineDataset:
+    # Actionable devices with a toggle and a dimmer each, and rules_per_device
+    # rules whose conditions read the given sensor devices
+    def __init__(self, devices: int = 4, rules_per_device: int = 5, sensor_devices: Optional[List[str]] = None,
+                 seed: int = 1):
+        rng = random.Random(seed)
+        sensor_devices = sensor_devices or sensor_device_ids('temperature', 4)
+        self.devices: Dict[str, Dict[str, Any]] = {}
+        self.rules: Dict[str, Dict[str, Any]] = {}
+        for index in range(1, devices + 1):
+            device_id = f"light_{index:03d}"
+            self.devices[device_id] = {
+                'device_id': device_id,
+                'device_type': 'light',
+                'location': LOCATIONS[index % len(LOCATIONS)],
+                'name': f"Light {index}",
+                'status': 'online',
+                'last_updated': '2026-01-01T00:00:00Z',
+                'capabilities': [
+                    {'name': 'power', 'capability_type': 'toggle', 'config': {'labels': ['Off', 'On']},
+                     'current_value': rng.choice([True, False])},
+                    {'name': 'brightness', 'capability_type': 'absolute_value',
+                     'config': {'min': 0, 'max': 100, 'unit': '%'}, 'current_value': rng.randrange(101)},
+                ],
+            }
+            for number in range(1, rules_per_device + 1):
+                rule_id = f"rule_{index:03d}_{number:03d}"
+                self.rules[rule_id] = {
+                    'rule_id': rule_id,
+                    'device_id': device_id,
+                    'rule_name': f"Rule {number} for light {index}",
+                    'conditions': {
+                        'type': 'and',
+                        'left': {'type': 'condition', 'sensor_device': rng.choice(sensor_devices),
+                                 'operator': 'gte', 'value': 21},
+                        'right': {'type': 'condition', 'sensor_device': rng.choice(sensor_devices),
+                                  'operator': 'lt', 'value': 60},
+                    },
+                    'actions': {'power': {'toggle': True}},
+                    'enabled': True,
+                }
+        self.version = 1
+        self._rule_ids = itertools.count(len(self.rules) + 1)
+        self._lock = threading.Lock()
+
+    def capabilities(self, device_id: str) -> Optional[List[Dict[str, Any]]]:
+        device = self.devices.get(device_id)
+        if device is None:
+            return None
+        return [{'name': cap['name'], 'label': cap['name'].title(), 'type': cap['capability_type'],
+                 'config': cap['config']}
+                for cap in device['capabilities']]
+
+    def device_rules(self, device_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [rule for rule in self.rules.values() if rule['device_id'] == device_id]
+
+    def create_rule(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            rule_id = f"rule_new_{next(self._rule_ids):05d}"
+            rule = {'rule_id': rule_id, 'device_id': payload.get('device_id'), 'rule_name': payload.get('rule_name'),
+                    'conditions': payload.get('condition_tree'), 'actions': payload.get('actions', {}),
+                    'enabled': True}
+            self.rules[rule_id] = rule
+            self.version += 1
+            return rule
+
+    def update_rule(self, rule_id: str, payload: Dict[str, Any]) -> bool:
+        with self._lock:
+            rule = self.rules.get(rule_id)
+            if rule is None:
+                return False
+            self.rules[rule_id] = dict(rule, rule_name=payload.get('rule_name', rule['rule_name']),
+                                       conditions=payload.get('condition_tree', rule['conditions']),
+                                       actions=payload.get('actions', rule['actions']))
+            self.version += 1
+            return True
+
+    def toggle_rule(self, rule_id: str) -> Optional[bool]:
+        with self._lock:
+            rule = self.rules.get(rule_id)
+            if rule is None:
+                return None
+            self.rules[rule_id] = dict(rule, enabled=not rule['enabled'])
+            self.version += 1
+            return self.rules[rule_id]['enabled']
+
+    def delete_rule(self, rule_id: str) -> bool:
+        with self._lock:
+            self.version += 1
+            return self.rules.pop(rule_id, None) is not None
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Benchmarks open many short-lived connections at once
+    request_queue_size = 128
+
+
+FAILURE_MODES = ('error', 'drop')
+
+
+class StandIn:
+    # One stand-in service on an ephemeral localhost port, served from a
+    # background thread. The dataset can be replaced between runs.
+    #
+    # Every request can be delayed by latency seconds, give or take jitter,
+    # and a failure_rate fraction of them fail instead of being answered:
+    # with a 503 in 'error' mode, or by closing the connection in 'drop' mode.
+    handler_class = BaseHTTPRequestHandler
+
+    def __init__(self, dataset=None, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                 jitter: float = 0.0, failure_rate: float = 0.0, failure_mode: str = 'error', seed: int = 1):
+        if failure_mode not in FAILURE_MODES:
+            raise ValueError(f"failure_mode must be one of {', '.join(FAILURE_MODES)}")
+        self.dataset = dataset
+        self.requests = 0
+        self.failures = 0
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.failure_mode = failure_mode
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._server = _Server((host, port), self.handler_class)
+        self._server.standin = self
+        self._thread: Optional[threading.Thread] = None
+
+    def draw_fault(self) -> Tuple[float, bool]:
+        # (delay in seconds, whether to fail) for one request
+        with self._rng_lock:
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+            fail = self.failure_rate > 0 and self._rng.random() < self.failure_rate
+        return delay, fail
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'StandIn':
+        self._thread = threading.Thread(target=self._server.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> 'StandIn':
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    @property
+    def standin(self):
+        return self.server.standin
+
+    def log_message(self, format, *args):
+        pass
+
+    def injected(self) -> bool:
+        # Applies the stand-in's latency, then answers with an injected failure
+        # if one is drawn. True when the request was failed and is done.
+        delay, fail = self.standin.draw_fault()
+        if delay > 0:
+            time.sleep(delay)
+        if not fail:
+            return False
+        self.standin.failures += 1
+        if self.standin.failure_mode == 'drop':
+            self.close_connection = True
+            return True
+        # The body is drained so the kept-alive connection stays in sync
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.send_json(503, {'success': False, 'message': 'Injected failure'})
+        return True
+
+    def read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def send_body(self, status: int, body: str, content_type: str = 'application/json', headers=None):
+        encoded = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(encoded)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def send_json(self, status: int, body: Any, headers=None):
+        self.send_body(status, json.dumps(body), headers=headers)
+
+
+class _InfluxHandler(_Handler):
+
+    def do_POST(self):
+        self.standin.requests += 1
+        if self.injected():
+            return
+        if not self.path.startswith('/api/v2/query'):
+            self.send_json(404, {'code': 'not found', 'message': self.path})
+            return
+        query = self.read_json().get('query', '')
+        self.send_body(200, self.standin.dataset.respond(query), 'text/csv; charset=utf-8')
+
+
+class FakeInfluxDB(StandIn):
+    handler_class = _InfluxHandler
+
+    def __init__(self, dataset: Optional[SensorDataset] = None, **kwargs):
+        super().__init__(dataset or SensorDataset(), **kwargs)
+
+
+class _RuleEngineHandler(_Handler):
+
+    def do_GET(self):
+        self.standin.requests += 1
+        if self.injected():
+            return
+        dataset = self.standin.dataset
+        parts = self.path.split('?')[0].strip('/').split('/')
+        if parts == ['devices']:
+            etag = f'"{dataset.version}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_body(304, '', headers={'ETag': etag})
+                return
+            self.send_json(200, {'success': True, 'devices': list(dataset.devices.values())}, {'ETag': etag})
+        elif len(parts) == 3 and parts[0] == 'devices' and parts[2] == 'capabilities':
+            capabilities = dataset.capabilities(parts[1])
+            if capabilities is None:
+                self.send_json(404, {'success': False, 'message': 'Device not found'})
+            else:
+                self.send_json(200, {'success': True, 'capabilities': capabilities})
+        elif len(parts) == 2 and parts[0] == 'rules':
+            self.send_json(200, {'success': True, 'rules': dataset.device_rules(parts[1])})
+        else:
+            self.send_json(404, {'success': False, 'message': 'Not found'})
+
+    def do_POST(self):
+        self.standin.requests += 1
+        if self.injected():
+            return
+        dataset = self.standin.dataset
+        parts = self.path.strip('/').split('/')
+        if parts == ['rules']:
+            rule = dataset.create_rule(self.read_json())
+            self.send_json(201, {'success': True, 'rule_id': rule['rule_id'], 'rule': rule})
+        elif len(parts) == 3 and parts[0] == 'rules' and parts[2] == 'toggle':
+            enabled = dataset.toggle_rule(parts[1])
+            self.send_json(200 if enabled is not None else 404, {'success': enabled is not None, 'enabled': enabled})
+        else:
+            self.send_json(404, {'success': False, 'message': 'Not found'})
+
+    def do_PUT(self):
+        self.standin.requests += 1
+        if self.injected():
+            return
+        parts = self.path.strip('/').split('/')
+        found = len(parts) == 2 and parts[0] == 'rules' and self.standin.dataset.update_rule(parts[1], self.read_json())
+        self.send_json(200 if found else 404, {'success': bool(found)})
+
+    def do_DELETE(self):
+        self.standin.requests += 1
+        if self.injected():
+            return
+        parts = self.path.strip('/').split('/')
+        found = len(parts) == 2 and parts[0] == 'rules' and self.standin.dataset.delete_rule(parts[1])
+        self.send_json(200 if found else 404, {'success': bool(found)})
+
+
+class FakeRuleEngine(StandIn):
+    handler_class = _RuleEngineHandler
+
+    def __init__(self, dataset: Optional[RuleEngineDataset] = None, **kwargs):
+        super().__init__(dataset or RuleEngineDataset(), **kwargs)
@@ -0,0 +1,3 @@
+from .rule_engine import RuleEngineClient, RuleEngineUnavailableError, CircuitBreaker
+
+__all__ = ['RuleEngineClient', 'RuleEngineUnavailableError', 'CircuitBreaker']
@@ -0,0 +1,212 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.config.settings import config
+from src.config.logger import get_logger
+from src.telemetry.instruments import RULE_ENGINE_REQUEST_SECONDS, RULE_ENGINE_REQUESTS_IN_FLIGHT
+from src.telemetry.tracing import tracer, KIND_CLIENT
+
+logger = get_logger(__name__)
+
+# Read timeouts per endpoint, in seconds. Listing calls sit on the dashboard's
+# refresh path and should give up quickly; writes are allowed a little longer.
+ENDPOINT_READ_TIMEOUTS = {
+    'list_devices': 3.0,
+    'device_capabilities': 3.0,
+    'list_rules': 3.0,
+    'create_rule': 8.0,
+    'update_rule': 8.0,
+    'toggle_rule': 5.0,
+    'delete_rule': 5.0,
+}
+
+LATENCY_WINDOW = 512
+
+
+class RuleEngineUnavailableError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            # Half-open: let a single trial request through
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("Rule engine circuit closed")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.error(f"Rule engine circuit opened after {self._failures} consecutive failures")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class RuleEngineClient:
+    def __init__(self, base_url: Optional[str] = None, connect_timeout: Optional[float] = None,
+                 read_timeouts: Optional[Dict[str, float]] = None, max_retries: Optional[int] = None,
+                 pool_size: Optional[int] = None, breaker: Optional[CircuitBreaker] = None):
+        self.base_url = (base_url or config.get("rule_engine.url", "http://localhost:5001")).rstrip('/')
+        self.connect_timeout = connect_timeout if connect_timeout is not None else config.get("rule_engine.connect_timeout", 2.0)
+        self.default_read_timeout = config.get("rule_engine.read_timeout", 5.0)
+        self.read_timeouts = dict(ENDPOINT_READ_TIMEOUTS)
+        if read_timeouts:
+            self.read_timeouts.update(read_timeouts)
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=config.get("rule_engine.breaker_threshold", 5),
+            reset_timeout=config.get("rule_engine.breaker_reset_seconds", 30.0)
+        )
+        self._latencies: Dict[str, deque] = {}
+        self._errors: Dict[str, int] = {}
+        self._stats_lock = threading.Lock()
+        self.session = self._create_session(
+            max_retries if max_retries is not None else config.get("rule_engine.max_retries", 2),
+            pool_size or config.get("rule_engine.pool_size", 10)
+        )
+
+    def _create_session(self, max_retries: int, pool_size: int) -> requests.Session:
+        # Only idempotent methods are retried, and never after a read timeout:
+        # a slow engine should not hold a worker for several timeouts in a row.
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=0,
+            status=max_retries,
+            backoff_factor=0.1,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({'GET', 'PUT', 'DELETE'}),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def _timeout(self, endpoint: str) -> Tuple[float, float]:
+        return self.connect_timeout, self.read_timeouts.get(endpoint, self.default_read_timeout)
+
+    def _request(self, endpoint: str, method: str, path: str, **kwargs) -> requests.Response:
+        if not self.breaker.allow_request():
+            self._record(endpoint, 0.0, failed=True, outcome='unavailable')
+            raise RuleEngineUnavailableError(f"Rule engine unavailable, skipping {method} {path}")
+
+        kwargs.setdefault('timeout', self._timeout(endpoint))
+        with tracer.span(f'rule_engine.{endpoint}', kind=KIND_CLIENT, **{'http.method': method, 'http.url': path}) as span:
+            start = time.perf_counter()
+            RULE_ENGINE_REQUESTS_IN_FLIGHT.inc()
+            try:
+                response = self.session.request(method, f'{self.base_url}{path}', **kwargs)
+            except Exception as e:
+                # Any error counts, or a failed half-open trial would never be released
+                self._record(endpoint, time.perf_counter() - start, failed=True)
+                self.breaker.record_failure()
+                logger.error(f"Rule engine request {method} {path} failed: {e}")
+                raise
+            finally:
+                RULE_ENGINE_REQUESTS_IN_FLIGHT.dec()
+
+            span.set_attribute('http.status_code', response.status_code)
+            failed = response.status_code >= 500
+            self._record(endpoint, time.perf_counter() - start, failed=failed)
+            if failed:
+                span.set_error(f"HTTP {response.status_code}")
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            return response
+
+    def _record(self, endpoint: str, seconds: float, failed: bool = False, outcome: Optional[str] = None):
+        RULE_ENGINE_REQUEST_SECONDS.labels(endpoint, outcome or ('error' if failed else 'ok')).observe(seconds)
+        with self._stats_lock:
+            self._latencies.setdefault(endpoint, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+            if failed:
+                self._errors[endpoint] = self._errors.get(endpoint, 0) + 1
+
+    def latency_stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._stats_lock:
+            snapshot = {endpoint: sorted(samples) for endpoint, samples in self._latencies.items()}
+            errors = dict(self._errors)
+
+        stats = {}
+        for endpoint, samples in snapshot.items():
+            if not samples:
+                continue
+            stats[endpoint] = {
+                'count': len(samples),
+                'errors': errors.get(endpoint, 0),
+                'p50': samples[int(0.5 * (len(samples) - 1))],
+                'p99': samples[int(0.99 * (len(samples) - 1))],
+                'max': samples[-1]
+            }
+        return stats
+
+    def list_devices(self, **kwargs) -> requests.Response:
+        return self._request('list_devices', 'GET', '/devices', **kwargs)
+
+    def get_device_capabilities(self, device_id: str, **kwargs) -> requests.Response:
+        return self._request('device_capabilities', 'GET', f'/devices/{device_id}/capabilities', **kwargs)
+
+    def list_rules(self, device_id: str, **kwargs) -> requests.Response:
+        return self._request('list_rules', 'GET', f'/rules/{device_id}', **kwargs)
+
+    def create_rule(self, payload: Dict[str, Any], **kwargs) -> requests.Response:
+        return self._request('create_rule', 'POST', '/rules', json=payload, **kwargs)
+
+    def update_rule(self, rule_id: str, payload: Dict[str, Any], **kwargs) -> requests.Response:
+        return self._request('update_rule', 'PUT', f'/rules/{rule_id}', json=payload, **kwargs)
+
+    def toggle_rule(self, rule_id: str, **kwargs) -> requests.Response:
+        return self._request('toggle_rule', 'POST', f'/rules/{rule_id}/toggle', **kwargs)
+
+    def delete_rule(self, rule_id: str, **kwargs) -> requests.Response:
+        return self._request('delete_rule', 'DELETE', f'/rules/{rule_id}', **kwargs)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,62 @@
+import importlib
+import sys
+import threading
+from typing import List
+
+from src.config.settings import config
+
+# Modules bound with lazy_import, in the order they were declared
+DEFERRED_IMPORTS: List[str] = []
+_deferred_lock = threading.Lock()
+_deferred_loaded = False
+
+
+class LazyModule:
+    # Stands in for a heavy module until one of its attributes is first read.
+    # import_module takes the module's import lock, so threads racing on the
+    # first read import it once. Attributes are copied onto the stand-in as
+    # they are read, so later reads are plain instance lookups.
+    def __init__(self, name: str):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None or self._name in sys.modules
+
+    def __getattr__(self, attribute):
+        module = self._module
+        if module is None:
+            module = importlib.import_module(self._name)
+            self.__dict__['_module'] = module
+        value = getattr(module, attribute)
+        self.__dict__[attribute] = value
+        return value
+
+    def __repr__(self):
+        return f"<lazy module '{self._name}'{' (loaded)' if self.loaded else ''}>"
+
+
+def lazy_import(name: str):
+    # With startup.lazy_imports off the module is imported right away, as a
+    # plain import would
+    if name not in DEFERRED_IMPORTS:
+        DEFERRED_IMPORTS.append(name)
+    if not config.get("startup.lazy_imports", True):
+        return importlib.import_module(name)
+    return LazyModule(name)
+
+
+def import_deferred():
+    # Loads every deferred module. Some libraries look modules up in
+    # sys.modules and use them as found (plotly does so for pandas), so
+    # nothing may run while one is half imported: request handlers call this
+    # first and wait here until all are loaded.
+    global _deferred_loaded
+    if _deferred_loaded:
+        return
+    with _deferred_lock:
+        if not _deferred_loaded:
+            for name in DEFERRED_IMPORTS:
+                importlib.import_module(name)
+            _deferred_loaded = True
@@ -17,10 +17,75 @@ class ConfigManager:
                 "url": os.getenv("INFLUXDB_URL", "http://localhost:8086"),
                 "token": os.getenv("INFLUXDB_TOKEN", "smart-home-token"),
                 "org": os.getenv("INFLUXDB_ORG", "smart-home"),
-                "bucket": os.getenv("INFLUXDB_BUCKET", "sensor-events")
+                "bucket": os.getenv("INFLUXDB_BUCKET", "sensor-events"),
+                "slow_query_ms": float(os.getenv("INFLUXDB_SLOW_QUERY_MS", "1000")),
+                "slow_query_profile_interval": float(os.getenv("INFLUXDB_SLOW_QUERY_PROFILE_INTERVAL", "600"))
+            },
+            "rule_engine": {
+                "url": os.getenv("RULE_ENGINE_URL", "http://localhost:5001"),
+                "connect_timeout": float(os.getenv("RULE_ENGINE_CONNECT_TIMEOUT", "2")),
+                "read_timeout": float(os.getenv("RULE_ENGINE_READ_TIMEOUT", "5")),
+                "max_retries": int(os.getenv("RULE_ENGINE_MAX_RETRIES", "2")),
+                "pool_size": int(os.getenv("RULE_ENGINE_POOL_SIZE", "10")),
+                "breaker_threshold": int(os.getenv("RULE_ENGINE_BREAKER_THRESHOLD", "5")),
+                "breaker_reset_seconds": float(os.getenv("RULE_ENGINE_BREAKER_RESET_SECONDS", "30")),
+                "rule_cache_ttl": float(os.getenv("RULE_CACHE_TTL", "30")),
+                "device_sync_interval": float(os.getenv("DEVICE_SYNC_INTERVAL", "2"))
             },
             "logging": {
                 "level": os.getenv("LOG_LEVEL", "INFO")
+            },
+            "profiling": {
+                "enabled": os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes"),
+                "sample_every": int(os.getenv("PROFILING_SAMPLE_EVERY", "100")),
+                "interval": float(os.getenv("PROFILING_INTERVAL", "0.005")),
+                "directory": os.getenv("PROFILING_DIR", "/tmp/dashboard-profiles"),
+                "max_files": int(os.getenv("PROFILING_MAX_FILES", "200"))
+            },
+            "tracing": {
+                "enabled": os.getenv("TRACING_ENABLED", "false").lower() in ("1", "true", "yes"),
+                "mode": os.getenv("TRACING_MODE", "tail"),
+                "slow_ms": float(os.getenv("TRACING_SLOW_MS", "500")),
+                "file": os.getenv("TRACING_FILE", "/tmp/dashboard-traces.jsonl")
+            },
+            "memory": {
+                "budget_bytes": int(os.getenv("MEMORY_BUDGET_BYTES", "0")),
+                "sample_interval": float(os.getenv("MEMORY_SAMPLE_INTERVAL", "30")),
+                "history_size": int(os.getenv("MEMORY_HISTORY_SIZE", "240")),
+                "tracemalloc_frames": int(os.getenv("MEMORY_TRACEMALLOC_FRAMES", "10")),
+                "actions_enabled": os.getenv("MEMORY_ACTIONS_ENABLED", "false").lower() in ("1", "true", "yes")
+            },
+            "debug": {
+                "pages_enabled": os.getenv("DEBUG_PAGES_ENABLED", "false").lower() in ("1", "true", "yes")
+            },
+            "startup": {
+                "lazy_imports": os.getenv("STARTUP_LAZY_IMPORTS", "true").lower() in ("1", "true", "yes"),
+                "warmup": os.getenv("STARTUP_WARMUP", "true").lower() in ("1", "true", "yes"),
+                "warmup_wait": float(os.getenv("STARTUP_WARMUP_WAIT", "60"))
+            },
+            "server": {
+                "bind": os.getenv("SERVER_BIND", "0.0.0.0:8050"),
+                "workers": int(os.getenv("SERVER_WORKERS", str(os.cpu_count() or 1))),
+                "threads": int(os.getenv("SERVER_THREADS", "4")),
+                "timeout": int(os.getenv("SERVER_TIMEOUT", "60"))
+            },
+            "shared_cache": {
+                "path": os.getenv("SHARED_CACHE_PATH", ""),
+                "max_bytes": int(os.getenv("SHARED_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+                "query_ttl": float(os.getenv("SHARED_CACHE_QUERY_TTL", "4")),
+                "catalog_ttl": float(os.getenv("SHARED_CACHE_CATALOG_TTL", "60")),
+                "session_ttl": float(os.getenv("SHARED_CACHE_SESSION_TTL", "86400")),
+                "lease_seconds": float(os.getenv("SHARED_CACHE_LEASE_SECONDS", "10"))
+            },
+            "sensor_cache": {
+                "enabled": os.getenv("SENSOR_CACHE_ENABLED", "true").lower() in ("1", "true", "yes"),
+                "refresh_interval": float(os.getenv("SENSOR_CACHE_REFRESH_INTERVAL", "2")),
+                "overlap": float(os.getenv("SENSOR_CACHE_OVERLAP", "120")),
+                "window_hours": float(os.getenv("SENSOR_CACHE_WINDOW_HOURS", "24"))
+            },
+            "snapshot": {
+                "path": os.getenv("CACHE_SNAPSHOT_PATH", "/tmp/dashboard-cache-snapshot.npz"),
+                "interval": float(os.getenv("CACHE_SNAPSHOT_INTERVAL", "300"))
             }
         }
     
@@ -1,14 +1,12 @@
+import os
+
 import dash
-import warnings
-from influxdb_client.client.warnings import MissingPivotFunction
 
 from .components.layout import create_layout
 
-warnings.simplefilter("ignore", MissingPivotFunction)
-
 app = dash.Dash(__name__, suppress_callback_exceptions=True)
 
-app.layout = create_layout()
+app.layout = create_layout
 
 # DO NOT remove imports, they build they UI
 from .callbacks import (
@@ -20,6 +18,23 @@ from .callbacks import (
     rule_management, 
     edit_modal
 )
+from .routes import register_routes, instrument_app
+from .warmup import start_warmup
+from src.config.imports import import_deferred
+from src.telemetry.memory import memory
+from src.telemetry.startup import startup
+
+register_routes(app.server)
+instrument_app(app)
+# Requests wait for deferred imports still in progress
+app.server.before_request(import_deferred)
+memory.start()
+startup.mark('imported')
 
 if __name__ == '__main__':
+    # The reloader serves from a child process; only that one warms up
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        from .callbacks import cache_snapshot
+        cache_snapshot.start()
+        start_warmup(app, 8050)
     app.run(debug=True, host='0.0.0.0', port=8050)
\ No newline at end of file
@@ -0,0 +1,30 @@
+// Pure UI transitions that need nothing from the server. Dash loads every
+// file in assets/, and these run in the browser instead of a round trip.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    ui: {
+        close_modal: function(n_clicks) {
+            if (!n_clicks) {
+                return window.dash_clientside.no_update;
+            }
+            return {'display': 'none'};
+        },
+
+        switch_tab: function(sensors_clicks, charts_clicks, actionable_clicks) {
+            var tabs = {'nav-sensors': 'sensors', 'nav-charts': 'charts', 'nav-actionable': 'actionable'};
+            var triggered = window.dash_clientside.callback_context.triggered_id;
+            var active = tabs[triggered] || 'sensors';
+            return [active].concat(Object.keys(tabs).map(function(button_id) {
+                return tabs[button_id] === active ? 'nav-button active' : 'nav-button';
+            }));
+        },
+
+        open_edit_modal: function(n_clicks_list, current_tree) {
+            var no_update = window.dash_clientside.no_update;
+            var triggered = window.dash_clientside.callback_context.triggered_id;
+            if (!(n_clicks_list || []).some(Boolean) || !triggered) {
+                return [no_update, no_update, no_update];
+            }
+            return [{'display': 'block'}, triggered.node_id, current_tree];
+        }
+    }
+});
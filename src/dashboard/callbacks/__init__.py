@@ -1,7 +1,50 @@
 from src.models.sensor import TemperatureModel, HumidityModel, MotionModel, GasModel
+from src.clients.rule_engine import RuleEngineClient
+from src.rules.network import RuleNetwork
+from src.telemetry.memory import memory
+from ..utils.rule_cache import RuleCache
+from ..utils.device_sync import DeviceSnapshot
+from ..utils.tree_history import TreeHistoryRegistry
+from ..utils.session_store import SessionStore
+from ..utils.shared_cache import shared_cache_from_config
+from ..utils.cache_snapshot import CacheSnapshot
+from ..utils.condition_tree import DEFAULT_CONDITION
 
-temp_model = TemperatureModel()
-humidity_model = HumidityModel()
-motion_model = MotionModel()
-gas_model = GasModel()
-sensor_models = [temp_model, humidity_model, motion_model, gas_model]
\ No newline at end of file
+# None unless workers share caches (SHARED_CACHE_PATH)
+shared_cache = shared_cache_from_config()
+
+temp_model = TemperatureModel(shared_cache)
+humidity_model = HumidityModel(shared_cache)
+motion_model = MotionModel(shared_cache)
+gas_model = GasModel(shared_cache)
+sensor_models = [temp_model, humidity_model, motion_model, gas_model]
+
+rule_engine_client = RuleEngineClient()
+rule_cache = RuleCache(rule_engine_client, shared=shared_cache)
+device_snapshot = DeviceSnapshot(rule_engine_client, shared=shared_cache)
+rule_network = RuleNetwork()
+rule_cache.add_listener(rule_network.sync_rules)
+tree_histories = TreeHistoryRegistry()
+# Trees, capabilities and device options live here; their dcc.Stores hold versions
+session_store = SessionStore(shared=shared_cache)
+# Sensor caches and the device catalog outlive restarts in CACHE_SNAPSHOT_PATH
+cache_snapshot = CacheSnapshot(sensor_models, device_snapshot)
+
+memory.register('rules', rule_cache)
+memory.register('devices', device_snapshot)
+memory.register('tree_histories', tree_histories)
+memory.register('session_store', session_store)
+for model in sensor_models:
+    if model.cache is not None:
+        memory.register(f'sensor_{model.sensor_type}', model.cache)
+
+
+def sensor_device_ids():
+    # Devices the sensor models report; ids from a client are only put into a
+    # query when they are one of these
+    return {device_id for model in sensor_models for device_id in model.get_devices()}
+
+
+def stored_tree(session_id, version):
+    # No version yet, or one evicted from the session, reads as a single empty condition
+    return session_store.get(session_id, version) or dict(DEFAULT_CONDITION)
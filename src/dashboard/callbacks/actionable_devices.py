@@ -1,17 +1,16 @@
 import dash
-from dash import html, Input, Output, callback
-import requests
-import os
+from dash import html, Input, Output, State, Patch, callback
 from datetime import datetime
 from dataclasses import dataclass
 from typing import List, Dict, Any
 import json
 from src.config.logger import get_logger
+from src.telemetry.memory import memory, CacheAccount
+from . import device_snapshot
+from ..utils.device_sync import DeviceSyncError
 
 logger = get_logger(__name__)
 
-RULE_ENGINE_URL = os.getenv('RULE_ENGINE_URL', 'http://localhost:5001')
-
 @dataclass
 class DeviceCapabilityDTO:
     name: str
@@ -29,119 +28,145 @@ class ActionableDeviceDTO:
     capabilities: List[DeviceCapabilityDTO]
     last_updated: str
 
+# Rendered cards keyed by device id, reused while the device payload is unchanged
+_card_cache: Dict[str, tuple] = {}
+memory.register('device_cards', CacheAccount(_card_cache))
+
+
+def render_actionable_device_card(device_data: Dict[str, Any]):
+    cached = _card_cache.get(device_data['device_id'])
+    if cached and cached[0] == device_data:
+        return cached[1]
+    
+    device = ActionableDeviceDTO(
+        device_id=device_data['device_id'],
+        device_type=device_data['device_type'],
+        location=device_data['location'],
+        name=device_data['name'],
+        status=device_data['status'],
+        capabilities=[
+            DeviceCapabilityDTO(
+                name=cap['name'],
+                capability_type=cap['capability_type'],
+                config=cap['config'],
+                current_value=cap['current_value']
+            ) for cap in device_data['capabilities']
+        ],
+        last_updated=device_data['last_updated']
+    )
+    
+    last_updated = datetime.fromisoformat(device.last_updated.replace('Z', '+00:00') if device.last_updated.endswith('Z') else device.last_updated)
+    time_str = last_updated.strftime('%H:%M:%S')
+    date_str = last_updated.strftime('%Y-%m-%d')
+    
+    capabilities_info = []
+    for cap in device.capabilities:
+        if cap.capability_type == 'toggle':
+            current_value_str = str(cap.current_value).lower()
+            is_on = current_value_str in ['true', '1', 'on', 'yes']
+            current_label = cap.config.get('labels', ['Off', 'On'])[1 if is_on else 0]
+            capabilities_info.append(html.Div([
+                html.Span(f"{cap.name.replace('_', ' ').title()}: ", className="label"),
+                html.Span(current_label, className="value")
+            ]))
+        elif cap.capability_type == 'absolute_value':
+            unit = cap.config.get('unit', '')
+            capabilities_info.append(html.Div([
+                html.Span(f"{cap.name.replace('_', ' ').title()}: ", className="label"),
+                html.Span(f"{str(cap.current_value)}{unit}", className="value")
+            ]))
+        elif cap.capability_type == 'discrete_values':
+            capabilities_info.append(html.Div([
+                html.Span(f"{cap.name.replace('_', ' ').title()}: ", className="label"),
+                html.Span(str(cap.current_value), className="value")
+            ]))
+        elif cap.capability_type == 'trigger':
+            action = cap.config.get('action', 'trigger')
+            capabilities_info.append(html.Div([
+                html.Span(f"{cap.name.replace('_', ' ').title()}: ", className="label"),
+                html.Span(action.replace('_', ' ').title(), className="value")
+            ]))
+    
+    card = html.Div([
+        html.H3(device.name, className="device-title"),
+        html.Div([
+            html.Div([
+                html.Span("Type: ", className="label"),
+                html.Span(device.device_type.replace('_', ' ').title(), className="value")
+            ]),
+            html.Div([
+                html.Span("Location: ", className="label"),
+                html.Span(device.location.replace('_', ' ').title(), className="value")
+            ]),
+            html.Div([
+                html.Span("Status: ", className="label"),
+                html.Span(device.status.title(), className=f"status-{device.status}")
+            ]),
+            html.Hr(),
+            *capabilities_info,
+            html.Hr(),
+            html.Div([
+                html.Span("Last Update: ", className="label"),
+                html.Span(f"{date_str} {time_str}", className="timestamp")
+            ])
+        ], className="device-info"),
+        html.Div([
+            html.Button("Create Rule", id={'type': 'rule-button', 'index': device.device_id}, 
+                      className="rule-button"),
+            html.Button("View Rules", id={'type': 'view-rules-button', 'index': device.device_id}, 
+                      className="view-rules-button")
+        ], className="device-buttons")
+    ], className="actionable-device-card", style={"pointerEvents": "none"})
+    
+    _card_cache[device.device_id] = (device_data, card)
+    return card
+
 @callback(
-    Output('actionable-devices-container', 'children'),
+    [Output('actionable-devices-container', 'children'),
+     Output('actionable-devices-rendered', 'data')],
     Input('interval-component', 'n_intervals'),
+    State('actionable-devices-rendered', 'data'),
     prevent_initial_call=False
 )
-def update_actionable_devices(n):
+def update_actionable_devices(n, rendered):
     try:
         logger.info(f"update_actionable_devices called with n={n}")
         
-        response = requests.get(f'{RULE_ENGINE_URL}/devices', timeout=10)
-        
-        if response.status_code != 200:
-            logger.error(f"Failed to get devices from rule engine: {response.status_code}")
-            return html.Div("Failed to load actionable devices", className="error")
+        try:
+            version = device_snapshot.sync()
+        except DeviceSyncError as e:
+            logger.error(str(e))
+            if device_snapshot.version and rendered:
+                return dash.no_update, dash.no_update
+            return html.Div("Failed to load actionable devices", className="error"), None
         
-        result = response.json()
-        if not result.get('success', False):
-            logger.error(f"Rule engine returned error: {result.get('message', 'Unknown error')}")
-            return html.Div("Failed to load actionable devices", className="error")
-        
-        devices = result.get('devices', [])
-        logger.info(f"Found {len(devices)} devices from API")
+        devices = device_snapshot.devices
+        order = [device['device_id'] for device in devices]
         
         if not devices:
             logger.info("No devices found, returning no-data message")
-            return html.Div("No actionable devices found", className="no-data")
+            return html.Div("No actionable devices found", className="no-data"), None
         
-        device_cards = []
-        for device_data in devices:
-            device = ActionableDeviceDTO(
-                device_id=device_data['device_id'],
-                device_type=device_data['device_type'],
-                location=device_data['location'],
-                name=device_data['name'],
-                status=device_data['status'],
-                capabilities=[
-                    DeviceCapabilityDTO(
-                        name=cap['name'],
-                        capability_type=cap['capability_type'],
-                        config=cap['config'],
-                        current_value=cap['current_value']
-                    ) for cap in device_data['capabilities']
-                ],
-                last_updated=device_data['last_updated']
-            )
-            
-            last_updated = datetime.fromisoformat(device.last_updated.replace('Z', '+00:00') if device.last_updated.endswith('Z') else device.last_updated)
-            time_str = last_updated.strftime('%H:%M:%S')
-            date_str = last_updated.strftime('%Y-%m-%d')
-            
-            capabilities_info = []
-            for cap in device.capabilities:
-                if cap.capability_type == 'toggle':
-                    current_value_str = str(cap.current_value).lower()
-                    is_on = current_value_str in ['true', '1', 'on', 'yes']
-                    current_label = cap.config.get('labels', ['Off', 'On'])[1 if is_on else 0]
-                    capabilities_info.append(html.Div([
-                        html.Span(f"{cap.name.replace('_', ' ').title()}: ", className="label"),
-                        html.Span(current_label, className="value")
-                    ]))
-                elif cap.capability_type == 'absolute_value':
-                    unit = cap.config.get('unit', '')
-                    capabilities_info.append(html.Div([
-                        html.Span(f"{cap.name.replace('_', ' ').title()}: ", className="label"),
-                        html.Span(f"{str(cap.current_value)}{unit}", className="value")
-                    ]))
-                elif cap.capability_type == 'discrete_values':
-                    capabilities_info.append(html.Div([
-                        html.Span(f"{cap.name.replace('_', ' ').title()}: ", className="label"),
-                        html.Span(str(cap.current_value), className="value")
-                    ]))
-                elif cap.capability_type == 'trigger':
-                    action = cap.config.get('action', 'trigger')
-                    capabilities_info.append(html.Div([
-                        html.Span(f"{cap.name.replace('_', ' ').title()}: ", className="label"),
-                        html.Span(action.replace('_', ' ').title(), className="value")
-                    ]))
-            
-            card = html.Div([
-                html.H3(device.name, className="device-title"),
-                html.Div([
-                    html.Div([
-                        html.Span("Type: ", className="label"),
-                        html.Span(device.device_type.replace('_', ' ').title(), className="value")
-                    ]),
-                    html.Div([
-                        html.Span("Location: ", className="label"),
-                        html.Span(device.location.replace('_', ' ').title(), className="value")
-                    ]),
-                    html.Div([
-                        html.Span("Status: ", className="label"),
-                        html.Span(device.status.title(), className=f"status-{device.status}")
-                    ]),
-                    html.Hr(),
-                    *capabilities_info,
-                    html.Hr(),
-                    html.Div([
-                        html.Span("Last Update: ", className="label"),
-                        html.Span(f"{date_str} {time_str}", className="timestamp")
-                    ])
-                ], className="device-info"),
-                html.Div([
-                    html.Button("Create Rule", id={'type': 'rule-button', 'index': device.device_id}, 
-                              className="rule-button"),
-                    html.Button("View Rules", id={'type': 'view-rules-button', 'index': device.device_id}, 
-                              className="view-rules-button")
-                ], className="device-buttons")
-            ], className="actionable-device-card", style={"pointerEvents": "none"})
+        for device_id in set(_card_cache) - set(order):
+            _card_cache.pop(device_id, None)
+        
+        changed = device_snapshot.changed_since(rendered.get('version')) if rendered else None
+        if changed is not None and rendered.get('order') == order:
+            if not changed:
+                return dash.no_update, dash.no_update
             
-            device_cards.append(card)
+            # Same cards in the same positions: send only the cards that changed
+            patched_grid = Patch()
+            for position, device in enumerate(devices):
+                if device['device_id'] in changed:
+                    patched_grid['props']['children'][position] = render_actionable_device_card(device)
+            logger.info(f"Patched {len(changed)} of {len(devices)} actionable device cards")
+            return patched_grid, {'version': version, 'order': order}
         
-        return html.Div(device_cards, className="device-grid")
+        logger.info(f"Rendering {len(devices)} actionable device cards")
+        device_cards = [render_actionable_device_card(device) for device in devices]
+        return html.Div(device_cards, className="device-grid"), {'version': version, 'order': order}
         
     except Exception as e:
         logger.error(f"Error updating actionable devices: {e}")
-        return html.Div(f"Error loading actionable devices: {str(e)}", className="error")
\ No newline at end of file
+        return html.Div(f"Error loading actionable devices: {str(e)}", className="error"), None
@@ -1,20 +1,24 @@
 import dash
 from dash import Input, Output, State, callback
 import plotly.graph_objs as go
-import plotly.express as px
-import pandas as pd
 from src.config.logger import get_logger
-from . import sensor_models
+from src.config.imports import lazy_import
+from src.telemetry.tracing import tracer
+from . import sensor_models, session_store
 
 logger = get_logger(__name__)
 
+# plotly.express is only needed for the histograms
+px = lazy_import('plotly.express')
+pd = lazy_import('pandas')
+
 @callback(
     [Output('device-dropdown', 'options'),
      Output('device-dropdown', 'value')],
     [Input('interval-component', 'n_intervals'), Input('active-tab', 'data')],
-    [State('selected-device', 'data'), State('available-options', 'data')]
+    [State('selected-device', 'data'), State('available-options', 'data'), State('session-id', 'data')]
 )
-def update_device_options(n, active_tab, selected_devices, available_options):
+def update_device_options(n, active_tab, selected_devices, options_version, session_id):
     if active_tab == 'charts':
         try:
             all_devices = []
@@ -32,7 +36,7 @@ def update_device_options(n, active_tab, selected_devices, available_options):
             return options, selected_devices or []
         except Exception as e:
             logger.error(f"Error updating device options: {e}")
-            return available_options or [], selected_devices or [], available_options or []
+            return session_store.get(session_id, options_version, []), selected_devices or []
     return dash.no_update, dash.no_update
 
 @callback(
@@ -46,18 +50,20 @@ def update_store_from_dropdown(selected_devices):
 @callback(
     Output('available-options', 'data', allow_duplicate=True),
     Input('device-dropdown', 'options'),
-    State('available-options', 'data'),
+    [State('available-options', 'data'),
+     State('session-id', 'data')],
     prevent_initial_call=True
 )
-def update_store_from_dropdown_options(available_options, current_store):
+def update_store_from_dropdown_options(available_options, options_version, session_id):
+    current_store = session_store.get(session_id, options_version)
     new_value = available_options if isinstance(available_options, list) else [
         available_options] if available_options else []
 
     if not new_value and current_store:
-        return current_store
+        return dash.no_update
 
     if new_value != current_store:
-        return new_value
+        return session_store.put(session_id, new_value)
 
     return dash.no_update
 
@@ -94,47 +100,50 @@ def update_charts(time_range, n, current_store, active_tab,):
             )
             return empty_fig, empty_fig, {'display': 'none'}, {'display': 'none'}
         
-        df = pd.concat(all_data, ignore_index=True)
+        with tracer.span('chart.figures', devices=len(current_store or []), time_range=time_range) as span:
+            df = pd.concat(all_data, ignore_index=True)
+            span.set_attribute('rows', len(df))
         
-        line_fig = go.Figure()
+            line_fig = go.Figure()
 
-        for device in df['device_id'].unique():
-            device_data = df[df['device_id'] == device]
-            line_fig.add_trace(go.Scatter(
-                x=device_data['_time'],
-                y=device_data['value'],
-                mode='lines+markers',
-                name=device,
-                line=dict(width=2)
-            ))
+            for device in df['device_id'].unique():
+                device_data = df[df['device_id'] == device]
+                line_fig.add_trace(go.Scatter(
+                    x=device_data['_time'],
+                    y=device_data['value'],
+                    mode='lines+markers',
+                    name=device,
+                    line=dict(width=2)
+                ))
         
-        line_fig.update_layout(
-            title='Sensor Values Over Time',
-            xaxis_title='Time',
-            yaxis_title='Value',
-            hovermode='x unified',
-            template='plotly_white',
-            height=400
-        )
+            line_fig.update_layout(
+                title='Sensor Values Over Time',
+                xaxis_title='Time',
+                yaxis_title='Value',
+                hovermode='x unified',
+                template='plotly_white',
+                height=400
+            )
         
-        hist_fig = px.histogram(
-            df,
-            x='value',
-            color='device_id',
-            nbins=20,
-            title='Value Distribution by Device',
-            labels={'value': 'Value', 'count': 'Frequency'}
-        )
+            hist_fig = px.histogram(
+                df,
+                x='value',
+                color='device_id',
+                nbins=20,
+                title='Value Distribution by Device',
+                labels={'value': 'Value', 'count': 'Frequency'}
+            )
 
-        hist_fig.update_layout(
-            template='plotly_white',
-            height=400
-        )
+            hist_fig.update_layout(
+                template='plotly_white',
+                height=400
+            )
         
         return line_fig, hist_fig, {'display': 'block'}, {'display': 'block'}
         
     except Exception as e:
         logger.error(f"Error updating charts: {e}")
+        tracer.current_span().record_error(e)
         empty_fig = go.Figure()
         empty_fig.add_annotation(
             text=f"Error loading data: {str(e)}",
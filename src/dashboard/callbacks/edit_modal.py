@@ -1,13 +1,35 @@
 import dash
-from dash import html, dcc, Input, Output, State, callback
+from dash import html, dcc, Input, Output, State, callback, clientside_callback, ClientsideFunction
 import json
-import copy
+import threading
+import time
+from collections import OrderedDict
+from src.config.imports import lazy_import
 from src.config.logger import get_logger
-from . import sensor_models
+from src.rules.conditions import OPERATORS
+from src.rules.threshold_sweep import sweep_sensor
+from src.telemetry.instruments import CACHE_REQUESTS
+from src.telemetry.memory import memory, CacheAccount
+from . import sensor_models, sensor_device_ids, tree_histories, session_store, stored_tree
+from ..utils.condition_tree import get_node, update_condition_node
 
 logger = get_logger(__name__)
 
-@callback(
+# Only the threshold sweep graph draws figures
+go = lazy_import('plotly.graph_objs')
+
+SWEEP_CACHE_SECONDS = 60
+MAX_SWEEPS = 64
+
+# (sensor_device, operator) -> (computed_at, ThresholdSweep), so typing a value
+# only redraws the marker; least recently used first
+_sweep_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_sweep_lock = threading.Lock()
+memory.register('threshold_sweep', CacheAccount(_sweep_cache, _sweep_lock))
+
+# Opening the editor only copies the tree version the browser already holds
+clientside_callback(
+    ClientsideFunction(namespace='ui', function_name='open_edit_modal'),
     [Output('edit-condition-modal', 'style'),
      Output('edit-node-id', 'data'),
      Output('edit-tree-data-store', 'data')],
@@ -15,63 +37,22 @@ logger = get_logger(__name__)
     [State('condition-tree-store', 'data')],
     prevent_initial_call=True
 )
-def open_edit_modal(n_clicks_list, current_tree_data):
-    if not any(n_clicks_list or []):
-        return dash.no_update, dash.no_update, dash.no_update
-    
-    ctx = dash.callback_context
-    if not ctx.triggered:
-        return dash.no_update, dash.no_update, dash.no_update
-    
-    button_id = ctx.triggered[0]['prop_id'].split('.')[0]
-    node_id = eval(button_id)['node_id']
-    
-    logger.info(f"Opening edit modal for node {node_id} with tree data: {current_tree_data}")
-    
-    return {'display': 'block'}, node_id, current_tree_data
 
 @callback(
     Output('edit-condition-form', 'children'),
     Input('edit-node-id', 'data'),
     [State('condition-tree-store', 'data'),
-     State('edit-tree-data-store', 'data')],
+     State('edit-tree-data-store', 'data'),
+     State('session-id', 'data')],
     prevent_initial_call=True
 )
-def create_edit_form(node_id, tree_data, edit_tree_data):
+def create_edit_form(node_id, tree_version, edit_tree_version, session_id):
     if not node_id:
         return html.Div()
     
-    active_tree_data = edit_tree_data if edit_tree_data else tree_data
-    
-    if not active_tree_data:
-        return html.Div("No tree data available")
-    
-    logger.info(f"Edit form called with node_id: {node_id}")
-    logger.info(f"Tree data received: {active_tree_data}")
-    logger.info(f"Edit tree data: {edit_tree_data}")
-    
-    def find_node_by_id(node, target_id, current_id="root"):
-        logger.info(f"Searching for target_id='{target_id}', current_id='{current_id}', node_type='{node.get('type')}'")
-        
-        if current_id == target_id:
-            logger.info(f"Found target node: {node}")
-            return node
-        
-        if node.get('type') in ['and', 'or']:
-            left_result = find_node_by_id(node.get('left', {}), target_id, f"{current_id}_left")
-            if left_result:
-                return left_result
-            right_result = find_node_by_id(node.get('right', {}), target_id, f"{current_id}_right")
-            if right_result:
-                return right_result
-        elif node.get('type') == 'not':
-            child_result = find_node_by_id(node.get('child', {}), target_id, f"{current_id}_child")
-            if child_result:
-                return child_result
-        
-        return None
+    active_tree_data = stored_tree(session_id, edit_tree_version if edit_tree_version is not None else tree_version)
     
-    node_to_edit = find_node_by_id(active_tree_data, node_id)
+    node_to_edit = get_node(active_tree_data, node_id)
     
     if not node_to_edit or node_to_edit.get('type') != 'condition':
         return html.Div("Cannot edit this node type")
@@ -127,6 +108,11 @@ def create_edit_form(node_id, tree_data, edit_tree_data):
             )
         ], className='form-group'),
         
+        html.Div([
+            html.Label("How often would this trigger (last 7 days):"),
+            dcc.Graph(id='threshold-sweep-graph', config={'displayModeBar': False}, style={'height': '240px'})
+        ], className='form-group'),
+        
         html.Div([
             html.Button('Save Changes', id='save-edit-button', className='btn btn-primary'),
             html.Button('Cancel', id='cancel-edit-button', className='btn btn-secondary')
@@ -143,53 +129,81 @@ def create_edit_form(node_id, tree_data, edit_tree_data):
      State('edit-tree-data-store', 'data'),
      State('edit-sensor-device', 'value'),
      State('edit-operator', 'value'),
-     State('edit-value', 'value')],
+     State('edit-value', 'value'),
+     State('condition-tree-history-id', 'data'),
+     State('session-id', 'data')],
     prevent_initial_call=True
 )
-def save_edited_condition(n_clicks, node_id, tree_data, edit_tree_data, sensor_device, operator, value):
+def save_edited_condition(n_clicks, node_id, tree_version, edit_tree_version, sensor_device, operator, value,
+                          history_id, session_id):
     if not n_clicks or not node_id:
         return dash.no_update, dash.no_update, dash.no_update
     
     logger.info(f"Saving condition node {node_id} with sensor_device={sensor_device}, operator={operator}, value={value}")
     
-    active_tree_data = edit_tree_data if edit_tree_data else tree_data
-    if not active_tree_data:
-        return dash.no_update, dash.no_update, {'display': 'none'}
-    
-    logger.info(f"Original tree data: {active_tree_data}")
-    
-    def update_node_by_id(node, target_id, current_id="root"):
-        if current_id == target_id:
-            if node.get('type') == 'condition':
-                logger.info(f"Updating node at {current_id} from {node} to sensor_device={sensor_device}, operator={operator}, value={value}")
-                node.update({
-                    'sensor_device': sensor_device or '',
-                    'operator': operator or 'gte',
-                    'value': value if value is not None else 0
-                })
-                logger.info(f"Node after update: {node}")
-            return True
-        
-        if node.get('type') in ['and', 'or']:
-            if update_node_by_id(node.get('left', {}), target_id, f"{current_id}_left"):
-                return True
-            if update_node_by_id(node.get('right', {}), target_id, f"{current_id}_right"):
-                return True
-        elif node.get('type') == 'not':
-            if update_node_by_id(node.get('child', {}), target_id, f"{current_id}_child"):
-                return True
-        
-        return False
-    
-    # Use deep copy to avoid modifying the original tree
-    updated_tree = copy.deepcopy(active_tree_data)
-    success = update_node_by_id(updated_tree, node_id)
+    active_tree_data = stored_tree(session_id, edit_tree_version if edit_tree_version is not None else tree_version)
     
-    logger.info(f"Update success: {success}")
-    logger.info(f"Updated tree data: {updated_tree}")
+    fields = {
+        'sensor_device': sensor_device or '',
+        'operator': operator or 'gte',
+        'value': value if value is not None else 0
+    }
+    if history_id:
+        # Edit the history's own copy so the new version shares its untouched subtrees
+        history = tree_histories.sync(history_id, active_tree_data)
+        updated_tree = history.push(update_condition_node(history.current, node_id, fields))
+    else:
+        updated_tree = update_condition_node(active_tree_data, node_id, fields)
     
     # Always update the main condition-tree-store so the display refreshes
-    return updated_tree, dash.no_update, {'display': 'none'}
+    return session_store.put(session_id, updated_tree), dash.no_update, {'display': 'none'}
+
+@callback(
+    Output('threshold-sweep-graph', 'figure'),
+    [Input('edit-sensor-device', 'value'),
+     Input('edit-operator', 'value'),
+     Input('edit-value', 'value')],
+    prevent_initial_call=False
+)
+def update_threshold_sweep(sensor_device, operator, value):
+    fig = go.Figure()
+    fig.update_layout(template='plotly_white', height=240, margin=dict(l=40, r=40, t=10, b=30),
+                      showlegend=False, yaxis=dict(title='Fires'),
+                      yaxis2=dict(title='Hours active', overlaying='y', side='right'))
+    if not sensor_device or operator not in OPERATORS:
+        return fig
+    
+    try:
+        if sensor_device not in sensor_device_ids():
+            return fig
+        key = (sensor_device, operator)
+        with _sweep_lock:
+            cached = _sweep_cache.get(key)
+        fresh = cached is not None and time.monotonic() - cached[0] <= SWEEP_CACHE_SECONDS
+        CACHE_REQUESTS.labels('threshold_sweep', 'hit' if fresh else 'miss').inc()
+        if not fresh:
+            cached = (time.monotonic(), sweep_sensor(sensor_models, sensor_device, operator, start_time='-7d'))
+        with _sweep_lock:
+            _sweep_cache[key] = cached
+            _sweep_cache.move_to_end(key)
+            while len(_sweep_cache) > MAX_SWEEPS:
+                _sweep_cache.popitem(last=False)
+        sweep = cached[1]
+    except Exception as e:
+        logger.error(f"Error computing threshold sweep for {sensor_device}: {e}")
+        return fig
+    
+    if not sweep.thresholds:
+        fig.add_annotation(text="No data in the last 7 days", xref="paper", yref="paper",
+                           x=0.5, y=0.5, showarrow=False)
+        return fig
+    
+    fig.add_trace(go.Scatter(x=sweep.thresholds, y=sweep.fire_counts, mode='lines', name='Fires'))
+    fig.add_trace(go.Scatter(x=sweep.thresholds, y=[seconds / 3600 for seconds in sweep.active_seconds],
+                             mode='lines', name='Hours active', yaxis='y2', line=dict(dash='dot')))
+    if value is not None:
+        fig.add_vline(x=value, line_color='#e67e22')
+    return fig
 
 @callback(
     Output('edit-modal-devices-store', 'data'),
@@ -221,12 +235,9 @@ def populate_edit_sensor_dropdown(devices_list):
         return [{'label': device, 'value': device} for device in devices_list]
     return []
 
-@callback(
+clientside_callback(
+    ClientsideFunction(namespace='ui', function_name='close_modal'),
     Output('edit-condition-modal', 'style', allow_duplicate=True),
     Input('cancel-edit-button', 'n_clicks'),
     prevent_initial_call=True
 )
-def cancel_edit(n_clicks):
-    if n_clicks:
-        return {'display': 'none'}
-    return dash.no_update
\ No newline at end of file
@@ -1,20 +1,18 @@
 import dash
-from dash import html, dcc, Input, Output, State, callback
-import requests
-import os
+from dash import html, dcc, Input, Output, State, callback, clientside_callback, ClientsideFunction
 import json
 from datetime import datetime
 from src.config.logger import get_logger
-from . import sensor_models
+from . import sensor_models, rule_engine_client, rule_cache, device_snapshot, tree_histories, session_store, stored_tree
+from src.rules import backtest_rule, is_satisfiable
 from ..utils.condition_tree import (
     render_condition_tree, apply_not_to_node, delete_node_from_tree, 
-    add_group_to_node, validate_condition_tree_completeness
+    add_group_to_node, validate_condition_tree_completeness, DEFAULT_CONDITION,
+    condition_tree_update, remember_rendered_tree
 )
 
 logger = get_logger(__name__)
 
-RULE_ENGINE_URL = os.getenv('RULE_ENGINE_URL', 'http://localhost:5001')
-
 
 def extract_value_from_container(container, target_id):
     if not container:
@@ -63,7 +61,7 @@ def handle_rule_button_click(n_clicks, current_edit_rule_id):
     try:
         button_dict = json.loads(button_id)
         device_id = button_dict['index']
-        return {'display': 'block'}, device_id, {'type': 'condition', 'sensor_device': '', 'operator': 'gte', 'value': 0}, None
+        return {'display': 'block'}, device_id, None, None
     except Exception as e:
         logger.error(f"Error in handle_rule_button_click: {e}")
         return {'display': 'none'}, dash.no_update, dash.no_update, dash.no_update
@@ -72,10 +70,11 @@ def handle_rule_button_click(n_clicks, current_edit_rule_id):
     Output('rule-form-container', 'children'),
     [Input('rule-device-id', 'data'),
      Input('edit-rule-id', 'data')],
-    [State('condition-tree-store', 'data')],
+    [State('condition-tree-store', 'data'),
+     State('session-id', 'data')],
     prevent_initial_call=True
 )
-def create_rule_form(device_id, edit_rule_id, condition_tree_data):
+def create_rule_form(device_id, edit_rule_id, tree_version, session_id):
     if not device_id:
         return html.Div("No device selected")
     
@@ -83,8 +82,9 @@ def create_rule_form(device_id, edit_rule_id, condition_tree_data):
     form_title = f"Edit Rule for {device_id}" if is_editing else f"Create Rule for {device_id}"
     
     # Pre-populate condition tree display with current data
-    tree_data = condition_tree_data if condition_tree_data else {'type': 'condition', 'sensor_device': '', 'operator': 'gte', 'value': 0}
+    tree_data = stored_tree(session_id, tree_version)
     initial_tree_display = render_condition_tree(tree_data)
+    rendered_digest = remember_rendered_tree(tree_data)
     
     return html.Div([
         html.H3(form_title),
@@ -97,10 +97,14 @@ def create_rule_form(device_id, edit_rule_id, condition_tree_data):
             html.H4("Condition Tree"),
             html.Div([
                 html.Div(id='condition-tree-display', children=initial_tree_display),
+                # Digest of the tree the display shows; recreated with the form
+                dcc.Store(id='condition-tree-rendered', data=rendered_digest),
                 html.Div([
                     html.Button('Add AND Group', id='add-and-btn', className='tree-button'),
                     html.Button('Add OR Group', id='add-or-btn', className='tree-button'),
                     html.Button('Add NOT Group', id='add-not-btn', className='tree-button'),
+                    html.Button('Undo', id='undo-tree-btn', className='tree-button history-btn'),
+                    html.Button('Redo', id='redo-tree-btn', className='tree-button history-btn'),
                     html.Button('Reset Tree', id='reset-tree-btn', className='tree-button reset-btn')
                 ], className='tree-buttons')
             ], className='condition-tree-builder')
@@ -125,10 +129,12 @@ def create_rule_form(device_id, edit_rule_id, condition_tree_data):
         ], className='form-group'),
         
         html.Div([
+            html.Button('Backtest (7 days)', id='backtest-rule-button', className='backtest-button'),
             html.Button('Save Rule', id='save-rule-button', className='save-button'),
             html.Button('Cancel', id='cancel-rule-button', className='cancel-button')
         ], className='form-buttons'),
         
+        html.Div(id='rule-backtest-result'),
         html.Div(id='rule-save-feedback')
     ], className='rule-form')
 
@@ -251,126 +257,120 @@ def populate_discrete_action_for_editing(edit_rule_data):
     return dash.no_update
 
 @callback(
-    Output('condition-tree-display', 'children'),
+    [Output('condition-tree-display', 'children'),
+     Output('condition-tree-rendered', 'data')],
     Input('condition-tree-store', 'data'),
+    [State('condition-tree-rendered', 'data'),
+     State('session-id', 'data')],
     prevent_initial_call=False
 )
-def update_condition_tree_display(tree_data):
-    if tree_data is None:
-        tree_data = {'type': 'condition', 'sensor_device': '', 'operator': 'gte', 'value': 0}
-    return render_condition_tree(tree_data)
+def update_condition_tree_display(tree_version, rendered_digest, session_id):
+    tree_data = stored_tree(session_id, tree_version)
+    # Sends only the subtrees that changed since the last render
+    children, digest = condition_tree_update(tree_data, rendered_digest)
+    if children is None:
+        return dash.no_update, dash.no_update
+    return children, digest
 
 @callback(
-    Output('condition-tree-store', 'data'),
+    [Output('condition-tree-store', 'data'),
+     Output('condition-tree-history-id', 'data')],
     [Input('add-and-btn', 'n_clicks'), 
      Input('add-or-btn', 'n_clicks'),
      Input('add-not-btn', 'n_clicks'),
      Input('reset-tree-btn', 'n_clicks'),
+     Input('undo-tree-btn', 'n_clicks'),
+     Input('redo-tree-btn', 'n_clicks'),
      Input({'type': 'delete-node', 'node_id': dash.dependencies.ALL}, 'n_clicks'),
      Input({'type': 'apply-not-to-node', 'node_id': dash.dependencies.ALL}, 'n_clicks'),
      Input({'type': 'add-and-to-node', 'node_id': dash.dependencies.ALL}, 'n_clicks'),
      Input({'type': 'add-or-to-node', 'node_id': dash.dependencies.ALL}, 'n_clicks')],
-    [State('condition-tree-store', 'data')],
+    [State('condition-tree-store', 'data'),
+     State('condition-tree-history-id', 'data'),
+     State('session-id', 'data')],
     prevent_initial_call=True
 )
-def update_condition_tree_data(add_and, add_or, add_not, reset_tree, delete_clicks, apply_not_clicks, add_and_to_node_clicks, add_or_to_node_clicks, current_tree):
+def update_condition_tree_data(add_and, add_or, add_not, reset_tree, undo, redo, delete_clicks, apply_not_clicks,
+                               add_and_to_node_clicks, add_or_to_node_clicks, tree_version, history_id, session_id):
     ctx = dash.callback_context
     if not ctx.triggered:
-        return dash.no_update
+        return dash.no_update, dash.no_update
     
     trigger = ctx.triggered[0]['prop_id']
+    history_id = history_id or tree_histories.new_id()
+    history = tree_histories.sync(history_id, stored_tree(session_id, tree_version))
+    tree = history.current
+    
+    node_id = None
+    if trigger.startswith('{'):
+        try:
+            node_id = json.loads(trigger.split('.')[0]).get('node_id', '')
+        except ValueError as e:
+            logger.error(f"Error reading tree button id {trigger}: {e}")
+            return dash.no_update, dash.no_update
+    
+    if 'undo-tree-btn' in trigger and undo:
+        return session_store.put(session_id, history.undo()), history_id
+    
+    elif 'redo-tree-btn' in trigger and redo:
+        return session_store.put(session_id, history.redo()), history_id
     
-    if 'reset-tree-btn' in trigger and reset_tree:
-        return {'type': 'condition', 'sensor_device': '', 'operator': 'gte', 'value': 0}
+    elif 'reset-tree-btn' in trigger and reset_tree:
+        modified_tree = dict(DEFAULT_CONDITION)
     
     elif 'add-and-btn' in trigger and add_and:
-        new_condition = {'type': 'condition', 'sensor_device': '', 'operator': 'gte', 'value': 0}
-        return {'type': 'and', 'left': current_tree, 'right': new_condition}
+        modified_tree = {'type': 'and', 'left': tree, 'right': dict(DEFAULT_CONDITION)}
     
     elif 'add-or-btn' in trigger and add_or:
-        new_condition = {'type': 'condition', 'sensor_device': '', 'operator': 'gte', 'value': 0}
-        return {'type': 'or', 'left': current_tree, 'right': new_condition}
+        modified_tree = {'type': 'or', 'left': tree, 'right': dict(DEFAULT_CONDITION)}
     
     elif 'add-not-btn' in trigger and add_not:
-        return apply_not_to_node(current_tree, 'root')
+        modified_tree = apply_not_to_node(tree, 'root')
     
     elif 'apply-not-to-node' in trigger and any(apply_not_clicks or []):
-        try:
-            button_info = json.loads(trigger.split('.')[0])
-            node_id = button_info.get('node_id', '')
-            
-            modified_tree = apply_not_to_node(current_tree, node_id)
-            return modified_tree
-        except Exception as e:
-            logger.error(f"Error applying NOT to node: {e}")
-            return current_tree
+        modified_tree = apply_not_to_node(tree, node_id)
     
     elif 'delete-node' in trigger and any(delete_clicks or []):
-        try:
-            button_info = json.loads(trigger.split('.')[0])
-            node_id = button_info.get('node_id', '')
-            
-            if node_id == 'root':
-                return {'type': 'condition', 'sensor_device': '', 'operator': 'gte', 'value': 0}
-            else:
-                modified_tree = delete_node_from_tree(current_tree, node_id)
-                return modified_tree if modified_tree else {'type': 'condition', 'sensor_device': '', 'operator': 'gte', 'value': 0}
-        except Exception as e:
-            logger.error(f"Error deleting node: {e}")
-            return {'type': 'condition', 'sensor_device': '', 'operator': 'gte', 'value': 0}
+        if node_id == 'root':
+            modified_tree = dict(DEFAULT_CONDITION)
+        else:
+            modified_tree = delete_node_from_tree(tree, node_id)
     
     elif 'add-and-to-node' in trigger and any(add_and_to_node_clicks or []):
-        try:
-            button_info = json.loads(trigger.split('.')[0])
-            node_id = button_info.get('node_id', '')
-            
-            modified_tree = add_group_to_node(current_tree, node_id, 'and')
-            return modified_tree
-        except Exception as e:
-            logger.error(f"Error adding AND group to node: {e}")
-            return current_tree
+        modified_tree = add_group_to_node(tree, node_id, 'and')
     
     elif 'add-or-to-node' in trigger and any(add_or_to_node_clicks or []):
-        try:
-            button_info = json.loads(trigger.split('.')[0])
-            node_id = button_info.get('node_id', '')
-            
-            modified_tree = add_group_to_node(current_tree, node_id, 'or')
-            return modified_tree
-        except Exception as e:
-            logger.error(f"Error adding OR group to node: {e}")
-            return current_tree
+        modified_tree = add_group_to_node(tree, node_id, 'or')
     
-    return dash.no_update
+    else:
+        return dash.no_update, dash.no_update
+    
+    return session_store.put(session_id, history.push(modified_tree)), history_id
 
 @callback(
     Output('device-capabilities-store', 'data'),
     Input('rule-device-id', 'data'),
+    State('session-id', 'data'),
     prevent_initial_call=True
 )
-def populate_capability_store(device_id):
+def populate_capability_store(device_id, session_id):
     if not device_id:
         return dash.no_update
     
     try:
-        response = requests.get(f'{RULE_ENGINE_URL}/devices/{device_id}/capabilities', timeout=10)
-        
-        if response.status_code == 200:
-            result = response.json()
-            if result['success']:
-                capabilities = result['capabilities']
-                return capabilities
-        return []
+        return session_store.put(session_id, device_snapshot.get_capabilities(device_id))
     except Exception as e:
         logger.error(f"Error getting capability options: {e}")
-        return []
+        return None
 
 @callback(
     Output('action-capability-dropdown', 'options'),
     Input('device-capabilities-store', 'data'),
+    State('session-id', 'data'),
     prevent_initial_call=True
 )
-def update_action_capability_options(capabilities_data):
+def update_action_capability_options(capabilities_version, session_id):
+    capabilities_data = session_store.get(session_id, capabilities_version, [])
     if not capabilities_data:
         logger.info("Action capability options: no capabilities data")
         return []
@@ -382,9 +382,11 @@ def update_action_capability_options(capabilities_data):
 @callback(
     Output('action-type-dropdown', 'options'),
     [Input('action-capability-dropdown', 'value')],
-    [State('device-capabilities-store', 'data')]
+    [State('device-capabilities-store', 'data'),
+     State('session-id', 'data')]
 )
-def update_action_type_options(selected_capability, capabilities_data):
+def update_action_type_options(selected_capability, capabilities_version, session_id):
+    capabilities_data = session_store.get(session_id, capabilities_version, [])
     logger.info(f"Action type options callback: capability={selected_capability}, capabilities_data={capabilities_data}")
     
     if not selected_capability or not capabilities_data:
@@ -413,9 +415,11 @@ def update_action_type_options(selected_capability, capabilities_data):
     Output('action-value-container', 'children'),
     [Input('action-type-dropdown', 'value'),
      Input('action-capability-dropdown', 'value')],
-    [State('device-capabilities-store', 'data')]
+    [State('device-capabilities-store', 'data'),
+     State('session-id', 'data')]
 )
-def update_action_value_options(action_type, selected_capability, capabilities_data):
+def update_action_value_options(action_type, selected_capability, capabilities_version, session_id):
+    capabilities_data = session_store.get(session_id, capabilities_version, [])
     if action_type == 'toggle':
         return html.Div([
             html.Label("Toggle State:"),
@@ -472,10 +476,12 @@ def update_action_value_options(action_type, selected_capability, capabilities_d
      State('condition-tree-store', 'data'),
      State('action-capability-dropdown', 'value'),
      State('action-type-dropdown', 'value'),
-     State('action-value-container', 'children')],
+     State('action-value-container', 'children'),
+     State('session-id', 'data')],
     prevent_initial_call=True
 )
-def save_rule(n_clicks, device_id, edit_rule_id, rule_name, condition_tree, capability, action_type, action_container):
+def save_rule(n_clicks, device_id, edit_rule_id, rule_name, tree_version, capability, action_type, action_container,
+              session_id):
     logger.info(f"Save rule callback triggered: n_clicks={n_clicks}, device_id={device_id}, rule_name={rule_name}")
     if not n_clicks:
         logger.info("Save rule callback returning early - no button click")
@@ -485,11 +491,16 @@ def save_rule(n_clicks, device_id, edit_rule_id, rule_name, condition_tree, capa
         logger.info("Save rule callback returning early - missing parameters")
         return dash.no_update, {'display': 'none'}, {'display': 'none'}, {'display': 'none'}
     
+    condition_tree = stored_tree(session_id, tree_version)
     try:
         if not validate_condition_tree_completeness(condition_tree):
             return html.Div("Please ensure all conditions have sensor device, operator, and value set.", 
                           className="error-message"), {'display': 'none'}, {'display': 'none'}, {'display': 'none'}
         
+        if not is_satisfiable(condition_tree):
+            return html.Div("These conditions can never all hold, so the rule would never fire.",
+                          className="error-message"), {'display': 'none'}, {'display': 'none'}, {'display': 'none'}
+        
         actions = {}
         if capability and action_type:
             logger.info(f"Processing action: capability={capability}, type={action_type}, is_editing={edit_rule_id is not None}")
@@ -521,6 +532,8 @@ def save_rule(n_clicks, device_id, edit_rule_id, rule_name, condition_tree, capa
         
         logger.info(f"Final actions payload: {actions}")
         
+        # Saved as built: the normalized form reads differently while a
+        # sensor has no reading, and the editor would get a rewritten tree back
         payload = {
             'device_id': device_id,
             'rule_name': rule_name,
@@ -533,14 +546,18 @@ def save_rule(n_clicks, device_id, edit_rule_id, rule_name, condition_tree, capa
         
         if is_editing:
             # Update existing rule
-            response = requests.put(f'{RULE_ENGINE_URL}/rules/{edit_rule_id}', json=payload, timeout=10)
+            response = rule_engine_client.update_rule(edit_rule_id, payload)
             success_msg = "Rule updated successfully!"
         else:
             # Create new rule
-            response = requests.post(f'{RULE_ENGINE_URL}/rules', json=payload, timeout=10)
+            response = rule_engine_client.create_rule(payload)
             success_msg = "Rule created successfully!"
         
         if response.status_code in [200, 201]:
+            if is_editing:
+                rule_cache.apply_updated(edit_rule_id, payload)
+            else:
+                rule_cache.apply_created(device_id, payload, response.json() if response.content else {})
             return html.Div(success_msg, className="success-message"), {'display': 'none'}, {'display': 'none'}, {'display': 'none'}
         else:
             error_msg = response.json().get('message', f'Failed to {"update" if is_editing else "create"} rule')
@@ -551,11 +568,44 @@ def save_rule(n_clicks, device_id, edit_rule_id, rule_name, condition_tree, capa
         return html.Div(f"Error: {str(e)}", className="error-message"), {'display': 'none'}, {'display': 'none'}, {'display': 'none'}
 
 @callback(
+    Output('rule-backtest-result', 'children'),
+    Input('backtest-rule-button', 'n_clicks'),
+    [State('condition-tree-store', 'data'),
+     State('session-id', 'data')],
+    prevent_initial_call=True
+)
+def backtest_condition_tree(n_clicks, tree_version, session_id):
+    if not n_clicks:
+        return dash.no_update
+    
+    condition_tree = stored_tree(session_id, tree_version)
+    if not validate_condition_tree_completeness(condition_tree):
+        return html.Div("Complete all conditions before running a backtest.", className="error-message")
+    
+    try:
+        result = backtest_rule(condition_tree, sensor_models, start_time='-7d')
+        logger.info(f"Backtest over {result.samples} samples: {result.fire_count} fires")
+        
+        if not result.fire_count:
+            return html.Div("This rule would not have fired in the last 7 days.", className="backtest-result")
+        
+        recent_intervals = [
+            html.Li(f"{start.tz_convert(None).strftime('%Y-%m-%d %H:%M:%S')} for {int((end - start).total_seconds())}s")
+            for start, end in result.intervals[-5:]
+        ]
+        return html.Div([
+            html.Div(f"Would have fired {result.fire_count} times in the last 7 days "
+                     f"(active {result.active_seconds / 3600:.1f} h)."),
+            html.Div("Most recent:", className="label"),
+            html.Ul(recent_intervals)
+        ], className="backtest-result")
+    except Exception as e:
+        logger.error(f"Error running backtest: {e}")
+        return html.Div(f"Backtest failed: {str(e)}", className="error-message")
+
+clientside_callback(
+    ClientsideFunction(namespace='ui', function_name='close_modal'),
     Output('rule-modal', 'style', allow_duplicate=True),
     Input('cancel-rule-button', 'n_clicks'),
     prevent_initial_call=True
 )
-def cancel_rule_creation(n_clicks):
-    if n_clicks:
-        return {'display': 'none'}
-    return dash.no_update
\ No newline at end of file
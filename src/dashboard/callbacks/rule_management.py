@@ -1,17 +1,17 @@
 import dash
-from dash import html, dcc, Input, Output, State, callback
-import requests
-import os
+from dash import html, dcc, Input, Output, State, callback, clientside_callback, ClientsideFunction
 import json
 from datetime import datetime
 from src.config.logger import get_logger
-from . import sensor_models
+from src.telemetry.memory import memory, CacheAccount
+from . import sensor_models, rule_engine_client, rule_cache, session_store
+from ..utils.rule_cache import RuleLoadError
+from ..utils.rule_search import RuleSearchIndexCache, summarize_actions
+from src.rules import analyze_rules, compile_condition_tree
 from ..utils.condition_tree import render_condition_tree, validate_condition_tree_completeness
 
 logger = get_logger(__name__)
 
-RULE_ENGINE_URL = os.getenv('RULE_ENGINE_URL', 'http://localhost:5001')
-
 
 @callback(
     [Output('view-rules-modal', 'style'),
@@ -34,165 +34,254 @@ def handle_view_rules_button_click(n_clicks):
         logger.error(f"Error in handle_view_rules_button_click: {e}")
         return {'display': 'none'}, dash.no_update
 
+RULES_PAGE_SIZE = 25
+
+rule_search_indexes = RuleSearchIndexCache()
+memory.register('rule_search', rule_search_indexes)
+
+# Compiled condition trees keyed by rule id, recompiled when the conditions change
+_compiled_conditions = {}
+memory.register('compiled_conditions', CacheAccount(_compiled_conditions))
+# Rule ids each device had when its rules last loaded
+_compiled_owners = {}
+
+
+def prune_compiled_conditions(device_id, rules):
+    # Rules a device no longer has, deleted ones included, drop their compiled trees
+    incoming = {str(rule['rule_id']) for rule in rules}
+    for rule_key in _compiled_owners.get(device_id, set()) - incoming:
+        _compiled_conditions.pop(rule_key, None)
+    _compiled_owners[device_id] = incoming
+
+
+rule_cache.add_listener(prune_compiled_conditions)
+
+# Static analysis of each device's rules, keyed by device id and redone per cache revision
+_rule_analyses = {}
+memory.register('rule_analyses', CacheAccount(_rule_analyses))
+
+
+def get_latest_sensor_values():
+    latest_values = {}
+    for model in sensor_models:
+        data = model.get_latest_device_data()
+        for device_id, value, reading_time in zip(data['device_id'], data['value'], data['_time']):
+            latest_values[device_id] = {'value': value, 'time': reading_time}
+    return latest_values
+
+
+def rule_fires_now(rule, latest_values):
+    conditions = rule.get('conditions')
+    if not conditions:
+        return None
+    
+    rule_key = str(rule['rule_id'])
+    cached = _compiled_conditions.get(rule_key)
+    if cached is None or cached[0] != conditions:
+        try:
+            # The literal tree, so a missing reading counts as the rule engine counts it
+            cached = (conditions, compile_condition_tree(conditions))
+        except ValueError as e:
+            logger.error(f"Cannot compile conditions of rule {rule_key}: {e}")
+            return None
+        _compiled_conditions[rule_key] = cached
+    return cached[1](latest_values)
+
+
+def get_rule_analysis(device_id, revision, rules):
+    cached = _rule_analyses.get(device_id)
+    if cached is None or cached[0] != revision:
+        cached = (revision, analyze_rules(rules))
+        _rule_analyses[device_id] = cached
+    return cached[1]
+
+
+def rule_warnings(rule, analysis, rule_names):
+    rule_key = str(rule['rule_id'])
+    warnings = []
+    if rule_key in analysis.unsatisfiable:
+        warnings.append("Never fires: its conditions can never all hold")
+    for conflict in analysis.conflicts_for(rule_key):
+        other = conflict.rule_ids[1] if conflict.rule_ids[0] == rule_key else conflict.rule_ids[0]
+        warnings.append(f"Conflicts with '{rule_names.get(other, other)}' on {conflict.capability}")
+    return warnings
+
+
+def render_rule_card(rule, fires_now=None, warnings=None):
+    rule_id = rule['rule_id']
+    rule_name = rule['rule_name']
+    enabled = rule['enabled']
+    created_at = rule.get('created_at', 'Unknown')
+    
+    try:
+        created_dt = datetime.fromisoformat(created_at.replace('Z', '+00:00') if created_at.endswith('Z') else created_at)
+        created_str = created_dt.strftime('%Y-%m-%d %H:%M')
+    except:
+        created_str = str(created_at)
+    
+    action_summary = summarize_actions(rule.get('actions', {}))
+    
+    status_class = "rule-enabled" if enabled else "rule-disabled"
+    status_text = "Enabled" if enabled else "Disabled"
+    
+    return html.Div([
+        html.H4(rule_name, className="rule-title"),
+        html.Div([
+            html.Div([
+                html.Span("Status: ", className="label"),
+                html.Span(status_text, className=f"status {status_class}")
+            ]),
+            html.Div([
+                html.Span("Created: ", className="label"),
+                html.Span(created_str, className="timestamp")
+            ]),
+            html.Div([
+                html.Span("Actions: ", className="label"),
+                html.Span(", ".join(action_summary) if action_summary else "No actions", className="actions-summary")
+            ]),
+            html.Div([
+                html.Span("Fires now: ", className="label"),
+                html.Span("Yes" if fires_now else "No", className=f"fires-now fires-now-{'yes' if fires_now else 'no'}")
+            ]) if fires_now is not None else None,
+            html.Div([
+                html.Div(warning, className="rule-warning") for warning in warnings
+            ], className="rule-warnings") if warnings else None
+        ], className="rule-info"),
+        html.Div([
+            html.Button(
+                "View Condition", 
+                id={'type': 'view-condition', 'rule_id': rule_id}, 
+                className="view-condition-button"
+            ),
+            html.Button(
+                "Disable" if enabled else "Enable", 
+                id={'type': 'toggle-rule', 'rule_id': rule_id}, 
+                className="toggle-rule-button"
+            ),
+            html.Button(
+                "Delete", 
+                id={'type': 'delete-rule', 'rule_id': rule_id}, 
+                className="delete-rule-button"
+            )
+        ], className="rule-buttons")
+    ], className=f"rule-card {status_class}")
+
 @callback(
-    Output('rules-list-container', 'children'),
-    [Input('view-rules-device-id', 'data'),
-     Input('rules-search-store', 'data')],
+    [Output('rules-list-container', 'children'),
+     Output('rules-search-store', 'data', allow_duplicate=True),
+     Output('rules-page-store', 'data', allow_duplicate=True)],
+    Input('view-rules-device-id', 'data'),
     prevent_initial_call=True
 )
-def populate_rules_list(device_id, search_term):
+def populate_rules_list(device_id):
     if not device_id:
-        return html.Div("No device selected")
+        return html.Div("No device selected"), dash.no_update, dash.no_update
+    
+    # The search box lives outside the results so typing never re-creates it;
+    # results are rendered by render_rules_page as the search or page changes.
+    return html.Div([
+        html.H3(f"Rules for {device_id}"),
+        html.Div([
+            html.Label("Search rules:", className="form-label"),
+            dcc.Input(id='rules-search-input', type='text', placeholder='Search by rule name or action...',
+                      className='search-input', value='', debounce=0.3)
+        ], className="search-container"),
+        html.Div(id='rules-results-container'),
+        html.Div([
+            html.Button("Previous", id='rules-prev-page', className='page-button', n_clicks=0),
+            html.Span(id='rules-page-label', className='page-label'),
+            html.Button("Next", id='rules-next-page', className='page-button', n_clicks=0)
+        ], className="rules-pagination"),
+        html.Div(id='rule-action-feedback')
+    ]), '', 0
+
+@callback(
+    [Output('rules-results-container', 'children'),
+     Output('rules-page-label', 'children'),
+     Output('rules-prev-page', 'disabled'),
+     Output('rules-next-page', 'disabled')],
+    [Input('rules-search-store', 'data'),
+     Input('rules-page-store', 'data'),
+     Input('rules-refresh-store', 'data')],
+    [State('view-rules-device-id', 'data')],
+    prevent_initial_call=True
+)
+def render_rules_page(search_term, page, refresh, device_id):
+    if not device_id:
+        return html.Div("No device selected"), '', True, True
     
     try:
-        response = requests.get(f'{RULE_ENGINE_URL}/rules/{device_id}', timeout=10)
-        
-        if response.status_code != 200:
-            logger.error(f"Failed to get rules from rule engine: {response.status_code}")
-            return html.Div([
-                html.H3(f"Rules for {device_id}"),
-                html.Div([
-                    html.Label("Search rules:", className="form-label"),
-                    dcc.Input(id='rules-search-input', type='text', placeholder='Search by rule name...', className='search-input')
-                ], className="search-container"),
-                html.Div("Failed to load rules", className="error")
-            ])
+        try:
+            revision, rules = rule_cache.get_versioned_rules(device_id)
+        except RuleLoadError as e:
+            logger.error(str(e))
+            return html.Div("Failed to load rules", className="error"), '', True, True
         
-        result = response.json()
-        if not result.get('success', False):
-            logger.error(f"Rule engine returned error: {result.get('message', 'Unknown error')}")
-            return html.Div([
-                html.H3(f"Rules for {device_id}"),
-                html.Div([
-                    html.Label("Search rules:", className="form-label"),
-                    dcc.Input(id='rules-search-input', type='text', placeholder='Search by rule name...', className='search-input')
-                ], className="search-container"),
-                html.Div("Failed to load rules", className="error")
-            ])
+        index = rule_search_indexes.get(device_id, revision, rules)
+        page_rules, match_count, page_count = index.page(search_term, page or 0, RULES_PAGE_SIZE)
+        current_page = min(max(page or 0, 0), page_count - 1)
         
-        rules = result.get('rules', [])
+        if not page_rules:
+            no_results_msg = "No rules found matching your search" if search_term else "No rules found for this device"
+            return html.Div(no_results_msg, className="no-data"), '', True, True
         
-        if search_term:
-            rules = [rule for rule in rules if search_term.lower() in rule['rule_name'].lower()]
+        try:
+            latest_values = get_latest_sensor_values()
+        except Exception as e:
+            logger.error(f"Error getting latest sensor values for rule preview: {e}")
+            latest_values = None
         
-        if not rules:
-            no_results_msg = "No rules found matching your search" if search_term else "No rules found for this device"
-            return html.Div([
-                html.H3(f"Rules for {device_id}"),
-                html.Div([
-                    html.Label("Search rules:", className="form-label"),
-                    dcc.Input(id='rules-search-input', type='text', placeholder='Search by rule name...', className='search-input', value=search_term or '')
-                ], className="search-container"),
-                html.Div(no_results_msg, className="no-data")
-            ])
+        analysis = get_rule_analysis(device_id, revision, rules)
+        rule_names = {str(rule['rule_id']): rule['rule_name'] for rule in rules}
         
-        rule_cards = []
-        for rule in rules:
-            rule_id = rule['rule_id']
-            rule_name = rule['rule_name']
-            enabled = rule['enabled']
-            created_at = rule.get('created_at', 'Unknown')
-            
-            try:
-                created_dt = datetime.fromisoformat(created_at.replace('Z', '+00:00') if created_at.endswith('Z') else created_at)
-                created_str = created_dt.strftime('%Y-%m-%d %H:%M')
-            except:
-                created_str = str(created_at)
-            
-            actions = rule.get('actions', {})
-            action_summary = []
-            for capability, action_config in actions.items():
-                if 'toggle' in action_config:
-                    action_summary.append(f"{capability}: {action_config['toggle']}")
-                elif 'absolute_value' in action_config:
-                    action_summary.append(f"{capability}: {action_config['absolute_value']}")
-                elif 'discrete_value' in action_config:
-                    action_summary.append(f"{capability}: {action_config['discrete_value']}")
-                elif 'trigger' in action_config:
-                    duration = action_config.get('duration', 30)
-                    action_summary.append(f"{capability}: trigger ({duration}s)")
-            
-            status_class = "rule-enabled" if enabled else "rule-disabled"
-            status_text = "Enabled" if enabled else "Disabled"
-            
-            rule_card = html.Div([
-                html.H4(rule_name, className="rule-title"),
-                html.Div([
-                    html.Div([
-                        html.Span("Status: ", className="label"),
-                        html.Span(status_text, className=f"status {status_class}")
-                    ]),
-                    html.Div([
-                        html.Span("Created: ", className="label"),
-                        html.Span(created_str, className="timestamp")
-                    ]),
-                    html.Div([
-                        html.Span("Actions: ", className="label"),
-                        html.Span(", ".join(action_summary) if action_summary else "No actions", className="actions-summary")
-                    ])
-                ], className="rule-info"),
-                html.Div([
-                    html.Button(
-                        "View Condition", 
-                        id={'type': 'view-condition', 'rule_id': rule_id}, 
-                        className="view-condition-button"
-                    ),
-                    html.Button(
-                        "Disable" if enabled else "Enable", 
-                        id={'type': 'toggle-rule', 'rule_id': rule_id}, 
-                        className="toggle-rule-button"
-                    ),
-                    html.Button(
-                        "Delete", 
-                        id={'type': 'delete-rule', 'rule_id': rule_id}, 
-                        className="delete-rule-button"
-                    )
-                ], className="rule-buttons")
-            ], className=f"rule-card {status_class}")
-            
-            rule_cards.append(rule_card)
+        rule_cards = [
+            render_rule_card(rule, rule_fires_now(rule, latest_values) if latest_values is not None else None,
+                             rule_warnings(rule, analysis, rule_names))
+            for rule in page_rules
+        ]
         
-        return html.Div([
-            html.H3(f"Rules for {device_id}"),
-            html.Div([
-                html.Label("Search rules:", className="form-label"),
-                dcc.Input(id='rules-search-input', type='text', placeholder='Search by rule name...', className='search-input', value=search_term or '')
-            ], className="search-container"),
-            html.Div(rule_cards, className="rules-grid"),
-            html.Div(id='rule-action-feedback')
-        ])
+        page_label = f"Page {current_page + 1} of {page_count} ({match_count} rules)"
+        return (html.Div(rule_cards, className="rules-grid"),
+                page_label, current_page == 0, current_page >= page_count - 1)
         
     except Exception as e:
         logger.error(f"Error loading rules for device {device_id}: {e}")
-        return html.Div([
-            html.H3(f"Rules for {device_id}"),
-            html.Div([
-                html.Label("Search rules:", className="form-label"),
-                dcc.Input(id='rules-search-input', type='text', placeholder='Search by rule name...', className='search-input')
-            ], className="search-container"),
-            html.Div(f"Error loading rules: {str(e)}", className="error")
-        ])
-
+        return html.Div(f"Error loading rules: {str(e)}", className="error"), '', True, True
 
 @callback(
+    Output('rules-page-store', 'data'),
+    [Input('rules-prev-page', 'n_clicks'),
+     Input('rules-next-page', 'n_clicks')],
+    [State('rules-page-store', 'data')],
+    prevent_initial_call=True
+)
+def change_rules_page(prev_clicks, next_clicks, page):
+    ctx = dash.callback_context
+    if not ctx.triggered or not (prev_clicks or next_clicks):
+        return dash.no_update
+    
+    page = page or 0
+    if ctx.triggered[0]['prop_id'].startswith('rules-next-page'):
+        return page + 1
+    return max(page - 1, 0)
+
+clientside_callback(
+    ClientsideFunction(namespace='ui', function_name='close_modal'),
     Output('view-rules-modal', 'style', allow_duplicate=True),
     Input('close-rules-modal', 'n_clicks'),
     prevent_initial_call=True
 )
-def close_rules_modal(n_clicks):
-    if n_clicks:
-        return {'display': 'none'}
-    return dash.no_update
 
 @callback(
     [Output('rule-action-feedback', 'children'),
-     Output('view-rules-device-id', 'data', allow_duplicate=True)],
+     Output('rules-refresh-store', 'data')],
     [Input({'type': 'toggle-rule', 'rule_id': dash.dependencies.ALL}, 'n_clicks'),
      Input({'type': 'delete-rule', 'rule_id': dash.dependencies.ALL}, 'n_clicks')],
-    [State('view-rules-device-id', 'data')],
+    [State('view-rules-device-id', 'data'),
+     State('rules-refresh-store', 'data')],
     prevent_initial_call=True
 )
-def handle_rule_actions(toggle_clicks, delete_clicks, device_id):
+def handle_rule_actions(toggle_clicks, delete_clicks, device_id, refresh_count):
     ctx = dash.callback_context
     if not ctx.triggered or not device_id:
         return dash.no_update, dash.no_update
@@ -208,16 +297,18 @@ def handle_rule_actions(toggle_clicks, delete_clicks, device_id):
         action_type = button_dict['type']
         
         if action_type == 'toggle-rule':
-            response = requests.post(f'{RULE_ENGINE_URL}/rules/{rule_id}/toggle', timeout=10)
+            response = rule_engine_client.toggle_rule(rule_id)
             if response.status_code == 200:
+                rule_cache.apply_toggled(rule_id, response.json())
                 feedback = html.Div("Rule status toggled successfully!", className="success-message")
             else:
                 error_msg = response.json().get('message', 'Failed to toggle rule')
                 feedback = html.Div(error_msg, className="error-message")
         
         elif action_type == 'delete-rule':
-            response = requests.delete(f'{RULE_ENGINE_URL}/rules/{rule_id}', timeout=10)
+            response = rule_engine_client.delete_rule(rule_id)
             if response.status_code == 200:
+                rule_cache.apply_deleted(rule_id)
                 feedback = html.Div("Rule deleted successfully!", className="success-message")
             else:
                 error_msg = response.json().get('message', 'Failed to delete rule')
@@ -225,8 +316,8 @@ def handle_rule_actions(toggle_clicks, delete_clicks, device_id):
         else:
             return dash.no_update, dash.no_update
         
-        # Trigger refresh by setting the device_id again - this will cause populate_rules_list to re-run
-        return feedback, device_id
+        # Bump the refresh counter so render_rules_page re-renders the current page from the updated cache
+        return feedback, (refresh_count or 0) + 1
     
     except Exception as e:
         logger.error(f"Error handling rule action: {e}")
@@ -263,26 +354,16 @@ def populate_condition_tree_view(rule_id, device_id):
         return html.Div("No rule selected")
     
     try:
-        response = requests.get(f'{RULE_ENGINE_URL}/rules/{device_id}', timeout=10)
-        
-        if response.status_code != 200:
+        try:
+            rule = rule_cache.get_rule(device_id, rule_id)
+        except RuleLoadError as e:
+            logger.error(str(e))
             return html.Div([
                 html.H3("Condition Tree"),
                 html.Div("Failed to load rule", className="error"),
                 html.Button('Close', id='close-condition-tree-modal', className='cancel-button')
             ])
         
-        result = response.json()
-        if not result.get('success', False):
-            return html.Div([
-                html.H3("Condition Tree"),
-                html.Div("Failed to load rule", className="error"),
-                html.Button('Close', id='close-condition-tree-modal', className='cancel-button')
-            ])
-        
-        rules = result.get('rules', [])
-        rule = next((r for r in rules if str(r['rule_id']) == str(rule_id)), None)
-        
         if not rule:
             return html.Div([
                 html.H3("Condition Tree"),
@@ -316,15 +397,12 @@ def populate_condition_tree_view(rule_id, device_id):
             html.Button('Close', id='close-condition-tree-modal', className='cancel-button')
         ])
 
-@callback(
+clientside_callback(
+    ClientsideFunction(namespace='ui', function_name='close_modal'),
     Output('condition-tree-modal', 'style', allow_duplicate=True),
     Input('close-condition-tree-modal', 'n_clicks'),
     prevent_initial_call=True
 )
-def close_condition_tree_modal(n_clicks):
-    if n_clicks:
-        return {'display': 'none'}
-    return dash.no_update
 
 @callback(
     [Output('rule-modal', 'style', allow_duplicate=True),
@@ -336,10 +414,11 @@ def close_condition_tree_modal(n_clicks):
      Output('edit-rule-data', 'data', allow_duplicate=True)],
     Input('edit-condition-tree-button', 'n_clicks'),
     [State('view-condition-rule-id', 'data'),
-     State('view-rules-device-id', 'data')],
+     State('view-rules-device-id', 'data'),
+     State('session-id', 'data')],
     prevent_initial_call=True
 )
-def handle_edit_condition_tree_button(n_clicks, rule_id, device_id):
+def handle_edit_condition_tree_button(n_clicks, rule_id, device_id, session_id):
     logger.info(f"Edit condition tree callback triggered with n_clicks={n_clicks}, rule_id={rule_id}, device_id={device_id}")
     
     if not n_clicks or not rule_id or not device_id:
@@ -350,20 +429,12 @@ def handle_edit_condition_tree_button(n_clicks, rule_id, device_id):
         logger.info(f"Edit condition tree button clicked for rule {rule_id} on device {device_id}")
         
         # Get the rule's condition tree data
-        response = requests.get(f'{RULE_ENGINE_URL}/rules/{device_id}', timeout=10)
-        
-        if response.status_code != 200:
-            logger.error(f"Failed to get rule data for editing: {response.status_code}")
-            return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
-        
-        result = response.json()
-        if not result.get('success', False):
-            logger.error(f"Rule engine returned error: {result.get('message', 'Unknown error')}")
+        try:
+            rule = rule_cache.get_rule(device_id, rule_id)
+        except RuleLoadError as e:
+            logger.error(f"Failed to get rule data for editing: {e}")
             return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
         
-        rules = result.get('rules', [])
-        rule = next((r for r in rules if str(r['rule_id']) == str(rule_id)), None)
-        
         if not rule:
             logger.error(f"Rule {rule_id} not found")
             return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
@@ -402,17 +473,18 @@ def handle_edit_condition_tree_button(n_clicks, rule_id, device_id):
         
         # Open the rule editor with existing condition tree (keep condition modal open in background)
         logger.info(f"Returning rule modal display=block, device_id={device_id}, edit_rule_id={rule_id}")
-        logger.info(f"About to set condition-tree-store to: {conditions}")
-        return {'display': 'block'}, device_id, conditions, dash.no_update, rule_id, device_id, rule_data
+        tree_version = session_store.put(session_id, conditions) if conditions else None
+        return {'display': 'block'}, device_id, tree_version, dash.no_update, rule_id, device_id, rule_data
         
     except Exception as e:
         logger.error(f"Error handling edit condition tree button: {e}")
         return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
 
 @callback(
-    Output('rules-search-store', 'data'),
+    [Output('rules-search-store', 'data'),
+     Output('rules-page-store', 'data', allow_duplicate=True)],
     Input('rules-search-input', 'value'),
     prevent_initial_call=True
 )
 def update_search_store(search_value):
-    return search_value or ''
\ No newline at end of file
+    return search_value or '', 0
\ No newline at end of file
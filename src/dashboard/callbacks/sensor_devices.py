@@ -1,12 +1,29 @@
 import dash
 from dash import html, Input, Output, callback
-import pandas as pd
 import json
 from src.config.logger import get_logger
-from . import sensor_models
+from src.config.imports import lazy_import
+from . import sensor_models, device_snapshot, rule_cache, rule_network
 
 logger = get_logger(__name__)
 
+pd = lazy_import('pandas')
+
+
+def refresh_rule_network():
+    # Rules reach the network through the rule cache listener; loading each
+    # actionable device's rules is a no-op while its cache entry is fresh.
+    try:
+        device_snapshot.sync()
+    except Exception as e:
+        logger.error(f"Error syncing devices for rule network: {e}")
+    for device in device_snapshot.devices:
+        try:
+            rule_cache.get_rules(device['device_id'])
+        except Exception as e:
+            logger.error(f"Error loading rules of {device['device_id']} for rule network: {e}")
+
+
 @callback(
     Output('sensor-devices-container', 'children'),
     Input('interval-component', 'n_intervals')
@@ -24,6 +41,16 @@ def update_sensor_devices(n):
             
         latest_data = pd.concat(all_data, ignore_index=True)
         
+        refresh_rule_network()
+        for device_id, value, timestamp in zip(latest_data['device_id'], latest_data['value'], latest_data['_time']):
+            for transition in rule_network.on_reading(device_id, value, timestamp):
+                logger.info(f"Rule {transition.rule_id} became {'active' if transition.active else 'inactive'} "
+                            f"after reading from {device_id}")
+        # Only time-filtered conditions whose schedule boundary has passed are re-evaluated
+        for transition in rule_network.tick():
+            logger.info(f"Rule {transition.rule_id} became {'active' if transition.active else 'inactive'} "
+                        f"at a schedule boundary")
+        
         device_cards = []
         for _, row in latest_data.iterrows():
             device_id = row['device_id']
@@ -38,6 +65,9 @@ def update_sensor_devices(n):
             time_str = timestamp.strftime('%H:%M:%S') if timestamp else 'Unknown'
             date_str = timestamp.strftime('%Y-%m-%d') if timestamp else 'Unknown'
             
+            dependent_rules = rule_network.rules_for_sensor(device_id)
+            rule_names = [rule.get('rule_name') or str(rule['rule_id']) for rule in dependent_rules]
+            
             card = html.Div([
                 html.H3(device_id, className="device-title"),
                 html.Div([
@@ -56,6 +86,10 @@ def update_sensor_devices(n):
                     html.Div([
                         html.Span("Last Update: ", className="label"),
                         html.Span(f"{date_str} {time_str}", className="timestamp")
+                    ]),
+                    html.Div([
+                        html.Span("Rules: ", className="label"),
+                        html.Span(str(len(rule_names)), className="value", title=", ".join(rule_names))
                     ])
                 ], className="device-info"),
                 html.Button("Details", id={'type': 'details-button', 'index': device_id}, 
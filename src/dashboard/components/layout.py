@@ -1,12 +1,17 @@
 from dash import dcc, html
+from ..utils.session_store import new_session_id
 
 def create_layout():
     return html.Div([
+        # Called per page load, so every browser tab gets its own session
+        dcc.Store(id='session-id', data=new_session_id()),
         dcc.Store(id='selected-device', data=[]),
-        dcc.Store(id='available-options', data=[]),
+        # Versions in the session store; None is the empty list / default tree
+        dcc.Store(id='available-options', data=None),
         dcc.Store(id='edit-modal-devices-store', data=[]),
-        dcc.Store(id='condition-tree-store', data={'type': 'condition', 'sensor_device': '', 'operator': 'gte', 'value': 0}),
-        dcc.Store(id='device-capabilities-store', data=[]),
+        dcc.Store(id='condition-tree-store', data=None),
+        dcc.Store(id='condition-tree-history-id', data=None),
+        dcc.Store(id='device-capabilities-store', data=None),
         
         html.H1("Smart Home Dashboard", className="main-header"),
 
@@ -49,8 +54,10 @@ def create_layout():
         dcc.Store(id='edit-condition-tree-store', data=None),
         dcc.Store(id='edit-rule-data', data=None),
         dcc.Store(id='edit-rule-id', data=None),
-        dcc.Store(id='edit-tree-data-store', data={'type': 'condition', 'sensor_device': '', 'operator': 'gte', 'value': 0}),
+        dcc.Store(id='edit-tree-data-store', data=None),
         dcc.Store(id='rules-search-store', data=''),
+        dcc.Store(id='rules-page-store', data=0),
+        dcc.Store(id='rules-refresh-store', data=0),
         
         dcc.Interval(
             id='interval-component',
@@ -99,5 +106,6 @@ def create_charts_tab_content(available_options, selected_devices):
 
 def create_actionable_tab_content():
     return html.Div([
-        html.Div(id='actionable-devices-container')
+        html.Div(id='actionable-devices-container'),
+        dcc.Store(id='actionable-devices-rendered', data=None)
     ])
\ No newline at end of file
@@ -0,0 +1,69 @@
+import os
+import tempfile
+
+# Production serving: gunicorn pre-forks SERVER_WORKERS processes with
+# SERVER_THREADS threads each, after importing the dashboard once in the
+# master. Workers share latest readings, chart series, the device catalog,
+# rule lists and session values through a SQLite file, so adding workers does
+# not multiply queries to InfluxDB or the rule engine.
+#
+#   gunicorn -c src/dashboard/gunicorn_conf.py src.dashboard.wsgi:server
+#
+# Settings are read when src is first imported, so the cache path is set first.
+# Without one, the cache goes in a new directory only this user can open;
+# workers inherit the path from the master.
+if not os.environ.get('SHARED_CACHE_PATH'):
+    os.environ['SHARED_CACHE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='smart-home-dashboard-'), 'cache.sqlite')
+
+# gunicorn reads every module-level name that matches a setting, and config is one
+from src.config.settings import config as dashboard_config  # noqa: E402
+
+bind = dashboard_config.get("server.bind", "0.0.0.0:8050")
+workers = dashboard_config.get("server.workers", 1)
+threads = dashboard_config.get("server.threads", 4)
+worker_class = 'gthread'
+timeout = dashboard_config.get("server.timeout", 60)
+preload_app = True
+
+
+def _port(server):
+    for address in server.cfg.address:
+        if isinstance(address, tuple):
+            return address[1]
+    return None
+
+
+def when_ready(server):
+    # Runs in the master with the socket bound and before any worker forks:
+    # work that needs no backend is done once and inherited by every worker.
+    # Threads and open connections do not survive a fork, so they are closed
+    # here and each worker starts its own.
+    from src.dashboard.app import app
+    from src.dashboard.callbacks import shared_cache
+    from src.dashboard.warmup import local_tasks, run_warmup
+    from src.telemetry.memory import memory
+
+    run_warmup(local_tasks(app), phase='preloaded')
+    memory.stop()
+    if shared_cache is not None:
+        shared_cache.close()
+
+
+def post_fork(server, worker):
+    from src.dashboard.callbacks import cache_snapshot
+    from src.dashboard.warmup import backend_tasks, start_warmup
+    from src.telemetry.memory import memory
+
+    memory.start()
+    # Every worker saves what it has cached; the last one to exit wins
+    cache_snapshot.start()
+    port = _port(server)
+    if port is not None:
+        # With the shared cache, one worker's queries warm every worker
+        start_warmup(None, port, tasks=backend_tasks())
+
+
+def worker_exit(server, worker):
+    from src.dashboard.callbacks import cache_snapshot
+
+    cache_snapshot.stop()
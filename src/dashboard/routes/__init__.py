@@ -0,0 +1,17 @@
+from .analysis import analysis_blueprint
+from .debug import debug_blueprint, instrument_profiling
+from .metrics import metrics_blueprint, callback_namer, instrument_requests
+from .tracing import instrument_tracing
+
+
+def register_routes(server):
+    server.register_blueprint(analysis_blueprint)
+    server.register_blueprint(metrics_blueprint)
+    server.register_blueprint(debug_blueprint)
+
+
+def instrument_app(app):
+    callback_name = callback_namer(app)
+    instrument_requests(app.server, callback_name)
+    instrument_profiling(app.server, callback_name)
+    instrument_tracing(app.server, callback_name)
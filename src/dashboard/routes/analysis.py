@@ -0,0 +1,47 @@
+from flask import Blueprint, jsonify, request
+from src.config.logger import get_logger
+from src.models.sensor_cache import relative_range
+from src.rules.conditions import OPERATORS
+from src.rules.threshold_sweep import sweep_sensor, SWEEP_POINTS
+from ..callbacks import sensor_models, sensor_device_ids
+
+logger = get_logger(__name__)
+
+analysis_blueprint = Blueprint('analysis', __name__, url_prefix='/api/analysis')
+
+MAX_SWEEP_POINTS = 500
+
+
+@analysis_blueprint.route('/threshold-sweep')
+def threshold_sweep():
+    sensor_device = request.args.get('sensor_device')
+    operator = request.args.get('operator', 'gte')
+    start_time = request.args.get('start', '-7d')
+    
+    if not sensor_device:
+        return jsonify({'success': False, 'message': 'sensor_device is required'}), 400
+    if operator not in OPERATORS:
+        return jsonify({'success': False, 'message': f'Unknown operator: {operator}'}), 400
+    # Both end up in the Flux query text
+    if relative_range(start_time) is None:
+        return jsonify({'success': False, 'message': 'start must be a relative range such as -7d'}), 400
+    if sensor_device not in sensor_device_ids():
+        return jsonify({'success': False, 'message': f'Unknown sensor_device: {sensor_device}'}), 400
+    
+    requested = request.args.getlist('threshold')
+    if len(requested) > MAX_SWEEP_POINTS:
+        return jsonify({'success': False, 'message': f'At most {MAX_SWEEP_POINTS} thresholds per sweep'}), 400
+    try:
+        thresholds = [float(value) for value in requested] or None
+        points = min(int(request.args.get('points', SWEEP_POINTS)), MAX_SWEEP_POINTS)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'threshold and points must be numeric'}), 400
+    if points < 2:
+        return jsonify({'success': False, 'message': 'points must be at least 2'}), 400
+    
+    try:
+        sweep = sweep_sensor(sensor_models, sensor_device, operator, start_time, thresholds, points)
+        return jsonify({'success': True, **sweep.to_dict()})
+    except Exception as e:
+        logger.error(f"Error running threshold sweep for {sensor_device}: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
@@ -0,0 +1,228 @@
+import html
+from datetime import datetime
+
+from flask import Blueprint, abort, g, jsonify, redirect, request, send_file
+from src.config.settings import config
+from src.telemetry.memory import memory
+from src.telemetry.profiler import profiler
+from src.telemetry.query_log import query_log, format_flux_profile
+from src.telemetry.startup import startup
+from .metrics import is_callback_request
+
+debug_blueprint = Blueprint('debug', __name__, url_prefix='/debug')
+
+PROFILE_HEADER = 'X-Profile'
+SNAPSHOT_KEY_TYPES = ('lineno', 'filename', 'traceback')
+MAX_SNAPSHOT_STATS = 200
+# The pages show query text and file paths and can force profiling, so they
+# are off unless explicitly enabled
+DEBUG_PAGES_ENABLED = config.get("debug.pages_enabled", False)
+
+
+@debug_blueprint.before_request
+def require_enabled():
+    if not DEBUG_PAGES_ENABLED:
+        abort(404)
+
+
+@debug_blueprint.route('/profiles')
+def profiles():
+    limit = request.args.get('limit', 50, type=int)
+    rows = []
+    for invocation in profiler.slowest(limit):
+        links = ' '.join(
+            f'<a href="/debug/profiles/{html.escape(filename)}">{"speedscope" if filename.endswith(".json") else "collapsed"}</a>'
+            for filename in invocation.files
+        )
+        rows.append(
+            f"<tr><td>{html.escape(invocation.name)}</td>"
+            f"<td>{datetime.fromtimestamp(invocation.started_at).strftime('%Y-%m-%d %H:%M:%S')}</td>"
+            f"<td>{invocation.duration * 1000:.1f}</td><td>{invocation.samples or ''}</td><td>{links}</td></tr>"
+        )
+    status = (f"Profiling 1 in {profiler.sample_every} calls into {html.escape(profiler.directory)}"
+              if profiler.enabled else "Profiling is disabled (set PROFILING_ENABLED=true)")
+    return (
+        "<!DOCTYPE html><html><head><title>Slowest calls</title>"
+        "<style>body{font-family:sans-serif}td,th{padding:2px 8px;text-align:left}</style></head><body>"
+        f"<h1>Slowest recent calls</h1><p>{status}. Send the {PROFILE_HEADER} header or ?profile=1 "
+        "to profile every call of one request.</p>"
+        "<table><tr><th>Call</th><th>Started</th><th>ms</th><th>Samples</th><th>Profile</th></tr>"
+        + "".join(rows) + "</table></body></html>"
+    )
+
+
+@debug_blueprint.route('/profiles/<path:filename>')
+def profile_file(filename):
+    path = profiler.profile_path(filename)
+    if path is None:
+        abort(404)
+    return send_file(path, as_attachment=True)
+
+
+@debug_blueprint.route('/queries')
+def queries():
+    shapes = query_log.shapes()
+    if request.args.get('format') == 'json':
+        return jsonify(shapes)
+    rows = []
+    for shape in shapes:
+        profile = format_flux_profile(shape['profile']) if shape['profile'] else ''
+        rows.append(
+            f"<tr><td><code>{shape['fingerprint']}</code></td><td><pre>{html.escape(shape['shape'])}</pre></td>"
+            f"<td>{shape['count']}</td><td>{_ms(shape['p50'])}</td><td>{_ms(shape['p99'])}</td>"
+            f"<td>{shape['mean_rows']:.0f}</td><td>{shape['errors']}</td><td>{shape['slow']}</td>"
+            f"<td><pre>{html.escape(profile)}</pre></td></tr>"
+        )
+    return (
+        "<!DOCTYPE html><html><head><title>Flux queries</title>"
+        "<style>body{font-family:sans-serif}td,th{padding:2px 8px;text-align:left;vertical-align:top}"
+        "pre{margin:0;font-size:12px}</style></head><body>"
+        f"<h1>Flux queries by shape</h1><p>Queries slower than {query_log.slow_ms:.0f} ms are profiled again "
+        f"at most once every {query_log.profile_interval:.0f} s per shape. Add ?format=json for raw numbers.</p>"
+        "<table><tr><th>Fingerprint</th><th>Shape</th><th>Count</th><th>p50 ms</th><th>p99 ms</th>"
+        "<th>Mean rows</th><th>Errors</th><th>Slow</th><th>Profile</th></tr>"
+        + "".join(rows) + "</table></body></html>"
+    )
+
+
+@debug_blueprint.route('/memory')
+def memory_usage():
+    # Shows the monitor's last sample; sizing every cache again per page view
+    # would cost as much as the sample itself
+    point = memory.history[-1] if memory.history else memory.sample()
+    if request.args.get('format') == 'json':
+        return jsonify({'current': point, 'caches': memory.cache_usage, 'budget_bytes': memory.budget_bytes,
+                        'history': list(memory.history)})
+    caches = "".join(
+        f"<tr><td>{html.escape(cache['name'])}</td><td>{cache['entries']}</td><td>{_kib(cache['bytes'])}</td>"
+        f"<td>{'yes' if cache['evictable'] else 'no'}</td></tr>"
+        for cache in memory.cache_usage
+    )
+    history = "".join(
+        f"<tr><td>{datetime.fromtimestamp(sample['time']).strftime('%Y-%m-%d %H:%M:%S')}</td>"
+        f"<td>{_kib(sample['rss'])}</td><td>{_kib(sample['traced'])}</td><td>{sample['allocated_blocks']}</td>"
+        f"<td>{_kib(sample['cache_bytes'])}</td></tr>"
+        for sample in reversed(memory.history)
+    )
+    budget = f"{_kib(memory.budget_bytes)} KiB" if memory.budget_bytes else "none (set MEMORY_BUDGET_BYTES)"
+    actions = (
+        "<form method=post action=/debug/memory/budget>Evict caches down to <input name=bytes size=12> bytes "
+        "<label><input type=checkbox name=keep value=1> keep as budget</label> <button>Evict</button></form>"
+        "<form method=post action=/debug/memory/snapshot><button>Take tracemalloc snapshot</button> "
+        "<button name=stop value=1>Stop tracing</button></form>"
+    ) if memory.actions_enabled else (
+        "<p>Eviction and tracemalloc snapshots are disabled (set MEMORY_ACTIONS_ENABLED=true).</p>"
+    )
+    return (
+        "<!DOCTYPE html><html><head><title>Memory</title>"
+        "<style>body{font-family:sans-serif}td,th{padding:2px 8px;text-align:left}</style></head><body>"
+        f"<h1>Memory</h1><p>RSS {_kib(point['rss'])} KiB, caches {_kib(point['cache_bytes'])} KiB, "
+        f"cache budget {budget}.</p>" + actions +
+        "<h2>Caches</h2><table><tr><th>Cache</th><th>Entries</th><th>KiB</th><th>Evictable</th></tr>"
+        + caches + "</table>"
+        "<h2>History</h2><table><tr><th>Time</th><th>RSS KiB</th><th>Traced KiB</th><th>Blocks</th>"
+        "<th>Cache KiB</th></tr>" + history + "</table></body></html>"
+    )
+
+
+@debug_blueprint.route('/memory/snapshot', methods=['POST'])
+def memory_snapshot():
+    # Each snapshot is diffed against the previous one; the first starts tracemalloc
+    if not memory.actions_enabled:
+        abort(404)
+    if request.values.get('stop'):
+        memory.stop_tracing()
+        return redirect('/debug/memory', code=303)
+    key_type = request.values.get('key_type', 'lineno')
+    limit = request.values.get('limit', 25, type=int)
+    if key_type not in SNAPSHOT_KEY_TYPES:
+        abort(400)
+    diff = memory.snapshot_diff(key_type, max(1, min(limit, MAX_SNAPSHOT_STATS)))
+    if request.values.get('format') == 'json':
+        return jsonify(diff)
+    if diff['baseline']:
+        body = "<p>Tracing started and baseline taken. Take another snapshot to see what grew.</p>"
+    else:
+        body = "<table><tr><th>KiB +/-</th><th>KiB</th><th>Blocks +/-</th><th>Allocated at</th></tr>" + "".join(
+            f"<tr><td>{stat['size_diff'] / 1024:+.1f}</td><td>{_kib(stat['size'])}</td><td>{stat['count_diff']:+d}</td>"
+            f"<td><pre>{html.escape(chr(10).join(stat['location']))}</pre></td></tr>"
+            for stat in diff['stats']
+        ) + "</table>"
+    return (
+        "<!DOCTYPE html><html><head><title>Allocation diff</title>"
+        "<style>body{font-family:sans-serif}td,th{padding:2px 8px;text-align:left;vertical-align:top}"
+        "pre{margin:0;font-size:12px}</style></head><body>"
+        f"<h1>Allocations since the last snapshot</h1><p>Traced {_kib(diff['traced'])} KiB. "
+        "<a href=/debug/memory>Back</a></p>" + body + "</body></html>"
+    )
+
+
+@debug_blueprint.route('/memory/budget', methods=['POST'])
+def memory_budget():
+    if not memory.actions_enabled:
+        abort(404)
+    budget = request.values.get('bytes', type=int)
+    if budget is None or budget < 0:
+        abort(400)
+    if request.values.get('keep'):
+        memory.budget_bytes = budget
+    freed = memory.enforce(budget)
+    if request.values.get('format') == 'json':
+        return jsonify({'freed': freed, 'budget_bytes': memory.budget_bytes, 'caches': memory.caches()})
+    return redirect('/debug/memory', code=303)
+
+
+@debug_blueprint.route('/startup')
+def startup_timeline():
+    timeline = startup.snapshot()
+    if request.args.get('format') == 'json':
+        return jsonify(timeline)
+    phases = "".join(f"<tr><td>{html.escape(phase)}</td><td>{_ms(seconds)}</td></tr>"
+                     for phase, seconds in timeline['phases'].items())
+    tasks = "".join(
+        f"<tr><td>{html.escape(task['task'])}</td><td>{_ms(task['seconds'])}</td>"
+        f"<td>{html.escape(task['error'] or 'ok')}</td></tr>"
+        for task in timeline['tasks']
+    )
+    imports = "".join(f"<tr><td>{html.escape(name)}</td><td>{'yes' if loaded else 'not yet'}</td></tr>"
+                      for name, loaded in timeline['deferred_imports'].items())
+    return (
+        "<!DOCTYPE html><html><head><title>Startup</title>"
+        "<style>body{font-family:sans-serif}td,th{padding:2px 8px;text-align:left}</style></head><body>"
+        f"<h1>Startup</h1><p>Process started {datetime.fromtimestamp(timeline['started_at']).strftime('%Y-%m-%d %H:%M:%S')}. "
+        "Run <code>python -m src.telemetry.startup</code> for a breakdown of import time.</p>"
+        "<h2>Phases</h2><table><tr><th>Phase</th><th>ms since start</th></tr>" + phases + "</table>"
+        "<h2>Warm-up</h2><table><tr><th>Task</th><th>ms</th><th>Result</th></tr>" + tasks + "</table>"
+        "<h2>Deferred imports</h2><table><tr><th>Module</th><th>Loaded</th></tr>" + imports + "</table></body></html>"
+    )
+
+
+def _kib(size):
+    return f"{size / 1024:.0f}" if size is not None else ''
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:.1f}" if seconds is not None else ''
+
+
+def instrument_profiling(server, callback_name):
+    # Dash callbacks are profiled per request, so the sample also covers
+    # request parsing and JSON serialization of the response
+    @server.before_request
+    def start_profile():
+        if not profiler.enabled:
+            return
+        if DEBUG_PAGES_ENABLED and (request.headers.get(PROFILE_HEADER) or request.args.get('profile')):
+            g.profile_forced = profiler.force()
+        if is_callback_request():
+            g.callback_profile = profiler.profile(callback_name())
+            g.callback_profile.__enter__()
+
+    @server.teardown_request
+    def stop_profile(error=None):
+        callback_profile = g.pop('callback_profile', None)
+        if callback_profile is not None:
+            callback_profile.__exit__(None, None, None)
+        forced = g.pop('profile_forced', None)
+        if forced is not None:
+            profiler.unforce(forced)
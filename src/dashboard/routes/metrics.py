@@ -0,0 +1,70 @@
+import time
+
+from flask import Blueprint, Response, g, request
+from src.telemetry import REGISTRY
+from src.telemetry.metrics import CONTENT_TYPE
+from src.telemetry.instruments import (
+    HTTP_REQUEST_SECONDS, HTTP_REQUESTS_IN_FLIGHT, DASH_CALLBACK_SECONDS, DASH_CALLBACKS_IN_FLIGHT
+)
+
+metrics_blueprint = Blueprint('metrics', __name__)
+
+CALLBACK_PATH = '/_dash-update-component'
+
+
+@metrics_blueprint.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+
+def callback_namer(app):
+    # Name of the function behind a /_dash-update-component request. Names
+    # only come from the app's callback map, so whatever a client sends the
+    # label has one value per callback plus 'unknown'
+    names = {}
+
+    def callback_name():
+        nonlocal names
+        if len(names) != len(app.callback_map):
+            # Dash fills the map when it serves its first request
+            names = {output: getattr(entry.get('callback'), '__name__', None) or 'unknown'
+                     for output, entry in list(app.callback_map.items())}
+        payload = request.get_json(silent=True)
+        output = payload.get('output') if isinstance(payload, dict) else None
+        return names.get(output, 'unknown') if isinstance(output, str) else 'unknown'
+
+    return callback_name
+
+
+def is_callback_request() -> bool:
+    return request.path.endswith(CALLBACK_PATH)
+
+
+def instrument_requests(server, callback_name):
+    # Times every Flask request, and Dash callbacks by the function they run
+    @server.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        if is_callback_request():
+            DASH_CALLBACKS_IN_FLIGHT.inc()
+
+    @server.after_request
+    def remember_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @server.teardown_request
+    def observe_request(error=None):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return
+        seconds = time.perf_counter() - start
+        # No response means the view raised
+        status = str(g.pop('metrics_status', 500))
+        HTTP_REQUESTS_IN_FLIGHT.dec()
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        HTTP_REQUEST_SECONDS.labels(route, request.method, status).observe(seconds)
+        if is_callback_request():
+            DASH_CALLBACKS_IN_FLIGHT.dec()
+            DASH_CALLBACK_SECONDS.labels(callback_name(), status).observe(seconds)
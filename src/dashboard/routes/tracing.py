@@ -0,0 +1,30 @@
+from flask import g, request
+from src.telemetry.tracing import tracer, KIND_SERVER
+from .metrics import is_callback_request
+
+
+def instrument_tracing(server, callback_name):
+    # Every Dash callback request is the root of a trace; queries, rule engine
+    # calls and figure building inside the callback become its child spans
+    @server.before_request
+    def start_trace():
+        if not tracer.enabled or not is_callback_request():
+            return
+        name = callback_name()
+        g.trace_span = tracer.span(f"callback {name}", kind=KIND_SERVER, callback=name, **{'http.route': request.path})
+        g.trace_span.__enter__()
+
+    @server.after_request
+    def record_status(response):
+        span = g.get('trace_span')
+        if span is not None:
+            span.set_attribute('http.status_code', response.status_code)
+            if response.status_code >= 500:
+                span.set_error(f"HTTP {response.status_code}")
+        return response
+
+    @server.teardown_request
+    def end_trace(error=None):
+        span = g.pop('trace_span', None)
+        if span is not None:
+            span.__exit__(type(error) if error else None, error, None)
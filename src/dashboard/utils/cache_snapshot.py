@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from dateutil.tz import tzlocal
+
+from src.config.settings import config
+from src.config.imports import lazy_import
+from src.config.logger import get_logger
+from src.models.sensor_cache import COLUMNS
+from src.telemetry.instruments import CACHE_SNAPSHOT_SECONDS, CACHE_SNAPSHOT_BYTES
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+logger = get_logger(__name__)
+
+FORMAT_VERSION = 1
+_LABEL_COLUMNS = ['device_id', 'location', 'type']
+
+
+def frame_arrays(prefix: str, frame: pd.DataFrame) -> Dict[str, np.ndarray]:
+    # One array per column: times as int64 nanoseconds, values in their own
+    # numeric dtype, and labels as int32 codes into a table of distinct strings
+    # with -1 for missing
+    values = frame['value'].to_numpy()
+    if values.dtype.kind not in 'biuf':
+        values = pd.to_numeric(frame['value']).to_numpy()
+    arrays = {
+        f'{prefix}.time': pd.DatetimeIndex(pd.to_datetime(frame['_time'], utc=True)).as_unit('ns').asi8,
+        f'{prefix}.value': values,
+    }
+    for column in _LABEL_COLUMNS:
+        codes, labels = pd.factorize(frame[column])
+        arrays[f'{prefix}.{column}.codes'] = codes.astype(np.int32)
+        arrays[f'{prefix}.{column}.labels'] = np.asarray([str(label) for label in labels], dtype=str)
+    return arrays
+
+
+def frame_from_arrays(prefix: str, arrays) -> pd.DataFrame:
+    # Times are in local time, as the influxdb client decodes them
+    times = pd.to_datetime(arrays[f'{prefix}.time'], unit='ns', utc=True).tz_convert(tzlocal())
+    columns = {
+        '_time': pd.Series(times),
+        'value': pd.Series(arrays[f'{prefix}.value']),
+    }
+    for column in _LABEL_COLUMNS:
+        codes, labels = arrays[f'{prefix}.{column}.codes'], arrays[f'{prefix}.{column}.labels'].astype(object)
+        # Missing labels come back as None, as the query path fills them
+        decoded = np.full(len(codes), None, dtype=object)
+        present = codes >= 0
+        decoded[present] = labels[codes[present]]
+        columns[column] = pd.Series(decoded, dtype=object)
+    return pd.DataFrame(columns)[COLUMNS]
+
+
+def _text_array(value: Any) -> np.ndarray:
+    return np.frombuffer(json.dumps(value).encode(), dtype=np.uint8)
+
+
+def _text_value(array: np.ndarray) -> Any:
+    return json.loads(array.tobytes().decode())
+
+
+def _time_text(moment: Optional[pd.Timestamp]) -> Optional[str]:
+    return moment.isoformat() if moment is not None else None
+
+
+def _time_value(text: Optional[str]) -> Optional[pd.Timestamp]:
+    return pd.Timestamp(text) if text is not None else None
+
+
+class CacheSnapshot:
+    # Saves the sensor caches and the device catalog to one local file every
+    # interval seconds and on shutdown, and loads it on startup, so a restarted
+    # dashboard starts warm and its first reads only ask the backends for what
+    # changed since the save. Frames are stored column by column as numpy
+    # arrays in a compressed .npz; the device catalog, which is nested, goes
+    # in as JSON. The file is replaced atomically, so a process stopped mid-
+    # write leaves the previous snapshot, and is only loaded for the backends
+    # it was written from.
+    def __init__(self, sensor_models: List[Any], device_snapshot, path: Optional[str] = None,
+                 interval: Optional[float] = None):
+        self.sensor_models = sensor_models
+        self.device_snapshot = device_snapshot
+        self.path = path if path is not None else config.get("snapshot.path", "")
+        self.interval = interval if interval is not None else config.get("snapshot.interval", 300.0)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._save_lock = threading.Lock()
+        self._exit_registered = False
+
+    def source(self) -> Dict[str, Any]:
+        return {
+            'influxdb': config.get("influxdb.url", "http://localhost:8086"),
+            'bucket': config.get("influxdb.bucket", "sensor-events"),
+            'rule_engine': config.get("rule_engine.url", "http://localhost:5001"),
+        }
+
+    def save(self) -> bool:
+        if not self.path:
+            return False
+        start = time.perf_counter()
+        arrays = {}
+        sensors = {}
+        for model in self.sensor_models:
+            if model.cache is None:
+                continue
+            state = model.cache.export()
+            saved = {}
+            for part in ('latest', 'series'):
+                frame = state[part]
+                if frame is None:
+                    continue
+                try:
+                    arrays.update(frame_arrays(f'{model.sensor_type}.{part}', frame))
+                except (TypeError, ValueError) as e:
+                    logger.error(f"Leaving {model.sensor_type} {part} readings out of the cache snapshot: {e}")
+                    continue
+                saved[part] = True
+            if not saved:
+                continue
+            sensors[model.sensor_type] = {
+                'parts': sorted(saved), 'latest_until': _time_text(state['latest_until']),
+                'series_start': _time_text(state['series_start']), 'series_until': _time_text(state['series_until']),
+                'span': state['span'].total_seconds() if state['span'] is not None else None,
+            }
+        devices = self.device_snapshot.export_state() if self.device_snapshot.version else None
+        if not sensors and devices is None:
+            # Nothing was cached yet; keep whatever an earlier run saved
+            return False
+        arrays['meta'] = _text_array({'format': FORMAT_VERSION, 'saved_at': time.time(), 'source': self.source(),
+                                      'sensors': sensors, 'devices': devices})
+
+        with self._save_lock:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            try:
+                with os.fdopen(descriptor, 'wb') as output:
+                    np.savez_compressed(output, **arrays)
+                os.replace(temporary, self.path)
+            except BaseException:
+                os.unlink(temporary)
+                raise
+        size = os.path.getsize(self.path)
+        CACHE_SNAPSHOT_SECONDS.labels('save').set(time.perf_counter() - start)
+        CACHE_SNAPSHOT_BYTES.set(size)
+        logger.info(f"Saved cache snapshot of {len(sensors)} sensor types to {self.path} ({size} bytes)")
+        return True
+
+    def load(self) -> bool:
+        # Fills caches that are still empty; a missing snapshot or one written
+        # for other backends is skipped
+        if not self.path or not os.path.exists(self.path):
+            return False
+        start = time.perf_counter()
+        with np.load(self.path, allow_pickle=False) as stored:
+            meta = _text_value(stored['meta'])
+            if meta.get('format') != FORMAT_VERSION or meta.get('source') != self.source():
+                logger.info(f"Ignoring cache snapshot {self.path} written for other backends or format")
+                return False
+            restored = []
+            for model in self.sensor_models:
+                saved = meta['sensors'].get(model.sensor_type)
+                if model.cache is None or saved is None:
+                    continue
+                state = {
+                    'latest_until': _time_value(saved['latest_until']),
+                    'series_start': _time_value(saved['series_start']),
+                    'series_until': _time_value(saved['series_until']),
+                    'span': pd.Timedelta(seconds=saved['span']) if saved['span'] is not None else None,
+                }
+                for part in saved['parts']:
+                    state[part] = frame_from_arrays(f'{model.sensor_type}.{part}', stored)
+                if model.cache.restore(state):
+                    restored.append(model.sensor_type)
+        if meta['devices'] is not None and self.device_snapshot.restore(meta['devices']):
+            restored.append('devices')
+        CACHE_SNAPSHOT_SECONDS.labels('load').set(time.perf_counter() - start)
+        CACHE_SNAPSHOT_BYTES.set(os.path.getsize(self.path))
+        logger.info(f"Loaded cache snapshot saved {time.time() - meta['saved_at']:.0f}s ago: "
+                    f"{', '.join(restored) or 'nothing to restore'}")
+        return bool(restored)
+
+    def start(self):
+        # Periodic saves, and a last one when the process exits
+        if not self.path or (self._thread is not None and self._thread.is_alive()):
+            return
+        if not self._exit_registered:
+            atexit.register(self.stop)
+            self._exit_registered = True
+        self._stop.clear()
+        if self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name='cache-snapshot', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._save()
+
+    def _save(self):
+        try:
+            self.save()
+        except Exception as e:
+            logger.error(f"Cache snapshot save failed: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._save()
@@ -1,145 +1,210 @@
-from dash import html
+from dash import html, Patch
+import hashlib
 import json
+import threading
+from collections import OrderedDict
+from src.telemetry.instruments import CACHE_REQUESTS
+from src.telemetry.memory import memory, CacheAccount
 
-def apply_not_to_node(tree, target_node_id, current_id="root"):
-    if current_id == target_node_id:
-        if tree.get('type') == 'not':
-            return tree.get('child', {'type': 'condition', 'sensor_device': '', 'operator': 'gte', 'value': 0})
+DEFAULT_CONDITION = {'type': 'condition', 'sensor_device': '', 'operator': 'gte', 'value': 0}
+
+# Node ids double as paths from the root: "root_left_child" is
+# tree['left']['child'] and "root_2" is tree['children'][2]. Edits copy only
+# the nodes along that path, so every version shares its untouched subtrees
+# with the previous one and an edit costs O(depth).
+
+def node_path(node_id):
+    parts = (node_id or '').split('_')
+    if parts[0] != 'root':
+        return None
+    return tuple(int(part) if part.isdigit() else part for part in parts[1:])
+
+def get_node(tree, node_id):
+    path = node_path(node_id)
+    return _get(tree, path) if path is not None else None
+
+def _get(tree, path):
+    node = tree
+    for key in path:
+        if not isinstance(node, dict):
+            return None
+        if isinstance(key, int):
+            children = node.get('children', [])
+            node = children[key] if key < len(children) else None
         else:
-            return {'type': 'not', 'child': tree}
-    
-    if not tree or tree.get('type') == 'condition':
+            node = node.get(key)
+    return node
+
+def _replace(tree, path, new_node):
+    if not path:
+        return new_node
+    key = path[0]
+    copied = dict(tree)
+    if isinstance(key, int):
+        children = list(tree['children'])
+        children[key] = _replace(children[key], path[1:], new_node)
+        copied['children'] = children
+    else:
+        copied[key] = _replace(tree.get(key) or {}, path[1:], new_node)
+    return copied
+
+def apply_not_to_node(tree, target_node_id):
+    path = node_path(target_node_id)
+    node = _get(tree, path) if path is not None else None
+    if node is None:
         return tree
     
-    node_type = tree.get('type')
-    if node_type in ['and', 'or']:
-        left_id = f"{current_id}_left"
-        right_id = f"{current_id}_right"
-        
-        new_left = apply_not_to_node(tree.get('left', {}), target_node_id, left_id)
-        new_right = apply_not_to_node(tree.get('right', {}), target_node_id, right_id)
-        
-        return {
-            'type': node_type,
-            'left': new_left,
-            'right': new_right
-        }
-    elif node_type == 'not':
-        child_id = f"{current_id}_child"
-        
-        if child_id == target_node_id:
-            return tree.get('child', {'type': 'condition', 'sensor_device': '', 'operator': 'gte', 'value': 0})
-        
-        new_child = apply_not_to_node(tree.get('child', {}), target_node_id, child_id)
-        return {
-            'type': 'not',
-            'child': new_child
-        }
-    
-    return tree
-
-def delete_node_from_tree(tree, target_node_id, current_id="root", parent_tree=None, parent_key=None):
-    if current_id == target_node_id and parent_tree and parent_key:
-        if parent_tree.get('type') in ['and', 'or']:
-            sibling_key = 'right' if parent_key == 'left' else 'left'
-            return parent_tree.get(sibling_key, {'type': 'condition', 'sensor_device': '', 'operator': 'gte', 'value': 0})
-        elif parent_tree.get('type') == 'not':
-            return parent_tree.get('child', {'type': 'condition', 'sensor_device': '', 'operator': 'gte', 'value': 0})
-        else:
-            return {'type': 'condition', 'sensor_device': '', 'operator': 'gte', 'value': 0}
-    
-    if not tree or tree.get('type') == 'condition':
+    parent = _get(tree, path[:-1]) if path else None
+    if parent and parent.get('type') == 'not':
+        # Negating the child of a NOT cancels the NOT instead of nesting another
+        return _replace(tree, path[:-1], node)
+    if node.get('type') == 'not':
+        return _replace(tree, path, node.get('child', dict(DEFAULT_CONDITION)))
+    return _replace(tree, path, {'type': 'not', 'child': node})
+
+def delete_node_from_tree(tree, target_node_id):
+    path = node_path(target_node_id)
+    if not path or _get(tree, path) is None:
         return tree
     
-    node_type = tree.get('type')
-    if node_type in ['and', 'or']:
-        left_id = f"{current_id}_left"
-        right_id = f"{current_id}_right"
-        
-        new_left = delete_node_from_tree(tree.get('left', {}), target_node_id, left_id, tree, 'left')
-        new_right = delete_node_from_tree(tree.get('right', {}), target_node_id, right_id, tree, 'right')
-        
-        if left_id == target_node_id:
-            return new_right
-        elif right_id == target_node_id:
-            return new_left
-        
-        return {
-            'type': node_type,
-            'left': new_left,
-            'right': new_right
-        }
-    elif node_type == 'not':
-        child_id = f"{current_id}_child"
-        new_child = delete_node_from_tree(tree.get('child', {}), target_node_id, child_id, tree, 'child')
-        
-        if child_id == target_node_id:
-            return new_child
-        
-        return {
-            'type': 'not',
-            'child': new_child
-        }
-    
-    return tree
-
-def add_group_to_node(tree, target_node_id, group_type, current_id="root"):
-    if current_id == target_node_id:
-        new_condition = {'type': 'condition', 'sensor_device': '', 'operator': 'gte', 'value': 0}
-        return {
-            'type': group_type,
-            'left': tree,
-            'right': new_condition
-        }
-    
-    if not tree or tree.get('type') == 'condition':
+    parent_path = path[:-1]
+    parent = _get(tree, parent_path)
+    key = path[-1]
+    if isinstance(key, int):
+        children = parent['children'][:key] + parent['children'][key + 1:]
+        remaining = children[0] if len(children) == 1 else dict(parent, children=children)
+        return _replace(tree, parent_path, remaining)
+    if parent.get('type') in ['and', 'or']:
+        sibling_key = 'right' if key == 'left' else 'left'
+        return _replace(tree, parent_path, parent.get(sibling_key, dict(DEFAULT_CONDITION)))
+    if parent.get('type') == 'not':
+        # Deleting under a NOT removes the NOT and keeps the condition
+        return _replace(tree, parent_path, parent.get('child', dict(DEFAULT_CONDITION)))
+    return _replace(tree, path, dict(DEFAULT_CONDITION))
+
+def add_group_to_node(tree, target_node_id, group_type):
+    path = node_path(target_node_id)
+    node = _get(tree, path) if path is not None else None
+    if node is None:
         return tree
-    
-    node_type = tree.get('type')
-    if node_type in ['and', 'or']:
-        left_id = f"{current_id}_left"
-        right_id = f"{current_id}_right"
-        
-        new_left = add_group_to_node(tree.get('left', {}), target_node_id, group_type, left_id)
-        new_right = add_group_to_node(tree.get('right', {}), target_node_id, group_type, right_id)
-        
-        return {
-            'type': node_type,
-            'left': new_left,
-            'right': new_right
-        }
-    elif node_type == 'not':
-        child_id = f"{current_id}_child"
-        new_child = add_group_to_node(tree.get('child', {}), target_node_id, group_type, child_id)
-        return {
-            'type': 'not',
-            'child': new_child
-        }
-    
-    return tree
+    return _replace(tree, path, {'type': group_type, 'left': node, 'right': dict(DEFAULT_CONDITION)})
+
+def update_condition_node(tree, target_node_id, fields):
+    path = node_path(target_node_id)
+    node = _get(tree, path) if path is not None else None
+    if node is None or node.get('type') != 'condition':
+        return tree
+    return _replace(tree, path, {**node, **fields})
+
+RENDER_CACHE_SIZE = 4096
+RENDERED_TREES_SIZE = 256
+
+# Rendered subtrees keyed by (content digest, node id, prefix); node ids are
+# part of the key because every button carries its node id
+_render_cache = OrderedDict()
+# Trees the browser was last sent, by root digest, to diff the next render against
+_rendered_trees = OrderedDict()
+_render_lock = threading.Lock()
+_render_hits = CACHE_REQUESTS.labels('condition_tree_render', 'hit')
+_render_misses = CACHE_REQUESTS.labels('condition_tree_render', 'miss')
+memory.register('condition_tree_render', CacheAccount(_render_cache, _render_lock))
+memory.register('condition_tree_rendered', CacheAccount(_rendered_trees, _render_lock))
+
+def tree_digests(tree, node_id='root', digests=None):
+    # Content digest of every subtree by node id, computed bottom-up in one pass
+    digests = {} if digests is None else digests
+    fields = {key: value for key, value in (tree or {}).items() if key not in ['left', 'right', 'child']}
+    children = [
+        (key, tree_digests(tree[key], f"{node_id}_{key}", digests)[f"{node_id}_{key}"])
+        for key in ['left', 'right', 'child'] if isinstance((tree or {}).get(key), dict)
+    ]
+    payload = json.dumps([fields, children], sort_keys=True, default=str)
+    digests[node_id] = hashlib.blake2b(payload.encode(), digest_size=12).hexdigest()
+    return digests
 
 def render_condition_tree(tree, prefix=''):
     if not tree:
         return html.Div("Empty condition tree", className="tree-empty")
     
     return html.Div([
-        render_tree_node(tree, node_id="root", parent_id=None, prefix=prefix)
+        render_tree_node(tree, node_id="root", parent_id=None, prefix=prefix, digests=tree_digests(tree))
     ], className="tree-display")
 
-def render_tree_node(node, node_id, parent_id=None, prefix=''):
+def remember_rendered_tree(tree):
+    digest = tree_digests(tree)['root']
+    with _render_lock:
+        _rendered_trees[digest] = tree
+        _rendered_trees.move_to_end(digest)
+        while len(_rendered_trees) > RENDERED_TREES_SIZE:
+            _rendered_trees.popitem(last=False)
+    return digest
+
+def condition_tree_update(tree, rendered_digest, prefix=''):
+    # (children, digest) for the tree display: a Patch replacing only the
+    # subtrees that differ from the tree the browser already shows, or the
+    # full tree when that tree is unknown here
+    previous = None
+    if rendered_digest:
+        with _render_lock:
+            previous = _rendered_trees.get(rendered_digest)
+    digest = remember_rendered_tree(tree)
+    if digest == rendered_digest:
+        return None, digest
+    if not previous or not tree:
+        return render_condition_tree(tree, prefix), digest
+    
+    patch = Patch()
+    _patch_subtree(previous, tree, 'root', None, patch['props']['children'], 0,
+                   tree_digests(previous), tree_digests(tree), prefix)
+    return patch, digest
+
+def _patch_subtree(old, new, node_id, parent_id, container, index, old_digests, new_digests, prefix):
+    if node_id in new_digests and old_digests.get(node_id) == new_digests[node_id]:
+        return
+    if not new:
+        container[index] = html.Div()
+        return
+    node_type = new.get('type')
+    if node_type == old.get('type') and node_type in ['and', 'or', 'not'] and 'children' not in new:
+        # Same kind of node: its header is unchanged, so only descend
+        children = container[index]['props']['children'][1]['props']['children']
+        keys = ['left', 'right'] if node_type in ['and', 'or'] else ['child']
+        for position, key in enumerate(keys):
+            _patch_subtree(old.get(key) or {}, new.get(key) or {}, f"{node_id}_{key}", node_id,
+                           children, position, old_digests, new_digests, prefix)
+        return
+    container[index] = render_tree_node(new, node_id, parent_id, prefix, new_digests)
+
+def render_tree_node(node, node_id, parent_id=None, prefix='', digests=None):
     if not node:
         return html.Div()
     
+    digests = digests if digests is not None else tree_digests(node, node_id)
+    key = (digests[node_id], node_id, prefix)
+    with _render_lock:
+        cached = _render_cache.get(key)
+        if cached is not None:
+            _render_cache.move_to_end(key)
+            _render_hits.inc()
+            return cached
+    _render_misses.inc()
+    
     node_type = node.get('type', 'unknown')
     
     if node_type == 'condition':
-        return render_condition_node(node, node_id, parent_id, prefix)
+        rendered = render_condition_node(node, node_id, parent_id, prefix)
     elif node_type in ['and', 'or']:
-        return render_binary_node(node, node_id, parent_id, prefix)
+        rendered = render_binary_node(node, node_id, parent_id, prefix, digests)
     elif node_type == 'not':
-        return render_unary_node(node, node_id, parent_id, prefix)
+        rendered = render_unary_node(node, node_id, parent_id, prefix, digests)
     else:
-        return html.Div(f"Unknown node type: {node_type}", className="tree-error")
+        rendered = html.Div(f"Unknown node type: {node_type}", className="tree-error")
+    
+    with _render_lock:
+        _render_cache[key] = rendered
+        while len(_render_cache) > RENDER_CACHE_SIZE:
+            _render_cache.popitem(last=False)
+    return rendered
 
 def render_condition_node(node, node_id, parent_id=None, prefix=''):
     sensor = node.get('sensor_device', '')
@@ -176,7 +241,7 @@ def render_condition_node(node, node_id, parent_id=None, prefix=''):
         ], className="condition-header")
     ], className="tree-node condition-node", id=f"node-{node_id}")
 
-def render_binary_node(node, node_id, parent_id=None, prefix=''):
+def render_binary_node(node, node_id, parent_id=None, prefix='', digests=None):
     operator = node['type'].upper()
     left = node.get('left', {})
     right = node.get('right', {})
@@ -189,12 +254,12 @@ def render_binary_node(node, node_id, parent_id=None, prefix=''):
             html.Button("Delete", id={'type': f'{prefix}delete-node', 'node_id': node_id}, className="node-button delete-btn") if parent_id else None
         ], className="operator-header"),
         html.Div([
-            render_tree_node(left, f"{node_id}_left", node_id, prefix),
-            render_tree_node(right, f"{node_id}_right", node_id, prefix)
+            render_tree_node(left, f"{node_id}_left", node_id, prefix, digests),
+            render_tree_node(right, f"{node_id}_right", node_id, prefix, digests)
         ], className="binary-children")
     ], className="tree-node binary-node", id=f"node-{node_id}")
 
-def render_unary_node(node, node_id, parent_id=None, prefix=''):
+def render_unary_node(node, node_id, parent_id=None, prefix='', digests=None):
     child = node.get('child', {})
     
     return html.Div([
@@ -203,7 +268,7 @@ def render_unary_node(node, node_id, parent_id=None, prefix=''):
             html.Button("Delete", id={'type': f'{prefix}delete-node', 'node_id': node_id}, className="node-button delete-btn") if parent_id else None
         ], className="operator-header"),
         html.Div([
-            render_tree_node(child, f"{node_id}_child", node_id, prefix)
+            render_tree_node(child, f"{node_id}_child", node_id, prefix, digests)
         ], className="unary-children")
     ], className="tree-node unary-node", id=f"node-{node_id}")
 
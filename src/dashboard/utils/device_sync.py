@@ -0,0 +1,245 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import requests
+
+from src.clients.rule_engine import RuleEngineUnavailableError
+from src.config.settings import config
+from src.config.logger import get_logger
+from src.telemetry.instruments import CACHE_REQUESTS
+from src.telemetry.memory import deep_size, evict_mapping
+
+logger = get_logger(__name__)
+
+_CAPABILITY_HITS = CACHE_REQUESTS.labels('device_capabilities', 'hit')
+_CAPABILITY_MISSES = CACHE_REQUESTS.labels('device_capabilities', 'miss')
+
+CHANGE_LOG_SIZE = 256
+SHARED_KEY = 'devices:snapshot'
+
+
+class DeviceSyncError(Exception):
+    pass
+
+
+class DeviceSnapshot:
+    # Local copy of the rule engine's /devices payload. Each sync asks only for
+    # changes, either through If-None-Match or a last_updated watermark, and
+    # records which devices changed at every version so renderers can update
+    # just those devices.
+    def __init__(self, client, min_sync_interval: Optional[float] = None, shared=None):
+        self.client = client
+        self.shared = shared
+        self.min_sync_interval = (min_sync_interval if min_sync_interval is not None
+                                  else config.get("rule_engine.device_sync_interval", 2.0))
+        self.version = 0
+        self._devices: Dict[str, Dict[str, Any]] = {}
+        self._etag: Optional[str] = None
+        self._watermark: Optional[str] = None
+        self._synced_at = 0.0
+        self._changes: deque = deque(maxlen=CHANGE_LOG_SIZE)
+        self._capabilities: Dict[str, tuple] = {}
+        self._shared_stamp: Optional[int] = None
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+
+    @property
+    def devices(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._devices.values())
+
+    def get_device(self, device_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._devices.get(device_id)
+
+    def sync(self, force: bool = False) -> int:
+        # Viewers share the snapshot, so concurrent ticks collapse into one
+        # request. Until a first sync succeeded there is nothing to serve, so
+        # callers then wait for the one in progress instead of getting no devices.
+        if not self._sync_lock.acquire(blocking=self._cold()):
+            return self.version
+        try:
+            if not force and self.version and time.monotonic() - self._synced_at < self.min_sync_interval:
+                return self.version
+            if self.shared is None:
+                self._sync()
+            else:
+                self._shared_sync(force)
+            return self.version
+        finally:
+            self._sync_lock.release()
+
+    def _cold(self) -> bool:
+        return not self.version and not self._synced_at
+
+    def _sync(self):
+        headers = {'If-None-Match': self._etag} if self._etag else {}
+        params = {'since': self._watermark} if self._watermark else {}
+        # Callers keep serving the snapshot on DeviceSyncError, so an open
+        # breaker or a dropped connection has to surface as one too
+        try:
+            response = self.client.list_devices(headers=headers, params=params)
+        except (RuleEngineUnavailableError, requests.RequestException) as e:
+            raise DeviceSyncError(f"Failed to get devices from rule engine: {e}") from e
+        self._synced_at = time.monotonic()
+
+        if response.status_code == 304:
+            return
+        if response.status_code != 200:
+            raise DeviceSyncError(f"Failed to get devices from rule engine: {response.status_code}")
+
+        result = response.json()
+        if not result.get('success', False):
+            raise DeviceSyncError(f"Rule engine returned error: {result.get('message', 'Unknown error')}")
+
+        devices = result.get('devices', [])
+        if result.get('delta'):
+            self._apply(devices, result.get('removed', []), replace=False)
+        else:
+            self._apply(devices, [], replace=True)
+        self._etag = response.headers.get('ETag')
+
+    def _shared_sync(self, force: bool):
+        # Workers share one snapshot, version numbers included, so a version a
+        # browser got from one worker means the same devices in every other.
+        # Whoever finds it older than the sync interval syncs it with the rule
+        # engine and publishes it; the rest adopt what was published.
+        published = self.shared.get(SHARED_KEY)
+        if published is not None and published[0] != self._shared_stamp:
+            self._adopt(published)
+        if not force and published is not None and time.time() - published[1]['synced_at'] < self.min_sync_interval:
+            self._synced_at = time.monotonic()
+            return
+        with self.shared.lease(SHARED_KEY) as acquired:
+            if not acquired and not force:
+                # Another worker is syncing; this one serves what it has
+                return
+            self._sync()
+            with self._lock:
+                state = {'version': self.version, 'devices': self._devices, 'etag': self._etag,
+                         'watermark': self._watermark, 'changes': list(self._changes), 'synced_at': time.time()}
+                # Long enough to outlive any sync interval; freshness is synced_at
+                self._shared_stamp = self.shared.set(SHARED_KEY, state, ttl=max(3600.0, self.min_sync_interval * 10))
+
+    def _adopt(self, published: Tuple[int, Dict[str, Any]]):
+        stamp, state = published
+        with self._lock:
+            for device_id in set(self._devices) - set(state['devices']):
+                self._capabilities.pop(device_id, None)
+            self._devices = state['devices']
+            self._etag = state['etag']
+            self._watermark = state['watermark']
+            self._changes = deque(state['changes'], maxlen=CHANGE_LOG_SIZE)
+            self.version = state['version']
+            self._shared_stamp = stamp
+
+    def export_state(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'version': self.version, 'devices': list(self._devices.values()), 'etag': self._etag,
+                    'watermark': self._watermark}
+
+    def restore(self, state: Dict[str, Any]) -> bool:
+        # A saved snapshot becomes the baseline for the first sync, which then
+        # only asks for changes since it. Versions carry on from the saved one,
+        # so versions browsers still hold keep meaning the same devices.
+        with self._lock:
+            if self.version:
+                return False
+            self._devices = {device['device_id']: device for device in state['devices']}
+            self._etag = state.get('etag')
+            self._watermark = state.get('watermark')
+            self.version = state['version']
+            self._synced_at = 0.0
+            return True
+
+    def _apply(self, devices: List[Dict[str, Any]], removed: List[str], replace: bool):
+        with self._lock:
+            incoming = {device['device_id']: device for device in devices}
+            changed: Set[str] = {device_id for device_id, device in incoming.items()
+                                 if self._devices.get(device_id) != device}
+            gone = set(removed)
+            if replace:
+                gone |= set(self._devices) - set(incoming)
+            gone &= set(self._devices)
+
+            if not changed and not gone:
+                return
+
+            if replace:
+                self._devices = {device_id: incoming[device_id] for device_id in incoming}
+            else:
+                for device_id in gone:
+                    self._devices.pop(device_id, None)
+                for device_id in changed:
+                    self._devices[device_id] = incoming[device_id]
+
+            for device_id in gone:
+                self._capabilities.pop(device_id, None)
+
+            stamps = [device.get('last_updated') for device in self._devices.values() if device.get('last_updated')]
+            self._watermark = max(stamps) if stamps else None
+
+            self.version += 1
+            self._changes.append((self.version, frozenset(changed | gone)))
+            logger.info(f"Device snapshot v{self.version}: {len(changed)} changed, {len(gone)} removed")
+
+    def changed_since(self, version: Optional[int]) -> Optional[Set[str]]:
+        # None means the caller is too far behind and has to redraw everything
+        with self._lock:
+            if version is None or version > self.version:
+                return None
+            if version == self.version:
+                return set()
+            if not self._changes or self._changes[0][0] > version + 1:
+                return None
+            changed = set()
+            for change_version, device_ids in self._changes:
+                if change_version > version:
+                    changed |= device_ids
+            return changed
+
+    def get_capabilities(self, device_id: str) -> List[Dict[str, Any]]:
+        signature = self._capability_signature(device_id)
+        with self._lock:
+            cached = self._capabilities.get(device_id)
+            if cached and signature is not None and cached[0] == signature:
+                _CAPABILITY_HITS.inc()
+                return cached[1]
+        _CAPABILITY_MISSES.inc()
+
+        response = self.client.get_device_capabilities(device_id)
+        if response.status_code != 200:
+            return []
+        result = response.json()
+        if not result.get('success'):
+            return []
+
+        capabilities = result['capabilities']
+        if signature is not None:
+            with self._lock:
+                self._capabilities[device_id] = (signature, capabilities)
+        return capabilities
+
+    def memory_usage(self) -> Tuple[int, int]:
+        with self._lock:
+            state = (dict(self._devices), dict(self._capabilities), list(self._changes))
+        return len(state[0]) + len(state[1]), deep_size(state)
+
+    def evict_to(self, max_bytes: int) -> int:
+        # The device list is the baseline for delta syncs and stays; cached
+        # capabilities are fetched again on their next use
+        with self._lock:
+            kept = deep_size((dict(self._devices), list(self._changes)))
+        return evict_mapping(self._capabilities, self._lock, max(0, max_bytes - kept))
+
+    def _capability_signature(self, device_id: str) -> Optional[tuple]:
+        # Current values change constantly; only the capability schema matters here
+        device = self.get_device(device_id)
+        if device is None:
+            return None
+        return tuple(
+            (cap.get('name'), cap.get('capability_type'), repr(sorted(cap.get('config', {}).items())))
+            for cap in device.get('capabilities', [])
+        )
@@ -0,0 +1,299 @@
+import itertools
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.config.settings import config
+from src.config.logger import get_logger
+from src.telemetry.instruments import CACHE_REQUESTS
+from src.telemetry.memory import deep_size, mapping_usage
+
+logger = get_logger(__name__)
+
+_CACHE_HITS = CACHE_REQUESTS.labels('rules', 'hit')
+_CACHE_MISSES = CACHE_REQUESTS.labels('rules', 'miss')
+
+
+class RuleLoadError(Exception):
+    pass
+
+
+@dataclass
+class CachedRuleSet:
+    rules: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    etag: Optional[str] = None
+    fetched_at: float = 0.0
+    revision: int = 0
+    shared_stamp: Optional[int] = None
+
+
+def _shared_key(device_id: str) -> str:
+    return f"rules:{device_id}"
+
+
+# Rules are served from memory while an entry is younger than the TTL and
+# revalidated with If-None-Match afterwards. Writes made from the dashboard
+# are applied to the cache directly instead of refetching the device's rules.
+# With a SharedCache, fetched rules and writes are published to the other
+# workers, and an entry is only fresh while its published copy is unchanged.
+class RuleCache:
+    def __init__(self, client, ttl: Optional[float] = None, shared=None):
+        self.client = client
+        self.shared = shared
+        self.ttl = ttl if ttl is not None else config.get("rule_engine.rule_cache_ttl", 30.0)
+        self._entries: Dict[str, CachedRuleSet] = {}
+        self._rule_devices: Dict[str, str] = {}
+        self._revisions = itertools.count(1)
+        self._listeners: List[Callable[[str, List[Dict[str, Any]]], None]] = []
+        self._lock = threading.RLock()
+
+    def add_listener(self, listener: Callable[[str, List[Dict[str, Any]]], None]):
+        # Called with (device_id, rules) whenever a device's rules change
+        self._listeners.append(listener)
+
+    def get_rules(self, device_id: str, revalidate: bool = False) -> List[Dict[str, Any]]:
+        return self.get_versioned_rules(device_id, revalidate)[1]
+
+    def get_versioned_rules(self, device_id: str, revalidate: bool = False) -> Tuple[int, List[Dict[str, Any]]]:
+        with self._lock:
+            entry = self._entries.get(device_id)
+            fresh = entry is not None and not revalidate and time.monotonic() - entry.fetched_at < self.ttl
+            etag = entry.etag if entry else None
+        if fresh and self.shared is not None:
+            fresh = self.shared.stamp(_shared_key(device_id)) == entry.shared_stamp
+        if fresh:
+            _CACHE_HITS.inc()
+            return entry.revision, list(entry.rules.values())
+        _CACHE_MISSES.inc()
+
+        try:
+            entry = self._fetch(device_id, etag) if self.shared is None else self._fetch_shared(device_id, etag,
+                                                                                              revalidate)
+        except Exception as e:
+            with self._lock:
+                stale = self._entries.get(device_id)
+            if stale is None:
+                raise
+            logger.error(f"Serving stale rules for device {device_id}: {e}")
+            return stale.revision, list(stale.rules.values())
+        return entry.revision, list(entry.rules.values())
+
+    def get_rule(self, device_id: str, rule_id: Any) -> Optional[Dict[str, Any]]:
+        # A rule indexed under this device is read from its rules, which are
+        # revalidated once past the TTL like any other read; anything else is
+        # looked up in the device's rules as the rule engine has them now
+        rule_key = str(rule_id)
+        with self._lock:
+            indexed = self._rule_devices.get(rule_key) == device_id
+
+        for rule in self.get_rules(device_id, revalidate=not indexed):
+            if str(rule['rule_id']) == rule_key:
+                return rule
+        return None
+
+    def _fetch(self, device_id: str, etag: Optional[str]) -> CachedRuleSet:
+        headers = {'If-None-Match': etag} if etag else {}
+        response = self.client.list_rules(device_id, headers=headers)
+
+        if response.status_code == 304:
+            with self._lock:
+                entry = self._entries.get(device_id)
+                if entry is not None:
+                    entry.fetched_at = time.monotonic()
+                    return entry
+            return self._fetch(device_id, None)
+
+        if response.status_code != 200:
+            raise RuleLoadError(f"Failed to get rules from rule engine: {response.status_code}")
+
+        result = response.json()
+        if not result.get('success', False):
+            raise RuleLoadError(f"Rule engine returned error: {result.get('message', 'Unknown error')}")
+
+        entry = CachedRuleSet(
+            rules={str(rule['rule_id']): rule for rule in result.get('rules', [])},
+            etag=response.headers.get('ETag'),
+            fetched_at=time.monotonic()
+        )
+        self._store(device_id, entry)
+        return entry
+
+    def _fetch_shared(self, device_id: str, etag: Optional[str], revalidate: bool) -> CachedRuleSet:
+        # One worker fetches from the rule engine and publishes; the others
+        # adopt what it published
+        key = _shared_key(device_id)
+        if revalidate:
+            self.shared.delete(key)
+        fetched = []
+
+        def fetch():
+            fetched.append(self._fetch(device_id, etag))
+            return {'rules': fetched[0].rules, 'etag': fetched[0].etag}
+
+        stamp, published = self.shared.get_or_compute(key, self.ttl, fetch)
+        with self._lock:
+            if fetched:
+                entry = fetched[0]
+            else:
+                entry = CachedRuleSet(rules=published['rules'], etag=published['etag'], fetched_at=time.monotonic())
+                self._store(device_id, entry)
+            entry.shared_stamp = stamp
+            return entry
+
+    def _publish(self, device_id: str):
+        # Writes made through this worker reach the others
+        if self.shared is None:
+            return
+        entry = self._entries[device_id]
+        entry.shared_stamp = self.shared.set(_shared_key(device_id), {'rules': entry.rules, 'etag': entry.etag},
+                                             self.ttl)
+
+    def _store(self, device_id: str, entry: CachedRuleSet):
+        with self._lock:
+            previous = self._entries.get(device_id)
+            if previous:
+                for rule_key in previous.rules:
+                    self._rule_devices.pop(rule_key, None)
+            entry.revision = next(self._revisions)
+            self._entries[device_id] = entry
+            for rule_key in entry.rules:
+                self._rule_devices[rule_key] = device_id
+            self._notify(device_id)
+
+    def apply_created(self, device_id: str, payload: Dict[str, Any], result: Dict[str, Any]):
+        rule = result.get('rule')
+        if not isinstance(rule, dict) and result.get('rule_id') is not None:
+            rule = {
+                'rule_id': result['rule_id'],
+                'device_id': device_id,
+                'rule_name': payload.get('rule_name'),
+                'conditions': payload.get('condition_tree'),
+                'actions': payload.get('actions', {}),
+                'enabled': True
+            }
+        if not isinstance(rule, dict) or rule.get('rule_id') is None:
+            self.invalidate(device_id)
+            return
+
+        with self._lock:
+            entry = self._entries.get(device_id)
+            if entry is None:
+                # Workers holding this device's rules must refetch them
+                self._unpublish(device_id)
+                return
+            rule_key = str(rule['rule_id'])
+            entry.rules[rule_key] = rule
+            entry.etag = None
+            entry.revision = next(self._revisions)
+            self._rule_devices[rule_key] = device_id
+            self._notify(device_id)
+            self._publish(device_id)
+
+    def apply_updated(self, rule_id: Any, payload: Dict[str, Any]):
+        with self._lock:
+            rule = self._locate(rule_id)
+            if rule is None:
+                self._unpublish()
+                return
+            updated = dict(rule)
+            updated['rule_name'] = payload.get('rule_name', rule.get('rule_name'))
+            updated['conditions'] = payload.get('condition_tree', rule.get('conditions'))
+            updated['actions'] = payload.get('actions', rule.get('actions', {}))
+            self._replace(updated)
+
+    def apply_toggled(self, rule_id: Any, result: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            rule = self._locate(rule_id)
+            if rule is None:
+                self._unpublish()
+                return
+            result = result or {}
+            reported = result.get('rule', {}) if isinstance(result.get('rule'), dict) else {}
+            enabled = result.get('enabled', reported.get('enabled'))
+            updated = dict(rule)
+            updated['enabled'] = (not rule.get('enabled', False)) if enabled is None else bool(enabled)
+            self._replace(updated)
+
+    def apply_deleted(self, rule_id: Any):
+        rule_key = str(rule_id)
+        with self._lock:
+            owner = self._rule_devices.pop(rule_key, None)
+            if owner is None:
+                self._unpublish()
+                return
+            entry = self._entries[owner]
+            entry.rules.pop(rule_key, None)
+            entry.etag = None
+            entry.revision = next(self._revisions)
+            self._notify(owner)
+            self._publish(owner)
+
+    def invalidate(self, device_id: Optional[str] = None):
+        self._unpublish(device_id)
+        self._forget(device_id)
+
+    def _unpublish(self, device_id: Optional[str] = None):
+        # Makes other workers refetch. A change to a rule this worker does not
+        # hold names no device, so every published rule list goes.
+        if self.shared is None:
+            return
+        if device_id is None:
+            self.shared.delete_prefix(_shared_key(''))
+        else:
+            self.shared.delete(_shared_key(device_id))
+
+    def _forget(self, device_id: Optional[str] = None):
+        with self._lock:
+            device_ids = [device_id] if device_id is not None else list(self._entries)
+            for key in device_ids:
+                entry = self._entries.pop(key, None)
+                if entry:
+                    for rule_key in entry.rules:
+                        self._rule_devices.pop(rule_key, None)
+
+    def memory_usage(self) -> Tuple[int, int]:
+        return mapping_usage(self._entries, self._lock)
+
+    def evict_to(self, max_bytes: int) -> int:
+        # Devices fetched longest ago go first
+        with self._lock:
+            entries = sorted(self._entries.items(), key=lambda item: item[1].fetched_at)
+        seen = set()
+        sizes = [(device_id, entry, deep_size(device_id, seen) + deep_size(entry, seen)) for device_id, entry in entries]
+        total = sum(size for _, _, size in sizes)
+        freed = 0
+        with self._lock:
+            for device_id, entry, size in sizes:
+                if total - freed <= max_bytes:
+                    break
+                if self._entries.get(device_id) is entry:
+                    # Only this worker's copy; the published one stays
+                    self._forget(device_id)
+                    freed += size
+        return freed
+
+    def _locate(self, rule_id: Any) -> Optional[Dict[str, Any]]:
+        owner = self._rule_devices.get(str(rule_id))
+        if owner is None:
+            return None
+        return self._entries[owner].rules.get(str(rule_id))
+
+    def _replace(self, rule: Dict[str, Any]):
+        rule_key = str(rule['rule_id'])
+        device_id = self._rule_devices[rule_key]
+        entry = self._entries[device_id]
+        # Rules are shared with callers, so swap in a new dict rather than mutate
+        entry.rules[rule_key] = rule
+        entry.etag = None
+        entry.revision = next(self._revisions)
+        self._notify(device_id)
+        self._publish(device_id)
+
+    def _notify(self, device_id: str):
+        rules = list(self._entries[device_id].rules.values())
+        for listener in self._listeners:
+            try:
+                listener(device_id, rules)
+            except Exception as e:
+                logger.error(f"Rule cache listener failed for device {device_id}: {e}")
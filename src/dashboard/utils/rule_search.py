@@ -0,0 +1,102 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from src.telemetry.memory import mapping_usage, evict_mapping
+
+NGRAM_SIZE = 3
+INDEX_CACHE_SIZE = 64
+
+
+def summarize_actions(actions: Dict[str, Any]) -> List[str]:
+    action_summary = []
+    for capability, action_config in (actions or {}).items():
+        if 'toggle' in action_config:
+            action_summary.append(f"{capability}: {action_config['toggle']}")
+        elif 'absolute_value' in action_config:
+            action_summary.append(f"{capability}: {action_config['absolute_value']}")
+        elif 'discrete_value' in action_config:
+            action_summary.append(f"{capability}: {action_config['discrete_value']}")
+        elif 'trigger' in action_config:
+            duration = action_config.get('duration', 30)
+            action_summary.append(f"{capability}: trigger ({duration}s)")
+    return action_summary
+
+
+def _ngrams(text: str, size: int) -> Set[str]:
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class RuleSearchIndex:
+    # Substring search over rule names and action summaries. Every 1..3-gram of
+    # each document is indexed, so a query is answered by intersecting the
+    # posting lists of its grams and confirming the few remaining candidates.
+    def __init__(self, rules: List[Dict[str, Any]]):
+        self.rules = list(rules)
+        self._documents = [
+            f"{rule.get('rule_name', '')}\n{' '.join(summarize_actions(rule.get('actions', {})))}".lower()
+            for rule in self.rules
+        ]
+        self._postings: Dict[str, List[int]] = {}
+        for position, document in enumerate(self._documents):
+            grams = set()
+            for size in range(1, NGRAM_SIZE + 1):
+                grams |= _ngrams(document, size)
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(position)
+
+    def search(self, query: Optional[str]) -> List[Dict[str, Any]]:
+        query = (query or '').strip().lower()
+        if not query:
+            return self.rules
+
+        size = min(len(query), NGRAM_SIZE)
+        postings = []
+        for gram in _ngrams(query, size):
+            posting = self._postings.get(gram)
+            if not posting:
+                return []
+            postings.append(posting)
+        postings.sort(key=len)
+
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+
+        return [self.rules[position] for position in sorted(candidates) if query in self._documents[position]]
+
+    def page(self, query: Optional[str], page: int, page_size: int) -> Tuple[List[Dict[str, Any]], int, int]:
+        matches = self.search(query)
+        page_count = max(1, -(-len(matches) // page_size))
+        page = min(max(page, 0), page_count - 1)
+        return matches[page * page_size:(page + 1) * page_size], len(matches), page_count
+
+
+class RuleSearchIndexCache:
+    def __init__(self, max_entries: int = INDEX_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._indexes: "OrderedDict[str, Tuple[Any, RuleSearchIndex]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, device_id: str, revision: Any, rules: List[Dict[str, Any]]) -> RuleSearchIndex:
+        with self._lock:
+            cached = self._indexes.get(device_id)
+            if cached and cached[0] == revision:
+                self._indexes.move_to_end(device_id)
+                return cached[1]
+
+        index = RuleSearchIndex(rules)
+        with self._lock:
+            self._indexes[device_id] = (revision, index)
+            self._indexes.move_to_end(device_id)
+            while len(self._indexes) > self.max_entries:
+                self._indexes.popitem(last=False)
+        return index
+
+    def memory_usage(self) -> Tuple[int, int]:
+        return mapping_usage(self._indexes, self._lock)
+
+    def evict_to(self, max_bytes: int) -> int:
+        return evict_mapping(self._indexes, self._lock, max_bytes)
@@ -0,0 +1,134 @@
+import itertools
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from src.config.settings import config
+from src.telemetry.instruments import CACHE_REQUESTS
+from src.telemetry.memory import mapping_usage, evict_mapping
+
+MAX_SESSIONS = 256
+MAX_SESSION_BYTES = 2 * 1024 * 1024
+
+_CACHE_HITS = CACHE_REQUESTS.labels('session_store', 'hit')
+_CACHE_MISSES = CACHE_REQUESTS.labels('session_store', 'miss')
+
+
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+
+def _shared_key(session_id: str, version: int) -> str:
+    return f"session:{session_id}:{version}"
+
+
+def value_size(value: Any) -> int:
+    # Approximate cost of a value: the size of the JSON it replaces on the wire
+    return len(json.dumps(value, default=str))
+
+
+class _Session:
+    __slots__ = ('versions', 'entries', 'bytes')
+
+    def __init__(self):
+        self.versions = itertools.count(1)
+        self.entries: "OrderedDict[int, Tuple[Any, int]]" = OrderedDict()
+        self.bytes = 0
+
+
+class SessionStore:
+    # Values that would otherwise travel as dcc.Store data with every callback.
+    # The browser keeps only the version number put() returns, per-session
+    # memory is capped by evicting the least recently used versions and whole
+    # sessions are evicted least recently used first. Stored values are shared,
+    # so callers replace them instead of mutating them.
+    #
+    # With a SharedCache every value is also published under a version drawn
+    # from a counter all workers share, so the browser's next request finds it
+    # whichever worker serves it. The in-process store is then a copy of what
+    # this worker has seen, and published values expire after ttl.
+    def __init__(self, max_sessions: int = MAX_SESSIONS, max_session_bytes: int = MAX_SESSION_BYTES, shared=None,
+                 ttl: Optional[float] = None):
+        self.max_sessions = max_sessions
+        self.max_session_bytes = max_session_bytes
+        self.shared = shared
+        self.ttl = ttl if ttl is not None else config.get("shared_cache.session_ttl", 86400.0)
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, session_id: str, value: Any) -> int:
+        size = value_size(value)
+        version = None
+        if self.shared is not None:
+            version = self.shared.next('session_versions')
+            self.shared.set(_shared_key(session_id, version), value, self.ttl)
+        with self._lock:
+            session = self._session(session_id)
+            if version is None:
+                version = next(session.versions)
+            self._keep(session, version, value, size)
+            return version
+
+    def _keep(self, session: _Session, version: int, value: Any, size: int):
+        session.entries[version] = (value, size)
+        session.bytes += size
+        # The newest version is always kept, even when it alone is over budget
+        while session.bytes > self.max_session_bytes and len(session.entries) > 1:
+            _, (_, evicted_size) = session.entries.popitem(last=False)
+            session.bytes -= evicted_size
+
+    def get(self, session_id: Optional[str], version: Optional[int], default: Any = None) -> Any:
+        if not session_id or version is None:
+            return default
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and version in session.entries:
+                _CACHE_HITS.inc()
+                self._sessions.move_to_end(session_id)
+                session.entries.move_to_end(version)
+                return session.entries[version][0]
+        published = self.shared.get(_shared_key(session_id, version)) if self.shared is not None else None
+        if published is None:
+            _CACHE_MISSES.inc()
+            return default
+        # Put by another worker
+        _CACHE_HITS.inc()
+        value = published[1]
+        with self._lock:
+            self._keep(self._session(session_id), version, value, value_size(value))
+        return value
+
+    def session_bytes(self, session_id: str) -> int:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return session.bytes if session else 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'entries': sum(len(session.entries) for session in self._sessions.values()),
+                'bytes': sum(session.bytes for session in self._sessions.values()),
+            }
+
+    def memory_usage(self) -> Tuple[int, int]:
+        return mapping_usage(self._sessions, self._lock)
+
+    def evict_to(self, max_bytes: int) -> int:
+        # Whole sessions, least recently used first
+        return evict_mapping(self._sessions, self._lock, max_bytes)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _session(self, session_id: str) -> _Session:
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = _Session()
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(session_id)
+        return session
@@ -0,0 +1,262 @@
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from dateutil.tz import tzlocal
+
+from src.config.settings import config
+from src.config.logger import get_logger
+from src.telemetry.instruments import CACHE_REQUESTS, CACHE_ENTRIES, CACHE_BYTES
+
+logger = get_logger(__name__)
+
+# Writes between sweeps of expired entries and, past max_bytes, the oldest ones
+PRUNE_EVERY = 64
+LEASE_POLL_SECONDS = 0.02
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    stamp INTEGER NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_stored_at ON entries (stored_at);
+CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+
+def encode_value(value: Any) -> bytes:
+    return json.dumps(value, default=_encode_object, separators=(',', ':')).encode()
+
+
+def decode_value(blob: bytes) -> Any:
+    return json.loads(blob, object_hook=_decode_object)
+
+
+def _encode_object(obj: Any) -> Any:
+    # Query results are frames, and device snapshots keep sets of device ids
+    if isinstance(obj, (set, frozenset)):
+        return {'__set__': list(obj)}
+    pd = sys.modules.get('pandas')
+    if pd is not None and isinstance(obj, pd.DataFrame):
+        return {'__frame__': [_encode_column(name, obj[name]) for name in obj.columns]}
+    raise TypeError(f"{type(obj).__name__} cannot be stored in the shared cache")
+
+
+def _encode_column(name: str, column) -> Dict[str, Any]:
+    if column.dtype.kind == 'M':
+        # Nanoseconds since the epoch, NaT as the smallest int64
+        tz = column.dt.tz
+        return {'name': name, 'time': True, 'unit': column.dt.unit,
+                'tz': None if tz is None else 'local' if isinstance(tz, tzlocal) else str(tz),
+                'values': column.dt.as_unit('ns').array.asi8.tolist()}
+    return {'name': name, 'dtype': str(column.dtype), 'values': column.tolist()}
+
+
+def _decode_object(obj: Dict[str, Any]) -> Any:
+    if '__set__' in obj:
+        return frozenset(obj['__set__'])
+    if '__frame__' in obj:
+        import pandas as pd
+        columns = {}
+        for column in obj['__frame__']:
+            if column.get('time'):
+                times = pd.to_datetime(column['values'], unit='ns', utc=True)
+                times = (times.tz_localize(None) if column['tz'] is None
+                         else times.tz_convert(tzlocal() if column['tz'] == 'local' else column['tz']))
+                columns[column['name']] = pd.Series(times.as_unit(column['unit']))
+            else:
+                columns[column['name']] = pd.Series(column['values'], dtype=column['dtype'])
+        return pd.DataFrame(columns)
+    return obj
+
+
+def check_private(path: str):
+    # Another user able to write the file could change what every worker
+    # serves, so it and its directory must belong to this user and the
+    # directory must not be writable by anyone else
+    if not hasattr(os, 'getuid'):
+        return
+    directory = os.path.dirname(os.path.abspath(path))
+    for target in (directory, path, f'{path}-wal', f'{path}-shm'):
+        try:
+            status = os.stat(target)
+        except FileNotFoundError:
+            continue
+        if status.st_uid != os.getuid() or (target == directory and status.st_mode & 0o022):
+            raise PermissionError(f"Refusing shared cache {path}: {target} is not private to this user")
+
+
+class SharedCache:
+    # Values shared by every worker process on the host through one SQLite
+    # file in WAL mode. Each write gives the entry a new stamp from a counter
+    # in the same file, so a process can hold a decoded copy and only read the
+    # value again once the stamp moved. Values are stored as JSON, so reading
+    # the file never runs code, and the file must be private to this user.
+    def __init__(self, path: str, max_bytes: Optional[int] = None, lease_seconds: Optional[float] = None):
+        check_private(path)
+        self.path = path
+        self.max_bytes = max_bytes if max_bytes is not None else config.get("shared_cache.max_bytes", 256 * 1024 * 1024)
+        self.lease_seconds = (lease_seconds if lease_seconds is not None
+                              else config.get("shared_cache.lease_seconds", 10.0))
+        self._local = threading.local()
+        self._inherited = []
+        self._writes = itertools.count(1)
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread, opened again in a forked child: a SQLite
+        # connection must not be used on both sides of a fork
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            if getattr(local, 'connection', None) is not None:
+                # Closing the parent's connection here could undo its locks
+                self._inherited.append(local.connection)
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            local.connection, local.pid = connection, os.getpid()
+        return local.connection
+
+    def close(self):
+        # This thread's connection; a pre-forking server calls it before forking
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            connection.close()
+            self._local.connection = self._local.pid = None
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def get(self, key: str) -> Optional[Tuple[int, Any]]:
+        # (stamp, value) while the entry has not expired
+        namespace = key.split(':', 1)[0]
+        row = self._connection().execute(
+            'SELECT stamp, value FROM entries WHERE key = ? AND expires_at > ?', (key, time.time())).fetchone()
+        if row is not None:
+            try:
+                value = decode_value(row[1])
+            except Exception as e:
+                # Written by another version of the dashboard
+                logger.error(f"Dropping unreadable shared cache entry {key}: {e}")
+                self.delete(key)
+            else:
+                CACHE_REQUESTS.labels(f'shared_{namespace}', 'hit').inc()
+                return row[0], value
+        CACHE_REQUESTS.labels(f'shared_{namespace}', 'miss').inc()
+        return None
+
+    def stamp(self, key: str) -> Optional[int]:
+        # Cheaper than get when the caller already holds the value
+        row = self._connection().execute(
+            'SELECT stamp FROM entries WHERE key = ? AND expires_at > ?', (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: Any, ttl: float) -> int:
+        blob = encode_value(value)
+        now = time.time()
+        with self._transaction() as connection:
+            stamp = self._next(connection, 'stamp')
+            connection.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)',
+                               (key, stamp, blob, len(blob), now, now + ttl))
+        if next(self._writes) % PRUNE_EVERY == 0:
+            self.prune()
+        return stamp
+
+    def delete(self, key: str):
+        self._connection().execute('DELETE FROM entries WHERE key = ?', (key,))
+
+    def delete_prefix(self, prefix: str):
+        self._connection().execute("DELETE FROM entries WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+    def next(self, name: str) -> int:
+        # A counter every process draws from, starting at 1
+        with self._transaction() as connection:
+            return self._next(connection, name)
+
+    def _next(self, connection: sqlite3.Connection, name: str) -> int:
+        return connection.execute(
+            'INSERT INTO counters VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1 RETURNING value',
+            (name,)).fetchone()[0]
+
+    @contextmanager
+    def lease(self, key: str) -> Iterator[bool]:
+        # Yields whether this thread holds the key's lease. A lease left by a
+        # process that died lapses after lease_seconds.
+        owner = f"{os.getpid()}:{threading.get_ident()}"
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute('DELETE FROM leases WHERE key = ? AND expires_at <= ?', (key, now))
+            acquired = connection.execute('INSERT OR IGNORE INTO leases VALUES (?, ?, ?)',
+                                          (key, owner, now + self.lease_seconds)).rowcount == 1
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self._connection().execute('DELETE FROM leases WHERE key = ? AND owner = ?', (key, owner))
+
+    def get_or_compute(self, key: str, ttl: float, compute: Callable[[], Any]) -> Tuple[int, Any]:
+        # Workers missing the same key at once run compute once: the lease
+        # holder computes and publishes, the rest poll for its result. When the
+        # holder fails or takes longer than the lease, waiters compute too.
+        deadline = time.monotonic() + self.lease_seconds
+        while True:
+            cached = self.get(key)
+            if cached is not None:
+                return cached
+            with self.lease(key) as acquired:
+                if acquired or time.monotonic() >= deadline:
+                    value = compute()
+                    return self.set(key, value, ttl), value
+            time.sleep(LEASE_POLL_SECONDS)
+
+    def prune(self) -> int:
+        # Expired entries, then the least recently written until under max_bytes
+        now = time.time()
+        with self._transaction() as connection:
+            removed = connection.execute('DELETE FROM entries WHERE expires_at <= ?', (now,)).rowcount
+            connection.execute('DELETE FROM leases WHERE expires_at <= ?', (now,))
+            removed += connection.execute(
+                'DELETE FROM entries WHERE key IN (SELECT key FROM ('
+                'SELECT key, SUM(size) OVER (ORDER BY stored_at DESC, key) AS kept FROM entries) WHERE kept > ?)',
+                (self.max_bytes,)).rowcount
+        stats = self.stats()
+        CACHE_ENTRIES.labels('shared').set(stats['entries'])
+        CACHE_BYTES.labels('shared').set(stats['bytes'])
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        entries, size = self._connection().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        return {'entries': entries, 'bytes': size}
+
+    def clear(self):
+        with self._transaction() as connection:
+            connection.execute('DELETE FROM entries')
+            connection.execute('DELETE FROM leases')
+
+
+def shared_cache_from_config() -> Optional[SharedCache]:
+    # Off unless a path is configured; the multi-worker server sets one
+    path = config.get("shared_cache.path", "")
+    if not path:
+        return None
+    logger.info(f"Sharing caches across workers through {path}")
+    return SharedCache(path)
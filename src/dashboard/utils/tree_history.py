@@ -0,0 +1,86 @@
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.telemetry.memory import mapping_usage, evict_mapping
+
+MAX_VERSIONS = 100
+MAX_HISTORIES = 256
+
+
+class TreeHistory:
+    # Versions of one condition tree being edited. Edits share unchanged
+    # subtrees with the version before them, so keeping every version costs
+    # about one path of new nodes per edit.
+    def __init__(self, tree: Dict[str, Any], max_versions: int = MAX_VERSIONS):
+        self.max_versions = max_versions
+        self._versions: List[Dict[str, Any]] = [tree]
+        self._cursor = 0
+
+    @property
+    def current(self) -> Dict[str, Any]:
+        return self._versions[self._cursor]
+
+    @property
+    def can_undo(self) -> bool:
+        return self._cursor > 0
+
+    @property
+    def can_redo(self) -> bool:
+        return self._cursor < len(self._versions) - 1
+
+    def push(self, tree: Dict[str, Any]) -> Dict[str, Any]:
+        if tree is self.current:
+            return tree
+        del self._versions[self._cursor + 1:]
+        self._versions.append(tree)
+        if len(self._versions) > self.max_versions:
+            del self._versions[0]
+        self._cursor = len(self._versions) - 1
+        return tree
+
+    def undo(self) -> Dict[str, Any]:
+        if self.can_undo:
+            self._cursor -= 1
+        return self.current
+
+    def redo(self) -> Dict[str, Any]:
+        if self.can_redo:
+            self._cursor += 1
+        return self.current
+
+
+class TreeHistoryRegistry:
+    # Server-side histories keyed by an id the browser keeps in a store
+    def __init__(self, max_histories: int = MAX_HISTORIES):
+        self.max_histories = max_histories
+        self._histories: "OrderedDict[str, TreeHistory]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def new_id(self) -> str:
+        return uuid.uuid4().hex
+
+    def sync(self, history_id: str, tree: Dict[str, Any]) -> TreeHistory:
+        # The browser's tree is authoritative; when another callback replaced it
+        # (a new rule, a rule loaded for editing) the history starts over
+        with self._lock:
+            history = self._histories.get(history_id)
+            if history is None or history.current != tree:
+                history = TreeHistory(tree)
+                self._histories[history_id] = history
+            self._histories.move_to_end(history_id)
+            while len(self._histories) > self.max_histories:
+                self._histories.popitem(last=False)
+            return history
+
+    def get(self, history_id: Optional[str]) -> Optional[TreeHistory]:
+        with self._lock:
+            return self._histories.get(history_id) if history_id else None
+
+    def memory_usage(self) -> Tuple[int, int]:
+        return mapping_usage(self._histories, self._lock)
+
+    def evict_to(self, max_bytes: int) -> int:
+        # An evicted history starts over from the browser's tree on the next edit
+        return evict_mapping(self._histories, self._lock, max_bytes)
@@ -0,0 +1,108 @@
+import socket
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from src.config.settings import config
+from src.config.logger import get_logger
+from src.config.imports import import_deferred
+from src.telemetry.startup import startup
+from .callbacks import sensor_models, rule_cache, device_snapshot, cache_snapshot
+
+logger = get_logger(__name__)
+
+
+def dash_first_requests(app):
+    # Dash builds its index, layout and dependency payloads on first request;
+    # the test client does that without going over the network
+    client = app.server.test_client()
+    for path in ('/', '/_dash-layout', '/_dash-dependencies'):
+        response = client.get(path)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {path} answered {response.status_code}")
+
+
+def sensor_connections():
+    # Connects every model and fills the latest-reading path the sensors tab reads
+    for model in sensor_models:
+        model.get_latest_device_data()
+
+
+def rule_lists():
+    device_snapshot.sync()
+    for device in device_snapshot.devices:
+        rule_cache.get_rules(device['device_id'])
+
+
+def figures():
+    # Plotly validates against its schema on the first figure it builds
+    import plotly.express as px
+    px.line(x=[0, 1], y=[0, 1]).to_plotly_json()
+
+
+def local_tasks(app) -> List[Tuple[str, Callable[[], object]]]:
+    # Nothing here opens a connection, so a pre-forking server can run these
+    # once before it forks its workers. The snapshot is loaded before the
+    # backend tasks, which then only fetch what changed since it was saved.
+    return [
+        ('imports', import_deferred),
+        ('snapshot', cache_snapshot.load),
+        ('dash', lambda: dash_first_requests(app)),
+        ('figures', figures),
+    ]
+
+
+def backend_tasks() -> List[Tuple[str, Callable[[], object]]]:
+    return [
+        ('sensors', sensor_connections),
+        ('rules', rule_lists),
+    ]
+
+
+def warmup_tasks(app) -> List[Tuple[str, Callable[[], object]]]:
+    return local_tasks(app) + backend_tasks()
+
+
+def run_warmup(tasks: List[Tuple[str, Callable[[], object]]], phase: str = 'warm'):
+    # A failing task is logged and recorded; the rest still run and the
+    # dashboard keeps serving either way
+    for name, task in tasks:
+        start = time.perf_counter()
+        error = None
+        try:
+            task()
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            logger.error(f"Warm-up task {name} failed: {error}")
+        startup.record_task(name, time.perf_counter() - start, error)
+    startup.mark(phase)
+
+
+def wait_for_port(host: str, port: int, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+
+def start_warmup(app, port: int, host: str = '127.0.0.1',
+                 tasks: Optional[List[Tuple[str, Callable[[], object]]]] = None) -> Optional[threading.Thread]:
+    # Runs once the port accepts connections, so warming never delays serving
+    if not config.get("startup.warmup", True):
+        return None
+    tasks = warmup_tasks(app) if tasks is None else tasks
+
+    def warm():
+        if not wait_for_port(host, port, config.get("startup.warmup_wait", 60)):
+            logger.error(f"Port {port} did not open, skipping warm-up")
+            return
+        startup.mark('serving')
+        run_warmup(tasks)
+
+    thread = threading.Thread(target=warm, name='warmup', daemon=True)
+    thread.start()
+    return thread
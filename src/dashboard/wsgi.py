@@ -0,0 +1,6 @@
+from .app import app
+
+# Entry point for WSGI servers; production runs it under gunicorn with the
+# settings in gunicorn_conf.py:
+#   gunicorn -c src/dashboard/gunicorn_conf.py src.dashboard.wsgi:server
+server = app.server
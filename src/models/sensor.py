@@ -1,15 +1,28 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from enum import Enum
-from influxdb_client import InfluxDBClient, Point
-from influxdb_client.client.write_api import SYNCHRONOUS
-import pandas as pd
 import warnings
 from src.config.settings import config
+from src.config.imports import lazy_import
 from src.config.logger import get_logger
+from src.models.sensor_cache import SensorCache, COLUMNS, LATEST_DAYS, empty_frame, flux_time, relative_range
+from src.telemetry import query_shape, query_shape_text
+from src.telemetry.query_log import query_log
+from src.telemetry.profiler import profiler
+from src.telemetry.tracing import tracer, KIND_CLIENT
+from src.telemetry.instruments import (
+    SENSOR_QUERY_SECONDS, SENSOR_QUERY_ROWS, SENSOR_QUERY_BYTES, SENSOR_QUERY_ERRORS, SENSOR_QUERIES_IN_FLIGHT
+)
 
 warnings.filterwarnings("ignore", category=UserWarning, module="influxdb_client")
 
+pd = lazy_import('pandas')
+
 logger = get_logger(__name__)
 
 
@@ -21,16 +34,42 @@ class SensorType(Enum):
 
 
 class SensorModel:
-    def __init__(self, sensor_type: SensorType):
-        self.client = None
+    def __init__(self, sensor_type: SensorType, shared=None):
+        self._client = None
+        self._client_lock = threading.Lock()
         self.sensor_type = sensor_type.value
         self.bucket = config.get("influxdb.bucket", "sensor-events")
         self.org = config.get("influxdb.org", "smart-home")
-        self._connect()
+        # With a SharedCache, workers and viewers asking the same query within
+        # the TTL share one run of it
+        self.shared = shared
+        self.query_ttl = config.get("shared_cache.query_ttl", 4.0)
+        self.catalog_ttl = config.get("shared_cache.catalog_ttl", 60.0)
+        # (fetched_at, device ids) of the last device catalog query
+        self._devices: Optional[Tuple[float, List[str]]] = None
+        # Latest readings and recent windows, refreshed with incremental queries
+        self.cache = (SensorCache(self._fetch_latest, self._fetch_series, name=f'sensor_{self.sensor_type}')
+                      if config.get("sensor_cache.enabled", True) else None)
+
+    @property
+    def client(self):
+        # Connects on first use, which also defers importing influxdb_client
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._connect()
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
 
     def _connect(self):
+        from influxdb_client import InfluxDBClient
+        from influxdb_client.client.warnings import MissingPivotFunction
+        warnings.simplefilter("ignore", MissingPivotFunction)
         try:
-            self.client = InfluxDBClient(
+            self._client = InfluxDBClient(
                 url=config.get("influxdb.url", "http://localhost:8086"),
                 token=config.get("influxdb.token", "smart-home-token"),
                 org=self.org
@@ -40,7 +79,49 @@ class SensorModel:
             logger.error(f"Failed to connect to InfluxDB: {e}")
             raise
 
-    def get_sensor_data(self, start_time: str = "-1h", device_ids: Optional[List[str]] = None, **extras) -> pd.DataFrame:
+    def _query_frame(self, method: str, query: str, ttl: Optional[float] = None, **attributes) -> pd.DataFrame:
+        if self.shared is None:
+            return self._run_query(method, query, **attributes)
+        key = 'query:' + hashlib.sha1(query.encode()).hexdigest()
+        return self.shared.get_or_compute(key, ttl if ttl is not None else self.query_ttl,
+                                          lambda: self._run_query(method, query, **attributes))[1]
+
+    def _run_query(self, method: str, query: str, **attributes) -> pd.DataFrame:
+        shape = query_shape(query)
+        SENSOR_QUERIES_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        # Covers the HTTP round trip and the client's CSV decoding into a frame
+        with tracer.span('influx.query', kind=KIND_CLIENT, **{
+            'db.system': 'influxdb', 'sensor.type': self.sensor_type, 'sensor.method': method, 'query.shape': shape,
+            **attributes
+        }) as span:
+            try:
+                result = self.client.query_api().query_data_frame(query)
+            except Exception:
+                SENSOR_QUERY_ERRORS.labels(self.sensor_type, method).inc()
+                query_log.record(shape, query_shape_text(query), query, time.perf_counter() - start, failed=True)
+                raise
+            finally:
+                SENSOR_QUERIES_IN_FLIGHT.dec()
+            seconds = time.perf_counter() - start
+            SENSOR_QUERY_SECONDS.labels(self.sensor_type, method, shape).observe(seconds)
+            # A query over several tables decodes to a list of frames
+            frames = result if isinstance(result, list) else [result]
+            rows = sum(len(frame) for frame in frames)
+            decoded_bytes = sum(int(frame.memory_usage(index=True).sum()) for frame in frames)
+            SENSOR_QUERY_ROWS.labels(self.sensor_type, method, shape).observe(rows)
+            SENSOR_QUERY_BYTES.labels(self.sensor_type, method, shape).inc(decoded_bytes)
+            span.set_attributes(rows=rows, decoded_bytes=decoded_bytes)
+        if query_log.record(shape, query_shape_text(query), query, seconds, rows):
+            query_log.profile_in_background(shape, query, self._profile_query)
+        return result
+
+    def _profile_query(self, query: str):
+        for table in self.client.query_api().query(query):
+            for record in table.records:
+                yield record.values
+
+    def sensor_data_query(self, start_time: str = "-1h", device_ids: Optional[List[str]] = None, **extras) -> str:
         query = f'''
         from(bucket: "{self.bucket}")
         |> range(start: {start_time})
@@ -61,45 +142,88 @@ class SensorModel:
                 query += f'|> filter(fn: (r) => {filter_values})'
         
         query += '|> pivot(rowKey:["_time", "device_id", "location", "type"], columnKey: ["_field"], valueColumn: "_value")'
-        
-        try:
-            query_api = self.client.query_api()
-            result = query_api.query_data_frame(query)
-            
-            if result.empty:
-                return pd.DataFrame(columns=['_time', 'value', 'device_id', 'location', 'type'])
-            
+        return query
+
+    def _sensor_frame(self, method: str, query: str, **attributes) -> pd.DataFrame:
+        result = self._query_frame(method, query, **attributes)
+        if result.empty:
+            return empty_frame()
+
+        with tracer.span('sensor.decode', rows=len(result)):
             result['_time'] = pd.to_datetime(result['_time'])
-            
+
             for col in ['location', 'type']:
                 if col not in result.columns:
                     result[col] = None
+        return result[COLUMNS]
+
+    def _fetch_series(self, start: pd.Timestamp) -> pd.DataFrame:
+        # Every device of the type, so one cached window serves any selection
+        return self._sensor_frame('get_sensor_data', self.sensor_data_query(flux_time(start)), range=flux_time(start),
+                                  device_count=0)
+
+    def _cached_series(self, start_time: str, device_ids: Optional[List[str]]) -> Optional[pd.DataFrame]:
+        # Only relative ranges such as "-6h" are served from the cache
+        span = relative_range(start_time)
+        if self.cache is None or span is None:
+            return None
+        result = self.cache.series(pd.Timestamp.now(tz='UTC') - span)
+        if result is not None and device_ids:
+            result = result[result['device_id'].isin(device_ids)]
+        return result
+
+    @profiler.wrap('SensorModel.get_sensor_data')
+    def get_sensor_data(self, start_time: str = "-1h", device_ids: Optional[List[str]] = None,
+                        deduplicate: bool = True, **extras) -> pd.DataFrame:
+        # Charts only need a point where the value changes; deduplicate=False
+        # keeps every reading, for callers that care when a sensor last reported
+        try:
+            result = None if extras else self._cached_series(start_time, device_ids)
+            if result is None:
+                query = self.sensor_data_query(start_time, device_ids, **extras)
+                result = self._sensor_frame('get_sensor_data', query, range=start_time,
+                                            device_count=len(device_ids or []))
+
+            if result.empty:
+                return empty_frame()
+            if not deduplicate:
+                return result[COLUMNS]
             
-            deduplicated_data = []
-            for device_id in result['device_id'].unique():
-                device_data = result[result['device_id'] == device_id].copy().reset_index(drop=True)
-                if len(device_data) > 1:
-                    try:
-                        current_values = device_data['value'].iloc[1:]
-                        previous_values = device_data['value'].iloc[:-1]
-                        comparison = current_values.values != previous_values.values
-                        mask = [True] + comparison.tolist()
-                        deduplicated_device_data = device_data[mask]
-                    except Exception as e:
+            with tracer.span('sensor.dedup', rows=len(result)) as span:
+                deduplicated_data = []
+                for device_id in result['device_id'].unique():
+                    device_data = result[result['device_id'] == device_id].copy().reset_index(drop=True)
+                    if len(device_data) > 1:
+                        try:
+                            current_values = device_data['value'].iloc[1:]
+                            previous_values = device_data['value'].iloc[:-1]
+                            comparison = current_values.values != previous_values.values
+                            mask = [True] + comparison.tolist()
+                            deduplicated_device_data = device_data[mask]
+                        except Exception as e:
+                            deduplicated_device_data = device_data
+                    else:
                         deduplicated_device_data = device_data
-                else:
-                    deduplicated_device_data = device_data
-                deduplicated_data.append(deduplicated_device_data)
+                    deduplicated_data.append(deduplicated_device_data)
+                
+                if deduplicated_data:
+                    result = pd.concat(deduplicated_data, ignore_index=True)
+                span.set_attributes(device_count=len(deduplicated_data), rows_kept=len(result))
             
-            if deduplicated_data:
-                result = pd.concat(deduplicated_data, ignore_index=True)
-            
-            return result[['_time', 'value', 'device_id', 'location', 'type']]
+            return result[COLUMNS]
         except Exception as e:
             logger.error(f"Error querying {self.sensor_type} data: {e}")
-            return pd.DataFrame(columns=['_time', 'value', 'device_id', 'location', 'type'])
+            tracer.current_span().record_error(e)
+            return empty_frame()
 
+    @profiler.wrap('SensorModel.get_devices')
     def get_devices(self, **extras) -> List[str]:
+        # Devices with any field in the last 7 days, which the latest readings
+        # cache cannot tell, since it only keeps the value field
+        devices = self._devices
+        if devices is not None and time.monotonic() - devices[0] < self.catalog_ttl:
+            return list(devices[1])
+
         query = f'''
         from(bucket: "{self.bucket}")
         |> range(start: -7d)
@@ -110,21 +234,19 @@ class SensorModel:
         '''
         
         try:
-            query_api = self.client.query_api()
-            result = query_api.query_data_frame(query)
-            
-            if result.empty:
-                return []
+            result = self._query_frame('get_devices', query, ttl=self.catalog_ttl)
             
-            return result['device_id'].unique().tolist()
+            device_ids = [] if result.empty else result['device_id'].unique().tolist()
+            self._devices = (time.monotonic(), device_ids)
+            return list(device_ids)
         except Exception as e:
             logger.error(f"Error getting {self.sensor_type} devices: {e}")
             return []
 
-    def get_latest_device_data(self, **extras) -> pd.DataFrame:
-        query = f'''
+    def latest_query(self, start_time: str = f"-{LATEST_DAYS}d") -> str:
+        return f'''
         from(bucket: "{self.bucket}")
-        |> range(start: -7d)
+        |> range(start: {start_time})
         |> filter(fn: (r) => r["_measurement"] == "sensor_events")
         |> filter(fn: (r) => r["_field"] == "value")
         |> filter(fn: (r) => r["type"] == "{self.sensor_type}")
@@ -132,45 +254,40 @@ class SensorModel:
         |> last()
         |> pivot(rowKey:["_time", "device_id", "location", "type"], columnKey: ["_field"], valueColumn: "_value")
         '''
-        
+
+    def _fetch_latest(self, start: pd.Timestamp) -> pd.DataFrame:
+        return self._sensor_frame('get_latest_device_data', self.latest_query(flux_time(start)))
+
+    @profiler.wrap('SensorModel.get_latest_device_data')
+    def get_latest_device_data(self, **extras) -> pd.DataFrame:
         try:
-            query_api = self.client.query_api()
-            result = query_api.query_data_frame(query)
-            
-            if result.empty:
-                return pd.DataFrame(columns=['_time', 'value', 'device_id', 'location', 'type'])
-            
-            result['_time'] = pd.to_datetime(result['_time'])
-            
-            for col in ['location', 'type']:
-                if col not in result.columns:
-                    result[col] = None
-            
-            return result[['_time', 'value', 'device_id', 'location', 'type']]
+            if self.cache is not None:
+                return self.cache.latest()
+            return self._sensor_frame('get_latest_device_data', self.latest_query())
         except Exception as e:
             logger.error(f"Error querying latest {self.sensor_type} device data: {e}")
-            return pd.DataFrame(columns=['_time', 'value', 'device_id', 'location', 'type'])
+            return empty_frame()
 
     def close(self):
-        if self.client:
-            self.client.close()
+        if self._client:
+            self._client.close()
 
 
 class TemperatureModel(SensorModel):
-    def __init__(self):
-        super().__init__(SensorType.TEMPERATURE)
+    def __init__(self, shared=None):
+        super().__init__(SensorType.TEMPERATURE, shared)
 
 
 class HumidityModel(SensorModel):
-    def __init__(self):
-        super().__init__(SensorType.HUMIDITY)
+    def __init__(self, shared=None):
+        super().__init__(SensorType.HUMIDITY, shared)
 
 
 class MotionModel(SensorModel):
-    def __init__(self):
-        super().__init__(SensorType.MOTION)
+    def __init__(self, shared=None):
+        super().__init__(SensorType.MOTION, shared)
 
 
 class GasModel(SensorModel):
-    def __init__(self):
-        super().__init__(SensorType.GAS)
\ No newline at end of file
+    def __init__(self, shared=None):
+        super().__init__(SensorType.GAS, shared)
\ No newline at end of file
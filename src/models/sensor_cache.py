@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import re
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.config.settings import config
+from src.config.imports import lazy_import
+from src.config.logger import get_logger
+from src.telemetry.instruments import CACHE_REQUESTS
+from src.telemetry.memory import deep_size
+
+pd = lazy_import('pandas')
+
+logger = get_logger(__name__)
+
+COLUMNS = ['_time', 'value', 'device_id', 'location', 'type']
+# How far back get_latest_device_data has always looked for a device's last reading
+LATEST_DAYS = 7
+
+RELATIVE_RANGE = re.compile(r'-(\d+)([smhdw])')
+_RANGE_UNITS = {'s': 'seconds', 'm': 'minutes', 'h': 'hours', 'd': 'days', 'w': 'weeks'}
+
+
+def empty_frame() -> pd.DataFrame:
+    return pd.DataFrame(columns=COLUMNS)
+
+
+def flux_time(moment: pd.Timestamp) -> str:
+    # An absolute Flux time literal, usable wherever a relative range is
+    return moment.tz_convert('UTC').strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def relative_range(start_time) -> Optional[timedelta]:
+    # Length of a Flux relative range start such as "-7d" or "-12h"; None for
+    # anything else, which must not be put into a query unchecked
+    match = RELATIVE_RANGE.fullmatch(start_time) if isinstance(start_time, str) else None
+    if match is None:
+        return None
+    return timedelta(**{_RANGE_UNITS[match.group(2)]: int(match.group(1))})
+
+
+def merge_readings(frames: List[Optional[pd.DataFrame]], keys: List[str]) -> pd.DataFrame:
+    # Rows of later frames replace earlier rows with the same keys; the result
+    # is in time order
+    frames = [frame for frame in frames if frame is not None and not frame.empty]
+    if not frames:
+        return empty_frame()
+    merged = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    merged = merged.sort_values('_time', kind='stable')
+    return merged.drop_duplicates(keys, keep='last').reset_index(drop=True)
+
+
+class SensorCache:
+    # Latest reading per device and the raw readings of a recent window for
+    # one sensor type. The first read queries the whole range; after that a
+    # read older than refresh_interval asks only for readings since the
+    # previous query, less an overlap for late writes, and merges them in.
+    # Query starts are whole minutes, so workers send identical queries that
+    # the shared cache answers once. A failed refresh serves what is cached.
+    # Queries run outside the lock: one thread refreshes while the others
+    # keep reading what is cached, and only a cold cache makes them wait.
+    def __init__(self, fetch_latest: Callable[[pd.Timestamp], pd.DataFrame],
+                 fetch_series: Callable[[pd.Timestamp], pd.DataFrame], refresh_interval: Optional[float] = None,
+                 overlap: Optional[float] = None, window_hours: Optional[float] = None,
+                 clock: Optional[Callable[[], pd.Timestamp]] = None, name: str = 'sensor'):
+        self.fetch_latest = fetch_latest
+        self.fetch_series = fetch_series
+        self.refresh_interval = (refresh_interval if refresh_interval is not None
+                                 else config.get("sensor_cache.refresh_interval", 2.0))
+        self.overlap = overlap if overlap is not None else config.get("sensor_cache.overlap", 120.0)
+        self.window_hours = window_hours if window_hours is not None else config.get("sensor_cache.window_hours", 24.0)
+        self.clock = clock or (lambda: pd.Timestamp.now(tz='UTC'))
+        self.name = name
+        self._latest: Optional[pd.DataFrame] = None
+        self._latest_until: Optional[pd.Timestamp] = None
+        self._latest_checked: Optional[float] = None
+        self._series: Optional[pd.DataFrame] = None
+        self._series_start: Optional[pd.Timestamp] = None
+        self._series_until: Optional[pd.Timestamp] = None
+        self._series_checked: Optional[float] = None
+        # Longest window asked for so far; the series keeps that much
+        self._span: Optional[pd.Timedelta] = None
+        # 'latest' or 'series' -> set once the query in flight for it is merged
+        self._fetching: Dict[str, threading.Event] = {}
+        # Move whenever cached frames are dropped or replaced, so a query
+        # that was in flight then is not merged into them
+        self._generations = {'latest': 0, 'series': 0}
+        self._lock = threading.Lock()
+
+    @property
+    def window(self) -> pd.Timedelta:
+        return pd.Timedelta(hours=self.window_hours)
+
+    def _fresh(self, checked: Optional[float]) -> bool:
+        return checked is not None and time.monotonic() - checked < self.refresh_interval
+
+    def _since(self, until: pd.Timestamp, floor: pd.Timestamp) -> pd.Timestamp:
+        return max(until - pd.Timedelta(seconds=self.overlap), floor).floor('min')
+
+    def latest(self) -> pd.DataFrame:
+        # One row per device that reported within LATEST_DAYS
+        while True:
+            with self._lock:
+                refreshing = self._fetching.get('latest')
+                if self._latest is not None and (refreshing is not None or self._fresh(self._latest_checked)):
+                    CACHE_REQUESTS.labels(f'{self.name}_latest', 'hit').inc()
+                    return self._latest.copy()
+                if refreshing is None:
+                    CACHE_REQUESTS.labels(f'{self.name}_latest', 'miss').inc()
+                    self._fetching['latest'] = threading.Event()
+                    generation = self._generations['latest']
+                    now = self.clock()
+                    floor = now - pd.Timedelta(days=LATEST_DAYS)
+                    since = floor.floor('min') if self._latest_until is None else self._since(self._latest_until, floor)
+            if refreshing is not None:
+                refreshing.wait()
+                continue
+            latest = self._refresh_latest(since, floor, now, generation)
+            if latest is not None:
+                return latest.copy()
+
+    def _refresh_latest(self, since: pd.Timestamp, floor: pd.Timestamp, now: pd.Timestamp,
+                        generation: int) -> Optional[pd.DataFrame]:
+        # Runs the query outside the lock, so readers are only held up by the
+        # merge. None means the cached readings were dropped meanwhile and the
+        # caller has to read again.
+        try:
+            fetched = self.fetch_latest(since)
+        except Exception as e:
+            with self._lock:
+                if self._latest is None:
+                    raise
+                logger.error(f"Serving cached latest {self.name} readings, refresh failed: {e}")
+                return self._latest
+        else:
+            with self._lock:
+                if generation != self._generations['latest']:
+                    return None
+                latest = merge_readings([self._latest, fetched], ['device_id'])
+                latest = latest[latest['_time'] >= floor] if not latest.empty else latest
+                self._latest = latest.sort_values('device_id', kind='stable').reset_index(drop=True)
+                self._latest_until, self._latest_checked = now, time.monotonic()
+                return self._latest
+        finally:
+            with self._lock:
+                self._fetching.pop('latest').set()
+
+    def series(self, start: pd.Timestamp) -> Optional[pd.DataFrame]:
+        # Raw readings since start, ordered by device and time, or None when
+        # start is further back than the cache keeps
+        now = self.clock()
+        if start < now - self.window:
+            return None
+        while True:
+            with self._lock:
+                self._span = max(self._span or pd.Timedelta(0), now - start)
+                cutoff = now - self._span
+                covered = self._series is not None and start >= self._series_start
+                refreshing = self._fetching.get('series')
+                if covered and (refreshing is not None or self._fresh(self._series_checked)):
+                    CACHE_REQUESTS.labels(f'{self.name}_series', 'hit').inc()
+                    series = self._series
+                    break
+                if refreshing is None:
+                    CACHE_REQUESTS.labels(f'{self.name}_series', 'miss').inc()
+                    self._fetching['series'] = threading.Event()
+                    generation = self._generations['series']
+                    since = self._since(self._series_until, cutoff) if covered else cutoff.floor('min')
+            if refreshing is not None:
+                refreshing.wait()
+                continue
+            series = self._refresh_series(since, covered, cutoff, now, generation)
+            if series is not None:
+                break
+        if series.empty:
+            return empty_frame()
+        rows = series.iloc[series['_time'].searchsorted(start):]
+        return rows.sort_values('device_id', kind='stable').reset_index(drop=True)
+
+    def _refresh_series(self, since: pd.Timestamp, covered: bool, cutoff: pd.Timestamp, now: pd.Timestamp,
+                        generation: int) -> Optional[pd.DataFrame]:
+        # As _refresh_latest, for the window of raw readings
+        try:
+            fetched = self.fetch_series(since)
+        except Exception as e:
+            if not covered:
+                raise
+            logger.error(f"Serving cached {self.name} readings, refresh failed: {e}")
+            with self._lock:
+                return self._series
+        else:
+            with self._lock:
+                if not covered:
+                    series = merge_readings([fetched], ['_time', 'device_id'])
+                    if generation == self._generations['series']:
+                        self._series, self._series_start = series, since
+                        self._series_until, self._series_checked = now, time.monotonic()
+                    return series
+                if generation != self._generations['series']:
+                    return None
+                series = merge_readings([self._series, fetched], ['_time', 'device_id'])
+                if self._series_start < cutoff:
+                    series = series.iloc[series['_time'].searchsorted(cutoff):]
+                    self._series_start = cutoff
+                self._series = series
+                self._series_until, self._series_checked = now, time.monotonic()
+                return series
+        finally:
+            with self._lock:
+                self._fetching.pop('series').set()
+
+    def _bump(self, *parts: str):
+        for part in parts:
+            self._generations[part] += 1
+
+    def export(self) -> Dict[str, Any]:
+        # Frames are replaced, never changed in place, so they are handed out as they are
+        with self._lock:
+            return {'latest': self._latest, 'latest_until': self._latest_until, 'series': self._series,
+                    'series_start': self._series_start, 'series_until': self._series_until, 'span': self._span}
+
+    def restore(self, state: Dict[str, Any]) -> bool:
+        # Adopts an exported state unless this cache already has its own; the
+        # next read reconciles it with what arrived since it was exported
+        with self._lock:
+            if self._latest is not None or self._series is not None:
+                return False
+            self._latest, self._latest_until = state.get('latest'), state.get('latest_until')
+            if state.get('series') is not None and state.get('span') is not None:
+                self._series, self._series_start = state['series'], state['series_start']
+                self._series_until, self._span = state['series_until'], min(state['span'], self.window)
+            self._latest_checked = self._series_checked = None
+            self._bump('latest', 'series')
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._bump('latest', 'series')
+            self._latest = self._latest_until = self._latest_checked = None
+            self._series = self._series_start = self._series_until = self._series_checked = self._span = None
+
+    def memory_usage(self) -> Tuple[int, int]:
+        with self._lock:
+            frames = [frame for frame in (self._latest, self._series) if frame is not None]
+        return sum(len(frame) for frame in frames), sum(deep_size(frame) for frame in frames)
+
+    def evict_to(self, max_bytes: int) -> int:
+        # The latest readings are small and read every tick, so only the series goes
+        with self._lock:
+            if self._series is None:
+                return 0
+            kept = deep_size(self._latest) if self._latest is not None else 0
+            if kept + deep_size(self._series) <= max_bytes:
+                return 0
+            freed = deep_size(self._series)
+            self._bump('series')
+            self._series = self._series_start = self._series_until = self._series_checked = self._span = None
+            return freed
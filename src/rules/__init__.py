@@ -0,0 +1,15 @@
+from .compiler import compile_condition_tree, CompiledCondition, EvaluationResult
+from .backtest import backtest_rule, backtest_frame, BacktestResult
+from .threshold_sweep import sweep_sensor, sweep_frame, ThresholdSweep
+from .network import RuleNetwork, RuleTransition
+from .timer_wheel import TimerWheel
+from .normalize import normalize_condition_tree, to_binary_tree
+from .intervals import IntervalSet
+from .analysis import analyze_rules, is_satisfiable, RuleConflict, RuleSetAnalysis
+
+__all__ = ['compile_condition_tree', 'CompiledCondition', 'EvaluationResult',
+           'backtest_rule', 'backtest_frame', 'BacktestResult',
+           'sweep_sensor', 'sweep_frame', 'ThresholdSweep',
+           'RuleNetwork', 'RuleTransition', 'TimerWheel',
+           'normalize_condition_tree', 'to_binary_tree', 'IntervalSet',
+           'analyze_rules', 'is_satisfiable', 'RuleConflict', 'RuleSetAnalysis']
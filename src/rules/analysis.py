@@ -0,0 +1,174 @@
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .conditions import child_entries, has_time_filter, parse_clock, parse_weekday
+from .intervals import Interval, IntervalSet, leaf_interval_set
+from .normalize import normalize_condition_tree
+
+# Past this many conjunctions a rule is assumed satisfiable and overlapping
+MAX_TERMS = 256
+
+DAY_SECONDS = 24 * 3600
+TIME_OF_DAY = '@time_of_day'
+WEEKDAY = '@weekday'
+
+# A term is one conjunction of the tree in disjunctive normal form: every
+# dimension (a sensor, the clock, the weekday or an opaque condition) maps to
+# the set of values it may take.
+Term = Dict[Any, IntervalSet]
+
+_TRUE = IntervalSet.from_comparison('eq', 1)
+_FALSE = IntervalSet.from_comparison('eq', 0)
+
+
+@dataclass
+class RuleConflict:
+    rule_ids: Tuple[str, str]
+    capability: str
+    actions: Tuple[Any, Any]
+
+
+@dataclass
+class RuleSetAnalysis:
+    unsatisfiable: Set[str] = field(default_factory=set)
+    conflicts: List[RuleConflict] = field(default_factory=list)
+
+    def conflicts_for(self, rule_id: Any) -> List[RuleConflict]:
+        rule_key = str(rule_id)
+        return [conflict for conflict in self.conflicts if rule_key in conflict.rule_ids]
+
+
+def condition_terms(tree: Dict[str, Any]) -> Optional[List[Term]]:
+    # Satisfiable conjunctions of the tree, or None when there are too many to list
+    if not tree:
+        return [{}]
+    return _terms(normalize_condition_tree(tree))
+
+
+def is_satisfiable(tree: Dict[str, Any]) -> bool:
+    terms = condition_terms(tree)
+    return terms is None or bool(terms)
+
+
+def conditions_overlap(first: Optional[List[Term]], second: Optional[List[Term]]) -> bool:
+    if first is None or second is None:
+        return True
+    return any(_intersect(a, b) is not None for a in first for b in second)
+
+
+def analyze_rules(rules: List[Dict[str, Any]]) -> RuleSetAnalysis:
+    # Rules of one device: which can never fire, and which enabled pairs can be
+    # active together while setting a capability to different values
+    analysis = RuleSetAnalysis()
+    terms = {}
+    for rule in rules:
+        rule_key = str(rule['rule_id'])
+        try:
+            terms[rule_key] = condition_terms(rule.get('conditions') or {})
+        except ValueError:
+            continue
+        if terms[rule_key] is not None and not terms[rule_key]:
+            analysis.unsatisfiable.add(rule_key)
+
+    by_capability: Dict[str, List[Tuple[str, Any]]] = {}
+    for rule in rules:
+        rule_key = str(rule['rule_id'])
+        if not rule.get('enabled', True) or rule_key not in terms or rule_key in analysis.unsatisfiable:
+            continue
+        for capability, action in (rule.get('actions') or {}).items():
+            by_capability.setdefault(capability, []).append((rule_key, action))
+
+    for capability, entries in by_capability.items():
+        for i, (first, first_action) in enumerate(entries):
+            for second, second_action in entries[i + 1:]:
+                if _canonical(first_action) == _canonical(second_action):
+                    continue
+                if conditions_overlap(terms[first], terms[second]):
+                    analysis.conflicts.append(RuleConflict(
+                        rule_ids=(first, second), capability=capability, actions=(first_action, second_action)))
+    return analysis
+
+
+def _terms(node: Dict[str, Any]) -> Optional[List[Term]]:
+    node_type = node.get('type')
+    if node_type == 'condition':
+        term = _leaf_term(node)
+        return [term] if term is not None else []
+    if node_type == 'constant':
+        return [{}] if node.get('value') else []
+    if node_type == 'not':
+        # After normalization NOT only wraps leaves that cannot be negated exactly
+        return [{('atom', _canonical(child_entries(node)[0][1])): _FALSE}]
+    if node_type == 'or':
+        terms = []
+        for _, child in child_entries(node):
+            child_terms = _terms(child)
+            if child_terms is None:
+                return None
+            terms.extend(child_terms)
+            if len(terms) > MAX_TERMS:
+                return None
+        return terms
+    if node_type == 'and':
+        terms = [{}]
+        for _, child in child_entries(node):
+            child_terms = _terms(child)
+            if child_terms is None:
+                return None
+            terms = [merged for merged in (_intersect(a, b) for a in terms for b in child_terms) if merged is not None]
+            if len(terms) > MAX_TERMS:
+                return None
+            if not terms:
+                return []
+        return terms
+    raise ValueError(f"Unknown node type: {node_type}")
+
+
+def _leaf_term(leaf: Dict[str, Any]) -> Optional[Term]:
+    values = leaf_interval_set(leaf)
+    term: Term = {leaf.get('sensor_device'): values} if values is not None else {('atom', _canonical(leaf)): _TRUE}
+    if not has_time_filter(leaf):
+        return term
+
+    term[('atom', _canonical(leaf))] = _TRUE
+    time_filter = leaf['time_filter']
+    if time_filter.get('type') == 'time_of_day':
+        window = _time_of_day_set(time_filter)
+        if window is not None:
+            term[TIME_OF_DAY] = window
+    elif time_filter.get('type') == 'days_of_week':
+        days = IntervalSet.empty()
+        for day in (parse_weekday(d) for d in time_filter.get('days', [])):
+            if day is not None:
+                days = days.union(IntervalSet.from_comparison('eq', day))
+        term[WEEKDAY] = days
+    return term if all(not values.is_empty() for values in term.values()) else None
+
+
+def _time_of_day_set(time_filter: Dict[str, Any]) -> Optional[IntervalSet]:
+    start = parse_clock(time_filter.get('start'))
+    end = parse_clock(time_filter.get('end'))
+    if start is None or end is None:
+        return None
+    start_s = start.hour * 3600 + start.minute * 60 + start.second
+    end_s = end.hour * 3600 + end.minute * 60 + end.second
+    if start_s <= end_s:
+        return IntervalSet([Interval(start_s, True, end_s, False)])
+    # Window wraps midnight
+    return IntervalSet([Interval(start_s, True, DAY_SECONDS, False), Interval(0, True, end_s, False)])
+
+
+def _intersect(first: Term, second: Term) -> Optional[Term]:
+    merged = dict(first)
+    for dimension, values in second.items():
+        if dimension in merged:
+            values = merged[dimension].intersection(values)
+            if values.is_empty():
+                return None
+        merged[dimension] = values
+    return merged
+
+
+def _canonical(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, default=str)
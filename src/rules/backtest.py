@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime, tzinfo
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config.imports import lazy_import
+from src.models.sensor_cache import relative_range
+from .conditions import (
+    OPERATORS, child_entries, has_time_filter, iter_leaves, parse_clock, parse_weekday,
+    recent_window, referenced_sensors
+)
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+NANOS_PER_SECOND = 1_000_000_000
+
+
+@dataclass
+class BacktestResult:
+    fire_count: int
+    active_seconds: float
+    intervals: List[Tuple[pd.Timestamp, pd.Timestamp]] = field(default_factory=list)
+    samples: int = 0
+
+
+@dataclass
+class _Series:
+    times: np.ndarray
+    values: np.ndarray
+
+
+class _Timeline:
+    def __init__(self, times: np.ndarray, tz, sensors: Dict[str, Tuple[np.ndarray, np.ndarray]]):
+        self.times = times
+        self.tz = tz
+        self.sensors = sensors
+        self._local = None
+
+    @property
+    def local(self) -> pd.DatetimeIndex:
+        # Wall-clock time is only needed by time_of_day and days_of_week filters
+        if self._local is None:
+            self._local = pd.DatetimeIndex(self.times.astype('datetime64[ns]')).tz_localize('UTC').tz_convert(self.tz)
+        return self._local
+
+
+def backtest_rule(tree: Dict[str, Any], sensor_models, start_time: str = "-7d",
+                  tz: Optional[tzinfo] = None) -> BacktestResult:
+    sensors = referenced_sensors(tree)
+    frames = []
+    for model in sensor_models:
+        # Repeated readings matter: they keep 'recent' time filters from expiring
+        data = model.get_sensor_data(start_time, sensors, deduplicate=False)
+        if not data.empty:
+            frames.append(data)
+    data = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['_time', 'value', 'device_id'])
+    return backtest_frame(tree, data, start=resolve_start_time(start_time), tz=tz)
+
+
+def backtest_frame(tree: Dict[str, Any], data: pd.DataFrame, start: Optional[pd.Timestamp] = None,
+                   end: Optional[pd.Timestamp] = None, tz: Optional[tzinfo] = None) -> BacktestResult:
+    series = _split_series(data, referenced_sensors(tree))
+    if not any(len(s.times) for s in series.values()):
+        return BacktestResult(fire_count=0, active_seconds=0.0)
+
+    end_ns = _to_ns(end) if end is not None else int(max(s.times[-1] for s in series.values() if len(s.times)))
+    start_ns = _to_ns(start) if start is not None else int(min(s.times[0] for s in series.values() if len(s.times)))
+    timeline = _build_timeline(tree, series, start_ns, end_ns, tz)
+
+    fired = _evaluate(tree, timeline)
+    return _collect_intervals(fired, timeline.times, end_ns)
+
+
+def _split_series(data: pd.DataFrame, sensors: List[str]) -> Dict[str, _Series]:
+    series = {}
+    if data.empty:
+        return {sensor: _Series(np.empty(0, dtype='int64'), np.empty(0)) for sensor in sensors}
+
+    times = pd.to_datetime(data['_time'], utc=True).to_numpy(dtype='datetime64[ns]').astype('int64')
+    values = pd.to_numeric(data['value'], errors='coerce').to_numpy(dtype='float64')
+    device_ids = data['device_id'].to_numpy()
+    for sensor in sensors:
+        mask = device_ids == sensor
+        order = np.argsort(times[mask], kind='stable')
+        series[sensor] = _Series(times[mask][order], values[mask][order])
+    return series
+
+
+def _build_timeline(tree, series: Dict[str, _Series], start_ns: int, end_ns: int, tz) -> _Timeline:
+    # Evaluate at every reading and at every instant a time filter can flip,
+    # so the result is exact between consecutive timeline points.
+    points = [s.times for s in series.values()]
+    points.append(np.array([start_ns], dtype='int64'))
+    points.append(_filter_boundaries(tree, start_ns, end_ns, tz))
+    points.extend(_recent_expiries(tree, series))
+    times = np.sort(np.concatenate(points), kind='stable')
+    times = times[(times >= start_ns) & (times <= end_ns)]
+    if len(times):
+        times = times[np.concatenate(([True], times[1:] != times[:-1]))]
+
+    sensors = {}
+    for sensor, s in series.items():
+        # As-of join: the latest reading at or before each timeline point
+        index = np.searchsorted(s.times, times, side='right') - 1
+        valid = index >= 0
+        clipped = np.clip(index, 0, None)
+        if len(s.times):
+            values = np.where(valid, s.values[clipped], np.nan)
+            reading_times = np.where(valid, s.times[clipped], np.iinfo('int64').min)
+        else:
+            values = np.full(len(times), np.nan)
+            reading_times = np.full(len(times), np.iinfo('int64').min)
+        sensors[sensor] = (values, reading_times)
+    return _Timeline(times, tz or _local_tz(), sensors)
+
+
+def _filter_boundaries(tree, start_ns: int, end_ns: int, tz) -> np.ndarray:
+    clocks = set()
+    for _, leaf in iter_leaves(tree):
+        if not has_time_filter(leaf):
+            continue
+        time_filter = leaf['time_filter']
+        if time_filter.get('type') == 'time_of_day':
+            for key in ['start', 'end']:
+                clock = parse_clock(time_filter.get(key))
+                if clock is not None:
+                    clocks.add(pd.Timedelta(hours=clock.hour, minutes=clock.minute, seconds=clock.second))
+        elif time_filter.get('type') == 'days_of_week':
+            clocks.add(pd.Timedelta(0))
+    if not clocks:
+        return np.empty(0, dtype='int64')
+
+    zone = tz or _local_tz()
+    start = pd.Timestamp(start_ns, tz='UTC').tz_convert(zone).normalize()
+    end = pd.Timestamp(end_ns, tz='UTC').tz_convert(zone)
+    days = pd.date_range(start, end, freq='D')
+    return np.concatenate([
+        (days + clock).tz_convert('UTC').to_numpy(dtype='datetime64[ns]').astype('int64') for clock in clocks
+    ])
+
+
+def _recent_expiries(tree, series: Dict[str, _Series]) -> List[np.ndarray]:
+    # A reading stops counting as recent exactly one window after it arrives
+    expiries = []
+    for _, leaf in iter_leaves(tree):
+        if has_time_filter(leaf) and leaf['time_filter'].get('type') == 'recent':
+            window = recent_window(leaf['time_filter'])
+            sensor = series.get(leaf.get('sensor_device'))
+            if window is not None and sensor is not None:
+                expiries.append(sensor.times + int(window.total_seconds() * NANOS_PER_SECOND) + 1)
+    return expiries
+
+
+def _evaluate(node: Dict[str, Any], timeline: _Timeline) -> np.ndarray:
+    node_type = (node or {}).get('type')
+    if node_type == 'condition':
+        return _evaluate_leaf(node, timeline)
+    if node_type in ['and', 'or']:
+        results = [_evaluate(child, timeline) for _, child in child_entries(node)]
+        reducer = np.logical_and if node_type == 'and' else np.logical_or
+        return reducer.reduce(results)
+    if node_type == 'not':
+        return ~_evaluate(child_entries(node)[0][1], timeline)
+    if node_type == 'constant':
+        return np.full(len(timeline.times), bool(node.get('value')))
+    raise ValueError(f"Unknown node type: {node_type}")
+
+
+def _evaluate_leaf(leaf: Dict[str, Any], timeline: _Timeline) -> np.ndarray:
+    compare = OPERATORS.get(leaf.get('operator'))
+    if compare is None:
+        raise ValueError(f"Unknown operator: {leaf.get('operator')}")
+    values, reading_times = timeline.sensors[leaf.get('sensor_device')]
+    with np.errstate(invalid='ignore'):
+        mask = compare(values, float(leaf.get('value'))) & ~np.isnan(values)
+
+    if not has_time_filter(leaf):
+        return mask
+
+    time_filter = leaf['time_filter']
+    filter_type = time_filter.get('type')
+    if filter_type == 'time_of_day':
+        start = parse_clock(time_filter.get('start'))
+        end = parse_clock(time_filter.get('end'))
+        if start is not None and end is not None:
+            seconds = (timeline.local.hour * 3600 + timeline.local.minute * 60 + timeline.local.second).to_numpy()
+            start_s = start.hour * 3600 + start.minute * 60 + start.second
+            end_s = end.hour * 3600 + end.minute * 60 + end.second
+            if start_s <= end_s:
+                mask &= (seconds >= start_s) & (seconds < end_s)
+            else:
+                mask &= (seconds >= start_s) | (seconds < end_s)
+    elif filter_type == 'days_of_week':
+        days = [day for day in (parse_weekday(d) for d in time_filter.get('days', [])) if day is not None]
+        mask &= np.isin(timeline.local.weekday.to_numpy(), days)
+    elif filter_type == 'recent':
+        window = recent_window(time_filter)
+        if window is not None:
+            mask &= (timeline.times - reading_times) <= int(window.total_seconds() * NANOS_PER_SECOND)
+    return mask
+
+
+def _collect_intervals(fired: np.ndarray, times: np.ndarray, end_ns: int) -> BacktestResult:
+    if not len(fired):
+        return BacktestResult(fire_count=0, active_seconds=0.0)
+
+    # Each timeline point holds until the next one
+    durations = np.diff(np.append(times, end_ns))
+    active_seconds = float(durations[fired].sum()) / NANOS_PER_SECOND
+
+    padded = np.concatenate(([False], fired, [False]))
+    edges = np.diff(padded.astype('int8'))
+    starts = np.flatnonzero(edges == 1)
+    stops = np.flatnonzero(edges == -1)
+    stop_times = np.append(times, end_ns)[stops]
+
+    intervals = [
+        (pd.Timestamp(int(times[start]), tz='UTC'), pd.Timestamp(int(stop), tz='UTC'))
+        for start, stop in zip(starts, stop_times)
+    ]
+    return BacktestResult(fire_count=len(starts), active_seconds=active_seconds,
+                          intervals=intervals, samples=len(times))
+
+
+def resolve_start_time(start_time: str) -> Optional[pd.Timestamp]:
+    # Flux relative ranges such as "-7d" or "-12h"
+    span = relative_range(start_time)
+    if span is not None:
+        return pd.Timestamp.now(tz='UTC') - span
+    if isinstance(start_time, str) and start_time.startswith('-'):
+        return None
+    return pd.Timestamp(start_time)
+
+
+def _to_ns(timestamp) -> int:
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize('UTC')
+    return int(timestamp.value)
+
+
+def _local_tz():
+    return datetime.now().astimezone().tzinfo
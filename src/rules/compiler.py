@@ -0,0 +1,147 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from .conditions import (
+    OPERATORS, OPERATOR_SELECTIVITY, child_entries, has_time_filter, reading_parts,
+    referenced_sensors, time_filter_matches, time_filter_selectivity
+)
+
+# A compiled node takes (latest_values, now) and returns (result, deciding leaf ids)
+Evaluator = Callable[[Mapping[str, Any], datetime], Tuple[bool, Tuple[str, ...]]]
+
+
+@dataclass
+class EvaluationResult:
+    result: bool
+    deciding_leaves: List[str]
+
+
+@dataclass
+class _Compiled:
+    evaluate: Evaluator
+    cost: float
+    probability: float
+
+
+class CompiledCondition:
+    def __init__(self, tree: Dict[str, Any]):
+        self.tree = tree
+        self.sensors = referenced_sensors(tree)
+        self._evaluate = _compile_node(tree, 'root').evaluate
+
+    def evaluate(self, latest_values: Mapping[str, Any], now: Optional[datetime] = None) -> EvaluationResult:
+        result, leaves = self._evaluate(latest_values, now or datetime.now().astimezone())
+        return EvaluationResult(result=result, deciding_leaves=list(leaves))
+
+    def __call__(self, latest_values: Mapping[str, Any], now: Optional[datetime] = None) -> bool:
+        return self._evaluate(latest_values, now or datetime.now().astimezone())[0]
+
+
+def compile_condition_tree(tree: Dict[str, Any]) -> CompiledCondition:
+    return CompiledCondition(tree)
+
+
+def _compile_node(node: Dict[str, Any], node_id: str) -> _Compiled:
+    node_type = (node or {}).get('type')
+    if node_type == 'condition':
+        return _compile_leaf(node, node_id)
+    if node_type in ['and', 'or']:
+        return _compile_group(node_type, _flatten(node, node_id))
+    if node_type == 'not':
+        child_id, child = child_entries(node, node_id)[0]
+        return _compile_not(_compile_node(child, child_id))
+    if node_type == 'constant':
+        value = bool(node.get('value'))
+        return _Compiled(lambda values, now: (value, ()), 0.0, 1.0 if value else 0.0)
+    raise ValueError(f"Unknown node type: {node_type}")
+
+
+def _flatten(node: Dict[str, Any], node_id: str) -> List[Tuple[str, Dict[str, Any]]]:
+    # Nested groups of the same type collapse into one n-ary group
+    flat = []
+    for child_id, child in child_entries(node, node_id):
+        if child.get('type') == node.get('type'):
+            flat.extend(_flatten(child, child_id))
+        else:
+            flat.append((child_id, child))
+    return flat
+
+
+def _compile_leaf(leaf: Dict[str, Any], node_id: str) -> _Compiled:
+    sensor = leaf.get('sensor_device')
+    compare = OPERATORS.get(leaf.get('operator'))
+    if compare is None:
+        raise ValueError(f"Unknown operator: {leaf.get('operator')}")
+    threshold = leaf.get('value')
+    time_filter = leaf.get('time_filter') if has_time_filter(leaf) else None
+    decided = (node_id,)
+    missing = object()
+
+    if time_filter is None:
+        def evaluate(values, now):
+            reading = values.get(sensor, missing)
+            if reading is missing:
+                return False, decided
+            value, _ = reading_parts(reading)
+            try:
+                return bool(value is not None and compare(value, threshold)), decided
+            except TypeError:
+                return False, decided
+        cost = 1.0
+    else:
+        def evaluate(values, now):
+            reading = values.get(sensor, missing)
+            if reading is missing:
+                return False, decided
+            value, reading_time = reading_parts(reading)
+            try:
+                matched = value is not None and compare(value, threshold)
+            except TypeError:
+                return False, decided
+            return bool(matched and time_filter_matches(time_filter, now, reading_time)), decided
+        cost = 2.0
+
+    probability = OPERATOR_SELECTIVITY.get(leaf.get('operator'), 0.5) * time_filter_selectivity(time_filter)
+    return _Compiled(evaluate, cost, probability)
+
+
+def _compile_group(group_type: str, children: List[Tuple[str, Dict[str, Any]]]) -> _Compiled:
+    compiled = [_compile_node(child, child_id) for child_id, child in children]
+
+    # Check first the children that are cheap and most likely to settle the
+    # result: false for AND, true for OR.
+    if group_type == 'and':
+        compiled.sort(key=lambda c: c.cost / max(1.0 - c.probability, 1e-6))
+    else:
+        compiled.sort(key=lambda c: c.cost / max(c.probability, 1e-6))
+    evaluators = tuple(c.evaluate for c in compiled)
+    short_circuit_on = group_type == 'or'
+
+    def evaluate(values, now):
+        deciding = ()
+        for child in evaluators:
+            result, leaves = child(values, now)
+            if result is short_circuit_on:
+                return result, leaves
+            deciding += leaves
+        return not short_circuit_on, deciding
+
+    probability = 1.0
+    if group_type == 'and':
+        for c in compiled:
+            probability *= c.probability
+    else:
+        for c in compiled:
+            probability *= 1.0 - c.probability
+        probability = 1.0 - probability
+    return _Compiled(evaluate, sum(c.cost for c in compiled), probability)
+
+
+def _compile_not(child: _Compiled) -> _Compiled:
+    child_evaluate = child.evaluate
+
+    def evaluate(values, now):
+        result, leaves = child_evaluate(values, now)
+        return not result, leaves
+    return _Compiled(evaluate, child.cost, 1.0 - child.probability)
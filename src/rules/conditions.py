@@ -0,0 +1,182 @@
+import operator
+from datetime import datetime, time, timedelta, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+OPERATORS: Dict[str, Callable[[Any, Any], Any]] = {
+    'gt': operator.gt,
+    'gte': operator.ge,
+    'lt': operator.lt,
+    'lte': operator.le,
+    'eq': operator.eq,
+    'ne': operator.ne,
+    'neq': operator.ne,
+}
+
+# Rough share of readings for which a comparison holds, used to order checks
+OPERATOR_SELECTIVITY = {
+    'eq': 0.1,
+    'ne': 0.9,
+    'neq': 0.9,
+    'gt': 0.5,
+    'gte': 0.5,
+    'lt': 0.5,
+    'lte': 0.5,
+}
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+DEFAULT_CONDITION = {'type': 'condition', 'sensor_device': '', 'operator': 'gte', 'value': 0}
+
+
+def child_entries(node: Dict[str, Any], node_id: str = 'root') -> List[Tuple[str, Dict[str, Any]]]:
+    # Children with the node ids the tree editor uses (root_left, root_child, ...).
+    # N-ary nodes produced by the normalizer use positional ids (root_0, root_1).
+    node_type = node.get('type')
+    if node_type in ['and', 'or']:
+        if 'children' in node:
+            return [(f"{node_id}_{i}", child) for i, child in enumerate(node['children'])]
+        return [(f"{node_id}_left", node.get('left') or {}), (f"{node_id}_right", node.get('right') or {})]
+    if node_type == 'not':
+        return [(f"{node_id}_child", node.get('child') or {})]
+    return []
+
+
+def iter_leaves(tree: Dict[str, Any], node_id: str = 'root') -> Iterator[Tuple[str, Dict[str, Any]]]:
+    if not tree:
+        return
+    if tree.get('type') == 'condition':
+        yield node_id, tree
+        return
+    for child_id, child in child_entries(tree, node_id):
+        yield from iter_leaves(child, child_id)
+
+
+def referenced_sensors(tree: Dict[str, Any]) -> List[str]:
+    return list(dict.fromkeys(leaf.get('sensor_device') for _, leaf in iter_leaves(tree) if leaf.get('sensor_device')))
+
+
+def has_time_filter(leaf: Dict[str, Any]) -> bool:
+    time_filter = leaf.get('time_filter')
+    return bool(time_filter) and time_filter.get('type', 'none') != 'none'
+
+
+def parse_clock(value: Any) -> Optional[time]:
+    if isinstance(value, time):
+        return value
+    try:
+        parts = [int(part) for part in str(value).split(':')]
+        return time(*parts[:3])
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_weekday(day: Any) -> Optional[int]:
+    if isinstance(day, int):
+        return day % 7
+    name = str(day).strip().lower()
+    for index, weekday in enumerate(WEEKDAYS):
+        if name and weekday.startswith(name[:3]):
+            return index
+    return None
+
+
+def recent_window(time_filter: Dict[str, Any]) -> Optional[timedelta]:
+    if 'minutes' in time_filter:
+        return timedelta(minutes=float(time_filter['minutes']))
+    if 'hours' in time_filter:
+        return timedelta(hours=float(time_filter['hours']))
+    return None
+
+
+def in_time_of_day(time_filter: Dict[str, Any], clock: time) -> bool:
+    start = parse_clock(time_filter.get('start'))
+    end = parse_clock(time_filter.get('end'))
+    if start is None or end is None:
+        return True
+    if start <= end:
+        return start <= clock < end
+    # Window wraps midnight, e.g. 22:00-06:00
+    return clock >= start or clock < end
+
+
+def time_filter_matches(time_filter: Optional[Dict[str, Any]], now: datetime,
+                        reading_time: Optional[datetime] = None) -> bool:
+    if not time_filter:
+        return True
+    filter_type = time_filter.get('type', 'none')
+    if filter_type == 'time_of_day':
+        return in_time_of_day(time_filter, now.time())
+    if filter_type == 'days_of_week':
+        days = {parse_weekday(day) for day in time_filter.get('days', [])}
+        return now.weekday() in days
+    if filter_type == 'recent':
+        window = recent_window(time_filter)
+        if window is None:
+            return True
+        if reading_time is None:
+            return False
+        return age(now, reading_time) <= window
+    return True
+
+
+def next_time_filter_boundary(time_filter: Optional[Dict[str, Any]], after: datetime,
+                              reading_time: Optional[datetime] = None) -> Optional[datetime]:
+    # The first instant after `after` at which time_filter_matches can change
+    # for the same reading
+    if not time_filter:
+        return None
+    filter_type = time_filter.get('type', 'none')
+    if filter_type == 'time_of_day':
+        clocks = [clock for clock in (parse_clock(time_filter.get(key)) for key in ['start', 'end']) if clock]
+        candidates = [
+            datetime.combine(after.date() + timedelta(days=offset), clock, tzinfo=after.tzinfo)
+            for offset in [0, 1] for clock in clocks
+        ]
+        upcoming = [candidate for candidate in candidates if candidate > after]
+        return min(upcoming) if upcoming else None
+    if filter_type == 'days_of_week':
+        return datetime.combine(after.date() + timedelta(days=1), time(0), tzinfo=after.tzinfo)
+    if filter_type == 'recent':
+        window = recent_window(time_filter)
+        if window is None or reading_time is None:
+            return None
+        remaining = window - age(after, reading_time)
+        # A reading still counts at exactly `window` old, so it expires just after
+        return after + remaining + timedelta(microseconds=1) if remaining >= timedelta(0) else None
+    return None
+
+
+def age(now: datetime, reading_time: datetime) -> timedelta:
+    if (now.tzinfo is None) != (reading_time.tzinfo is None):
+        if reading_time.tzinfo is None:
+            reading_time = reading_time.replace(tzinfo=now.tzinfo)
+        else:
+            reading_time = reading_time.astimezone(now.tzinfo or timezone.utc).replace(tzinfo=None)
+    return now - reading_time
+
+
+def time_filter_selectivity(time_filter: Optional[Dict[str, Any]]) -> float:
+    if not time_filter:
+        return 1.0
+    filter_type = time_filter.get('type', 'none')
+    if filter_type == 'days_of_week':
+        return len(time_filter.get('days', [])) / 7.0
+    if filter_type == 'time_of_day':
+        start = parse_clock(time_filter.get('start'))
+        end = parse_clock(time_filter.get('end'))
+        if start is None or end is None:
+            return 1.0
+        minutes = (end.hour * 60 + end.minute) - (start.hour * 60 + start.minute)
+        return (minutes % 1440) / 1440.0
+    if filter_type == 'recent':
+        return 0.5
+    return 1.0
+
+
+def reading_parts(reading: Any) -> Tuple[Any, Optional[datetime]]:
+    # Latest values may be bare numbers, (value, time) pairs or row-like dicts
+    if isinstance(reading, dict):
+        return reading.get('value'), reading.get('time', reading.get('_time'))
+    if isinstance(reading, tuple):
+        return reading[0], reading[1] if len(reading) > 1 else None
+    return reading, None
@@ -0,0 +1,171 @@
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+INFINITY = math.inf
+
+# Comparisons that can be described as a set of numbers
+INTERVAL_OPERATORS = ['gt', 'gte', 'lt', 'lte', 'eq', 'ne', 'neq']
+
+
+@dataclass(frozen=True)
+class Interval:
+    low: float
+    low_closed: bool
+    high: float
+    high_closed: bool
+
+    def is_empty(self) -> bool:
+        return self.low > self.high or (self.low == self.high and not (self.low_closed and self.high_closed))
+
+    def is_point(self) -> bool:
+        return self.low == self.high and self.low_closed and self.high_closed
+
+
+class IntervalSet:
+    # Disjoint, sorted, non-adjacent intervals over the real line
+    __slots__ = ('intervals',)
+
+    def __init__(self, intervals: Iterable[Interval] = ()):
+        self.intervals: Tuple[Interval, ...] = _merge(intervals)
+
+    @classmethod
+    def full(cls) -> 'IntervalSet':
+        return cls([Interval(-INFINITY, False, INFINITY, False)])
+
+    @classmethod
+    def empty(cls) -> 'IntervalSet':
+        return cls()
+
+    @classmethod
+    def from_comparison(cls, operator: str, value: float) -> 'IntervalSet':
+        if operator == 'gt':
+            return cls([Interval(value, False, INFINITY, False)])
+        if operator == 'gte':
+            return cls([Interval(value, True, INFINITY, False)])
+        if operator == 'lt':
+            return cls([Interval(-INFINITY, False, value, False)])
+        if operator == 'lte':
+            return cls([Interval(-INFINITY, False, value, True)])
+        if operator == 'eq':
+            return cls([Interval(value, True, value, True)])
+        if operator in ['ne', 'neq']:
+            return cls([Interval(-INFINITY, False, value, False), Interval(value, False, INFINITY, False)])
+        raise ValueError(f"Unknown operator: {operator}")
+
+    def union(self, other: 'IntervalSet') -> 'IntervalSet':
+        return IntervalSet(self.intervals + other.intervals)
+
+    def intersection(self, other: 'IntervalSet') -> 'IntervalSet':
+        result = []
+        i = j = 0
+        while i < len(self.intervals) and j < len(other.intervals):
+            a, b = self.intervals[i], other.intervals[j]
+            low, low_open = max((a.low, not a.low_closed), (b.low, not b.low_closed))
+            high, high_closed = min((a.high, a.high_closed), (b.high, b.high_closed))
+            result.append(Interval(low, not low_open, high, high_closed))
+            # Advance whichever interval ends first
+            if (a.high, a.high_closed) < (b.high, b.high_closed):
+                i += 1
+            else:
+                j += 1
+        return IntervalSet(result)
+
+    def complement(self) -> 'IntervalSet':
+        result = []
+        low, low_closed = -INFINITY, False
+        for interval in self.intervals:
+            result.append(Interval(low, low_closed, interval.low, not interval.low_closed))
+            low, low_closed = interval.high, not interval.high_closed
+        result.append(Interval(low, low_closed, INFINITY, False))
+        return IntervalSet(result)
+
+    def is_empty(self) -> bool:
+        return not self.intervals
+
+    def is_full(self) -> bool:
+        return self.intervals == IntervalSet.full().intervals
+
+    def overlaps(self, other: 'IntervalSet') -> bool:
+        return not self.intersection(other).is_empty()
+
+    def contains(self, value: float) -> bool:
+        return any(
+            (interval.low < value or (interval.low_closed and interval.low == value)) and
+            (value < interval.high or (interval.high_closed and interval.high == value))
+            for interval in self.intervals
+        )
+
+    def to_conditions(self, sensor_device: str) -> Optional[Dict[str, Any]]:
+        # The smallest condition tree describing the set; None for empty or full sets
+        if self.is_empty() or self.is_full():
+            return None
+        gaps = self.complement().intervals
+        if len(gaps) == 1 and gaps[0].is_point():
+            return _leaf(sensor_device, 'ne', gaps[0].low)
+        nodes = [_interval_conditions(sensor_device, interval) for interval in self.intervals]
+        if len(nodes) == 1:
+            return nodes[0]
+        return {'type': 'or', 'children': nodes}
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, IntervalSet) and self.intervals == other.intervals
+
+    def __hash__(self) -> int:
+        return hash(self.intervals)
+
+    def __repr__(self) -> str:
+        if not self.intervals:
+            return "IntervalSet(∅)"
+        return "IntervalSet(" + " ∪ ".join(
+            f"{'[' if i.low_closed else '('}{i.low}, {i.high}{']' if i.high_closed else ')'}" for i in self.intervals
+        ) + ")"
+
+
+def comparison_value(leaf: Dict[str, Any]) -> Optional[float]:
+    # Numeric threshold of a leaf, or None when it cannot be treated as an interval
+    value = leaf.get('value')
+    if leaf.get('operator') not in INTERVAL_OPERATORS or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value if not math.isnan(value) else None
+    return None
+
+
+def leaf_interval_set(leaf: Dict[str, Any]) -> Optional[IntervalSet]:
+    value = comparison_value(leaf)
+    if value is None:
+        return None
+    return IntervalSet.from_comparison(leaf['operator'], value)
+
+
+def _merge(intervals: Iterable[Interval]) -> Tuple[Interval, ...]:
+    ordered = sorted((i for i in intervals if not i.is_empty()), key=lambda i: (i.low, not i.low_closed))
+    merged: List[Interval] = []
+    for interval in ordered:
+        if merged:
+            last = merged[-1]
+            touches = last.high > interval.low or (last.high == interval.low and (last.high_closed or interval.low_closed))
+            if touches:
+                if (interval.high, interval.high_closed) > (last.high, last.high_closed):
+                    merged[-1] = Interval(last.low, last.low_closed, interval.high, interval.high_closed)
+                continue
+        merged.append(interval)
+    return tuple(merged)
+
+
+def _interval_conditions(sensor_device: str, interval: Interval) -> Dict[str, Any]:
+    if interval.is_point():
+        return _leaf(sensor_device, 'eq', interval.low)
+    leaves = []
+    if interval.low != -INFINITY:
+        leaves.append(_leaf(sensor_device, 'gte' if interval.low_closed else 'gt', interval.low))
+    if interval.high != INFINITY:
+        leaves.append(_leaf(sensor_device, 'lte' if interval.high_closed else 'lt', interval.high))
+    if len(leaves) == 1:
+        return leaves[0]
+    return {'type': 'and', 'children': leaves}
+
+
+def _leaf(sensor_device: str, operator: str, value: float) -> Dict[str, Any]:
+    return {'type': 'condition', 'sensor_device': sensor_device, 'operator': operator, 'value': value}
@@ -0,0 +1,336 @@
+import itertools
+import json
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .conditions import (
+    OPERATORS, child_entries, has_time_filter, iter_leaves, next_time_filter_boundary, reading_parts,
+    referenced_sensors, time_filter_matches
+)
+from .analysis import is_satisfiable
+from .normalize import normalize_condition_tree
+from .timer_wheel import TimerWheel
+
+
+@dataclass
+class RuleTransition:
+    rule_id: str
+    active: bool
+    rule: Dict[str, Any]
+
+
+class _Node:
+    __slots__ = ('id', 'key', 'parents', 'rules', 'refs', 'value')
+
+    def __init__(self, node_id: int, key: tuple):
+        self.id = node_id
+        self.key = key
+        # A parent appears once per edge, so a child listed twice counts twice
+        self.parents: List['_Group'] = []
+        self.rules: Set[str] = set()
+        self.refs = 0
+        self.value = False
+
+
+class _Leaf(_Node):
+    __slots__ = ('sensor', 'compare', 'threshold', 'time_filter')
+
+    def __init__(self, node_id: int, key: tuple, leaf: Dict[str, Any]):
+        super().__init__(node_id, key)
+        self.sensor = leaf.get('sensor_device')
+        self.compare = OPERATORS[leaf.get('operator')]
+        self.threshold = leaf.get('value')
+        self.time_filter = leaf.get('time_filter') if has_time_filter(leaf) else None
+
+    def evaluate(self, reading: Any, now: datetime) -> bool:
+        if reading is None:
+            return False
+        value, reading_time = reading_parts(reading)
+        try:
+            matched = value is not None and self.compare(value, self.threshold)
+        except TypeError:
+            return False
+        if not matched:
+            return False
+        return self.time_filter is None or time_filter_matches(self.time_filter, now, reading_time)
+
+
+class _Group(_Node):
+    __slots__ = ('node_type', 'children', 'true_count')
+
+    def __init__(self, node_id: int, key: tuple, node_type: str, children: List[_Node]):
+        super().__init__(node_id, key)
+        self.node_type = node_type
+        self.children = children
+        self.true_count = sum(1 for child in children if child.value)
+        self.value = self.compute()
+
+    def compute(self) -> bool:
+        if self.node_type == 'and':
+            return self.true_count == len(self.children)
+        if self.node_type == 'or':
+            return self.true_count > 0
+        return self.true_count == 0
+
+
+class _Constant(_Node):
+    __slots__ = ()
+
+
+class RuleNetwork:
+    # Discrimination network over all known rules. Identical leaves and
+    # subtrees are shared between rules, every node caches its truth value and
+    # groups keep a count of true children, so a reading only touches the
+    # leaves of its sensor and the ancestors whose value actually flips.
+    # Time-filtered leaves also change at clock boundaries; each one keeps its
+    # next boundary in a timer wheel and tick() re-evaluates only those due.
+    def __init__(self, timer_resolution: float = 1.0):
+        self.timer_resolution = timer_resolution
+        self._timers: Optional[TimerWheel] = None
+        self._ids = itertools.count(1)
+        self._nodes: Dict[tuple, _Node] = {}
+        self._by_sensor: Dict[str, List[_Leaf]] = {}
+        self._sensor_rules: Dict[str, Set[str]] = {}
+        self._rules: Dict[str, Tuple[Dict[str, Any], _Node]] = {}
+        self._owners: Dict[str, Set[str]] = {}
+        self._latest: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+
+    def add_rule(self, rule: Dict[str, Any], now: Optional[datetime] = None):
+        rule_key = str(rule['rule_id'])
+        with self._lock:
+            current = self._rules.get(rule_key)
+            if current and current[0].get('conditions') == rule.get('conditions'):
+                self._rules[rule_key] = (rule, current[1])
+                return
+
+            conditions = normalize_condition_tree(rule.get('conditions') or {})
+            if conditions and not is_satisfiable(conditions):
+                # Rules that can never fire stay indexed but are not evaluated
+                conditions = {'type': 'constant', 'value': False}
+            root = self._build(conditions, now or datetime.now().astimezone())
+            if current:
+                self.remove_rule(rule_key)
+            root.rules.add(rule_key)
+            self._rules[rule_key] = (rule, root)
+            for sensor in referenced_sensors(rule.get('conditions') or {}):
+                self._sensor_rules.setdefault(sensor, set()).add(rule_key)
+
+    def remove_rule(self, rule_id: Any):
+        rule_key = str(rule_id)
+        with self._lock:
+            current = self._rules.pop(rule_key, None)
+            if current is None:
+                return
+            rule, root = current
+            root.rules.discard(rule_key)
+            self._release(root)
+            for sensor in referenced_sensors(rule.get('conditions') or {}):
+                rule_keys = self._sensor_rules.get(sensor)
+                if rule_keys is not None:
+                    rule_keys.discard(rule_key)
+                    if not rule_keys:
+                        del self._sensor_rules[sensor]
+
+    def sync_rules(self, owner: str, rules: Iterable[Dict[str, Any]]):
+        # Replace every rule previously loaded for an owner (an actionable device)
+        with self._lock:
+            rules = list(rules)
+            incoming = {str(rule.get('rule_id')) for rule in rules}
+            for rule_key in self._owners.get(owner, set()) - incoming:
+                self.remove_rule(rule_key)
+            now = datetime.now().astimezone()
+            loaded = set()
+            for rule in rules:
+                try:
+                    self.add_rule(rule, now)
+                except (KeyError, TypeError, ValueError):
+                    if rule.get('rule_id') is not None:
+                        self.remove_rule(rule['rule_id'])
+                    continue
+                loaded.add(str(rule['rule_id']))
+            self._owners[owner] = loaded
+
+    def on_reading(self, sensor_device: str, value: Any, reading_time: Optional[datetime] = None,
+                   now: Optional[datetime] = None) -> List[RuleTransition]:
+        reading = (value, reading_time)
+        with self._lock:
+            if self._latest.get(sensor_device) == reading:
+                return []
+            self._latest[sensor_device] = reading
+
+            now = now or datetime.now().astimezone()
+            before: Dict[str, bool] = {}
+            for leaf in self._by_sensor.get(sensor_device, []):
+                result = leaf.evaluate(reading, now)
+                if result != leaf.value:
+                    leaf.value = result
+                    self._propagate(leaf, before)
+                if leaf.time_filter is not None:
+                    self._schedule(leaf, now)
+            return self._transitions(before)
+
+    def tick(self, now: Optional[datetime] = None) -> List[RuleTransition]:
+        now = now or datetime.now().astimezone()
+        with self._lock:
+            if self._timers is None:
+                return []
+            before: Dict[str, bool] = {}
+            for key in self._timers.advance(now):
+                leaf = self._nodes.get(key)
+                if not isinstance(leaf, _Leaf):
+                    continue
+                result = leaf.evaluate(self._latest.get(leaf.sensor), now)
+                if result != leaf.value:
+                    leaf.value = result
+                    self._propagate(leaf, before)
+                self._schedule(leaf, now)
+            return self._transitions(before)
+
+    def next_wakeup(self, rule_id: Any) -> Optional[datetime]:
+        # Earliest scheduled boundary among the rule's time-filtered leaves
+        with self._lock:
+            current = self._rules.get(str(rule_id))
+            if current is None or self._timers is None:
+                return None
+            deadlines = [self._timers.deadline(_leaf_key(leaf)) for _, leaf in iter_leaves(current[0].get('conditions'))
+                         if has_time_filter(leaf)]
+            deadlines = [deadline for deadline in deadlines if deadline is not None]
+            return min(deadlines) if deadlines else None
+
+    def rules_for_sensor(self, sensor_device: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [self._rules[rule_key][0] for rule_key in sorted(self._sensor_rules.get(sensor_device, ()))]
+
+    def rule_state(self, rule_id: Any) -> Optional[bool]:
+        with self._lock:
+            current = self._rules.get(str(rule_id))
+            return current[1].value if current else None
+
+    def active_rules(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [rule for rule, root in self._rules.values() if root.value]
+
+    @property
+    def node_count(self) -> int:
+        return len(self._nodes)
+
+    def __len__(self) -> int:
+        return len(self._rules)
+
+    def _build(self, tree: Dict[str, Any], now: datetime) -> _Node:
+        node_type = tree.get('type')
+        if node_type == 'condition':
+            if tree.get('operator') not in OPERATORS:
+                raise ValueError(f"Unknown operator: {tree.get('operator')}")
+            key = _leaf_key(tree)
+            node = self._nodes.get(key)
+            if node is None:
+                node = _Leaf(next(self._ids), key, tree)
+                node.value = node.evaluate(self._latest.get(node.sensor), now)
+                self._nodes[key] = node
+                self._by_sensor.setdefault(node.sensor, []).append(node)
+                if node.time_filter is not None:
+                    self._schedule(node, now)
+        elif node_type in ['and', 'or', 'not']:
+            children = []
+            try:
+                for child in _group_children(tree):
+                    children.append(self._build(child, now))
+            except Exception:
+                # Drop the references taken by siblings built before the failure
+                for child in children:
+                    self._release(child)
+                raise
+            # AND/OR are commutative, so the same children in any order share a node
+            child_ids = tuple(child.id for child in children)
+            key = (node_type, tuple(sorted(child_ids)) if node_type != 'not' else child_ids)
+            node = self._nodes.get(key)
+            if node is None:
+                node = _Group(next(self._ids), key, node_type, children)
+                for child in children:
+                    child.parents.append(node)
+                self._nodes[key] = node
+            else:
+                for child in children:
+                    self._release(child)
+        elif node_type == 'constant':
+            key = ('constant', bool(tree.get('value')))
+            node = self._nodes.get(key)
+            if node is None:
+                node = _Constant(next(self._ids), key)
+                node.value = bool(tree.get('value'))
+                self._nodes[key] = node
+        else:
+            raise ValueError(f"Unknown node type: {node_type}")
+        node.refs += 1
+        return node
+
+    def _release(self, node: _Node):
+        node.refs -= 1
+        if node.refs > 0:
+            return
+        del self._nodes[node.key]
+        if isinstance(node, _Leaf):
+            leaves = self._by_sensor[node.sensor]
+            leaves.remove(node)
+            if not leaves:
+                del self._by_sensor[node.sensor]
+            if self._timers is not None:
+                self._timers.cancel(node.key)
+        elif isinstance(node, _Group):
+            for child in node.children:
+                child.parents.remove(node)
+                self._release(child)
+
+    def _schedule(self, leaf: _Leaf, now: datetime):
+        if self._timers is None:
+            self._timers = TimerWheel(self.timer_resolution, start=now)
+        reading = self._latest.get(leaf.sensor)
+        reading_time = reading_parts(reading)[1] if reading is not None else None
+        boundary = next_time_filter_boundary(leaf.time_filter, now, reading_time)
+        if boundary is None:
+            self._timers.cancel(leaf.key)
+        else:
+            self._timers.schedule(leaf.key, boundary)
+
+    def _propagate(self, node: _Node, before: Dict[str, bool]):
+        for rule_key in node.rules:
+            before.setdefault(rule_key, not node.value)
+        delta = 1 if node.value else -1
+        for parent in node.parents:
+            parent.true_count += delta
+            result = parent.compute()
+            if result != parent.value:
+                parent.value = result
+                self._propagate(parent, before)
+
+    def _transitions(self, before: Dict[str, bool]) -> List[RuleTransition]:
+        transitions = []
+        for rule_key, was_active in before.items():
+            rule, root = self._rules[rule_key]
+            if root.value != was_active:
+                transitions.append(RuleTransition(rule_id=rule_key, active=root.value, rule=rule))
+        return transitions
+
+
+def _group_children(node: Dict[str, Any]) -> List[Dict[str, Any]]:
+    if node.get('type') == 'not':
+        return [child for _, child in child_entries(node)]
+    children = []
+    for _, child in child_entries(node):
+        if child.get('type') == node.get('type'):
+            children.extend(_group_children(child))
+        else:
+            children.append(child)
+    return children
+
+
+def _leaf_key(leaf: Dict[str, Any]) -> tuple:
+    threshold = leaf.get('value')
+    if isinstance(threshold, (int, float)) and not isinstance(threshold, bool):
+        threshold = float(threshold)
+    time_filter = json.dumps(leaf['time_filter'], sort_keys=True) if has_time_filter(leaf) else None
+    return ('condition', leaf.get('sensor_device'), leaf.get('operator'), threshold, time_filter)
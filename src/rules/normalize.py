@@ -0,0 +1,179 @@
+import json
+from typing import Any, Dict, List, Optional
+
+from .conditions import child_entries, has_time_filter
+from .intervals import leaf_interval_set
+
+NEGATED_OPERATORS = {
+    'gt': 'lte',
+    'gte': 'lt',
+    'lt': 'gte',
+    'lte': 'gt',
+    'eq': 'ne',
+    'ne': 'eq',
+    'neq': 'eq',
+}
+
+
+# Normalization treats every comparison as two-valued: NOT (temp > 30) becomes
+# temp <= 30 and temp > 30 OR temp <= 30 folds to true, which differs from the
+# literal tree only while a sensor has no reading at all. Time-filtered leaves
+# are kept as they are, since their negation is not a single comparison.
+def normalize_condition_tree(tree: Dict[str, Any]) -> Dict[str, Any]:
+    # N-ary AND/OR ('children'), NOT only directly above time-filtered or
+    # non-numeric leaves, no duplicate or subsumed comparisons, and constants
+    # folded away unless the whole tree is one.
+    if not tree:
+        return tree
+    return _normalize(tree, negate=False)
+
+
+def to_binary_tree(tree: Dict[str, Any]) -> Dict[str, Any]:
+    # Re-nest n-ary groups into balanced left/right pairs, the shape the tree
+    # editor builds
+    node_type = (tree or {}).get('type')
+    if node_type in ['and', 'or']:
+        children = [to_binary_tree(child) for _, child in child_entries(tree)]
+        return _balanced(node_type, children)
+    if node_type == 'not':
+        return {'type': 'not', 'child': to_binary_tree(child_entries(tree)[0][1])}
+    return tree
+
+
+def _normalize(node: Dict[str, Any], negate: bool) -> Dict[str, Any]:
+    node_type = node.get('type')
+    if node_type == 'condition':
+        return _normalize_leaf(node, negate)
+    if node_type == 'constant':
+        return _constant(bool(node.get('value')) != negate)
+    if node_type == 'not':
+        return _normalize(child_entries(node)[0][1], not negate)
+    if node_type in ['and', 'or']:
+        # De Morgan: the negation of an AND is an OR of negations
+        group_type = node_type if not negate else ('or' if node_type == 'and' else 'and')
+        children = [_normalize(child, negate) for _, child in child_entries(node)]
+        return _simplify_group(group_type, children)
+    raise ValueError(f"Unknown node type: {node_type}")
+
+
+def _normalize_leaf(leaf: Dict[str, Any], negate: bool) -> Dict[str, Any]:
+    leaf = dict(leaf)
+    if not has_time_filter(leaf):
+        leaf.pop('time_filter', None)
+    if not negate:
+        return leaf
+    if has_time_filter(leaf) or leaf.get('operator') not in NEGATED_OPERATORS:
+        return {'type': 'not', 'child': leaf}
+    leaf['operator'] = NEGATED_OPERATORS[leaf['operator']]
+    return leaf
+
+
+def _simplify_group(group_type: str, children: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # An OR is decided by any true child and an AND by any false one
+    absorbing = group_type == 'or'
+
+    flat = []
+    for child in children:
+        if child.get('type') == group_type:
+            flat.extend(child['children'])
+        else:
+            flat.append(child)
+
+    kept = []
+    seen = set()
+    for child in flat:
+        if child.get('type') == 'constant':
+            if child['value'] == absorbing:
+                return _constant(absorbing)
+            continue
+        key = _canonical(child)
+        if key not in seen:
+            seen.add(key)
+            kept.append(child)
+
+    # x AND NOT x, x OR NOT x
+    for child in kept:
+        if child.get('type') == 'not' and _canonical(child['child']) in seen:
+            return _constant(absorbing)
+
+    merged = _merge_comparisons(group_type, kept)
+    if merged is None:
+        return _constant(absorbing)
+
+    if not merged:
+        return _constant(not absorbing)
+    if len(merged) == 1:
+        return merged[0]
+    return {'type': group_type, 'children': merged}
+
+
+def _merge_comparisons(group_type: str, children: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    # Combine the plain numeric comparisons on each sensor into one interval set.
+    # Returns None when they alone decide the group (empty AND, full OR).
+    by_sensor: Dict[str, List[int]] = {}
+    sets = {}
+    for index, child in enumerate(children):
+        if child.get('type') != 'condition' or has_time_filter(child):
+            continue
+        interval_set = leaf_interval_set(child)
+        if interval_set is None:
+            continue
+        sets[index] = interval_set
+        by_sensor.setdefault(child.get('sensor_device'), []).append(index)
+
+    replaced = {}
+    dropped = set()
+    for sensor, indexes in by_sensor.items():
+        combined = sets[indexes[0]]
+        for index in indexes[1:]:
+            combined = combined.intersection(sets[index]) if group_type == 'and' else combined.union(sets[index])
+        if (group_type == 'and' and combined.is_empty()) or (group_type == 'or' and combined.is_full()):
+            return None
+        if len(indexes) == 1:
+            continue
+
+        rebuilt = combined.to_conditions(sensor)
+        rebuilt_children = rebuilt['children'] if rebuilt.get('type') == group_type else [rebuilt]
+        if _leaf_count(rebuilt) < len(indexes):
+            replaced[indexes[0]] = [_with_fields(children[indexes[0]], node) for node in rebuilt_children]
+            dropped.update(indexes[1:])
+
+    result = []
+    for index, child in enumerate(children):
+        if index in replaced:
+            result.extend(replaced[index])
+        elif index not in dropped:
+            result.append(child)
+    return result
+
+
+def _with_fields(template: Dict[str, Any], node: Dict[str, Any]) -> Dict[str, Any]:
+    # Keep any extra fields the editor stored on the original leaf
+    if node.get('type') != 'condition':
+        return {**node, 'children': [_with_fields(template, child) for child in node['children']]}
+    return {**template, **node}
+
+
+def _leaf_count(node: Dict[str, Any]) -> int:
+    if node.get('type') == 'condition':
+        return 1
+    return sum(_leaf_count(child) for _, child in child_entries(node))
+
+
+def _balanced(group_type: str, children: List[Dict[str, Any]]) -> Dict[str, Any]:
+    if len(children) == 1:
+        return children[0]
+    middle = len(children) // 2
+    return {
+        'type': group_type,
+        'left': _balanced(group_type, children[:middle]),
+        'right': _balanced(group_type, children[middle:])
+    }
+
+
+def _canonical(node: Dict[str, Any]) -> str:
+    return json.dumps(node, sort_keys=True, default=str)
+
+
+def _constant(value: bool) -> Dict[str, Any]:
+    return {'type': 'constant', 'value': value}
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+from src.config.imports import lazy_import
+from .backtest import NANOS_PER_SECOND, resolve_start_time
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+SWEEP_POINTS = 50
+
+
+@dataclass
+class ThresholdSweep:
+    sensor_device: str
+    operator: str
+    thresholds: List[float] = field(default_factory=list)
+    fire_counts: List[int] = field(default_factory=list)
+    active_seconds: List[float] = field(default_factory=list)
+    total_seconds: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'sensor_device': self.sensor_device,
+            'operator': self.operator,
+            'thresholds': self.thresholds,
+            'fire_counts': self.fire_counts,
+            'active_seconds': self.active_seconds,
+            'total_seconds': self.total_seconds
+        }
+
+
+def sweep_sensor(sensor_models, sensor_device: str, operator: str, start_time: str = "-7d",
+                 thresholds: Optional[Sequence[float]] = None, points: int = SWEEP_POINTS) -> ThresholdSweep:
+    frames = []
+    for model in sensor_models:
+        data = model.get_sensor_data(start_time, [sensor_device])
+        if not data.empty:
+            frames.append(data)
+    data = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['_time', 'value', 'device_id'])
+    return sweep_frame(data, sensor_device, operator, thresholds, points=points,
+                       end=pd.Timestamp.now(tz='UTC'), start=resolve_start_time(start_time))
+
+
+def sweep_frame(data: pd.DataFrame, sensor_device: str, operator: str,
+                thresholds: Optional[Sequence[float]] = None, points: int = SWEEP_POINTS,
+                start: Optional[pd.Timestamp] = None, end: Optional[pd.Timestamp] = None) -> ThresholdSweep:
+    data = data[data['device_id'] == sensor_device]
+    times = pd.to_datetime(data['_time'], utc=True).to_numpy(dtype='datetime64[ns]').astype('int64')
+    values = pd.to_numeric(data['value'], errors='coerce').to_numpy(dtype='float64')
+    order = np.argsort(times, kind='stable')
+    times, values = times[order], values[order]
+    keep = ~np.isnan(values)
+    times, values = times[keep], values[keep]
+
+    if start is not None:
+        in_range = times >= pd.Timestamp(start).value
+        times, values = times[in_range], values[in_range]
+    if not len(values):
+        return ThresholdSweep(sensor_device=sensor_device, operator=operator)
+
+    if thresholds is None:
+        thresholds = np.linspace(values.min(), values.max(), points)
+    thresholds = np.asarray(thresholds, dtype='float64')
+    end_ns = pd.Timestamp(end).value if end is not None else int(times[-1])
+    durations = np.diff(np.append(times, max(end_ns, int(times[-1]))))
+
+    return ThresholdSweep(
+        sensor_device=sensor_device,
+        operator=operator,
+        thresholds=thresholds.tolist(),
+        fire_counts=_fire_counts(values, operator, thresholds).tolist(),
+        active_seconds=(_active_nanos(values, durations, operator, thresholds) / NANOS_PER_SECOND).tolist(),
+        total_seconds=float(durations.sum()) / NANOS_PER_SECOND
+    )
+
+
+def _active_nanos(values: np.ndarray, durations: np.ndarray, operator: str, thresholds: np.ndarray) -> np.ndarray:
+    # Each reading holds until the next one. With readings sorted by value and
+    # their durations accumulated, time above/below any threshold is one lookup.
+    order = np.argsort(values, kind='stable')
+    sorted_values = values[order]
+    cumulative = np.concatenate(([0], np.cumsum(durations[order])))
+    total = cumulative[-1]
+    below = cumulative[np.searchsorted(sorted_values, thresholds, side='left')]
+    at_or_below = cumulative[np.searchsorted(sorted_values, thresholds, side='right')]
+
+    if operator == 'gte':
+        return total - below
+    if operator == 'gt':
+        return total - at_or_below
+    if operator == 'lte':
+        return at_or_below
+    if operator == 'lt':
+        return below
+    if operator == 'eq':
+        return at_or_below - below
+    if operator in ['ne', 'neq']:
+        return total - (at_or_below - below)
+    raise ValueError(f"Unknown operator: {operator}")
+
+
+def _count(sorted_values: np.ndarray, thresholds: np.ndarray, side: str) -> np.ndarray:
+    return np.searchsorted(sorted_values, thresholds, side=side)
+
+
+def _fire_counts(values: np.ndarray, operator: str, thresholds: np.ndarray) -> np.ndarray:
+    # A fire is a transition from false to true between consecutive readings
+    # (a, b). For gte that is a < T <= b, so among rising pairs the count at T
+    # is #{a < T} - #{b < T}; the other operators follow the same pattern.
+    previous, current = values[:-1], values[1:]
+    first = values[0]
+
+    if operator in ['gte', 'gt']:
+        rising = previous < current
+        a, b = np.sort(previous[rising]), np.sort(current[rising])
+        side = 'left' if operator == 'gte' else 'right'
+        counts = _count(a, thresholds, side) - _count(b, thresholds, side)
+        initial = first >= thresholds if operator == 'gte' else first > thresholds
+    elif operator in ['lte', 'lt']:
+        falling = previous > current
+        a, b = np.sort(previous[falling]), np.sort(current[falling])
+        side = 'right' if operator == 'lte' else 'left'
+        counts = _count(b, thresholds, side) - _count(a, thresholds, side)
+        initial = first <= thresholds if operator == 'lte' else first < thresholds
+    elif operator in ['eq', 'ne', 'neq']:
+        unchanged = np.sort(current[previous == current])
+        repeats = _count(unchanged, thresholds, 'right') - _count(unchanged, thresholds, 'left')
+        entering = current if operator == 'eq' else previous
+        entering = np.sort(entering)
+        counts = _count(entering, thresholds, 'right') - _count(entering, thresholds, 'left') - repeats
+        initial = first == thresholds if operator == 'eq' else first != thresholds
+    else:
+        raise ValueError(f"Unknown operator: {operator}")
+
+    return counts + initial.astype('int64')
@@ -0,0 +1,107 @@
+import math
+from datetime import datetime
+from typing import Dict, Hashable, List, Optional, Tuple
+
+SLOT_BITS = 6
+SLOTS = 1 << SLOT_BITS
+LEVELS = 4
+
+
+class TimerWheel:
+    # Hierarchical timer wheel: level 0 has one slot per tick, each level above
+    # covers SLOTS times the span of the one below. Scheduling and cancelling
+    # are O(1); a tick expires one level-0 slot and, when a lower level wraps,
+    # redistributes one slot of the level above. Deadlines past the top level
+    # wait in an overflow list that is re-checked once per full rotation.
+    def __init__(self, resolution: float = 1.0, start: Optional[datetime] = None):
+        self.resolution = resolution
+        self._tick = self._to_tick(start or datetime.now().astimezone(), math.floor)
+        self._wheels: List[List[List[Tuple[int, Hashable]]]] = [[[] for _ in range(SLOTS)] for _ in range(LEVELS)]
+        self._counts = [0] * LEVELS
+        self._overflow: List[Tuple[int, Hashable]] = []
+        self._deadlines: Dict[Hashable, int] = {}
+        self._due: List[Hashable] = []
+
+    def schedule(self, key: Hashable, when: datetime):
+        # Rounded up so a timer never fires before its deadline
+        deadline = self._to_tick(when, math.ceil)
+        self._deadlines[key] = deadline
+        self._insert(deadline, key)
+
+    def cancel(self, key: Hashable):
+        # Entries already in a slot are dropped lazily when their slot comes up
+        self._deadlines.pop(key, None)
+
+    def deadline(self, key: Hashable) -> Optional[datetime]:
+        deadline = self._deadlines.get(key)
+        if deadline is None:
+            return None
+        return datetime.fromtimestamp(deadline * self.resolution).astimezone()
+
+    def advance(self, now: Optional[datetime] = None) -> List[Hashable]:
+        target = self._to_tick(now or datetime.now().astimezone(), math.floor)
+        while self._tick < target:
+            if not self._counts[0]:
+                # Nothing can expire before level 0 wraps, so skip ahead to it
+                self._tick = min(target, (self._tick // SLOTS + 1) * SLOTS) - 1
+            self._step()
+
+        due, self._due = self._due, []
+        return due
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def _to_tick(self, when: datetime, rounding) -> int:
+        return int(rounding(when.timestamp() / self.resolution))
+
+    def _insert(self, deadline: int, key: Hashable):
+        if deadline <= self._tick:
+            self._expire(deadline, key)
+            return
+        for level in range(LEVELS):
+            # The lowest level whose higher digits already match the current tick
+            shift = SLOT_BITS * (level + 1)
+            if deadline >> shift == self._tick >> shift:
+                slot = (deadline >> (SLOT_BITS * level)) & (SLOTS - 1)
+                self._wheels[level][slot].append((deadline, key))
+                self._counts[level] += 1
+                return
+        self._overflow.append((deadline, key))
+
+    def _expire(self, deadline: int, key: Hashable):
+        if self._deadlines.get(key) == deadline:
+            del self._deadlines[key]
+            self._due.append(key)
+
+    def _step(self):
+        self._tick += 1
+        tick = self._tick
+
+        if tick % (1 << (SLOT_BITS * LEVELS)) == 0:
+            overflow, self._overflow = self._overflow, []
+            for deadline, key in overflow:
+                if self._deadlines.get(key) == deadline:
+                    self._insert(deadline, key)
+
+        for level in range(LEVELS - 1, 0, -1):
+            if tick % (1 << (SLOT_BITS * level)) == 0:
+                self._cascade(level, (tick >> (SLOT_BITS * level)) & (SLOTS - 1))
+
+        slot = tick & (SLOTS - 1)
+        entries = self._wheels[0][slot]
+        if entries:
+            self._wheels[0][slot] = []
+            self._counts[0] -= len(entries)
+            for deadline, key in entries:
+                self._expire(deadline, key)
+
+    def _cascade(self, level: int, slot: int):
+        entries = self._wheels[level][slot]
+        if not entries:
+            return
+        self._wheels[level][slot] = []
+        self._counts[level] -= len(entries)
+        for deadline, key in entries:
+            if self._deadlines.get(key) == deadline:
+                self._insert(deadline, key)
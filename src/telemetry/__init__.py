@@ -0,0 +1,5 @@
+from .metrics import Counter, Gauge, Histogram, Registry, REGISTRY
+from .flux import query_shape, query_shape_text
+
+__all__ = ['Counter', 'Gauge', 'Histogram', 'Registry', 'REGISTRY',
+           'query_shape', 'query_shape_text']
@@ -0,0 +1,25 @@
+import hashlib
+import re
+from functools import lru_cache
+
+# Column references r["..."] are kept; any other string literal is replaced
+_STRING = re.compile(r'(r\["[^"]*"\])|"(?:[^"\\]|\\.)*"')
+_NUMBER = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?(?:ns|us|ms|mo|[smhdwy])?\b')
+_WHITESPACE = re.compile(r'\s+')
+# r["device_id"] == ? or r["device_id"] == ? ... -> one comparison
+_REPEATED_OR = re.compile(r'(r\["([^"]*)"\] == \?)(?: or r\["\2"\] == \?)+')
+
+
+def query_shape_text(query: str) -> str:
+    # The query with literals replaced by ?, so queries that differ only in
+    # devices, time ranges or the number of OR-ed filters look the same
+    shape = _STRING.sub(lambda match: match.group(1) or '?', query)
+    shape = _NUMBER.sub('?', shape)
+    shape = _WHITESPACE.sub(' ', shape).strip()
+    return _REPEATED_OR.sub(r'\1', shape)
+
+
+@lru_cache(maxsize=1024)
+def query_shape(query: str) -> str:
+    # Short stable id of the shape, used as a metric label
+    return hashlib.blake2b(query_shape_text(query).encode(), digest_size=6).hexdigest()
@@ -0,0 +1,45 @@
+from .metrics import Counter, Gauge, Histogram, SIZE_BUCKETS
+
+# Every metric the dashboard exports at /metrics
+
+HTTP_REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', 'Flask request latency by route', ['route', 'method', 'status'])
+HTTP_REQUESTS_IN_FLIGHT = Gauge('http_requests_in_flight', 'Flask requests being handled')
+
+DASH_CALLBACK_SECONDS = Histogram(
+    'dash_callback_duration_seconds', 'Server-side Dash callback latency', ['callback', 'status'])
+DASH_CALLBACKS_IN_FLIGHT = Gauge('dash_callbacks_in_flight', 'Dash callbacks being handled')
+
+SENSOR_QUERY_SECONDS = Histogram(
+    'sensor_query_duration_seconds', 'InfluxDB query and decode latency by sensor model method and Flux query shape',
+    ['sensor_type', 'method', 'shape'])
+SENSOR_QUERY_ROWS = Histogram(
+    'sensor_query_rows', 'Rows returned per InfluxDB query', ['sensor_type', 'method', 'shape'], buckets=SIZE_BUCKETS)
+SENSOR_QUERY_BYTES = Counter(
+    'sensor_query_decoded_bytes_total', 'Size of the data frames decoded from InfluxDB results',
+    ['sensor_type', 'method', 'shape'])
+SENSOR_QUERY_ERRORS = Counter(
+    'sensor_query_errors_total', 'InfluxDB queries that raised', ['sensor_type', 'method'])
+SENSOR_QUERIES_IN_FLIGHT = Gauge('sensor_queries_in_flight', 'InfluxDB queries being run')
+
+RULE_ENGINE_REQUEST_SECONDS = Histogram(
+    'rule_engine_request_duration_seconds', 'Rule engine request latency by endpoint', ['endpoint', 'outcome'])
+RULE_ENGINE_REQUESTS_IN_FLIGHT = Gauge('rule_engine_requests_in_flight', 'Rule engine requests being sent')
+
+CACHE_REQUESTS = Counter('cache_requests_total', 'Cache lookups by cache and result', ['cache', 'result'])
+CACHE_ENTRIES = Gauge('cache_entries', 'Entries held by each cache', ['cache'])
+CACHE_BYTES = Gauge('cache_bytes', 'Approximate bytes reachable from each cache', ['cache'])
+CACHE_EVICTED_BYTES = Counter(
+    'cache_budget_evicted_bytes_total', 'Bytes evicted from each cache to meet the memory budget', ['cache'])
+
+PROCESS_RESIDENT_MEMORY_BYTES = Gauge('process_resident_memory_bytes', 'Resident set size of the dashboard process')
+PYTHON_TRACED_MEMORY_BYTES = Gauge(
+    'python_traced_memory_bytes', 'Python heap traced by tracemalloc, 0 while tracing is off')
+PYTHON_ALLOCATED_BLOCKS = Gauge('python_allocated_blocks', 'Memory blocks currently allocated by the Python allocator')
+
+STARTUP_PHASE_SECONDS = Gauge(
+    'dashboard_startup_phase_seconds', 'Seconds from process start until each startup phase was reached', ['phase'])
+WARMUP_TASK_SECONDS = Gauge('dashboard_warmup_task_seconds', 'Time spent on each background warm-up task', ['task'])
+CACHE_SNAPSHOT_SECONDS = Gauge(
+    'dashboard_cache_snapshot_seconds', 'Time the last cache snapshot save or load took', ['operation'])
+CACHE_SNAPSHOT_BYTES = Gauge('dashboard_cache_snapshot_bytes', 'Size of the cache snapshot last written or read')
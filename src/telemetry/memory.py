@@ -0,0 +1,307 @@
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import types
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config.settings import config
+from src.config.logger import get_logger
+from .instruments import (
+    PROCESS_RESIDENT_MEMORY_BYTES, PYTHON_TRACED_MEMORY_BYTES, PYTHON_ALLOCATED_BLOCKS,
+    CACHE_BYTES, CACHE_ENTRIES, CACHE_EVICTED_BYTES
+)
+
+logger = get_logger(__name__)
+
+# Never followed when sizing: shared by everything, not owned by a cache
+_SHARED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+                 types.MethodType, types.CodeType, types.FrameType)
+_ATOMIC_TYPES = (str, bytes, bytearray, int, float, complex, bool, type(None), range)
+
+_TRACEMALLOC_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+def deep_size(obj: Any, seen: Optional[set] = None) -> int:
+    # Bytes reachable from obj. Objects already in seen are not counted again,
+    # so passing one set over a whole cache counts shared subtrees once.
+    seen = set() if seen is None else seen
+    # Frames and arrays can only exist once their library is imported, so
+    # sizing never imports pandas or numpy itself
+    pd, np = sys.modules.get('pandas'), sys.modules.get('numpy')
+    # A library still being imported by another thread may lack these names
+    if not all(hasattr(pd, name) for name in ('DataFrame', 'Series', 'Index')):
+        pd = None
+    if not hasattr(np, 'ndarray'):
+        np = None
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _SHARED_TYPES):
+            continue
+        seen.add(id(obj))
+        # Column buffers only: sizing every string of an object column costs a
+        # pass over all rows each sample, and the cached frames' label strings
+        # are mostly the same few objects repeated
+        if pd is not None and isinstance(obj, (pd.DataFrame, pd.Series)):
+            size += int(obj.memory_usage(index=True, deep=False).sum())
+            continue
+        if pd is not None and isinstance(obj, pd.Index):
+            size += obj.memory_usage(deep=False)
+            continue
+        size += sys.getsizeof(obj)
+        if isinstance(obj, _ATOMIC_TYPES):
+            continue
+        if np is not None and isinstance(obj, np.ndarray):
+            if obj.base is not None:
+                stack.append(obj.base)
+            elif obj.dtype == object:
+                stack.extend(obj.ravel())
+            continue
+        if isinstance(obj, dict):
+            for key, value in list(obj.items()):
+                stack.append(key)
+                stack.append(value)
+        elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+            stack.extend(list(obj))
+        if hasattr(obj, '__dict__') and not isinstance(obj, dict):
+            stack.append(vars(obj))
+        for cls in type(obj).__mro__:
+            for slot in cls.__dict__.get('__slots__', ()):
+                if hasattr(obj, slot) and slot not in ('__dict__', '__weakref__'):
+                    stack.append(getattr(obj, slot))
+    return size
+
+
+def mapping_usage(mapping, lock=None) -> Tuple[int, int]:
+    # (entries, bytes) of a dict-backed cache
+    entries = _items(mapping, lock)
+    seen = set()
+    return len(entries), sum(deep_size(key, seen) + deep_size(value, seen) for key, value in entries)
+
+
+def evict_mapping(mapping, lock, max_bytes: int) -> int:
+    # Drops entries in iteration order, which is least recently used first for
+    # the OrderedDict caches that move hits to the end, until the mapping is
+    # within max_bytes. Returns the bytes freed.
+    entries = _items(mapping, lock)
+    seen = set()
+    sizes = [(key, value, deep_size(key, seen) + deep_size(value, seen)) for key, value in entries]
+    total = sum(size for _, _, size in sizes)
+    freed = 0
+    with lock or _NO_LOCK:
+        for key, value, size in sizes:
+            if total - freed <= max_bytes:
+                break
+            # Entries replaced while they were being measured are left alone
+            if mapping.get(key) is value:
+                del mapping[key]
+                freed += size
+    return freed
+
+
+def _items(mapping, lock) -> List[Tuple[Any, Any]]:
+    with lock or _NO_LOCK:
+        return list(mapping.items())
+
+
+class _NoLock:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_LOCK = _NoLock()
+
+
+class CacheAccount:
+    # Registers a module-level dict cache, guarded by lock if it has one
+    def __init__(self, mapping, lock=None):
+        self.mapping = mapping
+        self.lock = lock
+
+    def memory_usage(self) -> Tuple[int, int]:
+        return mapping_usage(self.mapping, self.lock)
+
+    def evict_to(self, max_bytes: int) -> int:
+        return evict_mapping(self.mapping, self.lock, max_bytes)
+
+
+def process_rss_bytes() -> int:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        # Peak rather than current RSS, in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except (ImportError, OSError):
+        return 0
+
+
+class MemoryMonitor:
+    # Every cache the dashboard keeps registers here and reports its entries
+    # and bytes. A background thread samples process RSS, the Python heap and
+    # the cache sizes into a bounded history, and when budget_bytes is set it
+    # evicts from the largest caches until their total fits. The budget covers
+    # cache contents only; freed memory is not necessarily returned to the OS.
+    def __init__(self, budget_bytes: Optional[int] = None, interval: Optional[float] = None,
+                 history_size: Optional[int] = None, tracemalloc_frames: Optional[int] = None,
+                 actions_enabled: Optional[bool] = None):
+        self.budget_bytes = budget_bytes if budget_bytes is not None else config.get("memory.budget_bytes", 0)
+        self.interval = interval if interval is not None else config.get("memory.sample_interval", 30.0)
+        self.tracemalloc_frames = (tracemalloc_frames if tracemalloc_frames is not None
+                                   else config.get("memory.tracemalloc_frames", 10))
+        # Tracing and evicting on request are off unless configured
+        self.actions_enabled = (actions_enabled if actions_enabled is not None
+                                else config.get("memory.actions_enabled", False))
+        self.history: deque = deque(maxlen=history_size or config.get("memory.history_size", 240))
+        # Per-cache usage as of the last sample
+        self.cache_usage: List[Dict[str, Any]] = []
+        self._caches: Dict[str, Any] = {}
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, name: str, cache):
+        # cache provides memory_usage() -> (entries, bytes) and, if it can
+        # drop entries, evict_to(max_bytes) -> bytes freed
+        with self._lock:
+            self._caches[name] = cache
+
+    def unregister(self, name: str):
+        with self._lock:
+            self._caches.pop(name, None)
+
+    def caches(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            caches = list(self._caches.items())
+        usage = []
+        for name, cache in caches:
+            try:
+                entries, size = cache.memory_usage()
+            except Exception as e:
+                logger.error(f"Could not measure cache {name}: {e}")
+                continue
+            CACHE_ENTRIES.labels(name).set(entries)
+            CACHE_BYTES.labels(name).set(size)
+            usage.append({'name': name, 'entries': entries, 'bytes': size, 'evictable': hasattr(cache, 'evict_to')})
+        return sorted(usage, key=lambda cache: cache['bytes'], reverse=True)
+
+    def enforce(self, budget_bytes: Optional[int] = None) -> Dict[str, int]:
+        # Bytes freed per cache, largest caches first. An explicit budget of 0
+        # empties every evictable cache; a configured budget of 0 disables this.
+        budget = self.budget_bytes if budget_bytes is None else budget_bytes
+        if budget_bytes is None and not budget:
+            return {}
+        usage = self.caches()
+        excess = sum(cache['bytes'] for cache in usage) - budget
+        if excess <= 0:
+            return {}
+        freed = {}
+        for cache in usage:
+            if excess <= 0:
+                break
+            if not cache['evictable']:
+                continue
+            with self._lock:
+                account = self._caches.get(cache['name'])
+            if account is None:
+                continue
+            released = account.evict_to(max(0, cache['bytes'] - excess))
+            if released:
+                freed[cache['name']] = released
+                CACHE_EVICTED_BYTES.labels(cache['name']).inc(released)
+                excess -= released
+        logger.info(f"Cache budget {budget} bytes: freed {sum(freed.values())} bytes from {', '.join(freed) or 'no caches'}")
+        return freed
+
+    def sample(self) -> Dict[str, Any]:
+        if self.budget_bytes:
+            self.enforce()
+        caches = self.caches()
+        traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        point = {
+            'time': time.time(),
+            'rss': process_rss_bytes(),
+            'traced': traced,
+            'allocated_blocks': sys.getallocatedblocks(),
+            'cache_bytes': sum(cache['bytes'] for cache in caches),
+            'caches': {cache['name']: cache['bytes'] for cache in caches},
+        }
+        PROCESS_RESIDENT_MEMORY_BYTES.set(point['rss'])
+        PYTHON_TRACED_MEMORY_BYTES.set(traced or 0)
+        PYTHON_ALLOCATED_BLOCKS.set(point['allocated_blocks'])
+        self.cache_usage = caches
+        self.history.append(point)
+        return point
+
+    def start(self):
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='memory-monitor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"Memory sample failed: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+    def snapshot_diff(self, key_type: str = 'lineno', limit: int = 25) -> Dict[str, Any]:
+        # Compares a new tracemalloc snapshot with the one taken on the
+        # previous call. The first call starts tracing and only records the
+        # baseline, since allocations made before it cannot be attributed.
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.tracemalloc_frames)
+            self._snapshot = None
+        snapshot = tracemalloc.take_snapshot().filter_traces(_TRACEMALLOC_FILTERS)
+        with self._lock:
+            previous, self._snapshot = self._snapshot, snapshot
+        if previous is None:
+            return {'baseline': True, 'traced': tracemalloc.get_traced_memory()[0], 'stats': []}
+        stats = snapshot.compare_to(previous, key_type)[:limit]
+        return {
+            'baseline': False,
+            'traced': tracemalloc.get_traced_memory()[0],
+            'stats': [{
+                'location': [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+                'size': stat.size,
+                'size_diff': stat.size_diff,
+                'count': stat.count,
+                'count_diff': stat.count_diff,
+            } for stat in stats],
+        }
+
+    def stop_tracing(self):
+        with self._lock:
+            self._snapshot = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+memory = MemoryMonitor()
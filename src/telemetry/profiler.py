@@ -0,0 +1,214 @@
+import contextvars
+import functools
+import itertools
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.config.settings import config
+from src.config.logger import get_logger
+
+logger = get_logger(__name__)
+
+RECENT_INVOCATIONS = 500
+
+Frame = Tuple[str, str, int]
+
+# Set while a sampler is watching the current call, so nested calls only time themselves
+_sampling = contextvars.ContextVar('profiler_sampling', default=False)
+# Set for one request when it asked to be profiled (X-Profile header or ?profile=1)
+_forced = contextvars.ContextVar('profiler_forced', default=False)
+
+
+@dataclass
+class Invocation:
+    name: str
+    started_at: float
+    duration: float
+    files: List[str] = field(default_factory=list)
+    samples: int = 0
+
+
+class StackSampler:
+    # Statistical profiler for one thread: a background thread reads the
+    # target's current frame from sys._current_frames() every interval and
+    # counts the stacks it sees. The profiled code runs untouched.
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, frame.f_lineno))
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+
+
+class CallProfiler:
+    # Times every wrapped call and runs a StackSampler over one call in
+    # sample_every, or over every call of a request that asked for it.
+    # Sampled calls leave a collapsed-stack file (flamegraph.pl, speedscope)
+    # and a speedscope JSON file in the output directory.
+    def __init__(self, enabled: Optional[bool] = None, sample_every: Optional[int] = None,
+                 interval: Optional[float] = None, directory: Optional[str] = None,
+                 max_files: Optional[int] = None, recent: int = RECENT_INVOCATIONS):
+        self.enabled = enabled if enabled is not None else config.get("profiling.enabled", False)
+        self.sample_every = max(1, sample_every or config.get("profiling.sample_every", 100))
+        self.interval = interval or config.get("profiling.interval", 0.005)
+        self.directory = directory or config.get("profiling.directory", "/tmp/dashboard-profiles")
+        self.max_files = max_files or config.get("profiling.max_files", 200)
+        self._calls = itertools.count(1)
+        self._recent: deque = deque(maxlen=recent)
+        self._files: deque = deque()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def profile(self, name: str):
+        if not self.enabled:
+            yield
+            return
+
+        sampler = None
+        token = None
+        if not _sampling.get() and (_forced.get() or next(self._calls) % self.sample_every == 0):
+            sampler = StackSampler(threading.get_ident(), self.interval)
+            token = _sampling.set(True)
+            sampler.start()
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            invocation = Invocation(name=name, started_at=started_at, duration=duration)
+            if sampler is not None:
+                _sampling.reset(token)
+                stacks = sampler.stop()
+                invocation.samples = sum(stacks.values())
+                if stacks:
+                    invocation.files = self._write(invocation, stacks)
+            with self._lock:
+                self._recent.append(invocation)
+
+    def wrap(self, name: str) -> Callable:
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.profile(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def force(self, force: bool = True) -> contextvars.Token:
+        return _forced.set(force)
+
+    def unforce(self, token: contextvars.Token):
+        _forced.reset(token)
+
+    def slowest(self, limit: int = 50) -> List[Invocation]:
+        with self._lock:
+            recent = list(self._recent)
+        return sorted(recent, key=lambda invocation: invocation.duration, reverse=True)[:limit]
+
+    def profile_path(self, filename: str) -> Optional[str]:
+        # Only files this profiler wrote can be served back
+        with self._lock:
+            if filename not in self._files:
+                return None
+        return os.path.join(self.directory, filename)
+
+    def _write(self, invocation: Invocation, stacks: Counter) -> List[str]:
+        stem = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(invocation.started_at))}-" \
+               f"{_safe_name(invocation.name)}-{int(invocation.duration * 1000)}ms-{os.getpid()}-{threading.get_ident()}"
+        files = [f"{stem}.collapsed", f"{stem}.speedscope.json"]
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, files[0]), 'w') as f:
+                f.write(collapsed_stacks(stacks))
+            with open(os.path.join(self.directory, files[1]), 'w') as f:
+                json.dump(speedscope_profile(invocation.name, stacks, self.interval), f)
+        except OSError as e:
+            logger.error(f"Could not write profile for {invocation.name}: {e}")
+            return []
+
+        with self._lock:
+            self._files.extend(files)
+            expired = []
+            while len(self._files) > self.max_files:
+                expired.append(self._files.popleft())
+        for filename in expired:
+            try:
+                os.remove(os.path.join(self.directory, filename))
+            except OSError:
+                pass
+        return files
+
+
+def collapsed_stacks(stacks: Dict[Tuple[Frame, ...], int]) -> str:
+    # One "root;caller;leaf count" line per distinct stack
+    lines = []
+    for stack, count in sorted(stacks.items()):
+        names = ';'.join(f"{name} ({os.path.basename(filename)}:{line})" for name, filename, line in stack)
+        lines.append(f"{names} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def speedscope_profile(name: str, stacks: Dict[Tuple[Frame, ...], int], interval: float) -> dict:
+    frames: List[dict] = []
+    frame_ids: Dict[Frame, int] = {}
+    samples = []
+    weights = []
+    for stack, count in stacks.items():
+        indexes = []
+        for frame in stack:
+            if frame not in frame_ids:
+                frame_ids[frame] = len(frames)
+                frames.append({'name': frame[0], 'file': frame[1], 'line': frame[2]})
+            indexes.append(frame_ids[frame])
+        samples.append(indexes)
+        weights.append(count * interval)
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'name': name,
+        'exporter': 'smart-home-dashboard',
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled',
+            'name': name,
+            'unit': 'seconds',
+            'startValue': 0,
+            'endValue': sum(weights),
+            'samples': samples,
+            'weights': weights,
+        }],
+    }
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', name)[:80]
+
+
+profiler = CallProfiler()
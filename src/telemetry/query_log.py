@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from src.config.settings import config
+from src.config.logger import get_logger
+from .memory import memory, CacheAccount
+
+logger = get_logger(__name__)
+
+LATENCY_WINDOW = 512
+MAX_SHAPES = 256
+
+# Prepended to a slow query to run it again under Flux's profiler package
+PROFILER_PREAMBLE = 'import "profiler"\noption profiler.enabledProfilers = ["query", "operator"]\n'
+
+QUERY_PROFILE_FIELDS = ['TotalDuration', 'CompileDuration', 'QueueDuration', 'PlanDuration', 'ExecuteDuration',
+                        'MaxAllocated', 'TotalAllocated', 'influxdb/scanned-bytes', 'influxdb/scanned-values']
+
+
+@dataclass
+class QueryShapeStats:
+    fingerprint: str
+    shape: str
+    example: str
+    count: int = 0
+    errors: int = 0
+    slow: int = 0
+    rows: int = 0
+    durations: deque = field(default_factory=lambda: deque(maxlen=LATENCY_WINDOW))
+    profile: Optional[Dict[str, Any]] = None
+    profiled_at: Optional[float] = None
+
+    def summary(self) -> Dict[str, Any]:
+        samples = sorted(self.durations)
+        return {
+            'fingerprint': self.fingerprint,
+            'shape': self.shape,
+            'example': self.example,
+            'count': self.count,
+            'errors': self.errors,
+            'slow': self.slow,
+            'rows': self.rows,
+            'mean_rows': self.rows / self.count if self.count else 0,
+            'p50': samples[int(0.5 * (len(samples) - 1))] if samples else None,
+            'p99': samples[int(0.99 * (len(samples) - 1))] if samples else None,
+            'max': samples[-1] if samples else None,
+            'profile': self.profile,
+        }
+
+
+class QueryLog:
+    # Timings of every Flux query grouped by shape fingerprint. A query slower
+    # than slow_ms is run once more under Flux's profiler on a background
+    # thread, at most once per shape every profile_interval seconds, and the
+    # operator breakdown is logged and kept for /debug/queries.
+    def __init__(self, slow_ms: Optional[float] = None, profile_interval: Optional[float] = None,
+                 max_shapes: int = MAX_SHAPES):
+        self.slow_ms = slow_ms if slow_ms is not None else config.get("influxdb.slow_query_ms", 1000.0)
+        self.profile_interval = profile_interval if profile_interval is not None else \
+            config.get("influxdb.slow_query_profile_interval", 600.0)
+        self.max_shapes = max_shapes
+        self._shapes: "OrderedDict[str, QueryShapeStats]" = OrderedDict()
+        self._profiling = set()
+        self._lock = threading.Lock()
+
+    def record(self, fingerprint: str, shape: str, query: str, seconds: float, rows: int = 0,
+               failed: bool = False) -> bool:
+        # Returns True when the query was slow and should be profiled
+        slow = not failed and seconds * 1000 >= self.slow_ms
+        with self._lock:
+            stats = self._shapes.get(fingerprint)
+            if stats is None:
+                stats = QueryShapeStats(fingerprint=fingerprint, shape=shape, example=query)
+                self._shapes[fingerprint] = stats
+                while len(self._shapes) > self.max_shapes:
+                    self._shapes.popitem(last=False)
+            self._shapes.move_to_end(fingerprint)
+            stats.count += 1
+            stats.durations.append(seconds)
+            if failed:
+                stats.errors += 1
+                return False
+            stats.rows += rows
+            if not slow:
+                return False
+            stats.slow += 1
+            stats.example = query
+            if fingerprint in self._profiling:
+                return False
+            if stats.profiled_at is not None and time.monotonic() - stats.profiled_at < self.profile_interval:
+                return False
+            self._profiling.add(fingerprint)
+            stats.profiled_at = time.monotonic()
+        logger.info(f"Slow Flux query {fingerprint} took {seconds * 1000:.0f} ms, {rows} rows: {shape}")
+        return True
+
+    def profile_in_background(self, fingerprint: str, query: str, run: Callable[[str], Iterable[Dict[str, Any]]]):
+        # run executes a Flux query and returns its records as dicts
+        thread = threading.Thread(target=self._profile, args=(fingerprint, query, run),
+                                  name=f'flux-profile-{fingerprint}', daemon=True)
+        thread.start()
+        return thread
+
+    def _profile(self, fingerprint: str, query: str, run: Callable[[str], Iterable[Dict[str, Any]]]):
+        try:
+            profile = parse_flux_profile(run(PROFILER_PREAMBLE + query))
+        except Exception as e:
+            logger.error(f"Could not profile Flux query {fingerprint}: {e}")
+            profile = None
+        with self._lock:
+            self._profiling.discard(fingerprint)
+            stats = self._shapes.get(fingerprint)
+            if stats is not None and profile is not None:
+                stats.profile = profile
+        if profile is not None:
+            logger.info(f"Flux profile for {fingerprint}:\n{format_flux_profile(profile)}")
+
+    def shapes(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            summaries = [stats.summary() for stats in self._shapes.values()]
+        return sorted(summaries, key=lambda summary: (summary['p99'] or 0), reverse=True)
+
+    def get(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            stats = self._shapes.get(fingerprint)
+            return stats.summary() if stats else None
+
+
+def parse_flux_profile(records: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    # Split the profiler's extra tables out of a profiled query's records
+    query = {}
+    operators = []
+    rows = 0
+    for values in records:
+        measurement = values.get('_measurement')
+        if measurement == 'profiler/query':
+            query = {key: values.get(key) for key in QUERY_PROFILE_FIELDS if values.get(key) is not None}
+            query['plan'] = values.get('flux/query-plan')
+        elif measurement == 'profiler/operator':
+            operators.append({
+                'type': values.get('Type'),
+                'label': values.get('Label'),
+                'count': values.get('Count'),
+                'duration_sum': values.get('DurationSum'),
+                'mean_duration': values.get('MeanDuration'),
+                'max_duration': values.get('MaxDuration'),
+            })
+        else:
+            rows += 1
+    operators.sort(key=lambda operator: operator['duration_sum'] or 0, reverse=True)
+    return {'query': query, 'operators': operators, 'rows': rows}
+
+
+def format_flux_profile(profile: Dict[str, Any]) -> str:
+    query = profile['query']
+    lines = [f"  total {_ms(query.get('TotalDuration'))}, execute {_ms(query.get('ExecuteDuration'))}, "
+             f"rows {profile['rows']}, scanned {query.get('influxdb/scanned-values', '?')} values"]
+    for operator in profile['operators']:
+        lines.append(f"  {operator['type']:<32} {_ms(operator['duration_sum']):>10} x{operator['count']}  {operator['label']}")
+    if query.get('plan'):
+        lines.append("  plan:")
+        lines.extend(f"    {line}" for line in str(query['plan']).splitlines())
+    return "\n".join(lines)
+
+
+def _ms(nanoseconds: Any) -> str:
+    if nanoseconds is None:
+        return '?'
+    return f"{float(nanoseconds) / 1e6:.1f} ms"
+
+
+query_log = QueryLog()
+memory.register('flux_query_log', CacheAccount(query_log._shapes, query_log._lock))
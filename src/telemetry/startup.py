@@ -0,0 +1,147 @@
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from src.config.logger import get_logger
+from .instruments import STARTUP_PHASE_SECONDS, WARMUP_TASK_SECONDS
+
+logger = get_logger(__name__)
+
+# Imported when src.telemetry.startup is, which is as early as the dashboard
+# gets; only used when /proc cannot say when the process started
+_IMPORTED_AT = time.time()
+
+
+def process_start_time() -> float:
+    # Wall-clock start of this process: field 22 of /proc/self/stat counts
+    # clock ticks since boot, and btime in /proc/stat is the boot time
+    try:
+        with open('/proc/self/stat') as f:
+            # The command name may hold spaces, so fields are counted after it
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/stat') as f:
+            boot_time = next(int(line.split()[1]) for line in f if line.startswith('btime'))
+        return boot_time + int(fields[19]) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, StopIteration):
+        return _IMPORTED_AT
+
+
+class StartupTimeline:
+    # Phases reached since the process started (imported, serving, warm) and
+    # how long each background warm-up task took
+
+    def __init__(self):
+        self.started_at = process_start_time()
+        self.phases: Dict[str, float] = {}
+        self.tasks: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def mark(self, phase: str) -> float:
+        # Only the first time a phase is reached counts
+        with self._lock:
+            if phase not in self.phases:
+                self.phases[phase] = max(0.0, time.time() - self.started_at)
+                STARTUP_PHASE_SECONDS.labels(phase).set(self.phases[phase])
+                logger.info(f"Startup: {phase} after {self.phases[phase] * 1000:.0f} ms")
+            return self.phases[phase]
+
+    def record_task(self, name: str, seconds: float, error: Optional[str] = None):
+        with self._lock:
+            self.tasks.append({'task': name, 'seconds': seconds, 'error': error})
+        WARMUP_TASK_SECONDS.labels(name).set(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        from src.config.imports import DEFERRED_IMPORTS
+
+        with self._lock:
+            return {
+                'started_at': self.started_at,
+                'phases': dict(self.phases),
+                'tasks': list(self.tasks),
+                'deferred_imports': {name: name in sys.modules for name in DEFERRED_IMPORTS},
+            }
+
+
+startup = StartupTimeline()
+
+
+def parse_importtime(text: str) -> List[Dict[str, Any]]:
+    # Lines written by python -X importtime, in the order imports finished:
+    #   import time:       412 |       1380 |   src.config.settings
+    # Nesting is the indentation of the module name, two spaces per level
+    entries = []
+    for line in text.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        columns = line[len('import time:'):].split('|')
+        if len(columns) != 3 or not columns[0].strip().isdigit():
+            continue
+        name = columns[2].rstrip()
+        module = name.lstrip()
+        entries.append({
+            'module': module,
+            'self_us': int(columns[0]),
+            'cumulative_us': int(columns[1]),
+            'depth': (len(name) - len(module) - 1) // 2,
+        })
+    return entries
+
+
+def import_report(entries: List[Dict[str, Any]], limit: int = 20) -> Dict[str, Any]:
+    # Self time summed per top-level package, and the imports that took
+    # longest including everything they pulled in
+    packages: Dict[str, int] = {}
+    for entry in entries:
+        package = entry['module'].split('.')[0]
+        packages[package] = packages.get(package, 0) + entry['self_us']
+    total = sum(entry['cumulative_us'] for entry in entries if entry['depth'] == 0)
+    # A module imported through its parent package is listed again at the top
+    # level with almost no time of its own; only its slowest line is kept
+    slowest: Dict[str, Dict[str, Any]] = {}
+    for entry in entries:
+        if entry['cumulative_us'] > slowest.get(entry['module'], {'cumulative_us': -1})['cumulative_us']:
+            slowest[entry['module']] = entry
+    return {
+        'total_us': total,
+        'modules': len(entries),
+        'packages': sorted(({'package': package, 'self_us': self_us} for package, self_us in packages.items()),
+                           key=lambda package: -package['self_us'])[:limit],
+        'slowest': sorted(slowest.values(), key=lambda entry: -entry['cumulative_us'])[:limit],
+    }
+
+
+def measure_imports(module: str) -> List[Dict[str, Any]]:
+    # A fresh interpreter, so nothing is imported already
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, cwd=os.getcwd())
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def format_import_report(module: str, report: Dict[str, Any]) -> str:
+    lines = [f"import {module}: {report['total_us'] / 1000:.0f} ms over {report['modules']} modules", "",
+             "Self time by package:"]
+    lines += [f"  {package['self_us'] / 1000:9.1f} ms  {package['package']}" for package in report['packages']]
+    lines += ["", "Slowest imports, including what they import:"]
+    lines += [f"  {entry['cumulative_us'] / 1000:9.1f} ms  {entry['module']}" for entry in report['slowest']]
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    # python -m src.telemetry.startup [--module src.dashboard.app] [--limit 20]
+    parser = argparse.ArgumentParser(prog='python -m src.telemetry.startup',
+                                     description='Where import time goes when the dashboard starts')
+    parser.add_argument('--module', default='src.dashboard.app')
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args(argv)
+    print(format_import_report(args.module, import_report(measure_imports(args.module), args.limit)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,208 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from src.config.settings import config
+from src.config.logger import get_logger
+
+logger = get_logger(__name__)
+
+SERVICE_NAME = 'smart-home-dashboard'
+MAX_SPANS_PER_TRACE = 1000
+
+# OTLP span kinds and status codes
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current = contextvars.ContextVar('current_span', default=None)
+
+
+class _Trace:
+    __slots__ = ('trace_id', 'spans', 'error', 'dropped')
+
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List['Span'] = []
+        self.error = False
+        self.dropped = 0
+
+
+class Span:
+    # One timed operation. Used as a context manager it becomes the parent of
+    # every span started inside it, including spans in Dash callbacks, which
+    # run in a copy of the request's context.
+    __slots__ = ('tracer', 'trace', 'name', 'kind', 'span_id', 'parent_id', 'start_ns', 'end_ns',
+                 'attributes', 'status', 'message', '_token')
+
+    def __init__(self, tracer: 'Tracer', name: str, kind: int, parent: Optional['Span'], attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.trace = parent.trace if parent is not None else _Trace()
+        self.name = name
+        self.kind = kind
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start_ns = 0
+        self.end_ns = 0
+        self.attributes = attributes
+        self.status = STATUS_OK
+        self.message = ''
+        self._token = None
+
+    @property
+    def duration(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        self.attributes.update(attributes)
+
+    def record_error(self, error: BaseException):
+        self.set_error(f"{type(error).__name__}: {error}")
+
+    def set_error(self, message: str):
+        self.status = STATUS_ERROR
+        self.message = message
+        self.trace.error = True
+
+    def __enter__(self) -> 'Span':
+        self.start_ns = time.time_ns()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        if exc is not None:
+            self.record_error(exc)
+        _current.reset(self._token)
+        self.tracer._finish(self)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, **attributes):
+        pass
+
+    def record_error(self, error: BaseException):
+        pass
+
+    def set_error(self, message: str):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    # Spans are buffered per trace and the whole trace is exported when its
+    # root span ends. In 'tail' mode only traces slower than slow_ms, or with
+    # an error, are kept; 'all' keeps every trace.
+    def __init__(self, enabled: Optional[bool] = None, mode: Optional[str] = None,
+                 slow_ms: Optional[float] = None, path: Optional[str] = None):
+        self.enabled = enabled if enabled is not None else config.get("tracing.enabled", False)
+        self.mode = mode or config.get("tracing.mode", "tail")
+        self.slow_ms = slow_ms if slow_ms is not None else config.get("tracing.slow_ms", 500.0)
+        self.path = path or config.get("tracing.file", "/tmp/dashboard-traces.jsonl")
+        self.exported = 0
+        self.discarded = 0
+        self._lock = threading.Lock()
+
+    def span(self, name: str, kind: int = KIND_INTERNAL, **attributes):
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, kind, _current.get(), attributes)
+
+    def current_span(self):
+        return _current.get() or NOOP_SPAN
+
+    def _finish(self, span: Span):
+        trace = span.trace
+        if len(trace.spans) < MAX_SPANS_PER_TRACE:
+            trace.spans.append(span)
+        else:
+            trace.dropped += 1
+        if span.parent_id is not None:
+            return
+        if self.mode == 'tail' and not trace.error and span.duration * 1000 < self.slow_ms:
+            with self._lock:
+                self.discarded += 1
+            return
+        self._export(trace, span)
+
+    def _export(self, trace: _Trace, root: Span):
+        if trace.dropped:
+            root.set_attribute('trace.dropped_spans', trace.dropped)
+        line = json.dumps(otlp_request(trace.spans), separators=(',', ':'))
+        try:
+            with self._lock:
+                with open(self.path, 'a') as f:
+                    f.write(line + "\n")
+                self.exported += 1
+        except OSError as e:
+            logger.error(f"Could not export trace {trace.trace_id}: {e}")
+
+
+def otlp_request(spans: List[Span]) -> Dict[str, Any]:
+    # ExportTraceServiceRequest in OTLP/JSON encoding
+    return {
+        'resourceSpans': [{
+            'resource': {'attributes': _attributes({'service.name': SERVICE_NAME})},
+            'scopeSpans': [{
+                'scope': {'name': __name__},
+                'spans': [_otlp_span(span) for span in spans],
+            }],
+        }],
+    }
+
+
+def _otlp_span(span: Span) -> Dict[str, Any]:
+    encoded = {
+        'traceId': span.trace.trace_id,
+        'spanId': span.span_id,
+        'name': span.name,
+        'kind': span.kind,
+        'startTimeUnixNano': str(span.start_ns),
+        'endTimeUnixNano': str(span.end_ns),
+        'attributes': _attributes(span.attributes),
+        'status': {'code': span.status, **({'message': span.message} if span.message else {})},
+    }
+    if span.parent_id is not None:
+        encoded['parentSpanId'] = span.parent_id
+    return encoded
+
+
+def _attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{'key': key, 'value': _any_value(value)} for key, value in attributes.items() if value is not None]
+
+
+def _any_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    if isinstance(value, (list, tuple)):
+        return {'arrayValue': {'values': [_any_value(item) for item in value]}}
+    return {'stringValue': str(value)}
+
+
+tracer = Tracer()
@@ -0,0 +1,107 @@
+from datetime import timedelta
+
+import pytest
+from influxdb_client import InfluxDBClient
+
+from benchmarks.harness import Case, Benchmark, measure, run_benchmarks, compare
+from benchmarks.standins import FakeInfluxDB, FakeRuleEngine, SensorDataset, RuleEngineDataset
+from src.clients.rule_engine import RuleEngineClient
+from src.dashboard.utils.device_sync import DeviceSnapshot
+from src.dashboard.utils.rule_cache import RuleCache
+from src.models.sensor import TemperatureModel
+
+
+@pytest.fixture(scope='module')
+def influx():
+    with FakeInfluxDB(SensorDataset(devices_per_type=3, points=120)) as standin:
+        yield standin
+
+
+@pytest.fixture
+def temperature(influx):
+    model = TemperatureModel()
+    model.client = InfluxDBClient(url=influx.url, token='token', org='org')
+    yield model
+    model.close()
+
+
+class TestFakeInfluxDB:
+
+    def test_sensor_data_is_decoded_and_deduplicated(self, influx, temperature):
+        data = temperature.get_sensor_data('-1d')
+
+        series = influx.dataset.series['temperature']
+        expected = sum(1 + sum(1 for (_, previous), (_, value) in zip(readings, readings[1:]) if value != previous)
+                       for _, readings in series.values())
+        assert len(data) == expected
+        assert set(data['device_id']) == set(series)
+        assert set(data['type']) == {'temperature'}
+
+    def test_range_and_device_filters_are_applied(self, influx, temperature):
+        recent = temperature.get_sensor_data('-5m', ['temp_002'])
+
+        assert set(recent['device_id']) == {'temp_002'}
+        assert recent['_time'].min() >= influx.dataset.end - timedelta(minutes=5)
+
+    def test_latest_readings_and_device_list(self, temperature):
+        latest = temperature.get_latest_device_data()
+
+        assert sorted(latest['device_id']) == ['temp_001', 'temp_002', 'temp_003']
+        assert sorted(temperature.get_devices()) == ['temp_001', 'temp_002', 'temp_003']
+
+
+class TestFakeRuleEngine:
+
+    def test_devices_and_rules_are_served_with_etags(self):
+        with FakeRuleEngine(RuleEngineDataset(devices=2, rules_per_device=3)) as engine:
+            client = RuleEngineClient(base_url=engine.url)
+            snapshot = DeviceSnapshot(client, min_sync_interval=0)
+            snapshot.sync()
+            snapshot.sync()
+            rules = RuleCache(client).get_rules('light_001')
+
+            response = client.create_rule({'device_id': 'light_001', 'rule_name': 'new', 'condition_tree': {}})
+            client.close()
+
+        assert [device['device_id'] for device in snapshot.devices] == ['light_001', 'light_002']
+        assert snapshot.version == 1
+        assert len(rules) == 3
+        assert response.status_code == 201
+        assert len(engine.dataset.device_rules('light_001')) == 4
+
+
+class TestHarness:
+
+    def test_reset_runs_untimed_before_every_repetition(self):
+        calls = []
+        result = measure(Case(lambda: calls.append('run'), reset=lambda: calls.append('reset')), repeat=3, warmup=1)
+
+        assert calls == ['reset', 'run'] * 4
+        assert result['repeat'] == 3
+        assert result['min'] <= result['median'] <= result['max']
+
+    def test_cases_run_over_the_parameter_grid_and_failures_are_kept(self):
+        def setup(params, context):
+            if params['leaves'] == 64:
+                raise ValueError("too many leaves")
+            return Case(lambda: None)
+
+        results = run_benchmarks([Benchmark('tree', ('devices', 'leaves'), setup)],
+                                 {'devices': [1, 2], 'leaves': [8, 64]}, context=None, repeat=1)
+
+        assert [result['params'] for result in results] == [
+            {'devices': 1, 'leaves': 8}, {'devices': 1, 'leaves': 64},
+            {'devices': 2, 'leaves': 8}, {'devices': 2, 'leaves': 64}]
+        assert results[1]['error'] == "ValueError: too many leaves"
+
+    def test_comparison_flags_slower_medians(self):
+        baseline = [{'name': 'a', 'params': {}, 'median': 1.0}, {'name': 'b', 'params': {'n': 1}, 'median': 1.0},
+                    {'name': 'c', 'params': {}, 'median': 1.0}]
+        results = [{'name': 'a', 'params': {}, 'median': 1.1}, {'name': 'b', 'params': {'n': 1}, 'median': 1.5},
+                   {'name': 'c', 'params': {}, 'median': 0.5}, {'name': 'd', 'params': {}, 'median': 1.0},
+                   {'name': 'e', 'params': {}, 'error': 'ValueError: broken'}]
+
+        statuses = {comparison['key']: comparison['status'] for comparison in compare(results, baseline, 0.25)}
+
+        assert statuses == {'a[]': 'ok', 'b[n=1]': 'regression', 'c[]': 'improvement', 'd[]': 'new',
+                            'e[]': 'failed'}
@@ -0,0 +1,120 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.dashboard.utils.cache_snapshot import CacheSnapshot, frame_arrays, frame_from_arrays
+from src.dashboard.utils.device_sync import DeviceSnapshot
+from src.models.sensor_cache import SensorCache, COLUMNS
+from test_device_sync import FakeRuleEngine, make_device
+
+NOW = pd.Timestamp('2026-03-01T12:00:30Z')
+
+
+def frame(rows):
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+class FakeModel:
+    # What CacheSnapshot reads from a SensorModel
+    def __init__(self, sensor_type, clock):
+        self.sensor_type = sensor_type
+        self.fetches = []
+        self.latest = frame([(NOW - pd.Timedelta(minutes=1), 19.5, f'{sensor_type}_001', 'kitchen', sensor_type),
+                             (NOW - pd.Timedelta(minutes=3), 20.0, f'{sensor_type}_002', None, sensor_type)])
+        self.cache = SensorCache(self.fetch, self.fetch, refresh_interval=0, overlap=120, clock=lambda: clock['now'])
+
+    def fetch(self, since):
+        self.fetches.append(since)
+        return self.latest[self.latest['_time'] >= since]
+
+
+@pytest.fixture
+def clock():
+    return {'now': NOW}
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'cache' / 'snapshot.npz')
+
+
+def filled(clock, engine):
+    models = [FakeModel('temperature', clock), FakeModel('humidity', clock)]
+    for model in models:
+        model.cache.latest()
+        model.cache.series(NOW - pd.Timedelta(hours=1))
+    devices = DeviceSnapshot(engine, min_sync_interval=0)
+    devices.sync()
+    return models, devices
+
+
+class TestColumns:
+
+    def test_frames_round_trip_with_missing_labels(self):
+        original = frame([(NOW, 1, 'motion_001', None, 'motion'),
+                          (NOW + pd.Timedelta(seconds=1), 0, 'motion_002', 'hallway', 'motion')])
+        arrays = frame_arrays('motion.latest', original)
+        restored = frame_from_arrays('motion.latest', arrays)
+
+        assert arrays['motion.latest.time'].dtype == np.int64
+        assert arrays['motion.latest.location.codes'].tolist() == [-1, 0]
+        assert list(restored['location']) == [None, 'hallway']
+        assert list(restored['value']) == [1, 0]
+        assert list(restored['_time']) == list(original['_time'])
+
+
+class TestCacheSnapshot:
+
+    def test_restored_caches_only_fetch_what_changed_since_the_save(self, path, clock):
+        engine = FakeRuleEngine()
+        engine.body['devices'] = [make_device('light_001', last_updated='2026-03-01T11:00:00Z')]
+        models, devices = filled(clock, engine)
+        assert CacheSnapshot(models, devices, path=path).save()
+
+        clock['now'] = NOW + pd.Timedelta(minutes=30)
+        restarted = [FakeModel('temperature', clock), FakeModel('humidity', clock)]
+        restarted_devices = DeviceSnapshot(engine, min_sync_interval=0)
+        assert CacheSnapshot(restarted, restarted_devices, path=path).load()
+
+        latest = restarted[0].cache.latest()
+        series = restarted[0].cache.series(clock['now'] - pd.Timedelta(hours=1))
+        assert restarted[0].fetches == [pd.Timestamp('2026-03-01T11:58:00Z')] * 2
+        assert list(latest['location']) == ['kitchen', None]
+        assert len(series) == 2
+        assert restarted_devices.version == devices.version
+        assert [device['device_id'] for device in restarted_devices.devices] == ['light_001']
+
+        restarted_devices.sync()
+        assert engine.params[-1] == {'since': '2026-03-01T11:00:00Z'}
+
+    def test_snapshots_for_other_backends_are_ignored(self, path, clock, monkeypatch):
+        models, devices = filled(clock, FakeRuleEngine())
+        snapshot = CacheSnapshot(models, devices, path=path)
+        snapshot.save()
+        monkeypatch.setattr(CacheSnapshot, 'source', lambda self: {'influxdb': 'http://elsewhere:8086'})
+
+        restarted = [FakeModel('temperature', clock)]
+        assert not CacheSnapshot(restarted, DeviceSnapshot(FakeRuleEngine()), path=path).load()
+        assert restarted[0].cache.export()['latest'] is None
+
+    def test_empty_caches_leave_an_earlier_snapshot_alone(self, path, clock):
+        models, devices = filled(clock, FakeRuleEngine())
+        CacheSnapshot(models, devices, path=path).save()
+        saved = os.path.getmtime(path)
+
+        assert not CacheSnapshot([FakeModel('temperature', clock)], DeviceSnapshot(FakeRuleEngine()), path=path).save()
+        assert os.path.getmtime(path) == saved
+        assert os.listdir(os.path.dirname(path)) == ['snapshot.npz']
+
+    def test_stopping_saves_a_last_snapshot(self, path, clock):
+        models, devices = filled(clock, FakeRuleEngine())
+        snapshot = CacheSnapshot(models, devices, path=path, interval=3600)
+        snapshot.start()
+        snapshot.stop()
+        snapshot.stop()
+
+        assert os.path.exists(path)
+        assert not any(thread.name == 'cache-snapshot' for thread in threading.enumerate())
@@ -0,0 +1,127 @@
+import json
+
+import plotly
+from dash import Patch
+
+from src.dashboard.utils.condition_tree import (
+    add_group_to_node, apply_not_to_node, condition_tree_update, delete_node_from_tree, get_node,
+    remember_rendered_tree, render_condition_tree, update_condition_node
+)
+from src.dashboard.utils.tree_history import TreeHistory, TreeHistoryRegistry
+
+
+def leaf(sensor, value=0):
+    return {'type': 'condition', 'sensor_device': sensor, 'operator': 'gte', 'value': value}
+
+
+def sample_tree():
+    return {'type': 'and',
+            'left': {'type': 'or', 'left': leaf('temp_001'), 'right': leaf('humid_001')},
+            'right': {'type': 'not', 'child': leaf('motion_001')}}
+
+
+class TestPathEdits:
+
+    def test_get_node_by_path_id(self):
+        tree = sample_tree()
+
+        assert get_node(tree, 'root_left_right') == leaf('humid_001')
+        assert get_node(tree, 'root_right_child') == leaf('motion_001')
+        assert get_node(tree, 'root_left_left_left') is None
+        assert get_node(tree, 'bogus') is None
+
+    def test_edit_copies_only_the_path(self):
+        tree = sample_tree()
+
+        edited = update_condition_node(tree, 'root_left_left', {'value': 25})
+
+        assert edited['left']['left']['value'] == 25
+        assert tree['left']['left']['value'] == 0
+        assert edited['right'] is tree['right']
+        assert edited['left']['right'] is tree['left']['right']
+
+    def test_structural_edits(self):
+        tree = sample_tree()
+
+        assert add_group_to_node(tree, 'root_right_child', 'or')['right']['child'] == {
+            'type': 'or', 'left': leaf('motion_001'), 'right': leaf('', 0)}
+        assert delete_node_from_tree(tree, 'root_left_left')['left'] == leaf('humid_001')
+        assert apply_not_to_node(tree, 'root_left')['left']['type'] == 'not'
+        # Negating inside a NOT, or the NOT itself, removes the NOT
+        assert apply_not_to_node(tree, 'root_right_child')['right'] == leaf('motion_001')
+        assert apply_not_to_node(tree, 'root_right')['right'] == leaf('motion_001')
+
+
+class TestTreeHistory:
+
+    def test_undo_redo(self):
+        history = TreeHistory(sample_tree())
+        first = history.current
+        second = history.push(update_condition_node(first, 'root_left_left', {'value': 1}))
+        history.push(update_condition_node(second, 'root_left_left', {'value': 2}))
+
+        assert history.undo() is second
+        assert history.undo() is first
+        assert history.undo() is first
+        assert history.redo() is second
+
+        history.push(delete_node_from_tree(second, 'root_right'))
+        assert not history.can_redo
+
+    def test_registry_restarts_when_tree_was_replaced(self):
+        registry = TreeHistoryRegistry(max_histories=2)
+        history = registry.sync('a', sample_tree())
+        history.push(update_condition_node(history.current, 'root_left_left', {'value': 1}))
+
+        assert registry.sync('a', history.current) is history
+        assert registry.sync('a', leaf('gas_001')) is not history
+
+        registry.sync('b', leaf('gas_001'))
+        registry.sync('c', leaf('gas_001'))
+        assert registry.get('a') is None
+
+
+def to_json(component):
+    return json.loads(json.dumps(component, cls=plotly.utils.PlotlyJSONEncoder))
+
+
+def apply_patch(document, patch):
+    for operation in to_json(patch)['operations']:
+        assert operation['operation'] == 'Assign'
+        target = document
+        for key in operation['location'][:-1]:
+            target = target[key]
+        target[operation['location'][-1]] = operation['params']['value']
+    return document
+
+
+class TestPartialRendering:
+
+    def test_leaf_edit_patches_only_that_leaf(self):
+        tree = sample_tree()
+        digest = remember_rendered_tree(tree)
+        edited = update_condition_node(tree, 'root_left_right', {'value': 70})
+
+        children, new_digest = condition_tree_update(edited, digest)
+
+        assert isinstance(children, Patch)
+        operations = to_json(children)['operations']
+        assert len(operations) == 1
+        assert 'humid_001' in json.dumps(operations[0]['params'])
+        assert 'temp_001' not in json.dumps(operations[0]['params'])
+        assert apply_patch(to_json(render_condition_tree(tree)), children) == to_json(render_condition_tree(edited))
+        assert condition_tree_update(edited, new_digest) == (None, new_digest)
+
+    def test_structural_edit_matches_full_render(self):
+        tree = sample_tree()
+        digest = remember_rendered_tree(tree)
+        edited = apply_not_to_node(add_group_to_node(tree, 'root_left_left', 'or'), 'root_right')
+
+        children, _ = condition_tree_update(edited, digest)
+
+        assert apply_patch(to_json(render_condition_tree(tree)), children) == to_json(render_condition_tree(edited))
+
+    def test_unknown_digest_renders_everything(self):
+        children, _ = condition_tree_update(sample_tree(), 'not-a-digest')
+
+        assert to_json(children) == to_json(render_condition_tree(sample_tree()))
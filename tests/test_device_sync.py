@@ -0,0 +1,124 @@
+import json
+import threading
+import time
+
+import pytest
+import requests
+
+from src.clients.rule_engine import RuleEngineUnavailableError
+from src.dashboard.utils.device_sync import DeviceSnapshot, DeviceSyncError
+
+
+def make_device(device_id, value='on', last_updated='2026-01-01T10:00:00Z'):
+    return {
+        'device_id': device_id,
+        'last_updated': last_updated,
+        'capabilities': [{'name': 'power', 'capability_type': 'toggle', 'config': {}, 'current_value': value}]
+    }
+
+
+def make_response(body, status_code=200):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(body).encode()
+    return response
+
+
+class FakeRuleEngine:
+    def __init__(self):
+        self.body = {'success': True, 'devices': []}
+        self.params = []
+        self.capability_calls = 0
+
+    def list_devices(self, headers=None, params=None):
+        self.params.append(params)
+        return make_response(self.body)
+
+    def get_device_capabilities(self, device_id):
+        self.capability_calls += 1
+        return make_response({'success': True, 'capabilities': [{'name': 'power', 'type': 'toggle'}]})
+
+
+class TestDeviceSnapshot:
+
+    def test_full_payload_is_diffed(self):
+        engine = FakeRuleEngine()
+        snapshot = DeviceSnapshot(engine, min_sync_interval=0)
+        engine.body['devices'] = [make_device('light_001'), make_device('light_002')]
+        first = snapshot.sync()
+
+        engine.body['devices'] = [make_device('light_001', 'off', '2026-01-01T10:05:00Z')]
+        snapshot.sync()
+
+        assert snapshot.changed_since(first) == {'light_001', 'light_002'}
+        assert [device['device_id'] for device in snapshot.devices] == ['light_001']
+        assert engine.params[-1] == {'since': '2026-01-01T10:00:00Z'}
+
+    def test_delta_payload_is_merged(self):
+        engine = FakeRuleEngine()
+        snapshot = DeviceSnapshot(engine, min_sync_interval=0)
+        engine.body['devices'] = [make_device('light_001'), make_device('light_002')]
+        first = snapshot.sync()
+
+        engine.body = {'success': True, 'delta': True, 'devices': [make_device('light_002', 'off')], 'removed': []}
+        snapshot.sync()
+
+        assert snapshot.changed_since(first) == {'light_002'}
+        assert len(snapshot.devices) == 2
+
+    def test_unchanged_payload_keeps_version(self):
+        engine = FakeRuleEngine()
+        snapshot = DeviceSnapshot(engine, min_sync_interval=0)
+        engine.body['devices'] = [make_device('light_001')]
+
+        assert snapshot.sync() == snapshot.sync() == 1
+        assert snapshot.changed_since(1) == set()
+        assert snapshot.changed_since(None) is None
+
+    def test_transport_failures_are_sync_errors(self):
+        engine = FakeRuleEngine()
+        snapshot = DeviceSnapshot(engine, min_sync_interval=0)
+        engine.body['devices'] = [make_device('light_001')]
+        snapshot.sync()
+
+        for error in (RuleEngineUnavailableError('breaker open'), requests.ConnectionError('refused')):
+            def unreachable(headers=None, params=None, error=error):
+                raise error
+            engine.list_devices = unreachable
+            with pytest.raises(DeviceSyncError):
+                snapshot.sync()
+        assert [device['device_id'] for device in snapshot.devices] == ['light_001']
+
+    def test_concurrent_cold_start_callers_wait_for_the_first_sync(self):
+        engine = FakeRuleEngine()
+        engine.body['devices'] = [make_device('light_001')]
+        list_devices = engine.list_devices
+        engine.list_devices = lambda **kwargs: (time.sleep(0.2), list_devices(**kwargs))[1]
+        snapshot = DeviceSnapshot(engine, min_sync_interval=60)
+        seen = []
+
+        def tick():
+            version = snapshot.sync()
+            seen.append((version, [device['device_id'] for device in snapshot.devices]))
+
+        threads = [threading.Thread(target=tick) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert seen == [(1, ['light_001'])] * 5
+        assert len(engine.params) == 1
+
+    def test_capabilities_reused_while_schema_unchanged(self):
+        engine = FakeRuleEngine()
+        snapshot = DeviceSnapshot(engine, min_sync_interval=0)
+        engine.body['devices'] = [make_device('light_001')]
+        snapshot.sync()
+
+        snapshot.get_capabilities('light_001')
+        engine.body['devices'] = [make_device('light_001', 'off')]
+        snapshot.sync()
+        snapshot.get_capabilities('light_001')
+
+        assert engine.capability_calls == 1
@@ -0,0 +1,176 @@
+import random
+import threading
+import time
+
+import pytest
+import requests
+from influxdb_client import InfluxDBClient
+from werkzeug.serving import make_server
+
+from benchmarks.load import (
+    DashSession, LoadStats, apply_patch, parse_outputs, stringify_id, expand_mix, parse_mix, saturation, edit_rules,
+    run_level
+)
+from benchmarks.standins import FakeInfluxDB, FakeRuleEngine, SensorDataset, RuleEngineDataset
+
+
+class TestFaultInjection:
+
+    def test_latency_is_added_to_every_request(self):
+        with FakeRuleEngine(RuleEngineDataset(devices=1, rules_per_device=1), latency=0.05) as engine:
+            start = time.perf_counter()
+            response = requests.get(f"{engine.url}/devices", timeout=5)
+
+            assert response.status_code == 200
+            assert time.perf_counter() - start >= 0.05
+
+    def test_failures_answer_503_or_drop_the_connection(self):
+        with FakeRuleEngine(RuleEngineDataset(devices=1, rules_per_device=1), failure_rate=1.0) as engine:
+            assert requests.post(f"{engine.url}/rules", json={'device_id': 'light_001'}, timeout=5).status_code == 503
+            assert len(engine.dataset.rules) == 1
+        with FakeRuleEngine(RuleEngineDataset(devices=1, rules_per_device=1), failure_rate=1.0,
+                            failure_mode='drop') as engine:
+            with pytest.raises(requests.ConnectionError):
+                requests.get(f"{engine.url}/devices", timeout=5)
+            assert engine.failures == 1
+
+    def test_failure_rate_is_a_fraction_of_requests(self):
+        with FakeInfluxDB(SensorDataset(devices_per_type=1, points=10), failure_rate=0.5, seed=3) as influx:
+            statuses = [requests.post(f"{influx.url}/api/v2/query", json={'query': 'range(start: -1h)'},
+                                      timeout=5).status_code for _ in range(40)]
+
+        assert 10 < statuses.count(503) < 30
+        assert statuses.count(503) == influx.failures
+
+
+class TestRenderer:
+
+    def test_outputs_and_ids_are_parsed_like_dash(self):
+        outputs = parse_outputs('..rule-modal.style...condition-tree-store.data@593d..')
+
+        assert outputs == [{'id': 'rule-modal', 'property': 'style'},
+                           {'id': 'condition-tree-store', 'property': 'data@593d'}]
+        assert stringify_id({'type': 'rule-button', 'index': 'light_001'}) == '{"index":"light_001","type":"rule-button"}'
+
+    def test_patches_are_applied_to_a_copy(self):
+        value = {'props': {'children': [1, 2]}, 'count': 1}
+        operations = [
+            {'operation': 'Append', 'location': ['props', 'children'], 'params': {'value': 3}},
+            {'operation': 'Assign', 'location': ['props', 'children', 0], 'params': {'value': 0}},
+            {'operation': 'Add', 'location': ['count'], 'params': {'value': 2}},
+            {'operation': 'Delete', 'location': ['props', 'children', 1], 'params': {}},
+        ]
+
+        assert apply_patch(value, operations) == {'props': {'children': [0, 3]}, 'count': 3}
+        assert value == {'props': {'children': [1, 2]}, 'count': 1}
+
+    def test_mix_interleaves_scenarios(self):
+        order = expand_mix(parse_mix('sensors=2,charts=1,rules=1'))
+
+        assert sorted(order) == ['charts', 'rules', 'sensors', 'sensors']
+        assert order[0] == 'sensors' and order[1] != 'sensors'
+        with pytest.raises(ValueError):
+            parse_mix('sensors=1,unknown=2')
+
+
+def _level(sessions, p50, error_rate=0.0, tick_p99=0.1):
+    return {'sessions': sessions, 'error_rate': error_rate, 'interval': 5.0, 'tick_p99': tick_p99, 'late_ticks': 0,
+            'callbacks': {'sensor-devices-container.children': {'p50': p50}}}
+
+
+class TestSaturation:
+
+    def test_first_level_with_queueing_or_errors_saturates(self):
+        assert saturation([_level(1, 0.05), _level(5, 0.08)]) == (None, [])
+
+        sessions, reasons = saturation([_level(1, 0.05), _level(5, 0.08), _level(10, 0.2), _level(20, 0.5)])
+        assert sessions == 10
+        assert reasons == ['sensor-devices-container.children median x4.0']
+
+        sessions, reasons = saturation([_level(1, 0.05), _level(5, 0.05, error_rate=0.1, tick_p99=6.0)])
+        assert sessions == 5
+        assert reasons[0] == 'error rate 10.0%'
+        assert 'over the 5000 ms interval' in reasons[1]
+
+
+@pytest.fixture(scope='module')
+def dashboard():
+    # The dashboard in this process, pointed at stand-ins
+    from src.dashboard.app import app
+    from src.dashboard.callbacks import sensor_models, rule_engine_client, rule_cache, device_snapshot
+
+    influx = FakeInfluxDB(SensorDataset(devices_per_type=2, points=60)).start()
+    engine = FakeRuleEngine(RuleEngineDataset(devices=2, rules_per_device=2)).start()
+    clients = [model.client for model in sensor_models]
+    base_url = rule_engine_client.base_url
+    for model in sensor_models:
+        model.client = InfluxDBClient(url=influx.url, token='token', org='org')
+    rule_engine_client.base_url = engine.url
+    rule_cache.invalidate()
+    device_snapshot.sync(force=True)
+    server = make_server('127.0.0.1', 0, app.server, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}", engine
+    server.shutdown()
+    for model, client in zip(sensor_models, clients):
+        model.client.close()
+        model.client = client
+    rule_engine_client.base_url = base_url
+    rule_cache.invalidate()
+    influx.stop()
+    engine.stop()
+
+
+class TestDashSession:
+
+    def test_page_load_renders_the_sensors_tab(self, dashboard):
+        url, _ = dashboard
+        stats = LoadStats()
+        session = DashSession(url, stats)
+        session.load()
+        session.tick()
+        session.close()
+
+        summary = stats.summary(1, 1.0)
+        assert session.value('active-tab', 'data') == 'sensors'
+        assert summary['callbacks']['sensor-devices-container.children']['count'] == 2
+        assert summary['errors'] == 0
+
+    def test_tab_switch_runs_clientside_and_fills_the_dropdown(self, dashboard):
+        url, _ = dashboard
+        session = DashSession(url, LoadStats())
+        session.load()
+        session.click('nav-charts')
+        session.close()
+
+        assert session.value('nav-charts', 'className') == 'nav-button active'
+        assert [option['value'] for option in session.value('device-dropdown', 'options')][:2] == ['temp_001',
+                                                                                                   'temp_002']
+
+    def test_rule_editing_creates_a_rule(self, dashboard):
+        url, engine = dashboard
+        stats = LoadStats()
+        session = DashSession(url, stats)
+        session.load()
+        rules = len(engine.dataset.rules)
+
+        steps = edit_rules(session, lambda steps=1.0: 0.0, random.Random(1))
+        for _ in range(40):
+            next(steps)
+            if session.value('rule-save-feedback', 'children'):
+                break
+        session.close()
+
+        assert session.value('rule-save-feedback', 'children')['props']['children'] == 'Rule created successfully!'
+        assert len(engine.dataset.rules) == rules + 1
+        assert stats.summary(1, 1.0)['errors'] == 0
+        assert not stats.script_errors
+
+    def test_run_level_reports_every_session(self, dashboard):
+        url, _ = dashboard
+        level = run_level(url, 2, duration=1.0, mix=['sensors', 'actionable'], think=0.2, ramp=0.2)
+
+        assert level['sessions'] == 2
+        assert level['callbacks']['GET /_dash-layout']['count'] == 2
+        assert level['requests'] > 4 and level['errors'] == 0
@@ -0,0 +1,154 @@
+import tracemalloc
+from collections import OrderedDict, deque
+
+import pandas as pd
+import pytest
+
+from src.telemetry.memory import MemoryMonitor, CacheAccount, deep_size, mapping_usage
+
+
+class FixedCache:
+    # Reports a size without being able to drop anything
+    def __init__(self, size):
+        self.size = size
+
+    def memory_usage(self):
+        return 1, self.size
+
+
+class TestDeepSize:
+
+    def test_nested_containers_are_counted(self):
+        payload = [bytes(1000) for _ in range(10)]
+
+        assert deep_size({'payload': payload}) > 10 * 1000
+
+    def test_shared_objects_are_counted_once(self):
+        shared = b'x' * 10000
+        cache = {'a': (shared,), 'b': (shared,)}
+
+        assert mapping_usage(cache)[1] < 2 * 10000
+
+    def test_data_frames_report_their_buffers(self):
+        frame = pd.DataFrame({'value': range(10000), 'device_id': ['sensor-1'] * 10000})
+
+        assert deep_size({'frame': frame}) >= frame.memory_usage(deep=False).sum() >= 2 * 8 * 10000
+
+
+class TestCacheAccount:
+
+    def test_eviction_drops_least_recently_used_entries_first(self):
+        cache = OrderedDict((key, bytes(1000)) for key in 'abcd')
+        cache.move_to_end('a')
+        account = CacheAccount(cache)
+        _, size = account.memory_usage()
+
+        freed = account.evict_to(size // 2)
+
+        assert freed > 0
+        assert list(cache) == ['d', 'a']
+        assert account.memory_usage()[1] <= size // 2
+
+
+class TestMemoryMonitor:
+
+    def test_budget_evicts_from_the_largest_cache_first(self):
+        monitor = MemoryMonitor(budget_bytes=0, interval=0)
+        large = OrderedDict((key, bytes(10000)) for key in range(5))
+        small = OrderedDict((key, bytes(1000)) for key in range(5))
+        monitor.register('large', CacheAccount(large))
+        monitor.register('small', CacheAccount(small))
+        monitor.register('fixed', FixedCache(500))
+        total = sum(cache['bytes'] for cache in monitor.caches())
+
+        freed = monitor.enforce(total - 15000)
+
+        assert list(freed) == ['large']
+        assert len(large) == 3
+        assert len(small) == 5
+        assert sum(cache['bytes'] for cache in monitor.caches()) <= total - 15000
+
+    def test_configured_budget_is_enforced_on_each_sample(self):
+        cache = OrderedDict((key, bytes(10000)) for key in range(5))
+        monitor = MemoryMonitor(budget_bytes=25000, interval=0, history_size=2)
+        monitor.register('cache', CacheAccount(cache))
+        for _ in range(3):
+            point = monitor.sample()
+
+        assert point['cache_bytes'] <= 25000
+        assert point['rss'] > 0
+        assert len(monitor.history) == 2
+
+    def test_snapshot_diff_reports_growth_since_the_previous_snapshot(self):
+        monitor = MemoryMonitor(interval=0, tracemalloc_frames=1)
+        was_tracing = tracemalloc.is_tracing()
+        try:
+            assert monitor.snapshot_diff()['baseline']
+            retained = [bytearray(1000) for _ in range(1000)]
+            diff = monitor.snapshot_diff(limit=5)
+        finally:
+            if not was_tracing:
+                monitor.stop_tracing()
+
+        assert not diff['baseline']
+        top = diff['stats'][0]
+        assert top['size_diff'] >= 1000 * 1000
+        assert 'test_memory.py' in top['location'][0]
+        assert len(retained) == 1000
+
+
+class TestMemoryRoutes:
+
+    @pytest.fixture
+    def client(self, monkeypatch):
+        from flask import Flask
+        from src.dashboard.routes import debug
+        monkeypatch.setattr(debug, 'DEBUG_PAGES_ENABLED', True)
+        app = Flask(__name__)
+        app.register_blueprint(debug.debug_blueprint)
+        return app.test_client()
+
+    def test_pages_are_not_found_unless_enabled(self, client, monkeypatch):
+        from src.dashboard.routes import debug
+        monkeypatch.setattr(debug, 'DEBUG_PAGES_ENABLED', False)
+
+        for path in ['/debug/memory', '/debug/queries', '/debug/profiles', '/debug/startup']:
+            assert client.get(path).status_code == 404
+        assert client.post('/debug/memory/snapshot').status_code == 404
+
+    def test_actions_are_not_found_unless_enabled(self, client, monkeypatch):
+        from src.telemetry.memory import memory
+        monkeypatch.setattr(memory, 'actions_enabled', False)
+        monkeypatch.setattr(memory, 'enforce', lambda budget=None: pytest.fail('evicted while disabled'))
+
+        assert client.post('/debug/memory/budget', data={'bytes': 0}).status_code == 404
+        assert client.post('/debug/memory/snapshot').status_code == 404
+        assert b'MEMORY_ACTIONS_ENABLED' in client.get('/debug/memory').data
+
+        monkeypatch.setattr(memory, 'actions_enabled', True)
+        monkeypatch.setattr(memory, 'enforce', lambda budget=None: {})
+        assert client.post('/debug/memory/budget', data={'bytes': 0, 'format': 'json'}).status_code == 200
+
+    def test_snapshot_arguments_are_checked(self, client, monkeypatch):
+        from src.telemetry.memory import memory
+        calls = []
+        monkeypatch.setattr(memory, 'actions_enabled', True)
+        monkeypatch.setattr(memory, 'snapshot_diff', lambda key_type, limit: calls.append((key_type, limit)) or
+                            {'baseline': True, 'traced': 0, 'stats': []})
+
+        assert client.post('/debug/memory/snapshot', data={'key_type': 'size'}).status_code == 400
+        assert client.post('/debug/memory/snapshot', data={'key_type': 'filename', 'limit': 10 ** 9}).status_code == 200
+        assert client.post('/debug/memory/snapshot', data={'limit': -5}).status_code == 200
+        assert calls == [('filename', 200), ('lineno', 1)]
+
+    def test_memory_page_shows_the_last_sample(self, client, monkeypatch):
+        from src.telemetry.memory import memory
+        monkeypatch.setattr(memory, 'history', deque(maxlen=2))
+        monkeypatch.setattr(memory, 'cache_usage', [])
+        memory.sample()
+        monkeypatch.setattr(memory, 'sample', lambda: pytest.fail('sampled on a page view'))
+        monkeypatch.setattr(memory, 'caches', lambda: pytest.fail('measured on a page view'))
+
+        current = client.get('/debug/memory?format=json').get_json()['current']
+        assert current == memory.history[-1]
+        assert client.get('/debug/memory').status_code == 200
@@ -0,0 +1,97 @@
+import pytest
+
+from src.telemetry import Counter, Gauge, Histogram, Registry, query_shape, query_shape_text
+
+
+class TestMetrics:
+
+    def test_counter_and_gauge_render(self):
+        registry = Registry()
+        requests = Counter('requests_total', 'Requests', ['cache', 'result'], registry=registry)
+        in_flight = Gauge('in_flight', 'In flight', registry=registry)
+        requests.labels('rules', 'hit').inc()
+        requests.labels('rules', 'hit').inc(2)
+        in_flight.inc()
+        in_flight.inc()
+        in_flight.dec()
+
+        text = registry.render()
+        assert '# TYPE requests_total counter' in text
+        assert 'requests_total{cache="rules",result="hit"} 3' in text
+        assert 'in_flight 1' in text
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = Registry()
+        latency = Histogram('latency_seconds', 'Latency', ['endpoint'], buckets=[0.1, 1.0], registry=registry)
+        child = latency.labels('list_rules')
+        for value in [0.05, 0.1, 0.5, 3.0]:
+            child.observe(value)
+
+        text = registry.render()
+        assert 'latency_seconds_bucket{endpoint="list_rules",le="0.1"} 2' in text
+        assert 'latency_seconds_bucket{endpoint="list_rules",le="1"} 3' in text
+        assert 'latency_seconds_bucket{endpoint="list_rules",le="+Inf"} 4' in text
+        assert 'latency_seconds_count{endpoint="list_rules"} 4' in text
+        assert 'latency_seconds_sum{endpoint="list_rules"} 3.65' in text
+
+    def test_label_values_are_escaped(self):
+        registry = Registry()
+        counter = Counter('escaped_total', 'Escaped', ['callback'], registry=registry)
+        counter.labels('a "quoted"\nname').inc()
+
+        assert 'escaped_total{callback="a \\"quoted\\"\\nname"} 1' in registry.render()
+
+    def test_wrong_label_count_and_duplicate_names_raise(self):
+        registry = Registry()
+        counter = Counter('labelled_total', 'Labelled', ['cache'], registry=registry)
+        with pytest.raises(ValueError):
+            counter.labels('a', 'b')
+        with pytest.raises(ValueError):
+            Counter('labelled_total', 'Again', registry=registry)
+
+
+class TestQueryShape:
+
+    def test_literals_and_device_lists_share_a_shape(self):
+        first = '''
+        from(bucket: "sensor-events")
+        |> range(start: -1h)
+        |> filter(fn: (r) => r["type"] == "temperature")
+        |> filter(fn: (r) => r["device_id"] == "a")'''
+        second = '''
+        from(bucket: "sensor-events") |> range(start: -7d)
+        |> filter(fn: (r) => r["type"] == "humidity")
+        |> filter(fn: (r) => r["device_id"] == "b" or r["device_id"] == "c")'''
+
+        assert query_shape(first) == query_shape(second)
+        assert 'r["device_id"] == ?' in query_shape_text(first)
+
+    def test_different_filters_differ(self):
+        assert query_shape('from(bucket: "b") |> filter(fn: (r) => r["type"] == "gas")') != \
+            query_shape('from(bucket: "b") |> filter(fn: (r) => r["location"] == "gas")')
+
+
+
+class TestCallbackNames:
+
+    def test_only_outputs_in_the_callback_map_are_named(self):
+        from types import SimpleNamespace
+        from flask import Flask
+        from src.dashboard.routes.metrics import callback_namer
+
+        def update_graph():
+            pass
+
+        server = Flask(__name__)
+        app = SimpleNamespace(callback_map={})
+        callback_name = callback_namer(app)
+
+        def name_for(output):
+            with server.test_request_context('/_dash-update-component', method='POST', json={'output': output}):
+                return callback_name()
+
+        # Before Dash fills the map nothing is named
+        assert name_for('graph.figure') == 'unknown'
+        app.callback_map['graph.figure'] = {'callback': update_graph}
+        assert name_for('graph.figure') == 'update_graph'
+        assert [name_for(output) for output in ['made-up.children', ['graph.figure'], None]] == ['unknown'] * 3
@@ -0,0 +1,110 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+from src.rules import compile_condition_tree, normalize_condition_tree, to_binary_tree
+
+
+def leaf(sensor, operator, value, time_filter=None):
+    node = {'type': 'condition', 'sensor_device': sensor, 'operator': operator, 'value': value}
+    if time_filter:
+        node['time_filter'] = time_filter
+    return node
+
+
+def chain(group_type, *nodes):
+    tree = nodes[0]
+    for node in nodes[1:]:
+        tree = {'type': group_type, 'left': tree, 'right': node}
+    return tree
+
+
+NOW = datetime(2026, 3, 2, 21, 30, tzinfo=timezone.utc)
+
+
+def random_tree(rng, depth=0):
+    roll = rng.random()
+    if depth > 4 or roll < 0.3:
+        node = leaf(rng.choice('abc'), rng.choice(['gt', 'gte', 'lt', 'lte', 'eq', 'ne']), rng.randint(0, 4))
+        if rng.random() < 0.1:
+            node['time_filter'] = {'type': 'recent', 'minutes': 5}
+        return node
+    if roll < 0.33:
+        return {'type': 'constant', 'value': rng.random() < 0.5}
+    node_type = rng.choice(['and', 'or', 'not', 'and', 'or'])
+    if node_type == 'not':
+        return {'type': 'not', 'child': random_tree(rng, depth + 1)}
+    return {'type': node_type, 'left': random_tree(rng, depth + 1), 'right': random_tree(rng, depth + 1)}
+
+
+class TestNormalize:
+
+    def test_chains_flatten_and_rebalance(self):
+        leaves = [leaf(f"sensor_{i}", 'gt', 1) for i in range(8)]
+        normalized = normalize_condition_tree(chain('and', *leaves))
+
+        assert normalized == {'type': 'and', 'children': leaves}
+        binary = to_binary_tree(normalized)
+        assert binary['left']['left']['left'] == leaves[0]
+        assert binary['right']['right']['right'] == leaves[7]
+
+    def test_not_is_pushed_to_leaves(self):
+        tree = {'type': 'not', 'child': {'type': 'or', 'left': leaf('temp_001', 'gt', 30),
+                                         'right': {'type': 'not', 'child': leaf('motion_001', 'eq', 1)}}}
+
+        assert normalize_condition_tree(tree) == {
+            'type': 'and', 'children': [leaf('temp_001', 'lte', 30), leaf('motion_001', 'eq', 1)]}
+
+    def test_not_stays_above_time_filtered_leaves(self):
+        recent = leaf('motion_001', 'eq', 1, {'type': 'recent', 'minutes': 5})
+
+        assert normalize_condition_tree({'type': 'not', 'child': recent}) == {'type': 'not', 'child': recent}
+
+    def test_duplicate_and_subsumed_comparisons(self):
+        tree = chain('and', leaf('temp_001', 'gt', 20), leaf('humid_001', 'lt', 60),
+                     leaf('temp_001', 'gte', 25), leaf('humid_001', 'lt', 60))
+
+        assert normalize_condition_tree(tree) == {
+            'type': 'and', 'children': [leaf('temp_001', 'gte', 25), leaf('humid_001', 'lt', 60)]}
+        assert normalize_condition_tree(chain('or', leaf('temp_001', 'gt', 20), leaf('temp_001', 'eq', 25))) == \
+            leaf('temp_001', 'gt', 20)
+
+    def test_contradictions_and_tautologies_fold(self):
+        never = chain('and', leaf('temp_001', 'gt', 30), leaf('temp_001', 'lt', 20), leaf('humid_001', 'gt', 1))
+        always = chain('or', leaf('temp_001', 'gt', 30), leaf('temp_001', 'lte', 30))
+
+        assert normalize_condition_tree(never) == {'type': 'constant', 'value': False}
+        assert normalize_condition_tree(always) == {'type': 'constant', 'value': True}
+        assert normalize_condition_tree(chain('and', always, leaf('humid_001', 'gt', 1))) == leaf('humid_001', 'gt', 1)
+
+    def test_rules_are_saved_as_built(self, monkeypatch):
+        from src.dashboard.callbacks import rule_engine
+        tree = chain('and', {'type': 'not', 'child': leaf('temp_001', 'gt', 30)},
+                     chain('and', leaf('humid_001', 'lt', 60), leaf('humid_001', 'lt', 60)))
+        saved = []
+
+        class Response:
+            status_code, content = 201, b''
+
+        monkeypatch.setattr(rule_engine, 'stored_tree', lambda session_id, version: tree)
+        monkeypatch.setattr(rule_engine.rule_engine_client, 'create_rule', lambda payload: saved.append(payload) or Response())
+        monkeypatch.setattr(rule_engine.rule_cache, 'apply_created', lambda device_id, payload, result: None)
+        rule_engine.save_rule(1, 'heater_001', None, 'Cold', 1, None, None, None, 'session-1')
+
+        assert saved[0]['condition_tree'] == tree
+
+    def test_fires_now_counts_a_missing_reading_as_the_rule_engine_does(self):
+        from src.dashboard.callbacks.rule_management import rule_fires_now
+        rule = {'rule_id': 'not-hot', 'conditions': {'type': 'not', 'child': leaf('temp_001', 'gt', 30)}}
+
+        # NOT (temp > 30) holds without a reading; its normalized form temp <= 30 does not
+        assert rule_fires_now(rule, {}) is True
+
+    def test_preserves_evaluation(self):
+        rng = random.Random(11)
+        for _ in range(500):
+            tree = random_tree(rng)
+            literal = compile_condition_tree(tree)
+            normalized = compile_condition_tree(to_binary_tree(normalize_condition_tree(tree)))
+            for _ in range(10):
+                values = {sensor: (rng.randint(-1, 5), NOW - timedelta(minutes=rng.choice([1, 10]))) for sensor in 'abc'}
+                assert literal(values, NOW) == normalized(values, NOW)
@@ -0,0 +1,110 @@
+import json
+import os
+import time
+
+from src.telemetry.profiler import CallProfiler
+
+
+def busy_wait(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class TestCallProfiler:
+
+    def test_sampled_call_writes_collapsed_and_speedscope_files(self, tmp_path):
+        profiler = CallProfiler(enabled=True, sample_every=1, interval=0.001, directory=str(tmp_path))
+
+        @profiler.wrap('busy')
+        def busy():
+            busy_wait(0.05)
+
+        busy()
+        [invocation] = profiler.slowest()
+        assert invocation.name == 'busy'
+        assert invocation.samples > 0
+        assert sorted(os.listdir(tmp_path)) == sorted(invocation.files)
+
+        collapsed = (tmp_path / invocation.files[0]).read_text()
+        assert 'busy_wait (test_profiler.py:' in collapsed
+        speedscope = json.loads((tmp_path / invocation.files[1]).read_text())
+        profile = speedscope['profiles'][0]
+        assert profile['type'] == 'sampled'
+        assert len(profile['samples']) == len(profile['weights'])
+        assert any(frame['name'] == 'busy_wait' for frame in speedscope['shared']['frames'])
+
+    def test_only_one_in_n_calls_is_sampled(self, tmp_path):
+        profiler = CallProfiler(enabled=True, sample_every=3, interval=0.001, directory=str(tmp_path))
+        for _ in range(6):
+            with profiler.profile('call'):
+                busy_wait(0.01)
+
+        assert len(profiler.slowest()) == 6
+        assert sum(1 for invocation in profiler.slowest() if invocation.samples) == 2
+
+    def test_forced_request_samples_every_call(self, tmp_path):
+        profiler = CallProfiler(enabled=True, sample_every=1000, interval=0.001, directory=str(tmp_path))
+        token = profiler.force()
+        try:
+            for _ in range(2):
+                with profiler.profile('call'):
+                    busy_wait(0.01)
+        finally:
+            profiler.unforce(token)
+
+        assert all(invocation.samples for invocation in profiler.slowest())
+
+    def test_nested_calls_are_timed_but_not_sampled_twice(self, tmp_path):
+        profiler = CallProfiler(enabled=True, sample_every=1, interval=0.001, directory=str(tmp_path))
+        with profiler.profile('outer'):
+            with profiler.profile('inner'):
+                busy_wait(0.02)
+
+        by_name = {invocation.name: invocation for invocation in profiler.slowest()}
+        assert by_name['outer'].samples > 0
+        assert by_name['inner'].samples == 0
+        assert profiler.slowest()[0].name == 'outer'
+
+    def test_old_profiles_are_removed(self, tmp_path):
+        profiler = CallProfiler(enabled=True, sample_every=1, interval=0.001, directory=str(tmp_path), max_files=2)
+        for name in ['first', 'second']:
+            with profiler.profile(name):
+                busy_wait(0.02)
+
+        files = os.listdir(tmp_path)
+        assert len(files) == 2
+        assert all('second' in filename for filename in files)
+        assert profiler.profile_path(files[0]) is not None
+        assert profiler.profile_path('../secret') is None
+
+    def test_disabled_profiler_records_nothing(self, tmp_path):
+        profiler = CallProfiler(enabled=False, directory=str(tmp_path))
+        with profiler.profile('call'):
+            pass
+
+        assert profiler.slowest() == []
+        assert not os.listdir(tmp_path)
+
+    def test_requests_can_force_profiling_only_when_debug_pages_are_enabled(self, tmp_path, monkeypatch):
+        from flask import Flask
+        from src.dashboard.routes import debug
+        profiler = CallProfiler(enabled=True, sample_every=1000, interval=0.001, directory=str(tmp_path))
+        monkeypatch.setattr(debug, 'profiler', profiler)
+        app = Flask(__name__)
+        debug.instrument_profiling(app, lambda: 'call')
+
+        @app.route('/work')
+        def work():
+            with profiler.profile('work'):
+                busy_wait(0.01)
+            return ''
+
+        client = app.test_client()
+        monkeypatch.setattr(debug, 'DEBUG_PAGES_ENABLED', False)
+        client.get('/work?profile=1', headers={debug.PROFILE_HEADER: '1'})
+        assert not os.listdir(tmp_path)
+
+        monkeypatch.setattr(debug, 'DEBUG_PAGES_ENABLED', True)
+        client.get('/work?profile=1')
+        assert os.listdir(tmp_path)
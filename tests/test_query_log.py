@@ -0,0 +1,86 @@
+from src.telemetry.query_log import QueryLog, PROFILER_PREAMBLE, parse_flux_profile, format_flux_profile
+
+
+def profiled_records():
+    return [
+        {'_measurement': 'temperature', '_value': 21.5},
+        {'_measurement': 'temperature', '_value': 21.7},
+        {'_measurement': 'profiler/query', 'TotalDuration': 1500000000, 'ExecuteDuration': 1200000000,
+         'influxdb/scanned-values': 40000, 'flux/query-plan': 'digraph {\n  ReadRange\n}'},
+        {'_measurement': 'profiler/operator', 'Type': '*universe.filterTransformation', 'Label': 'filter2',
+         'Count': 4, 'DurationSum': 200000000, 'MeanDuration': 50000000, 'MaxDuration': 90000000},
+        {'_measurement': 'profiler/operator', 'Type': '*influxdb.readFilterSource', 'Label': 'ReadRange3',
+         'Count': 1, 'DurationSum': 900000000, 'MeanDuration': 900000000, 'MaxDuration': 900000000},
+    ]
+
+
+class TestQueryLog:
+
+    def test_queries_are_aggregated_by_fingerprint(self):
+        log = QueryLog(slow_ms=1000, profile_interval=600)
+        for seconds in [0.01, 0.02, 0.03, 0.5]:
+            log.record('abc', 'from(bucket: ?)', 'from(bucket: "a")', seconds, rows=10)
+        log.record('abc', 'from(bucket: ?)', 'from(bucket: "a")', 0.04, failed=True)
+        log.record('def', 'from(bucket: ?) |> last()', 'from(bucket: "a") |> last()', 0.001, rows=1)
+
+        [slowest, fastest] = log.shapes()
+        assert slowest['fingerprint'] == 'abc'
+        assert slowest['count'] == 5
+        assert slowest['errors'] == 1
+        assert slowest['mean_rows'] == 8
+        assert slowest['p50'] == 0.03
+        assert slowest['p99'] == 0.04
+        assert slowest['max'] == 0.5
+        assert fastest['fingerprint'] == 'def'
+
+    def test_slow_queries_are_profiled_once_per_interval(self):
+        log = QueryLog(slow_ms=100, profile_interval=600)
+        assert not log.record('abc', 'shape', 'query', 0.05)
+        assert log.record('abc', 'shape', 'query', 0.2)
+        assert not log.record('abc', 'shape', 'query', 0.3)
+        assert log.record('def', 'shape', 'query', 0.2)
+        assert log.get('abc')['slow'] == 2
+
+    def test_profile_runs_in_background_and_is_kept(self):
+        log = QueryLog(slow_ms=0, profile_interval=0)
+        queries = []
+
+        def run(query):
+            queries.append(query)
+            return profiled_records()
+
+        assert log.record('abc', 'shape', 'from(bucket: "a")', 0.2, rows=2)
+        log.profile_in_background('abc', 'from(bucket: "a")', run).join(1)
+
+        assert queries == [PROFILER_PREAMBLE + 'from(bucket: "a")']
+        profile = log.get('abc')['profile']
+        assert profile['rows'] == 2
+        assert log.record('abc', 'shape', 'from(bucket: "a")', 0.2, rows=2)
+
+    def test_failed_profile_allows_a_later_attempt(self):
+        log = QueryLog(slow_ms=0, profile_interval=0)
+
+        def run(query):
+            raise RuntimeError("profiler not available")
+
+        assert log.record('abc', 'shape', 'query', 0.2)
+        assert not log.record('abc', 'shape', 'query', 0.2)
+        log.profile_in_background('abc', 'query', run).join(1)
+        assert log.get('abc')['profile'] is None
+        assert log.record('abc', 'shape', 'query', 0.2)
+
+
+class TestFluxProfile:
+
+    def test_profiler_tables_are_separated_from_results(self):
+        profile = parse_flux_profile(profiled_records())
+
+        assert profile['rows'] == 2
+        assert profile['query']['TotalDuration'] == 1500000000
+        assert profile['query']['plan'].startswith('digraph')
+        assert [operator['label'] for operator in profile['operators']] == ['ReadRange3', 'filter2']
+
+        text = format_flux_profile(profile)
+        assert 'total 1500.0 ms' in text
+        assert '*influxdb.readFilterSource' in text.splitlines()[1]
+        assert '    ReadRange' in text
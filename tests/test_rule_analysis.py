@@ -0,0 +1,87 @@
+from src.rules import IntervalSet, RuleNetwork, analyze_rules, is_satisfiable
+
+
+def leaf(sensor, operator, value, time_filter=None):
+    node = {'type': 'condition', 'sensor_device': sensor, 'operator': operator, 'value': value}
+    if time_filter:
+        node['time_filter'] = time_filter
+    return node
+
+
+def both(group_type, left, right):
+    return {'type': group_type, 'left': left, 'right': right}
+
+
+def rule(rule_id, conditions, actions, enabled=True):
+    return {'rule_id': rule_id, 'rule_name': f"Rule {rule_id}", 'conditions': conditions,
+            'actions': actions, 'enabled': enabled}
+
+
+class TestIntervalSet:
+
+    def test_set_operations(self):
+        above = IntervalSet.from_comparison('gt', 20)
+        below = IntervalSet.from_comparison('lte', 25)
+
+        assert above.intersection(below).contains(25)
+        assert not above.intersection(below).contains(20)
+        assert above.union(below).is_full()
+        assert IntervalSet.from_comparison('ne', 3).complement() == IntervalSet.from_comparison('eq', 3)
+        assert above.intersection(IntervalSet.from_comparison('lt', 20)).is_empty()
+
+
+class TestSatisfiability:
+
+    def test_contradictory_bounds(self):
+        assert not is_satisfiable(both('and', leaf('temp_001', 'gt', 30), leaf('temp_001', 'lt', 20)))
+        assert is_satisfiable(both('and', leaf('temp_001', 'gt', 30), leaf('humid_001', 'lt', 20)))
+
+    def test_contradiction_across_branches(self):
+        tree = both('and', both('or', leaf('temp_001', 'gt', 30), leaf('temp_001', 'eq', 10)),
+                    both('and', leaf('temp_001', 'lt', 25), leaf('temp_001', 'ne', 10)))
+        assert not is_satisfiable(tree)
+
+    def test_disjoint_time_windows(self):
+        morning = leaf('temp_001', 'gt', 20, {'type': 'time_of_day', 'start': '06:00', 'end': '09:00'})
+        night = leaf('humid_001', 'gt', 50, {'type': 'time_of_day', 'start': '22:00', 'end': '05:00'})
+        weekdays = leaf('temp_001', 'gt', 20, {'type': 'days_of_week', 'days': ['monday', 'tuesday']})
+        weekend = leaf('humid_001', 'gt', 50, {'type': 'days_of_week', 'days': ['saturday']})
+
+        assert not is_satisfiable(both('and', morning, night))
+        assert not is_satisfiable(both('and', weekdays, weekend))
+
+    def test_network_skips_rules_that_never_fire(self):
+        network = RuleNetwork()
+        network.add_rule(rule(1, both('and', leaf('temp_001', 'gt', 30), leaf('temp_001', 'lt', 20)), {}))
+
+        assert network.on_reading('temp_001', 25) == []
+        assert network.rule_state(1) is False
+        assert [r['rule_id'] for r in network.rules_for_sensor('temp_001')] == [1]
+
+
+class TestConflicts:
+
+    def test_overlapping_rules_with_different_values(self):
+        rules = [
+            rule(1, leaf('temp_001', 'gt', 25), {'power': {'toggle': 'on'}}),
+            rule(2, leaf('temp_001', 'gt', 28), {'power': {'toggle': 'off'}}),
+            rule(3, leaf('temp_001', 'lt', 18), {'power': {'toggle': 'off'}}),
+            rule(4, leaf('temp_001', 'gt', 40), {'power': {'toggle': 'on'}}),
+        ]
+
+        analysis = analyze_rules(rules)
+
+        assert [(c.rule_ids, c.capability) for c in analysis.conflicts] == [(('1', '2'), 'power'), (('2', '4'), 'power')]
+        assert analysis.conflicts_for(3) == []
+
+    def test_disabled_and_unsatisfiable_rules_do_not_conflict(self):
+        rules = [
+            rule(1, leaf('temp_001', 'gt', 25), {'power': {'toggle': 'on'}}),
+            rule(2, leaf('temp_001', 'gt', 25), {'power': {'toggle': 'off'}}, enabled=False),
+            rule(3, both('and', leaf('temp_001', 'gt', 30), leaf('temp_001', 'lt', 20)), {'power': {'toggle': 'off'}}),
+        ]
+
+        analysis = analyze_rules(rules)
+
+        assert analysis.conflicts == []
+        assert analysis.unsatisfiable == {'3'}
@@ -0,0 +1,97 @@
+import warnings
+from datetime import timedelta, timezone
+
+import pandas as pd
+
+from src.models.sensor import MotionModel
+from src.models.sensor_cache import relative_range
+from src.rules import backtest_frame, backtest_rule
+from src.rules.backtest import resolve_start_time
+
+
+def readings(device_id, start, values, freq='1min'):
+    times = pd.date_range(start, periods=len(values), freq=freq, tz='UTC')
+    return pd.DataFrame({'_time': times, 'value': values, 'device_id': device_id})
+
+
+def leaf(sensor, operator, value, time_filter=None):
+    node = {'type': 'condition', 'sensor_device': sensor, 'operator': operator, 'value': value}
+    if time_filter:
+        node['time_filter'] = time_filter
+    return node
+
+
+class TestBacktest:
+
+    def test_counts_fire_intervals(self):
+        data = readings('temp_001', '2026-03-02 10:00', [20, 26, 27, 21, 25, 19])
+
+        result = backtest_frame(leaf('temp_001', 'gte', 25), data, end=pd.Timestamp('2026-03-02 10:06', tz='UTC'))
+
+        assert result.fire_count == 2
+        assert result.active_seconds == 180
+        assert result.intervals[0] == (pd.Timestamp('2026-03-02 10:01', tz='UTC'), pd.Timestamp('2026-03-02 10:03', tz='UTC'))
+
+    def test_as_of_join_across_sensors(self):
+        data = pd.concat([
+            readings('temp_001', '2026-03-02 10:00', [26, 26, 26, 26]),
+            readings('motion_001', '2026-03-02 10:01:30', [1, 0], freq='1min'),
+        ])
+        tree = {'type': 'and', 'left': leaf('temp_001', 'gte', 25), 'right': leaf('motion_001', 'eq', 1)}
+
+        result = backtest_frame(tree, data, end=pd.Timestamp('2026-03-02 10:04', tz='UTC'))
+
+        assert result.fire_count == 1
+        assert result.active_seconds == 60
+
+    def test_time_of_day_mask_splits_intervals(self):
+        data = readings('temp_001', '2026-03-02 07:00', [30], freq='1h')
+        tree = leaf('temp_001', 'gt', 25, {'type': 'time_of_day', 'start': '08:00', 'end': '09:30'})
+
+        result = backtest_frame(tree, data, end=pd.Timestamp('2026-03-02 12:00', tz='UTC'), tz=timezone.utc)
+
+        assert result.fire_count == 1
+        assert result.active_seconds == 90 * 60
+
+    def test_recent_filter_expires_readings(self):
+        data = readings('motion_001', '2026-03-02 10:00', [1], freq='1h')
+        tree = leaf('motion_001', 'eq', 1, {'type': 'recent', 'minutes': 10})
+
+        result = backtest_frame(tree, data, end=pd.Timestamp('2026-03-02 11:00', tz='UTC'))
+
+        assert result.fire_count == 1
+        assert round(result.active_seconds) == 600
+
+    def test_repeated_readings_keep_recent_filters_active(self, monkeypatch):
+        # A motion sensor reporting 1 every 10 s for ten minutes
+        start = pd.Timestamp.now(tz='UTC').floor('s') - pd.Timedelta(minutes=10)
+        data = readings('motion_001', start, [1] * 61, freq='10s')
+        data['location'], data['type'] = 'hallway', 'motion'
+        model = MotionModel()
+        model.cache = None
+        monkeypatch.setattr(model, '_sensor_frame', lambda *args, **kwargs: data.copy())
+        tree = leaf('motion_001', 'eq', 1, {'type': 'recent', 'minutes': 1})
+
+        result = backtest_rule(tree, [model], start_time='-10m')
+
+        assert len(model.get_sensor_data('-10m', ['motion_001'])) == 1
+        assert result.fire_count == 1
+        assert result.active_seconds >= 599
+
+
+class TestStartTime:
+
+    def test_relative_ranges_map_units_explicitly(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            assert relative_range('-7d') == timedelta(days=7)
+            assert relative_range('-2w') == timedelta(weeks=2)
+            assert relative_range('-90s') == timedelta(seconds=90)
+            start = resolve_start_time('-12h')
+        assert abs(pd.Timestamp.now(tz='UTC') - timedelta(hours=12) - start) < timedelta(seconds=5)
+
+    def test_anything_else_is_not_a_relative_range(self):
+        for start_time in ('7d', '-7', '-7d) |> drop()', '-7d\n', '-1.5h', None):
+            assert relative_range(start_time) is None
+        assert resolve_start_time('-soon') is None
+        assert resolve_start_time('2026-01-01T00:00:00Z') == pd.Timestamp('2026-01-01T00:00:00Z')
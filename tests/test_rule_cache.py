@@ -0,0 +1,112 @@
+import json
+import requests
+
+from src.dashboard.utils.rule_cache import RuleCache
+
+
+class FakeRuleEngine:
+    def __init__(self, rules, etag='"v1"'):
+        self.rules = rules
+        self.etag = etag
+        self.requests = []
+
+    def list_rules(self, device_id, headers=None):
+        self.requests.append((device_id, dict(headers or {})))
+        response = requests.Response()
+        if self.etag and (headers or {}).get('If-None-Match') == self.etag:
+            response.status_code = 304
+            response._content = b''
+        else:
+            response.status_code = 200
+            response._content = json.dumps({'success': True, 'rules': self.rules}).encode()
+            if self.etag:
+                response.headers['ETag'] = self.etag
+        return response
+
+
+def make_rules():
+    return [
+        {'rule_id': 1, 'rule_name': 'Heat on', 'enabled': True, 'conditions': {}, 'actions': {}},
+        {'rule_id': 2, 'rule_name': 'Heat off', 'enabled': False, 'conditions': {}, 'actions': {}},
+    ]
+
+
+class TestRuleCache:
+
+    def test_rule_lookup_uses_index(self):
+        engine = FakeRuleEngine(make_rules())
+        cache = RuleCache(engine, ttl=60)
+
+        assert len(cache.get_rules('heater_001')) == 2
+        assert cache.get_rule('heater_001', '2')['rule_name'] == 'Heat off'
+        assert len(engine.requests) == 1
+
+    def test_rule_lookup_checks_the_device_and_freshness(self):
+        engine = FakeRuleEngine(make_rules())
+        cache = RuleCache(engine, ttl=0)
+        cache.get_rules('heater_001')
+        engine.rules = [dict(make_rules()[1], rule_name='Heat off at night')]
+        engine.etag = '"v2"'
+
+        assert cache.get_rule('heater_001', 2)['rule_name'] == 'Heat off at night'
+        assert cache.get_rule('heater_001', 1) is None
+
+        engine.rules = []
+        assert cache.get_rule('fan_001', 2) is None
+        assert engine.requests[-1][0] == 'fan_001'
+
+    def test_revalidates_with_etag(self):
+        engine = FakeRuleEngine(make_rules())
+        cache = RuleCache(engine, ttl=0)
+
+        cache.get_rules('heater_001')
+        rules = cache.get_rules('heater_001')
+
+        assert len(rules) == 2
+        assert engine.requests[1][1] == {'If-None-Match': '"v1"'}
+
+    def test_write_through(self):
+        engine = FakeRuleEngine(make_rules())
+        cache = RuleCache(engine, ttl=60)
+        cache.get_rules('heater_001')
+
+        cache.apply_toggled(1, {'success': True})
+        cache.apply_deleted(2)
+        cache.apply_updated(1, {'rule_name': 'Heat on early', 'condition_tree': {'type': 'condition'}})
+        cache.apply_created('heater_001', {'rule_name': 'Boost', 'condition_tree': {}, 'actions': {}}, {'rule_id': 3})
+
+        rules = {rule['rule_id']: rule for rule in cache.get_rules('heater_001')}
+        assert set(rules) == {1, 3}
+        assert rules[1]['enabled'] is False
+        assert rules[1]['rule_name'] == 'Heat on early'
+        assert rules[3]['rule_name'] == 'Boost'
+        assert len(engine.requests) == 1
+
+    def test_listeners_see_every_change(self):
+        engine = FakeRuleEngine(make_rules())
+        cache = RuleCache(engine, ttl=0)
+        seen = []
+        cache.add_listener(lambda device_id, rules: seen.append((device_id, sorted(r['rule_id'] for r in rules))))
+
+        cache.get_rules('heater_001')
+        cache.get_rules('heater_001')
+        cache.apply_deleted(2)
+
+        assert seen == [('heater_001', [1, 2]), ('heater_001', [1])]
+
+    def test_compiled_conditions_of_deleted_rules_are_dropped(self):
+        from src.dashboard.callbacks import rule_management
+
+        engine = FakeRuleEngine(make_rules())
+        cache = RuleCache(engine, ttl=60)
+        cache.add_listener(rule_management.prune_compiled_conditions)
+        rules = cache.get_rules('heater_001')
+        leaf = {'type': 'condition', 'sensor_device': 'temp_001', 'operator': 'gte', 'value': 20}
+        for rule in rules:
+            rule_management.rule_fires_now(dict(rule, conditions=leaf), {})
+        assert {'1', '2'} <= set(rule_management._compiled_conditions)
+
+        cache.apply_deleted(2)
+
+        assert '1' in rule_management._compiled_conditions
+        assert '2' not in rule_management._compiled_conditions
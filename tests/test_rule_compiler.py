@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.rules import compile_condition_tree
+
+
+def leaf(sensor, operator, value, time_filter=None):
+    node = {'type': 'condition', 'sensor_device': sensor, 'operator': operator, 'value': value}
+    if time_filter:
+        node['time_filter'] = time_filter
+    return node
+
+
+NOW = datetime(2026, 3, 2, 21, 30, tzinfo=timezone.utc)  # a Monday
+
+
+class TestCompiledCondition:
+
+    def test_and_false_is_decided_by_failing_leaf(self):
+        tree = {'type': 'and', 'left': leaf('temp_001', 'gte', 25), 'right': leaf('motion_001', 'eq', 1)}
+        compiled = compile_condition_tree(tree)
+
+        result = compiled.evaluate({'temp_001': 27, 'motion_001': 0}, NOW)
+
+        assert result.result is False
+        assert result.deciding_leaves == ['root_right']
+
+    def test_nested_chain_is_flattened(self):
+        tree = {'type': 'and',
+                'left': {'type': 'and', 'left': leaf('a', 'gt', 1), 'right': leaf('b', 'gt', 1)},
+                'right': leaf('c', 'gt', 1)}
+        compiled = compile_condition_tree(tree)
+
+        result = compiled.evaluate({'a': 2, 'b': 2, 'c': 2}, NOW)
+
+        assert result.result is True
+        assert sorted(result.deciding_leaves) == ['root_left_left', 'root_left_right', 'root_right']
+
+    def test_or_and_not(self):
+        tree = {'type': 'or',
+                'left': {'type': 'not', 'child': leaf('humid_001', 'lt', 60)},
+                'right': leaf('gas_001', 'neq', 0)}
+        compiled = compile_condition_tree(tree)
+
+        assert compiled({'humid_001': 70, 'gas_001': 0}, NOW) is True
+        assert compiled({'humid_001': 50, 'gas_001': 0}, NOW) is False
+        assert compiled.evaluate({'humid_001': 50, 'gas_001': 0.2}, NOW).deciding_leaves == ['root_right']
+
+    def test_missing_sensor_is_false(self):
+        assert compile_condition_tree(leaf('temp_009', 'lte', 100))({}, NOW) is False
+
+    def test_time_filters(self):
+        evening = leaf('temp_001', 'gte', 20, {'type': 'time_of_day', 'start': '21:00', 'end': '06:00'})
+        weekend = leaf('temp_001', 'gte', 20, {'type': 'days_of_week', 'days': ['saturday', 'sunday']})
+        recent = leaf('temp_001', 'gte', 20, {'type': 'recent', 'minutes': 10})
+
+        assert compile_condition_tree(evening)({'temp_001': 21}, NOW) is True
+        assert compile_condition_tree(weekend)({'temp_001': 21}, NOW) is False
+        assert compile_condition_tree(recent)({'temp_001': (21, NOW - timedelta(minutes=5))}, NOW) is True
+        assert compile_condition_tree(recent)({'temp_001': (21, NOW - timedelta(minutes=15))}, NOW) is False
+
+    def test_unknown_operator_is_rejected(self):
+        with pytest.raises(ValueError):
+            compile_condition_tree(leaf('temp_001', 'between', 3))
@@ -0,0 +1,106 @@
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from src.clients.rule_engine import RuleEngineClient, RuleEngineUnavailableError, CircuitBreaker
+
+
+class StubAdapter(BaseAdapter):
+    def __init__(self, status_code=200, body=b'{"success": true}', error=None):
+        super().__init__()
+        self.status_code = status_code
+        self.body = body
+        self.error = error
+        self.calls = []
+
+    def send(self, request, **kwargs):
+        self.calls.append((request.method, request.url, kwargs.get('timeout')))
+        if self.error:
+            raise self.error
+        response = requests.Response()
+        response.status_code = self.status_code
+        response._content = self.body
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+def make_client(adapter, threshold=2, reset_timeout=60.0):
+    client = RuleEngineClient(base_url='http://rule-engine:5001', breaker=CircuitBreaker(threshold, reset_timeout))
+    client.session.mount('http://', adapter)
+    return client
+
+
+class TestRuleEngineClient:
+
+    def test_uses_endpoint_timeouts(self):
+        adapter = StubAdapter()
+        client = make_client(adapter)
+
+        response = client.list_rules('light_001')
+
+        assert response.json()['success'] is True
+        method, url, timeout = adapter.calls[0]
+        assert (method, url) == ('GET', 'http://rule-engine:5001/rules/light_001')
+        assert timeout == (client.connect_timeout, client.read_timeouts['list_rules'])
+
+    def test_breaker_opens_and_fails_fast(self):
+        adapter = StubAdapter(error=requests.ConnectionError("refused"))
+        client = make_client(adapter, threshold=2)
+
+        for _ in range(2):
+            with pytest.raises(requests.ConnectionError):
+                client.list_devices()
+
+        with pytest.raises(RuleEngineUnavailableError):
+            client.list_devices()
+        assert len(adapter.calls) == 2
+        assert client.breaker.state == CircuitBreaker.OPEN
+
+    def test_breaker_half_open_recovers(self):
+        adapter = StubAdapter(status_code=503)
+        client = make_client(adapter, threshold=1, reset_timeout=0.0)
+
+        client.list_devices()
+        assert client.breaker.state == CircuitBreaker.HALF_OPEN
+
+        adapter.status_code = 200
+        client.list_devices()
+        assert client.breaker.state == CircuitBreaker.CLOSED
+
+    def test_unexpected_errors_release_the_half_open_trial(self):
+        adapter = StubAdapter(status_code=503)
+        client = make_client(adapter, threshold=1, reset_timeout=0.0)
+        client.list_devices()
+
+        adapter.error = ValueError("bad adapter")
+        with pytest.raises(ValueError):
+            client.list_devices()
+
+        adapter.error = None
+        adapter.status_code = 200
+        client.list_devices()
+        assert client.breaker.state == CircuitBreaker.CLOSED
+
+    def test_client_errors_do_not_trip_breaker(self):
+        adapter = StubAdapter(status_code=404, body=b'{"success": false}')
+        client = make_client(adapter, threshold=1)
+
+        client.delete_rule('rule_1')
+        client.delete_rule('rule_1')
+
+        assert client.breaker.state == CircuitBreaker.CLOSED
+
+    def test_latency_stats_per_endpoint(self):
+        client = make_client(StubAdapter())
+
+        client.list_devices()
+        client.toggle_rule('rule_1')
+        stats = client.latency_stats()
+
+        assert stats['list_devices']['count'] == 1
+        assert stats['toggle_rule']['errors'] == 0
+        assert stats['toggle_rule']['p99'] >= stats['toggle_rule']['p50']
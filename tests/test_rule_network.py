@@ -0,0 +1,128 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+from src.rules import RuleNetwork, compile_condition_tree
+
+
+def leaf(sensor, operator, value, time_filter=None):
+    node = {'type': 'condition', 'sensor_device': sensor, 'operator': operator, 'value': value}
+    if time_filter:
+        node['time_filter'] = time_filter
+    return node
+
+
+NOW = datetime(2026, 3, 2, 21, 30, tzinfo=timezone.utc)
+
+
+def random_tree(rng, depth=0):
+    if depth > 3 or rng.random() < 0.35:
+        return leaf(rng.choice('abcd'), rng.choice(['gt', 'gte', 'lt', 'lte', 'eq', 'ne']), rng.randint(0, 4))
+    node_type = rng.choice(['and', 'or', 'not'])
+    if node_type == 'not':
+        return {'type': 'not', 'child': random_tree(rng, depth + 1)}
+    return {'type': node_type, 'left': random_tree(rng, depth + 1), 'right': random_tree(rng, depth + 1)}
+
+
+class TestRuleNetwork:
+
+    def test_reading_emits_transitions_for_dependent_rules_only(self):
+        network = RuleNetwork()
+        network.sync_rules('ac_001', [
+            {'rule_id': 1, 'conditions': leaf('temp_001', 'gte', 25)},
+            {'rule_id': 2, 'conditions': {'type': 'and', 'left': leaf('temp_001', 'gte', 25),
+                                          'right': leaf('motion_001', 'eq', 1)}},
+            {'rule_id': 3, 'conditions': leaf('humid_001', 'lt', 40)},
+        ])
+
+        transitions = network.on_reading('temp_001', 27, now=NOW)
+        assert [(t.rule_id, t.active) for t in transitions] == [('1', True)]
+
+        transitions = network.on_reading('motion_001', 1, now=NOW)
+        assert [(t.rule_id, t.active) for t in transitions] == [('2', True)]
+
+        transitions = network.on_reading('temp_001', 20, now=NOW)
+        assert sorted((t.rule_id, t.active) for t in transitions) == [('1', False), ('2', False)]
+
+    def test_identical_leaves_and_subtrees_are_shared(self):
+        network = RuleNetwork()
+        shared = {'type': 'and', 'left': leaf('temp_001', 'gte', 25), 'right': leaf('motion_001', 'eq', 1)}
+        swapped = {'type': 'and', 'left': leaf('motion_001', 'eq', 1.0), 'right': leaf('temp_001', 'gte', 25)}
+        network.sync_rules('ac_001', [{'rule_id': 1, 'conditions': shared}, {'rule_id': 2, 'conditions': swapped}])
+
+        assert network.node_count == 3
+
+        network.remove_rule(1)
+        assert network.node_count == 3
+        network.remove_rule(2)
+        assert network.node_count == 0
+
+    def test_rules_for_sensor_follows_sync(self):
+        network = RuleNetwork()
+        network.sync_rules('ac_001', [{'rule_id': 1, 'rule_name': 'Cool', 'conditions': leaf('temp_001', 'gte', 25)}])
+        network.sync_rules('light_001', [{'rule_id': 2, 'rule_name': 'Night', 'conditions': leaf('temp_001', 'lt', 5)}])
+        assert [rule['rule_name'] for rule in network.rules_for_sensor('temp_001')] == ['Cool', 'Night']
+
+        network.sync_rules('ac_001', [])
+        assert [rule['rule_name'] for rule in network.rules_for_sensor('temp_001')] == ['Night']
+
+    def test_invalid_rules_are_skipped(self):
+        network = RuleNetwork()
+        network.sync_rules('ac_001', [{'rule_id': 1, 'conditions': leaf('temp_001', 'approx', 25)},
+                                      {'rule_id': 2, 'conditions': None}])
+        assert len(network) == 0
+
+    def test_failed_builds_leave_no_nodes_behind(self):
+        network = RuleNetwork()
+        broken = {'type': 'and', 'left': leaf('temp_001', 'gte', 25), 'right': leaf('motion_001', 'approx', 1)}
+        network.sync_rules('ac_001', [{'rule_id': 1, 'conditions': broken},
+                                      {'conditions': leaf('humid_001', 'lt', 40)}])
+
+        assert len(network) == 0
+        assert network.node_count == 0
+        assert network.on_reading('temp_001', 27, now=NOW) == []
+
+    def test_recent_filter_uses_reading_time(self):
+        network = RuleNetwork()
+        network.add_rule({'rule_id': 1, 'conditions': leaf('temp_001', 'gte', 20, {'type': 'recent', 'minutes': 10})})
+
+        assert network.on_reading('temp_001', 21, NOW - timedelta(minutes=30), now=NOW) == []
+        assert network.on_reading('temp_001', 21, NOW - timedelta(minutes=1), now=NOW)[0].active is True
+
+    def test_matches_compiled_evaluation(self):
+        rng = random.Random(7)
+        rules = [{'rule_id': i, 'conditions': random_tree(rng)} for i in range(200)]
+        network = RuleNetwork()
+        network.sync_rules('ac_001', rules)
+        compiled = {str(rule['rule_id']): compile_condition_tree(rule['conditions']) for rule in rules}
+        # Normalized NOTs only agree with the literal tree once every sensor has a reading
+        values = {sensor: 0 for sensor in 'abcd'}
+        for sensor in values:
+            network.on_reading(sensor, 0, now=NOW)
+
+        for _ in range(500):
+            sensor, value = rng.choice('abcd'), rng.randint(0, 4)
+            values[sensor] = value
+            network.on_reading(sensor, value, now=NOW)
+            for rule_id, condition in compiled.items():
+                assert network.rule_state(rule_id) == condition(values, NOW)
+
+    def test_tick_flips_time_of_day_rules_at_boundaries(self):
+        network = RuleNetwork()
+        evening = leaf('temp_001', 'gte', 20, {'type': 'time_of_day', 'start': '22:00', 'end': '06:00'})
+        network.add_rule({'rule_id': 1, 'conditions': evening}, NOW)
+        network.on_reading('temp_001', 21, now=NOW)
+
+        assert network.rule_state(1) is False
+        assert network.next_wakeup(1) == NOW.replace(hour=22, minute=0)
+        assert network.tick(NOW + timedelta(minutes=29)) == []
+        assert [(t.rule_id, t.active) for t in network.tick(NOW + timedelta(minutes=30))] == [('1', True)]
+        assert [(t.rule_id, t.active) for t in network.tick(NOW + timedelta(hours=8, minutes=30))] == [('1', False)]
+
+    def test_tick_expires_recent_readings(self):
+        network = RuleNetwork()
+        network.add_rule({'rule_id': 1, 'conditions': leaf('motion_001', 'eq', 1, {'type': 'recent', 'minutes': 5})}, NOW)
+        network.on_reading('motion_001', 1, NOW, now=NOW)
+
+        assert network.rule_state(1) is True
+        assert network.tick(NOW + timedelta(minutes=5)) == []
+        assert [(t.rule_id, t.active) for t in network.tick(NOW + timedelta(minutes=5, seconds=1))] == [('1', False)]
@@ -0,0 +1,45 @@
+from src.dashboard.utils.rule_search import RuleSearchIndex, RuleSearchIndexCache
+
+
+def make_rules(count):
+    return [
+        {'rule_id': i, 'rule_name': f'Rule {i} {"heating" if i % 2 else "cooling"}',
+         'actions': {'power': {'toggle': 'on' if i % 3 else 'off'}}}
+        for i in range(count)
+    ]
+
+
+class TestRuleSearchIndex:
+
+    def test_matches_substring_of_name(self):
+        index = RuleSearchIndex(make_rules(10))
+
+        assert [rule['rule_id'] for rule in index.search('HEAT')] == [1, 3, 5, 7, 9]
+        assert [rule['rule_id'] for rule in index.search('e 4')] == [4]
+        assert index.search('missing') == []
+
+    def test_matches_action_summary(self):
+        index = RuleSearchIndex(make_rules(7))
+
+        assert [rule['rule_id'] for rule in index.search('power: off')] == [0, 3, 6]
+
+    def test_empty_query_returns_all_in_order(self):
+        rules = make_rules(5)
+
+        assert RuleSearchIndex(rules).search('  ') == rules
+
+    def test_pagination_clamps_page(self):
+        index = RuleSearchIndex(make_rules(55))
+
+        page_rules, total, page_count = index.page('', 10, 25)
+
+        assert (total, page_count) == (55, 3)
+        assert [rule['rule_id'] for rule in page_rules] == list(range(50, 55))
+
+    def test_cache_rebuilds_on_new_revision(self):
+        cache = RuleSearchIndexCache()
+        rules = make_rules(3)
+
+        first = cache.get('heater_001', 1, rules)
+        assert cache.get('heater_001', 1, rules) is first
+        assert cache.get('heater_001', 2, rules) is not first
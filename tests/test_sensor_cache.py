@@ -0,0 +1,239 @@
+import threading
+
+import pandas as pd
+import pytest
+from influxdb_client import InfluxDBClient
+
+from benchmarks.standins import FakeInfluxDB, SensorDataset
+from src.models.sensor import TemperatureModel
+from src.models.sensor_cache import SensorCache, COLUMNS
+
+NOW = pd.Timestamp('2026-03-01T12:00:30Z')
+
+
+def readings(*rows):
+    # (device_id, minutes before NOW, value)
+    return pd.DataFrame([{'_time': NOW - pd.Timedelta(minutes=minutes), 'value': value, 'device_id': device_id,
+                          'location': 'kitchen', 'type': 'temperature'} for device_id, minutes, value in rows],
+                        columns=COLUMNS)
+
+
+class FakeBackend:
+    def __init__(self):
+        self.latest = readings()
+        self.series = readings()
+        self.calls = []
+        self.fail = False
+
+    def fetch_latest(self, since):
+        return self._fetch('latest', since, self.latest)
+
+    def fetch_series(self, since):
+        return self._fetch('series', since, self.series)
+
+    def _fetch(self, kind, since, frame):
+        self.calls.append((kind, since))
+        if self.fail:
+            raise ConnectionError('refused')
+        return frame[frame['_time'] >= since]
+
+
+@pytest.fixture
+def clock():
+    return {'now': NOW}
+
+
+@pytest.fixture
+def backend():
+    return FakeBackend()
+
+
+@pytest.fixture
+def cache(backend, clock):
+    return SensorCache(backend.fetch_latest, backend.fetch_series, refresh_interval=0, overlap=120, window_hours=24,
+                       clock=lambda: clock['now'])
+
+
+class TestLatest:
+
+    def test_refreshes_only_ask_for_readings_since_the_last_query(self, cache, backend, clock):
+        backend.latest = readings(('temp_002', 30, 20.5), ('temp_001', 60 * 24 * 3, 19.0))
+        assert list(cache.latest()['device_id']) == ['temp_001', 'temp_002']
+
+        clock['now'] = NOW + pd.Timedelta(minutes=10)
+        backend.latest = readings(('temp_002', -5, 21.0))
+        latest = cache.latest()
+
+        assert [since for _, since in backend.calls] == [pd.Timestamp('2026-02-22T12:00:00Z'),
+                                                         pd.Timestamp('2026-03-01T11:58:00Z')]
+        assert list(zip(latest['device_id'], latest['value'])) == [('temp_001', 19.0), ('temp_002', 21.0)]
+
+    def test_devices_silent_for_a_week_drop_out(self, cache, backend, clock):
+        backend.latest = readings(('temp_001', 60 * 24 * 6, 19.0), ('temp_002', 10, 20.0))
+        cache.latest()
+        clock['now'] = NOW + pd.Timedelta(days=2)
+        backend.latest = readings()
+
+        assert list(cache.latest()['device_id']) == ['temp_002']
+
+    def test_failed_refresh_serves_the_cached_readings(self, cache, backend):
+        backend.latest = readings(('temp_001', 1, 19.0))
+        cache.latest()
+        backend.fail = True
+
+        assert list(cache.latest()['value']) == [19.0]
+
+    def test_reads_within_the_refresh_interval_do_not_query(self, backend, clock):
+        cache = SensorCache(backend.fetch_latest, backend.fetch_series, refresh_interval=60,
+                            clock=lambda: clock['now'])
+        cache.latest()
+        cache.latest()
+
+        assert len(backend.calls) == 1
+
+
+class TestSeries:
+
+    def test_window_is_fetched_once_then_extended_with_new_readings(self, cache, backend, clock):
+        backend.series = readings(('temp_001', 50, 19.0), ('temp_001', 20, 19.5), ('temp_002', 10, 21.0))
+        assert len(cache.series(NOW - pd.Timedelta(hours=1))) == 3
+
+        clock['now'] = NOW + pd.Timedelta(minutes=5)
+        backend.series = readings(('temp_001', 20, 19.5), ('temp_001', -4, 19.7))
+        series = cache.series(clock['now'] - pd.Timedelta(hours=1))
+
+        assert backend.calls[1] == ('series', pd.Timestamp('2026-03-01T11:58:00Z'))
+        assert list(zip(series['device_id'], series['value'])) == [('temp_001', 19.0), ('temp_001', 19.5),
+                                                                   ('temp_001', 19.7), ('temp_002', 21.0)]
+
+    def test_shorter_windows_are_sliced_from_the_cached_one(self, cache, backend):
+        backend.series = readings(('temp_001', 50, 19.0), ('temp_001', 20, 19.5))
+        cache.series(NOW - pd.Timedelta(hours=1))
+        cache.refresh_interval = 60
+
+        assert list(cache.series(NOW - pd.Timedelta(minutes=30))['value']) == [19.5]
+        assert len(backend.calls) == 1
+
+    def test_wider_windows_refetch_and_windows_past_the_limit_are_not_cached(self, cache, backend):
+        backend.series = readings(('temp_001', 50, 19.0), ('temp_001', 200, 18.0))
+        cache.series(NOW - pd.Timedelta(hours=1))
+
+        assert list(cache.series(NOW - pd.Timedelta(hours=6))['value']) == [18.0, 19.0]
+        assert backend.calls[-1] == ('series', pd.Timestamp('2026-03-01T06:00:00Z'))
+        assert cache.series(NOW - pd.Timedelta(days=2)) is None
+
+    def test_eviction_drops_the_series_and_keeps_the_latest_readings(self, cache, backend):
+        backend.latest = readings(('temp_001', 1, 19.0))
+        backend.series = readings(*[('temp_001', minutes, float(minutes)) for minutes in range(60)])
+        cache.latest()
+        cache.series(NOW - pd.Timedelta(hours=1))
+        rows, size = cache.memory_usage()
+
+        assert rows == 61
+        assert cache.evict_to(size // 2) > 0
+        assert cache.memory_usage()[0] == 1
+
+
+class TestConcurrentReads:
+
+    def test_a_slow_refresh_does_not_hold_up_cached_reads(self, cache, backend, clock):
+        backend.latest = readings(('temp_001', 1, 19.0))
+        backend.series = readings(('temp_001', 30, 19.0))
+        cache.latest()
+        cache.series(NOW - pd.Timedelta(hours=1))
+        querying, release = threading.Event(), threading.Event()
+        fetch_series = cache.fetch_series
+        cache.fetch_series = lambda since: (querying.set(), release.wait(5), fetch_series(since))[2]
+        clock['now'] = NOW + pd.Timedelta(minutes=1)
+        refresh = threading.Thread(target=cache.series, args=(NOW - pd.Timedelta(minutes=59),))
+        refresh.start()
+        querying.wait(2)
+
+        reads = []
+        reader = threading.Thread(target=lambda: reads.extend([
+            list(cache.series(NOW - pd.Timedelta(minutes=59))['value']), list(cache.latest()['value'])]))
+        reader.start()
+        # The refresh is blocked in its query; other readers are not
+        reader.join(2)
+        waited_for_refresh = reader.is_alive()
+        release.set()
+        refresh.join()
+        reader.join()
+
+        assert not waited_for_refresh
+        assert reads == [[19.0], [19.0]]
+        assert [kind for kind, _ in backend.calls].count('series') == 2
+
+    def test_concurrent_cold_reads_share_one_query(self, backend, clock):
+        cache = SensorCache(backend.fetch_latest, backend.fetch_series, refresh_interval=60,
+                            clock=lambda: clock['now'])
+        backend.latest = readings(('temp_001', 1, 19.0))
+        fetch_latest = cache.fetch_latest
+        started = threading.Barrier(4)
+        cache.fetch_latest = lambda since: (threading.Event().wait(0.2), fetch_latest(since))[1]
+        results = []
+
+        def read():
+            started.wait()
+            results.append(list(cache.latest()['value']))
+
+        threads = [threading.Thread(target=read) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == [[19.0]] * 4
+        assert len(backend.calls) == 1
+
+
+class TestSensorModel:
+
+    @pytest.fixture(scope='class')
+    def influx(self):
+        with FakeInfluxDB(SensorDataset(devices_per_type=3, points=240)) as standin:
+            yield standin
+
+    def model(self, influx, cached):
+        model = TemperatureModel()
+        model.client = InfluxDBClient(url=influx.url, token='token', org='org')
+        if not cached:
+            model.cache = None
+        return model
+
+    def test_cached_reads_match_direct_queries(self, influx):
+        cached, direct = self.model(influx, True), self.model(influx, False)
+
+        for device_ids in (None, ['temp_002']):
+            expected = direct.get_sensor_data('-30m', device_ids)
+            actual = cached.get_sensor_data('-30m', device_ids)
+            pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected.reset_index(drop=True),
+                                          check_dtype=False)
+        pd.testing.assert_frame_equal(cached.get_latest_device_data(), direct.get_latest_device_data(),
+                                      check_dtype=False)
+        assert cached.get_devices() == ['temp_001', 'temp_002', 'temp_003']
+        cached.close()
+        direct.close()
+
+    def test_repeated_reads_query_only_for_new_readings(self, influx):
+        model = self.model(influx, True)
+        model.cache.refresh_interval = 60
+        before = influx.requests
+        for _ in range(5):
+            model.get_latest_device_data()
+            model.get_sensor_data('-1h', ['temp_001'])
+            model.get_sensor_data('-10m')
+
+        assert influx.requests - before == 2
+        model.close()
+
+    def test_devices_come_from_the_catalog_query_within_its_ttl(self, influx):
+        model = self.model(influx, True)
+        before = influx.requests
+        for _ in range(3):
+            assert model.get_devices() == ['temp_001', 'temp_002', 'temp_003']
+
+        # Not derived from the latest readings, which only keep the value field
+        assert model.cache.export()['latest'] is None
+        assert influx.requests - before == 1
+        model.close()
@@ -0,0 +1,71 @@
+from src.dashboard.utils.session_store import SessionStore, value_size
+
+
+class TestSessionStore:
+
+    def test_versions_are_returned_per_put(self):
+        store = SessionStore()
+        first = store.put('a', {'type': 'condition'})
+        second = store.put('a', {'type': 'and'})
+
+        assert first != second
+        assert store.get('a', first) == {'type': 'condition'}
+        assert store.get('a', second) == {'type': 'and'}
+
+    def test_missing_session_or_version_returns_default(self):
+        store = SessionStore()
+        version = store.put('a', [1, 2])
+
+        assert store.get('b', version, []) == []
+        assert store.get('a', version + 1, 'default') == 'default'
+        assert store.get(None, version) is None
+        assert store.get('a', None) is None
+
+    def test_session_bytes_are_bounded(self):
+        value = list(range(100))
+        store = SessionStore(max_session_bytes=value_size(value) * 3)
+        versions = [store.put('a', value) for _ in range(10)]
+
+        assert store.session_bytes('a') <= value_size(value) * 3
+        assert store.get('a', versions[-1]) == value
+        assert store.get('a', versions[0]) is None
+
+    def test_recently_read_versions_survive_eviction(self):
+        value = list(range(100))
+        store = SessionStore(max_session_bytes=value_size(value) * 2)
+        first = store.put('a', value)
+        store.put('a', value)
+        store.get('a', first)
+        store.put('a', value)
+
+        assert store.get('a', first) == value
+
+    def test_oversized_value_is_still_kept(self):
+        store = SessionStore(max_session_bytes=10)
+        version = store.put('a', 'x' * 100)
+
+        assert store.get('a', version) == 'x' * 100
+
+    def test_least_recently_used_session_is_evicted(self):
+        store = SessionStore(max_sessions=2)
+        a = store.put('a', 1)
+        store.put('b', 2)
+        store.get('a', a)
+        store.put('c', 3)
+
+        assert len(store) == 2
+        assert store.get('a', a) == 1
+        assert store.session_bytes('b') == 0
+        assert store.stats()['sessions'] == 2
+
+    def test_memory_budget_evicts_least_recently_used_sessions(self):
+        store = SessionStore()
+        a = store.put('a', list(range(1000)))
+        b = store.put('b', list(range(1000)))
+        store.get('a', a)
+        entries, size = store.memory_usage()
+
+        assert entries == 2
+        assert store.evict_to(size - 1) > 0
+        assert store.get('a', a) is not None
+        assert store.get('b', b) is None
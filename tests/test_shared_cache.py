@@ -0,0 +1,168 @@
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+
+import pandas as pd
+import pytest
+from dateutil.tz import tzlocal
+
+from src.dashboard.utils.device_sync import DeviceSnapshot
+from src.dashboard.utils.rule_cache import RuleCache
+from src.dashboard.utils.session_store import SessionStore
+from src.dashboard.utils.shared_cache import SharedCache
+from test_device_sync import FakeRuleEngine as FakeDeviceEngine, make_device
+from test_rule_cache import FakeRuleEngine, make_rules
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'cache.sqlite')
+
+
+def _compute_in_child(path, results):
+    # A worker process: the cache was opened by the parent before forking
+    cache = SharedCache(path)
+    results.put(cache.get_or_compute('query:slow', 60, lambda: (cache.next('computed'), time.sleep(0.3))[0])[1])
+
+
+class TestSharedCache:
+
+    def test_entries_expire_and_stamps_change_on_write(self, path):
+        cache = SharedCache(path)
+        first = cache.set('query:a', {'rows': 1}, ttl=60)
+        second = cache.set('query:a', {'rows': 2}, ttl=60)
+        cache.set('query:b', 'gone', ttl=-1)
+
+        assert second > first
+        assert cache.get('query:a') == (second, {'rows': 2})
+        assert cache.stamp('query:a') == second
+        assert cache.get('query:b') is None
+
+    def test_concurrent_misses_compute_once(self, path):
+        cache = SharedCache(path)
+        results = []
+
+        def compute():
+            cache.next('computed')
+            time.sleep(0.2)
+            return 'value'
+
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('query:x', 60, compute)))
+                   for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len({stamp for stamp, _ in results}) == 1
+        assert cache.next('computed') == 2
+
+    def test_forked_workers_share_one_computation(self, path):
+        parent = SharedCache(path)
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        workers = [context.Process(target=_compute_in_child, args=(path, results)) for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(10)
+
+        assert sorted(results.get(timeout=1) for _ in workers) == [1, 1, 1]
+        assert parent.get('query:slow')[1] == 1
+
+    def test_failed_computation_is_not_cached(self, path):
+        cache = SharedCache(path)
+
+        def broken():
+            raise ConnectionError('refused')
+
+        with pytest.raises(ConnectionError):
+            cache.get_or_compute('query:x', 60, broken)
+        assert cache.get_or_compute('query:x', 60, lambda: 'ok')[1] == 'ok'
+
+    def test_prune_keeps_the_newest_entries_within_budget(self, path):
+        cache = SharedCache(path, max_bytes=3100)
+        for index in range(5):
+            cache.set(f'query:{index}', 'x' * 998, ttl=60)
+
+        cache.prune()
+
+        assert [cache.get(f'query:{index}') is not None for index in range(5)] == [False, False, True, True, True]
+        assert cache.stats()['bytes'] <= 3100
+
+    def test_frames_and_sets_round_trip_as_json(self, path):
+        cache = SharedCache(path)
+        frame = pd.DataFrame({
+            '_time': pd.Series(pd.to_datetime(['2026-03-01T12:00:00Z', None], utc=True)).dt.tz_convert(tzlocal()),
+            'value': [19.5, float('nan')], 'device_id': ['temp_001', None], 'table': [0, 1],
+        })
+        cache.set('query:frame', {'frames': [frame], 'changes': [(3, frozenset({'light_001'}))]}, ttl=60)
+
+        value = cache.get('query:frame')[1]
+        pd.testing.assert_frame_equal(value['frames'][0], frame)
+        assert value['changes'] == [[3, frozenset({'light_001'})]]
+        with pytest.raises(TypeError):
+            cache.set('query:object', object(), ttl=60)
+
+    def test_pickled_entries_are_dropped_unread(self, path):
+        cache = SharedCache(path)
+        blob = pickle.dumps(Exploit())
+        cache._connection().execute('INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?)',
+                                    ('query:planted', 1, blob, len(blob), time.time(), time.time() + 60))
+
+        assert cache.get('query:planted') is None
+        assert not Exploit.ran
+
+    def test_files_in_directories_others_can_write_are_refused(self, tmp_path):
+        shared = tmp_path / 'shared'
+        shared.mkdir()
+        os.chmod(shared, 0o777)
+
+        with pytest.raises(PermissionError):
+            SharedCache(str(shared / 'cache.sqlite'))
+
+
+class Exploit:
+    ran = False
+
+    def __reduce__(self):
+        return setattr, (Exploit, 'ran', True)
+
+
+class TestSharedConsumers:
+
+    def test_session_values_are_found_by_another_worker(self, path):
+        first, second = SessionStore(shared=SharedCache(path)), SessionStore(shared=SharedCache(path))
+        version = first.put('session-1', {'tree': 1})
+
+        assert second.get('session-1', version) == {'tree': 1}
+        assert second.put('session-1', {'tree': 2}) != version
+
+    def test_rules_are_fetched_once_and_writes_reach_other_workers(self, path):
+        engine = FakeRuleEngine(make_rules())
+        first = RuleCache(engine, ttl=60, shared=SharedCache(path))
+        second = RuleCache(engine, ttl=60, shared=SharedCache(path))
+
+        assert len(first.get_rules('heater_001')) == 2
+        assert len(second.get_rules('heater_001')) == 2
+        assert len(engine.requests) == 1
+
+        first.apply_deleted(2)
+
+        assert [rule['rule_id'] for rule in second.get_rules('heater_001')] == [1]
+        assert len(engine.requests) == 1
+
+    def test_device_snapshot_versions_agree_across_workers(self, path):
+        engine = FakeDeviceEngine()
+        engine.body['devices'] = [make_device('light_001'), make_device('light_002')]
+        first = DeviceSnapshot(engine, min_sync_interval=60, shared=SharedCache(path))
+        second = DeviceSnapshot(engine, min_sync_interval=60, shared=SharedCache(path))
+
+        version = first.sync()
+
+        assert second.sync() == version
+        assert [device['device_id'] for device in second.devices] == ['light_001', 'light_002']
+        assert second.changed_since(version) == set()
+        assert len(engine.params) == 1
@@ -0,0 +1,121 @@
+import socket
+import subprocess
+import sys
+import threading
+
+from src.config.imports import LazyModule
+from src.dashboard.warmup import run_warmup, start_warmup, wait_for_port
+from src.models.sensor import TemperatureModel
+from src.telemetry.startup import StartupTimeline, import_report, parse_importtime, startup
+
+IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       100 |        100 |     pkg.inner
+import time:       300 |        400 |   pkg
+import time:        50 |        450 | app
+import time:        20 |         20 | pkg.inner
+import time:        10 |         10 | other
+"""
+
+
+class TestLazyModule:
+
+    def test_module_is_imported_on_first_attribute(self):
+        module = LazyModule('json')
+
+        assert module.dumps({'a': 1}) == '{"a": 1}'
+        assert module.loaded
+        assert 'dumps' in vars(module)
+
+    def test_threads_racing_on_first_read_get_one_module(self):
+        module = LazyModule('decimal')
+        seen = []
+        threads = [threading.Thread(target=lambda: seen.append(module.Decimal)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(set(map(id, seen))) == 1
+
+    def test_dashboard_import_leaves_heavy_modules_unloaded(self):
+        code = ("import sys, src.dashboard.app; "
+                "print(','.join(m for m in ('pandas', 'numpy', 'plotly.express', 'influxdb_client') "
+                "if m in sys.modules))")
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+
+        assert result.returncode == 0, result.stderr
+        # The logger also writes to stdout, so only the last line is ours
+        assert result.stdout.splitlines()[-1] == ''
+
+    def test_sensor_models_connect_on_first_use(self):
+        model = TemperatureModel()
+
+        assert model._client is None
+        client = model.client
+        assert model.client is client
+        model.close()
+
+
+class TestImportReport:
+
+    def test_importtime_lines_are_parsed_with_depth(self):
+        entries = parse_importtime(IMPORTTIME)
+
+        assert [(entry['module'], entry['depth']) for entry in entries] == [
+            ('pkg.inner', 2), ('pkg', 1), ('app', 0), ('pkg.inner', 0), ('other', 0)]
+
+    def test_report_sums_packages_and_lists_each_module_once(self):
+        report = import_report(parse_importtime(IMPORTTIME), limit=2)
+
+        assert report['total_us'] == 480
+        assert report['packages'] == [{'package': 'pkg', 'self_us': 420}, {'package': 'app', 'self_us': 50}]
+        assert [(entry['module'], entry['cumulative_us']) for entry in report['slowest']] == [('app', 450),
+                                                                                            ('pkg', 400)]
+
+
+class TestWarmup:
+
+    def test_failing_tasks_are_recorded_and_the_rest_still_run(self, monkeypatch):
+        timeline = StartupTimeline()
+        monkeypatch.setattr('src.dashboard.warmup.startup', timeline)
+        ran = []
+
+        def broken():
+            raise ConnectionError('refused')
+
+        run_warmup([('broken', broken), ('after', lambda: ran.append(True))])
+
+        assert ran == [True]
+        assert [(task['task'], task['error']) for task in timeline.tasks] == [
+            ('broken', 'ConnectionError: refused'), ('after', None)]
+        assert 'warm' in timeline.phases
+
+    def test_warmup_waits_for_the_port(self, monkeypatch):
+        timeline = StartupTimeline()
+        monkeypatch.setattr('src.dashboard.warmup.startup', timeline)
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        port = listener.getsockname()[1]
+        assert not wait_for_port('127.0.0.1', port, 0.2)
+
+        ran = threading.Event()
+        thread = start_warmup(None, port, tasks=[('task', ran.set)])
+        assert not ran.wait(0.2)
+        listener.listen()
+        thread.join(5)
+        listener.close()
+
+        assert ran.is_set()
+        assert timeline.phases['serving'] <= timeline.phases['warm']
+
+    def test_imported_phase_is_marked_by_the_app(self):
+        import src.dashboard.app  # noqa: F401
+
+        assert 'imported' in startup.snapshot()['phases']
+
+    def test_requests_wait_for_deferred_imports(self):
+        from src.config.imports import import_deferred
+        from src.dashboard.app import app
+
+        assert import_deferred in app.server.before_request_funcs[None]
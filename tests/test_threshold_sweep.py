@@ -0,0 +1,84 @@
+import pandas as pd
+import pytest
+
+from src.rules import backtest_frame
+from src.rules.threshold_sweep import sweep_frame
+
+
+def readings(values):
+    times = pd.date_range('2026-03-02 10:00', periods=len(values), freq='1min', tz='UTC')
+    return pd.DataFrame({'_time': times, 'value': values, 'device_id': 'temp_001'})
+
+
+END = pd.Timestamp('2026-03-02 10:10', tz='UTC')
+
+
+class TestThresholdSweep:
+
+    def test_matches_backtest_for_every_threshold(self):
+        data = readings([20, 24, 26, 22, 27, 27, 19, 25, 21, 23])
+        thresholds = [18, 21, 22.5, 24, 25, 26, 27, 28]
+
+        for operator in ['gte', 'gt', 'lte', 'lt', 'eq', 'ne']:
+            sweep = sweep_frame(data, 'temp_001', operator, thresholds, end=END)
+            for threshold, fires, seconds in zip(sweep.thresholds, sweep.fire_counts, sweep.active_seconds):
+                leaf = {'type': 'condition', 'sensor_device': 'temp_001', 'operator': operator, 'value': threshold}
+                expected = backtest_frame(leaf, data, end=END)
+                assert (fires, seconds) == (expected.fire_count, expected.active_seconds), (operator, threshold)
+
+    def test_default_thresholds_span_observed_values(self):
+        sweep = sweep_frame(readings([10, 30, 20]), 'temp_001', 'gte', points=5, end=END)
+
+        assert sweep.thresholds == [10, 15, 20, 25, 30]
+        assert sweep.fire_counts == [1, 1, 1, 1, 1]
+        assert sweep.total_seconds == 600
+
+    def test_unknown_sensor_returns_empty_sweep(self):
+        assert sweep_frame(readings([1, 2]), 'temp_404', 'gte').thresholds == []
+
+
+class TestSweepRoute:
+
+    @pytest.fixture
+    def client(self, monkeypatch):
+        from flask import Flask
+        from src.dashboard.routes import analysis
+        monkeypatch.setattr(analysis, 'sensor_device_ids', lambda: {'temp_001'})
+        monkeypatch.setattr(analysis, 'sweep_sensor', lambda *args: sweep_frame(readings([20, 25]), 'temp_001', 'gte'))
+        app = Flask(__name__)
+        app.register_blueprint(analysis.analysis_blueprint)
+        return app.test_client()
+
+    @pytest.mark.parametrize('query', [
+        'sensor_device=temp_001&start=-7d) |> drop(columns: ["x"]',
+        'sensor_device=temp_001&start=2026-03-01',
+        'sensor_device=temp_001&start=-7x',
+        'sensor_device=temp_404',
+        'sensor_device=temp_001" or r._measurement == "x',
+        'sensor_device=temp_001&operator=between',
+        'sensor_device=temp_001&points=1',
+        'sensor_device=temp_001&points=-3',
+        'sensor_device=temp_001&' + '&'.join(f'threshold={value}' for value in range(501)),
+    ])
+    def test_rejects_values_that_would_reach_the_query(self, client, query):
+        assert client.get(f'/api/analysis/threshold-sweep?{query}').status_code == 400
+
+    def test_known_device_and_relative_start_are_swept(self, client):
+        response = client.get('/api/analysis/threshold-sweep?sensor_device=temp_001&start=-12h')
+
+        assert response.status_code == 200
+        assert response.get_json()['success']
+
+    def test_editor_keeps_a_bounded_number_of_sweeps(self, monkeypatch):
+        from src.dashboard.callbacks import edit_modal
+        devices = {f'temp_{index:03d}' for index in range(edit_modal.MAX_SWEEPS + 10)}
+        monkeypatch.setattr(edit_modal, 'sensor_device_ids', lambda: devices)
+        monkeypatch.setattr(edit_modal, 'sweep_sensor',
+                            lambda models, device, operator, start_time: sweep_frame(readings([20, 25]), device, operator))
+        monkeypatch.setattr(edit_modal, '_sweep_cache', edit_modal.OrderedDict())
+        for device in sorted(devices):
+            edit_modal.update_threshold_sweep(device, 'gte', 22)
+        edit_modal.update_threshold_sweep('temp_010', 'gte', 22)
+
+        assert len(edit_modal._sweep_cache) == edit_modal.MAX_SWEEPS
+        assert list(edit_modal._sweep_cache)[-1] == ('temp_010', 'gte')
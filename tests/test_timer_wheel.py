@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta, timezone
+
+from src.rules.conditions import next_time_filter_boundary
+from src.rules.timer_wheel import TimerWheel
+
+START = datetime(2026, 3, 2, 21, 30, tzinfo=timezone.utc)  # a Monday
+
+
+class TestTimerWheel:
+
+    def test_fires_at_deadline_not_before(self):
+        wheel = TimerWheel(start=START)
+        wheel.schedule('soon', START + timedelta(seconds=2.5))
+        wheel.schedule('later', START + timedelta(hours=5))
+
+        assert wheel.advance(START + timedelta(seconds=2)) == []
+        assert wheel.advance(START + timedelta(seconds=3)) == ['soon']
+        assert wheel.advance(START + timedelta(hours=5) - timedelta(seconds=1)) == []
+        assert wheel.advance(START + timedelta(hours=5)) == ['later']
+        assert len(wheel) == 0
+
+    def test_cancel_and_reschedule(self):
+        wheel = TimerWheel(start=START)
+        wheel.schedule('a', START + timedelta(minutes=1))
+        wheel.schedule('b', START + timedelta(minutes=1))
+        wheel.cancel('a')
+        wheel.schedule('b', START + timedelta(days=2))
+
+        assert wheel.advance(START + timedelta(days=1)) == []
+        assert wheel.advance(START + timedelta(days=2)) == ['b']
+
+    def test_far_deadlines_overflow_the_top_level(self):
+        wheel = TimerWheel(start=START)
+        wheel.schedule('next_year', START + timedelta(days=365))
+
+        assert wheel.advance(START + timedelta(days=364)) == []
+        assert wheel.advance(START + timedelta(days=365, seconds=1)) == ['next_year']
+
+    def test_past_deadlines_fire_on_next_advance(self):
+        wheel = TimerWheel(start=START)
+        wheel.schedule('missed', START - timedelta(minutes=5))
+
+        assert wheel.advance(START) == ['missed']
+
+
+class TestNextTimeFilterBoundary:
+
+    def test_time_of_day_wrapping_midnight(self):
+        time_filter = {'type': 'time_of_day', 'start': '22:00', 'end': '06:00'}
+
+        assert next_time_filter_boundary(time_filter, START) == START.replace(hour=22, minute=0)
+        assert next_time_filter_boundary(time_filter, START.replace(hour=23)) == datetime(2026, 3, 3, 6, tzinfo=timezone.utc)
+
+    def test_days_of_week_changes_at_midnight(self):
+        boundary = next_time_filter_boundary({'type': 'days_of_week', 'days': ['monday']}, START)
+        assert boundary == datetime(2026, 3, 3, tzinfo=timezone.utc)
+
+    def test_recent_expires_one_window_after_reading(self):
+        time_filter = {'type': 'recent', 'minutes': 10}
+        reading_time = START - timedelta(minutes=4)
+
+        boundary = next_time_filter_boundary(time_filter, START, reading_time)
+        assert timedelta(minutes=6) < boundary - START < timedelta(minutes=6, seconds=1)
+        assert next_time_filter_boundary(time_filter, START, START - timedelta(hours=1)) is None
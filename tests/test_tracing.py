@@ -0,0 +1,84 @@
+import contextvars
+import json
+import time
+
+import pytest
+
+from src.telemetry.tracing import Tracer, NOOP_SPAN, KIND_CLIENT, STATUS_ERROR
+
+
+def read_traces(path):
+    traces = []
+    for line in path.read_text().splitlines():
+        request = json.loads(line)
+        traces.append(request['resourceSpans'][0]['scopeSpans'][0]['spans'])
+    return traces
+
+
+class TestTracer:
+
+    def test_child_spans_share_the_trace_of_their_parent(self, tmp_path):
+        path = tmp_path / 'traces.jsonl'
+        tracer = Tracer(enabled=True, mode='all', path=str(path))
+        with tracer.span('callback update_charts', callback='update_charts'):
+            with tracer.span('influx.query', kind=KIND_CLIENT, range='-1h', device_count=2) as span:
+                span.set_attribute('rows', 10)
+            with tracer.span('chart.figures'):
+                pass
+
+        [spans] = read_traces(path)
+        by_name = {span['name']: span for span in spans}
+        root = by_name['callback update_charts']
+        assert 'parentSpanId' not in root
+        assert {span['traceId'] for span in spans} == {root['traceId']}
+        assert by_name['influx.query']['parentSpanId'] == root['spanId']
+        assert by_name['influx.query']['kind'] == KIND_CLIENT
+        attributes = {a['key']: a['value'] for a in by_name['influx.query']['attributes']}
+        assert attributes == {'range': {'stringValue': '-1h'}, 'device_count': {'intValue': '2'},
+                              'rows': {'intValue': '10'}}
+        assert int(root['endTimeUnixNano']) >= int(by_name['chart.figures']['endTimeUnixNano'])
+
+    def test_spans_in_a_copied_context_attach_to_the_request_span(self, tmp_path):
+        path = tmp_path / 'traces.jsonl'
+        tracer = Tracer(enabled=True, mode='all', path=str(path))
+        root = tracer.span('callback')
+        root.__enter__()
+
+        def callback():
+            with tracer.span('influx.query'):
+                pass
+
+        contextvars.copy_context().run(callback)
+        root.__exit__(None, None, None)
+
+        [spans] = read_traces(path)
+        assert [span['name'] for span in spans] == ['influx.query', 'callback']
+
+    def test_tail_mode_keeps_only_slow_or_failed_traces(self, tmp_path):
+        path = tmp_path / 'traces.jsonl'
+        tracer = Tracer(enabled=True, mode='tail', slow_ms=20, path=str(path))
+        with tracer.span('fast'):
+            pass
+        with tracer.span('slow'):
+            time.sleep(0.03)
+        with pytest.raises(ValueError):
+            with tracer.span('failed'):
+                with tracer.span('query'):
+                    raise ValueError("bad query")
+
+        traces = read_traces(path)
+        assert [spans[-1]['name'] for spans in traces] == ['slow', 'failed']
+        failed = {span['name']: span for span in traces[1]}
+        assert failed['query']['status'] == {'code': STATUS_ERROR, 'message': 'ValueError: bad query'}
+        assert tracer.exported == 2
+        assert tracer.discarded == 1
+
+    def test_disabled_tracer_returns_a_noop_span(self, tmp_path):
+        path = tmp_path / 'traces.jsonl'
+        tracer = Tracer(enabled=False, path=str(path))
+        with tracer.span('callback') as span:
+            span.set_attribute('rows', 1)
+
+        assert span is NOOP_SPAN
+        assert tracer.current_span() is NOOP_SPAN
+        assert not path.exists()